@@ -1,8 +1,101 @@
 # archivo principal de la aplicación Flask
-from flask import Flask, render_template, request
-from utils.calculator import calcular_impacto, obtener_estadisticas_por_modelo, obtener_estadisticas_por_tipo_consulta
+import hashlib
+import math
+import os
+
+from flask import Flask, Response, jsonify, make_response, render_template, request, send_file, url_for
+from utils import asignacion, assets, calentamiento, ingesta, metricas, perfilado, plantillas, registro, trabajos
+from utils.calculator import GESTOR, GESTOR_INCERTIDUMBRE, GESTOR_PERFILES, calcular_impacto, calcular_impacto_lote, obtener_estadisticas, ranking_eficiencia
+from utils.proyeccion import barrido, grilla, proyeccion_temporal
 
 app = Flask(__name__)
+metricas.instrumentar(app)
+
+# Paquetes CSS/JS construidos con `python -m utils assets` (ruta /assets/ y assets() en templates);
+# el manifiesto (nombres con hash) forma parte del ETag de las páginas que los enlazan
+MANIFIESTO_ASSETS = assets.registrar(app)
+
+# Bytecode de templates en disco y fragmentos cacheados por versión del dataset (ver utils/plantillas.py)
+plantillas.registrar(app)
+
+# Perfilado de requests a pedido (sin ECOAI_PERFIL_DIR no se instala; ver utils/perfilado.py)
+perfilado.registrar(app)
+
+# Máximo de ítems aceptados por request en /api/calcular/lote
+app.config['LOTE_MAX_ITEMS'] = 100_000
+
+# Segundos que un navegador, CDN o proxy puede reutilizar una respuesta cacheable
+app.config['CACHE_MAX_AGE'] = int(os.environ.get('ECOAI_CACHE_MAX_AGE', 300))
+
+# Máximo de puntos (series × cantidades) que puede evaluar /api/proyeccion por request
+app.config['PROYECCION_MAX_PUNTOS'] = 1_000_000
+
+# Versión del código desplegado (Render define RENDER_GIT_COMMIT); forma parte de los ETag
+app.config['VERSION_APP'] = os.environ.get('RENDER_GIT_COMMIT', '')
+
+# Registro persistente de los cálculos (SQLite); deshabilitado si no se define ECOAI_REGISTRO_DB
+REGISTRO = registro.desde_entorno()
+
+# Trabajos en segundo plano sobre archivos subidos; deshabilitados si no se define ECOAI_TRABAJOS_DIR
+TRABAJOS = trabajos.desde_entorno()
+
+# Tamaño máximo de un archivo subido a /api/trabajos
+app.config['TRABAJOS_MAX_BYTES'] = 1024 ** 3
+
+def calcular_etag(*partes, dataset=True):
+    """
+    ETag fuerte derivado de la versión del código, la versión del dataset y las entradas.
+    Con dataset=False no depende del dataset (páginas que no muestran sus datos).
+    """
+    version = GESTOR.actual().version if dataset else ''
+    clave = '\x1f'.join(str(p) for p in (app.config['VERSION_APP'], version) + partes)
+    return hashlib.sha256(clave.encode('utf-8')).hexdigest()[:32]
+
+def respuesta_cacheable(etag, generar):
+    """
+    Responde 304 si el cliente ya tiene el ETag; si no, genera la respuesta y
+    agrega ETag y Cache-Control para que un CDN o proxy pueda reutilizarla.
+    
+    Args:
+        etag: ETag calculado con calcular_etag
+        generar: función sin argumentos que produce la respuesta (solo se llama si hace falta)
+    """
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(generar())
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['CACHE_MAX_AGE']
+    return response
+
+def leer_cantidad(valor):
+    """
+    Convierte la cantidad recibida como texto a int o float (None si no es
+    numérica o no es finita: 'nan', 'inf', '1e400').
+    """
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        try:
+            numero = float(valor)
+        except (TypeError, ValueError):
+            return None
+        return numero if math.isfinite(numero) else None
+
+def leer_nivel(valor):
+    """
+    Parámetro de incertidumbre recibido como texto: ausente -> None,
+    '1'/'true'/'si' -> True (nivel por defecto), un número -> nivel de confianza.
+    """
+    if valor is None or valor is False or valor == '':
+        return None
+    if valor is True or str(valor).lower() in ('1', 'true', 'si', 'sí'):
+        return True
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValueError("Error: el nivel de confianza debe estar entre 0 y 1")
 
 # Ruta principal (interfaz web)
 
@@ -17,32 +110,443 @@ def calcular():
     modelo = request.form.get('modelo')
     tipo_consulta = request.form.get('tipo_consulta')
     cantidad = request.form.get('cantidad', type=int)
-    resultado = calcular_impacto(modelo, tipo_consulta, cantidad) 
+    with metricas.cronometro('ecoai_calculo_duracion_segundos', funcion='calcular_impacto'):
+        resultado = calcular_impacto(modelo, tipo_consulta, cantidad)
+    if (REGISTRO is not None and isinstance(resultado, dict)
+            and not request.environ.get(calentamiento.ENTORNO_CALENTAMIENTO)):
+        # Se encola; la escritura en disco la hace el thread del registro
+        REGISTRO.registrar(modelo, tipo_consulta, cantidad, resultado['agua'], resultado['energia'],
+                           resultado['co2'], equipo=request.form.get('equipo', '').strip())
     return render_template('results.html', resultado=resultado)
 
+# Ruta para cálculo individual (JSON, cacheable)
+
+@app.route('/api/calcular', methods=['GET'])
+def calcular_api():
+    """
+    Variante GET/JSON de /calcular. El resultado depende solo de las entradas
+    y de la versión del dataset, así que se expone con ETag y Cache-Control.
+    
+    Con incertidumbre=1 (o un nivel, ej: 0.95) agrega los intervalos de
+    agua, energia y co2. Con region (y opcionalmente fecha) el CO2 se calcula
+    con la intensidad de la red de esa región.
+    """
+    modelo = request.args.get('modelo')
+    tipo_consulta = request.args.get('tipo_consulta')
+    cantidad = leer_cantidad(request.args.get('cantidad'))
+    region = request.args.get('region') or None
+    fecha = request.args.get('fecha') or None
+    try:
+        nivel = leer_nivel(request.args.get('incertidumbre'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # El ETag depende solo de las entradas y las versiones: si el cliente ya tiene
+    # la respuesta, el 304 sale sin calcular (los errores nunca llevan ETag)
+    version_incertidumbre = GESTOR_INCERTIDUMBRE.actual().version if nivel else None
+    version_perfiles = GESTOR_PERFILES.version if region else None
+    etag = calcular_etag('calcular', modelo, tipo_consulta, repr(cantidad), repr(nivel), version_incertidumbre,
+                         region, fecha, version_perfiles)
+    if request.if_none_match.contains(etag):
+        return respuesta_cacheable(etag, None)
+    
+    with metricas.cronometro('ecoai_calculo_duracion_segundos', funcion='calcular_impacto'):
+        resultado = calcular_impacto(modelo, tipo_consulta, cantidad, nivel, region, fecha)
+    if isinstance(resultado, str):
+        return jsonify({'error': resultado}), 400
+    return respuesta_cacheable(etag, lambda: jsonify(resultado))
+
+# Ruta para cálculo en lote (JSON)
+
+@app.route('/api/calcular/lote', methods=['POST'])
+def calcular_lote():
+    """
+    Calcula el impacto de muchos ítems en una sola request.
+    
+    Acepta {"items": [{"modelo", "tipo_consulta", "cantidad"}, ...]} o las
+    columnas directamente: {"modelo": [...], "tipo_consulta": [...], "cantidad": [...]}.
+    Cada ítem puede traer "region" y "fecha" (o las columnas "region" y "fecha")
+    para calcular su CO2 con la intensidad de la red.
+    Los ítems inválidos se reportan en "errores" sin abortar el lote.
+    Con "incertidumbre": true (o un nivel, ej: 0.95) agrega los intervalos
+    por ítem y de los totales. Con "equivalencias": false se omiten las columnas
+    de equivalencias (lotes grandes). Con el registro de uso habilitado, los ítems
+    válidos se registran a nombre de "equipo" (opcional).
+    """
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    
+    if 'items' in datos:
+        items = datos['items']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return jsonify({'error': '"items" debe ser una lista de objetos'}), 400
+        modelos = [item.get('modelo') for item in items]
+        tipos_consulta = [item.get('tipo_consulta') for item in items]
+        cantidades = [item.get('cantidad') for item in items]
+        regiones = [item.get('region') for item in items]
+        fechas = [item.get('fecha') for item in items]
+        if not any(regiones):
+            regiones = fechas = None
+    else:
+        modelos = datos.get('modelo')
+        tipos_consulta = datos.get('tipo_consulta')
+        cantidades = datos.get('cantidad')
+        if not all(isinstance(col, list) for col in (modelos, tipos_consulta, cantidades)):
+            return jsonify({'error': 'Se esperaba "items" o las listas "modelo", "tipo_consulta" y "cantidad"'}), 400
+        regiones = datos.get('region')
+        fechas = datos.get('fecha') if regiones is not None else None
+        if not all(isinstance(col, list) for col in (regiones, fechas) if col is not None):
+            return jsonify({'error': '"region" y "fecha" deben ser listas'}), 400
+    
+    if len(cantidades) > app.config['LOTE_MAX_ITEMS']:
+        return jsonify({'error': f"El lote supera el máximo de {app.config['LOTE_MAX_ITEMS']} ítems"}), 413
+    
+    try:
+        nivel = leer_nivel(datos.get('incertidumbre'))
+        with metricas.cronometro('ecoai_calculo_duracion_segundos', funcion='calcular_impacto_lote'):
+            resultado = calcular_impacto_lote(modelos, tipos_consulta, cantidades, nivel, regiones, fechas,
+                                              equivalencias=datos.get('equivalencias') is not False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if REGISTRO is not None:
+        registrar_lote(resultado, modelos, tipos_consulta, cantidades, str(datos.get('equipo') or ''))
+    return jsonify(resultado)
+
+def registrar_lote(resultado, modelos, tipos_consulta, cantidades, equipo):
+    """
+    Encola en el registro de uso los ítems válidos de un lote calculado.
+    """
+    invalidos = {error['indice'] for error in resultado['errores']}
+    fecha = registro.ahora_iso()
+    REGISTRO.registrar_filas(
+        (fecha, equipo, m, t, c, a, e, co2)
+        for i, (m, t, c, a, e, co2) in enumerate(zip(modelos, tipos_consulta, cantidades,
+                                                     resultado['agua'], resultado['energia'], resultado['co2']))
+        if i not in invalidos
+    )
+
+# Rutas de proyección (barridos server-side para los gráficos de impacto acumulado)
+
+def _lista_numeros(valor):
+    # "1,10,100" -> [1.0, 10.0, 100.0]
+    return [float(v) for v in valor.split(',') if v.strip()]
+
+def _lista_textos(nombre):
+    # Acepta ?modelo=a&modelo=b o ?modelos=a,b
+    valores = request.args.getlist(nombre)
+    plural = request.args.get(nombre + 's')
+    if plural:
+        valores += [v.strip() for v in plural.split(',') if v.strip()]
+    return valores
+
+@app.route('/api/proyeccion')
+def proyeccion():
+    """
+    Barrido de impacto sobre cantidad × modelo × tipo_consulta × horizonte.
+    
+    Parámetros: modelo/modelos, tipo_consulta/tipos_consulta (por defecto todos),
+    cantidades=1,10,100 o desde/hasta/pasos/escala (lineal|log),
+    horizontes=1,30,365 y max_puntos (presupuesto por serie, reducido con LTTB).
+    """
+    args = request.args
+    try:
+        cantidades = _lista_numeros(args['cantidades']) if 'cantidades' in args else None
+        pasos = len(cantidades) if cantidades is not None else int(args.get('pasos', 100))
+        horizontes = _lista_numeros(args.get('horizontes', '1'))
+        max_puntos = args.get('max_puntos', type=int)
+        modelos = _lista_textos('modelo')
+        tipos_consulta = _lista_textos('tipo_consulta')
+        
+        # Validar el tamaño antes de generar la grilla
+        tabla = GESTOR.actual().tabla
+        n_modelos = len(modelos) or len(tabla.modelos())
+        n_tipos = len(tipos_consulta) or len(tabla.tipos_consulta())
+        if n_modelos * n_tipos * len(horizontes) * pasos > app.config['PROYECCION_MAX_PUNTOS']:
+            return jsonify({'error': f"La grilla supera el máximo de {app.config['PROYECCION_MAX_PUNTOS']} puntos"}), 413
+        
+        if cantidades is None:
+            cantidades = grilla(float(args.get('desde', 1)), float(args.get('hasta', 10000)),
+                                pasos, args.get('escala', 'log'))
+        
+        etag = calcular_etag('proyeccion', sorted(args.items(multi=True)))
+        return respuesta_cacheable(etag, lambda: jsonify(barrido(
+            modelos, tipos_consulta, cantidades, horizontes, max_puntos
+        )))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/proyeccion/temporal')
+def proyeccion_temporal_api():
+    """
+    Impacto acumulado periodo a periodo para una combinación, con crecimiento del uso.
+    
+    Parámetros: modelo, tipo_consulta, cantidad (por periodo), periodos,
+    crecimiento (tasa por periodo, ej: 0.05) y max_puntos.
+    """
+    args = request.args
+    try:
+        cantidad = float(args.get('cantidad', 1))
+        periodos = int(args.get('periodos', 12))
+        if not cantidad > 0:
+            return jsonify({'error': 'Error: La cantidad debe ser un número positivo'}), 400
+        if periodos > app.config['PROYECCION_MAX_PUNTOS']:
+            return jsonify({'error': f"Se permiten como máximo {app.config['PROYECCION_MAX_PUNTOS']} periodos"}), 413
+        serie = proyeccion_temporal(args.get('modelo'), args.get('tipo_consulta'), cantidad, periodos,
+                                    float(args.get('crecimiento', 0)), args.get('max_puntos', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if serie is None:
+        return jsonify({'error': f"Combinación no encontrada: {args.get('modelo')} + {args.get('tipo_consulta')}"}), 404
+    
+    etag = calcular_etag('proyeccion_temporal', sorted(args.items(multi=True)))
+    return respuesta_cacheable(etag, lambda: jsonify(serie))
+
 # Ruta para comparativo/gráficos
 
 @app.route('/comparativo')
 def comparativo():
     """
     Renderiza la página de comparativos con gráficos Chart.js.
-    Pasa datos del CSV para visualización de estadísticas por modelo y tipo de consulta.
+    La página no incluye estadísticas: cada gráfico las pide a /api/graficos recién
+    cuando entra en pantalla. Sí lista los modelos y tipos del dataset en los selects
+    de la proyección, por eso el ETag depende del dataset, de los templates y del
+    manifiesto de assets (el HTML enlaza los paquetes con hash, que cambian al reconstruirlos).
+    """
+    etag = calcular_etag('comparativo', plantillas.version_templates(app.jinja_env),
+                         sorted(MANIFIESTO_ASSETS.items()))
+    return respuesta_cacheable(etag, lambda: render_template('results_charts.html'))
+
+@app.route('/api/graficos')
+def graficos():
+    """
+    Datos de los gráficos de /comparativo: promedios de agua, energía y CO2
+    por modelo y por tipo de consulta.
     """
-    modelos = ['GPT-4 Turbo', 'Claude 3', 'Gemini 1.5']
-    tipos_consulta = ['texto', 'código', 'imagen', 'audio', 'video']
+    def generar():
+        # Modelos y tipos del dataset vigente; estadísticas precalculadas por snapshot
+        tabla = GESTOR.actual().tabla
+        estadisticas = obtener_estadisticas()
+        return jsonify({
+            'modelos': tabla.modelos(),
+            'tipos_consulta': tabla.tipos_consulta(),
+            'por_modelo': estadisticas['por_modelo'],
+            'por_tipo_consulta': estadisticas['por_tipo_consulta'],
+        })
+
+    return respuesta_cacheable(calcular_etag('graficos'), generar)
+
+@app.route('/api/ranking')
+def ranking():
+    """
+    Ranking de eficiencia ambiental de todos los modelos del dataset.
     
-    # Obtener estadísticas desde el CSV
-    model_stats = obtener_estadisticas_por_modelo()
-    query_type_stats = obtener_estadisticas_por_tipo_consulta()
+    Parámetros: pesos (ej: agua:1,energia:1,carbono:2), tipo_consulta,
+    pagina y por_pagina (ver calculator.ranking_eficiencia).
+    """
+    args = request.args
+    try:
+        pesos = {}
+        for parte in args.get('pesos', '').split(','):
+            if parte.strip():
+                metrica, _, peso = parte.partition(':')
+                pesos[metrica.strip()] = float(peso)
+        pagina = int(args.get('pagina', 1))
+        por_pagina = int(args.get('por_pagina', 20))
+        etag = calcular_etag('ranking', sorted(args.items(multi=True)))
+        return respuesta_cacheable(etag, lambda: jsonify(ranking_eficiencia(
+            pesos, args.get('tipo_consulta') or None, pagina, por_pagina
+        )))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Ruta de optimización de la asignación de carga (JSON)
+
+@app.route('/api/optimizar', methods=['POST'])
+def optimizar():
+    """
+    Reparte una carga de trabajo entre los modelos minimizando su impacto.
     
-    return render_template('results_charts.html',
-        models=modelos,
-        query_types=tipos_consulta,
-        model_stats=model_stats,
-        query_type_stats=query_type_stats
-    )
+    Cuerpo: {"demanda": {tipo: cantidad}, "objetivo": "co2" | "agua" |
+    "energia" | {pesos}, "permitidos", "capacidades", "capacidades_tipo"}
+    (ver asignacion.optimizar_asignacion).
+    """
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    try:
+        with metricas.cronometro('ecoai_calculo_duracion_segundos', funcion='optimizar_asignacion'):
+            resultado = asignacion.optimizar_asignacion(
+                datos.get('demanda'), datos.get('objetivo', 'co2'), datos.get('permitidos'),
+                datos.get('capacidades'), datos.get('capacidades_tipo'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(resultado)
+
+# Ruta de totales del registro de uso
+
+@app.route('/api/registro/totales')
+def registro_totales():
+    """
+    Totales de impacto registrados, agrupados por equipo, modelo y/o tipo de
+    consulta y por periodo. Parámetros: por (ej: equipo,modelo), periodo
+    (hora, dia, mes, anio o total), desde, hasta, equipo, modelo, tipo_consulta.
+    """
+    if REGISTRO is None:
+        return jsonify({'error': 'Registro de uso deshabilitado (definir ECOAI_REGISTRO_DB)'}), 404
+    args = request.args
+    por = [c.strip() for c in args.get('por', 'equipo').split(',') if c.strip()]
+    filtros = {c: args[c] for c in registro.AGRUPACIONES if c in args}
+    try:
+        filas = REGISTRO.totales(por, args.get('periodo', 'mes'), args.get('desde'), args.get('hasta'), **filtros)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'filas': filas, 'pendientes': REGISTRO.pendientes()})
+
+@app.route('/api/registro/acumulados')
+def registro_acumulados():
+    """
+    Totales por día, mes o año leídos de los acumulados materializados (incluye
+    lo ingerido con --registro). Parámetros: periodo (dia, mes, anio o total),
+    por (modelo y/o tipo_consulta), desde, hasta, modelo, tipo_consulta.
+    """
+    if REGISTRO is None:
+        return jsonify({'error': 'Registro de uso deshabilitado (definir ECOAI_REGISTRO_DB)'}), 404
+    args = request.args
+    por = [c.strip() for c in args.get('por', 'modelo,tipo_consulta').split(',') if c.strip()]
+    filtros = {c: args[c] for c in ('modelo', 'tipo_consulta') if c in args}
+    try:
+        filas = REGISTRO.acumulados(args.get('periodo', 'mes'), args.get('desde'), args.get('hasta'), por, **filtros)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'filas': filas, 'pendientes': REGISTRO.pendientes()})
+
+# Rutas de trabajos en segundo plano (archivos de registros de uso)
+
+ARCHIVOS_TRABAJO = {
+    'resultados': ('resultados.csv', 'text/csv'),
+    'agregados.csv': ('agregados.csv', 'text/csv'),
+    'agregados.json': ('agregados.json', 'application/json'),
+}
+
+def _trabajos_deshabilitados():
+    return jsonify({'error': 'Trabajos deshabilitados (definir ECOAI_TRABAJOS_DIR)'}), 404
+
+def _con_urls(estado):
+    id_trabajo = estado['id']
+    estado['urls'] = {
+        'estado': url_for('trabajo_estado', id_trabajo=id_trabajo),
+        **{nombre: url_for('trabajo_archivo', id_trabajo=id_trabajo, nombre=nombre) for nombre in ARCHIVOS_TRABAJO},
+    }
+    return estado
+
+@app.route('/api/trabajos', methods=['POST'])
+def trabajo_crear():
+    """
+    Sube un archivo de registros de uso (CSV o NDJSON) y lo procesa en segundo plano.
+    
+    El archivo va en el campo "archivo" de un form multipart o como cuerpo de
+    la request. Parámetros: formato (csv o ndjson; por defecto según el nombre
+    o el Content-Type) y por (periodo de los agregados, 'mes' por defecto).
+    Responde 202 con el id del trabajo sin esperar a que se procese.
+    """
+    if TRABAJOS is None:
+        return _trabajos_deshabilitados()
+    maximo = app.config['TRABAJOS_MAX_BYTES']
+    if request.content_length is not None and request.content_length > maximo:
+        return jsonify({'error': f"El archivo supera el máximo de {maximo} bytes"}), 413
+    subido = request.files.get('archivo') if request.mimetype == 'multipart/form-data' else None
+    if subido is not None:
+        flujo, nombre = subido.stream, subido.filename or ''
+    else:
+        flujo, nombre = request.stream, ''
+    formato = request.args.get('formato')
+    if not formato:
+        tipo = subido.mimetype if subido is not None else request.mimetype
+        formato = 'ndjson' if 'json' in tipo else ingesta.detectar_formato(nombre)
+    try:
+        estado = TRABAJOS.crear(flujo, formato, request.args.get('por', 'mes'), nombre, maximo)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    respuesta = jsonify(_con_urls(estado))
+    respuesta.status_code = 202
+    respuesta.headers['Location'] = estado['urls']['estado']
+    return respuesta
+
+@app.route('/api/trabajos')
+def trabajo_listar():
+    """
+    Los últimos trabajos (parámetro limite, 50 por defecto) con su progreso.
+    """
+    if TRABAJOS is None:
+        return _trabajos_deshabilitados()
+    limite = request.args.get('limite', 50, type=int)
+    return jsonify({'trabajos': [_con_urls(estado) for estado in TRABAJOS.listar(limite)]})
+
+@app.route('/api/trabajos/<id_trabajo>')
+def trabajo_estado(id_trabajo):
+    """
+    Estado de un trabajo: registros procesados, porcentaje del archivo leído,
+    tiempo estimado restante (eta_segundos) y, al terminar, los totales.
+    """
+    if TRABAJOS is None:
+        return _trabajos_deshabilitados()
+    estado = TRABAJOS.estado(id_trabajo)
+    if estado is None:
+        return jsonify({'error': f"Trabajo no encontrado: {id_trabajo}"}), 404
+    return jsonify(_con_urls(estado))
+
+@app.route('/api/trabajos/<id_trabajo>/<nombre>')
+def trabajo_archivo(id_trabajo, nombre):
+    """
+    Descarga los resultados por registro (resultados) o los agregados por
+    modelo, tipo y periodo (agregados.csv o agregados.json) de un trabajo terminado.
+    """
+    if TRABAJOS is None:
+        return _trabajos_deshabilitados()
+    if nombre not in ARCHIVOS_TRABAJO:
+        return jsonify({'error': f"Archivo no válido: {nombre} (usar {', '.join(ARCHIVOS_TRABAJO)})"}), 404
+    archivo, tipo = ARCHIVOS_TRABAJO[nombre]
+    estado, ruta = TRABAJOS.archivo(id_trabajo, archivo)
+    if estado is None:
+        return jsonify({'error': f"Trabajo no encontrado: {id_trabajo}"}), 404
+    if ruta is None:
+        return jsonify({'error': f"El trabajo está {estado['estado']}", 'estado': estado['estado']}), 409
+    return send_file(ruta, mimetype=tipo, as_attachment=True, download_name=f'{id_trabajo}_{archivo}',
+                     conditional=True)
+
+# Ruta para consultar la versión del dataset cargada en este worker
+
+@app.route('/api/dataset')
+def dataset_info():
+    """
+    Retorna la versión y fecha de carga del dataset vigente en este proceso,
+    para confirmar que todos los workers convergieron tras una actualización.
+    """
+    return jsonify(GESTOR.info())
+
+# Ruta de readiness (para el health check del balanceador)
+
+@app.route('/listo')
+def listo():
+    """
+    Responde 200 solo cuando este worker tiene el dataset cargado y los
+    templates y caches calientes; mientras tanto, 503.
+    """
+    estado = calentamiento.estado()
+    return jsonify(estado), 200 if estado['listo'] else 503
+
+# Ruta de métricas (formato de texto de Prometheus)
+
+@app.route('/metrics')
+def metrics():
+    """
+    Exporta contadores e histogramas de latencia, sumados entre todos los workers.
+    """
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
+    calentamiento.calentar(app)
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Benchmarks de EcoAI.
+
+Miden los caminos críticos del calculador y de las rutas Flask, también sobre
+datasets sintéticos escalados, y comparan contra baselines JSON guardadas.
+"""
@@ -0,0 +1,60 @@
+"""
+Ejecuta la suite de benchmarks.
+
+Uso:
+    python -m benchmarks --guardar                      # crea/actualiza la baseline
+    python -m benchmarks --comparar --umbral 0.25       # falla si algo es >25% más lento
+    python -m benchmarks --escalas 1000,10000 --filtro calcular_impacto
+"""
+
+import argparse
+import json
+import sys
+
+from .suite import DIRECTORIO_BASELINES, ESCALAS_POR_DEFECTO, UMBRAL_POR_DEFECTO, comparar, ejecutar, guardar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks de EcoAI')
+    parser.add_argument('--escalas', default=','.join(str(e) for e in ESCALAS_POR_DEFECTO),
+                        help='filas de los datasets sintéticos, separadas por coma')
+    parser.add_argument('--filtro', help='solo casos cuyo nombre contenga este texto')
+    parser.add_argument('--baseline', default=str(DIRECTORIO_BASELINES / 'baseline.json'),
+                        help='archivo JSON de baseline')
+    parser.add_argument('--guardar', action='store_true', help='guardar el resultado como baseline')
+    parser.add_argument('--comparar', action='store_true', help='comparar contra la baseline')
+    parser.add_argument('--umbral', type=float, default=UMBRAL_POR_DEFECTO,
+                        help='regresión tolerada (0.25 = 25%% más lento)')
+    parser.add_argument('--tiempo-minimo', type=float, default=0.2,
+                        help='segundos mínimos por repetición')
+    args = parser.parse_args(argv)
+
+    escalas = [int(e) for e in args.escalas.split(',') if e.strip()]
+    resultado = ejecutar(escalas, args.filtro, args.tiempo_minimo)
+
+    if args.guardar:
+        guardar(resultado, args.baseline)
+        print(f"Baseline guardada en {args.baseline}")
+
+    if args.comparar:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No existe la baseline {args.baseline}; ejecutar primero con --guardar", file=sys.stderr)
+            return 2
+        filas = comparar(baseline, resultado, args.umbral)
+        regresiones = [f for f in filas if f['regresion']]
+        print()
+        for fila in filas:
+            marca = 'REGRESIÓN' if fila['regresion'] else 'ok'
+            print(f"{fila['caso']:<50} x{fila['razon']:.2f}  {marca}")
+        if regresiones:
+            print(f"\n{len(regresiones)} caso(s) superan el umbral de {args.umbral:.0%}", file=sys.stderr)
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+Prueba de carga local: levanta la app con gunicorn y la recorre con una mezcla
+ponderada de rutas y formularios.
+
+Uso:
+    python -m benchmarks.carga --workers 2 --threads 4 --conexiones 16 --duracion 20
+    python -m benchmarks.carga --url http://127.0.0.1:5000 --duracion 10   # servidor ya levantado
+    python -m benchmarks.carga --mezcla calcular=1 --json resultado.json
+
+Reporta requests por segundo, latencias p50/p95/p99 y tasa de error, en total
+y por caso, para elegir workers/threads de render.yaml a partir de datos.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+MODELOS = ['GPT-4 Turbo', 'Claude 3', 'Gemini 1.5']
+TIPOS_CONSULTA = ['texto', 'código', 'imagen', 'audio', 'video']
+
+# Formularios inválidos (la app responde 200 con el mensaje de error en la página)
+FORMULARIOS_INVALIDOS = [
+    {'modelo': 'Modelo X', 'tipo_consulta': 'texto', 'cantidad': '5'},
+    {'modelo': 'Claude 3', 'tipo_consulta': 'podcast', 'cantidad': '5'},
+    {'modelo': 'Claude 3', 'tipo_consulta': 'texto', 'cantidad': '0'},
+    {'modelo': 'Claude 3', 'tipo_consulta': 'texto', 'cantidad': '-3'},
+    {'modelo': 'Claude 3', 'tipo_consulta': 'texto', 'cantidad': 'cinco'},
+    {'modelo': '', 'tipo_consulta': '', 'cantidad': ''},
+]
+
+# Caso -> peso relativo en la mezcla (aprox. el tráfico de la interfaz web)
+MEZCLA_POR_DEFECTO = {
+    'index': 30,
+    'calcular': 40,
+    'calcular_invalido': 10,
+    'comparativo': 10,
+    'graficos': 10,
+}
+
+
+def casos():
+    """
+    Retorna caso -> lista de requests (método, ruta, cuerpo) entre las que se elige al azar.
+
+    'calcular' cubre todas las combinaciones modelo × tipo_consulta con cantidades variadas.
+    """
+    validos = [
+        {'modelo': modelo, 'tipo_consulta': tipo, 'cantidad': str(cantidad)}
+        for modelo, tipo, cantidad in itertools.product(MODELOS, TIPOS_CONSULTA, (1, 5, 50, 1000))
+    ]
+    return {
+        'index': [('GET', '/', None)],
+        'calcular': [('POST', '/calcular', urllib.parse.urlencode(f)) for f in validos],
+        'calcular_invalido': [('POST', '/calcular', urllib.parse.urlencode(f)) for f in FORMULARIOS_INVALIDOS],
+        'comparativo': [('GET', '/comparativo', None)],
+        'graficos': [('GET', '/api/graficos', None)],
+    }
+
+
+def leer_mezcla(texto):
+    """
+    Convierte 'index=3,calcular=5' en {'index': 3, 'calcular': 5}.
+
+    Raises:
+        ValueError si un caso no existe o un peso no es un número positivo
+    """
+    disponibles = casos()
+    mezcla = {}
+    for parte in texto.split(','):
+        if not parte.strip():
+            continue
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in disponibles:
+            raise ValueError(f"Caso desconocido: {nombre} (disponibles: {', '.join(disponibles)})")
+        try:
+            mezcla[nombre] = float(peso) if peso else 1.0
+        except ValueError:
+            raise ValueError(f"Peso inválido para {nombre}: {peso}")
+        if mezcla[nombre] <= 0:
+            raise ValueError(f"Peso inválido para {nombre}: {peso}")
+    if not mezcla:
+        raise ValueError("La mezcla está vacía")
+    return mezcla
+
+
+def percentil(ordenados, q):
+    """
+    Percentil q (0-100) de una lista ordenada, por rango más cercano (None si está vacía).
+    """
+    if not ordenados:
+        return None
+    rango = math.ceil(q / 100 * len(ordenados))
+    return ordenados[max(0, min(len(ordenados), rango) - 1)]
+
+
+def _conducir(url, mezcla, hilos, duracion, calentamiento, semilla):
+    """
+    Envía requests con `hilos` conexiones concurrentes durante `calentamiento` + `duracion` segundos.
+
+    Returns:
+        lista de (caso, status, segundos) de las requests completadas después del calentamiento;
+        status es 0 si falló la conexión
+    """
+    destino = urllib.parse.urlsplit(url)
+    disponibles = casos()
+    nombres = list(mezcla)
+    pesos = [mezcla[n] for n in nombres]
+    inicio = time.perf_counter()
+    desde = inicio + calentamiento
+    hasta = desde + duracion
+    resultados = []
+    cerrojo = threading.Lock()
+
+    def hilo(indice):
+        aleatorio = random.Random(semilla * 1000 + indice)
+        conexion = None
+        propios = []
+        while True:
+            ahora = time.perf_counter()
+            if ahora >= hasta:
+                break
+            caso = aleatorio.choices(nombres, pesos)[0]
+            metodo, ruta, cuerpo = aleatorio.choice(disponibles[caso])
+            encabezados = {'Content-Type': 'application/x-www-form-urlencoded'} if cuerpo else {}
+            t0 = time.perf_counter()
+            try:
+                if conexion is None:
+                    conexion = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+                conexion.request(metodo, ruta, body=cuerpo, headers=encabezados)
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                status = respuesta.status
+                if respuesta.will_close:
+                    conexion.close()
+                    conexion = None
+            except (OSError, http.client.HTTPException):
+                status = 0
+                if conexion is not None:
+                    conexion.close()
+                conexion = None
+            t1 = time.perf_counter()
+            if t0 >= desde:
+                propios.append((caso, status, t1 - t0))
+        if conexion is not None:
+            conexion.close()
+        with cerrojo:
+            resultados.extend(propios)
+
+    threads = [threading.Thread(target=hilo, args=(i,), daemon=True) for i in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resultados
+
+
+def _conducir_proceso(argumentos):
+    return _conducir(*argumentos)
+
+
+def resumir(resultados, duracion):
+    """
+    Agrega los resultados por caso y en total.
+
+    Returns:
+        dict caso -> {requests, rps, p50_ms, p95_ms, p99_ms, errores, tasa_error, status};
+        la clave 'total' agrupa todos los casos. Es error cualquier status
+        distinto de 2xx/3xx o una conexión fallida.
+    """
+    grupos = {'total': []}
+    for caso, status, segundos in resultados:
+        grupos.setdefault(caso, []).append((status, segundos))
+        grupos['total'].append((status, segundos))
+    resumen = {}
+    for caso, filas in grupos.items():
+        latencias = sorted(s for _, s in filas)
+        errores = sum(1 for status, _ in filas if not 200 <= status < 400)
+        conteo_status = {}
+        for status, _ in filas:
+            conteo_status[str(status)] = conteo_status.get(str(status), 0) + 1
+        resumen[caso] = {
+            'requests': len(filas),
+            'rps': round(len(filas) / duracion, 1) if duracion else None,
+            **{f'p{q}_ms': round(percentil(latencias, q) * 1000, 2) if latencias else None for q in (50, 95, 99)},
+            'errores': errores,
+            'tasa_error': round(errores / len(filas), 4) if filas else 0.0,
+            'status': conteo_status,
+        }
+    return resumen
+
+
+def ejecutar_carga(url, mezcla=None, conexiones=8, duracion=10.0, calentamiento=1.0, procesos=1, semilla=0):
+    """
+    Ejecuta la prueba de carga contra un servidor ya levantado.
+
+    Args:
+        url: base del servidor (ej: http://127.0.0.1:5000)
+        mezcla: caso -> peso (por defecto MEZCLA_POR_DEFECTO)
+        conexiones: requests concurrentes en total (una conexión por hilo)
+        duracion: segundos medidos
+        calentamiento: segundos iniciales que no se cuentan
+        procesos: procesos generadores de carga (el cliente también usa CPU;
+            con varios procesos no lo limita el GIL)
+        semilla: semilla de la elección de casos
+
+    Returns:
+        dict con 'config' y 'resumen' (ver resumir)
+    """
+    mezcla = dict(mezcla or MEZCLA_POR_DEFECTO)
+    procesos = max(1, min(procesos, conexiones))
+    repartidos = [conexiones // procesos + (1 if i < conexiones % procesos else 0) for i in range(procesos)]
+    tareas = [(url, mezcla, hilos, duracion, calentamiento, semilla + i) for i, hilos in enumerate(repartidos)]
+    if procesos == 1:
+        resultados = _conducir(*tareas[0])
+    else:
+        with multiprocessing.get_context('spawn').Pool(procesos) as pool:
+            resultados = [fila for parte in pool.map(_conducir_proceso, tareas) for fila in parte]
+    return {
+        'config': {'url': url, 'mezcla': mezcla, 'conexiones': conexiones, 'duracion': duracion,
+                   'calentamiento': calentamiento, 'procesos': procesos},
+        'resumen': resumir(resultados, duracion),
+    }
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def levantar_gunicorn(workers=1, threads=1, puerto=None, timeout=60, entorno=None):
+    """
+    Inicia `gunicorn -c gunicorn.conf.py app:app` en 127.0.0.1 y espera a que /listo responda 200.
+
+    Args:
+        workers, threads: configuración de gunicorn a probar (threads > 1 usa el worker gthread)
+        puerto: puerto local (por defecto uno libre)
+        timeout: segundos máximos de espera del arranque
+        entorno: variables de entorno adicionales (ej: {'ECOAI_PRELOAD': '0'})
+
+    Returns:
+        (proceso, url)
+
+    Raises:
+        RuntimeError si gunicorn termina o no queda listo a tiempo
+    """
+    puerto = puerto or _puerto_libre()
+    comando = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app',
+               '--bind', f'127.0.0.1:{puerto}', '--workers', str(workers), '--threads', str(threads),
+               '--log-level', 'warning']
+    proceso = subprocess.Popen(comando, cwd=PROJECT_ROOT, env={**os.environ, **(entorno or {})})
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó con código {proceso.returncode}")
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=2)
+            conexion.request('GET', '/listo')
+            if conexion.getresponse().status == 200:
+                conexion.close()
+                return proceso, f'http://127.0.0.1:{puerto}'
+            conexion.close()
+        except OSError:
+            pass
+        time.sleep(0.1)
+    detener(proceso)
+    raise RuntimeError(f"gunicorn no quedó listo en {timeout} s")
+
+
+def detener(proceso, timeout=10):
+    """
+    Detiene gunicorn con SIGTERM (cierre ordenado de los workers).
+    """
+    proceso.terminate()
+    try:
+        proceso.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+        proceso.wait()
+
+
+def formatear(resultado):
+    """
+    Tabla de texto con el resumen por caso y el total al final.
+    """
+    resumen = resultado['resumen']
+    lineas = [f"{'caso':<20} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'error':>7}"]
+    for caso in sorted(c for c in resumen if c != 'total') + ['total']:
+        if caso not in resumen:
+            continue
+        fila = resumen[caso]
+        p = [f"{fila[k]:.2f}" if fila[k] is not None else '-' for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+        lineas.append(f"{caso:<20} {fila['requests']:>9} {fila['rps']:>9.1f} {p[0]:>8} {p[1]:>8} {p[2]:>8} "
+                      f"{fila['tasa_error']:>7.2%}")
+    return '\n'.join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.carga', description='Prueba de carga local de EcoAI')
+    parser.add_argument('--url', help='servidor ya levantado (si se omite, se inicia gunicorn)')
+    parser.add_argument('--workers', type=int, default=1, help='workers de gunicorn')
+    parser.add_argument('--threads', type=int, default=1, help='threads por worker de gunicorn')
+    parser.add_argument('--conexiones', type=int, default=8, help='requests concurrentes')
+    parser.add_argument('--duracion', type=float, default=10.0, help='segundos medidos')
+    parser.add_argument('--calentamiento', type=float, default=1.0, help='segundos iniciales descartados')
+    parser.add_argument('--procesos', type=int, default=min(4, os.cpu_count() or 1),
+                        help='procesos generadores de carga')
+    parser.add_argument('--mezcla', help='pesos por caso, ej: index=3,calcular=5 (casos: '
+                        + ', '.join(MEZCLA_POR_DEFECTO) + ')')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--json', help='guardar el resultado completo en este archivo')
+    args = parser.parse_args(argv)
+
+    try:
+        mezcla = leer_mezcla(args.mezcla) if args.mezcla else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    proceso = None
+    url = args.url
+    if url is None:
+        try:
+            proceso, url = levantar_gunicorn(args.workers, args.threads)
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    try:
+        resultado = ejecutar_carga(url, mezcla, args.conexiones, args.duracion, args.calentamiento,
+                                   args.procesos, args.semilla)
+    finally:
+        if proceso is not None:
+            detener(proceso)
+
+    if proceso is not None:
+        resultado['config'].update(workers=args.workers, threads=args.threads)
+    print(formatear(resultado))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+    return 1 if resultado['resumen'].get('total', {}).get('requests', 0) == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Casos de benchmark y utilidades de medición/comparación.
+"""
+
+import contextlib
+import csv
+import json
+import platform
+import random
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# directorio raíz al path para imports (igual que tests/conftest.py)
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from utils import calculator  # noqa: E402
+from utils.dataset import GestorDataset  # noqa: E402
+
+DIRECTORIO_BASELINES = Path(__file__).parent / 'baselines'
+
+ESCALAS_POR_DEFECTO = (1_000, 10_000, 100_000, 1_000_000)
+
+# Umbral de regresión por defecto: 25% más lento que la baseline
+UMBRAL_POR_DEFECTO = 0.25
+
+
+def medir(funcion, tiempo_minimo=0.2, repeticiones=5):
+    """
+    Mide una función y retorna estadísticas por llamada en nanosegundos.
+
+    Calibra la cantidad de iteraciones por repetición para que cada repetición
+    dure al menos `tiempo_minimo` segundos (mínimo una iteración) y reporta la
+    mediana y el mínimo entre repeticiones.
+    """
+    iteraciones = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            funcion()
+        duracion = time.perf_counter() - inicio
+        if duracion >= tiempo_minimo or iteraciones >= 1_000_000:
+            break
+        iteraciones *= 2 if duracion < tiempo_minimo / 10 else max(2, int(tiempo_minimo / duracion) + 1)
+
+    # Las funciones lentas (ej: 10^6 filas) se repiten menos
+    if duracion > 2:
+        repeticiones = min(repeticiones, 3)
+    muestras = [duracion / iteraciones]
+    for _ in range(repeticiones - 1):
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            funcion()
+        muestras.append((time.perf_counter() - inicio) / iteraciones)
+
+    return {
+        'mediana_ns': statistics.median(muestras) * 1e9,
+        'minimo_ns': min(muestras) * 1e9,
+        'iteraciones': iteraciones,
+        'repeticiones': len(muestras),
+    }
+
+
+def generar_dataset(ruta, filas, semilla=42):
+    """
+    Escribe un CSV sintético con las columnas de data/ecoai_dataset.csv y `filas` filas.
+
+    Reparte las filas entre ~filas/50 modelos sintéticos y los tipos de
+    consulta reales, con coeficientes cercanos a los del dataset original.
+    """
+    with open(calculator.CSV_PATH, 'r', encoding='utf-8') as f:
+        originales = list(csv.DictReader(f))
+    columnas = list(originales[0].keys())
+    rng = random.Random(semilla)
+    n_modelos = max(3, filas // 50)
+
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=columnas)
+        escritor.writeheader()
+        for i in range(filas):
+            base = dict(originales[i % len(originales)])
+            base['modelo'] = f"Modelo {i % n_modelos}"
+            for campo in ('agua(L)', 'energia(kWh)', 'carbono(gCO2e)'):
+                base[campo] = f"{float(base[campo]) * rng.uniform(0.8, 1.2):.4f}"
+            escritor.writerow(base)
+
+
+@contextlib.contextmanager
+def dataset_escalado(filas, directorio):
+    """
+    Reemplaza temporalmente el dataset del calculador por uno sintético de `filas` filas.
+    """
+    ruta = Path(directorio) / f'dataset_{filas}.csv'
+    if not ruta.exists():
+        generar_dataset(ruta, filas)
+    csv_original, gestor_original = calculator.CSV_PATH, calculator.GESTOR
+    calculator.CSV_PATH = ruta
+    calculator.GESTOR = GestorDataset(ruta, calculator.construir_datos, intervalo=3600)
+    try:
+        yield ruta
+    finally:
+        calculator.CSV_PATH, calculator.GESTOR = csv_original, gestor_original
+
+
+# Script que mide, en un proceso nuevo, desde el import de la app hasta la primera respuesta
+# y la memoria propia del proceso (anónima: no incluye páginas del archivo mapeado,
+# que se comparten entre workers a través del page cache)
+_SCRIPT_ARRANQUE = """
+import sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from app import app
+cliente = app.test_client()
+for ruta in ('/comparativo', '/api/graficos'):
+    respuesta = cliente.get(ruta)
+    assert respuesta.status_code == 200, respuesta.status_code
+duracion = time.perf_counter() - inicio
+cliente.post('/calcular', data={{'modelo': 'Modelo 1', 'tipo_consulta': 'texto', 'cantidad': 3}})
+memoria = 0
+try:
+    with open('/proc/self/smaps_rollup') as f:
+        memoria = next(int(l.split()[1]) for l in f if l.startswith('Anonymous:'))
+except (OSError, StopIteration):
+    pass
+print(memoria, duracion)
+"""
+
+
+def medir_arranque(ruta_csv, compilado, repeticiones=5):
+    """
+    Mide el tiempo desde el import de la app hasta la primera respuesta de /comparativo y /api/graficos.
+
+    Cada repetición es un intérprete nuevo con ECOAI_DATASET apuntando a
+    `ruta_csv`. Con compilado=True se genera antes el dataset compilado; con
+    False se borra para forzar el parseo del CSV. Además del tiempo reporta
+    'memoria_privada_kb' (memoria anónima del proceso, solo en Linux).
+    """
+    ruta_csv = Path(ruta_csv)
+    ruta_compilado = ruta_csv.with_suffix('.bin')
+    if compilado:
+        calculator.compilar_dataset(ruta_csv, ruta_compilado)
+    elif ruta_compilado.exists():
+        ruta_compilado.unlink()
+
+    entorno = {**os.environ, 'ECOAI_DATASET': str(ruta_csv)}
+    entorno.pop('ECOAI_METRICAS_DIR', None)
+    script = _SCRIPT_ARRANQUE.format(raiz=str(PROJECT_ROOT))
+    muestras = []
+    memoria = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', script], env=entorno, check=True,
+                                capture_output=True, text=True).stdout
+        kb, duracion = salida.strip().splitlines()[-1].split()
+        memoria.append(int(kb))
+        muestras.append(float(duracion))
+    return {
+        'mediana_ns': statistics.median(muestras) * 1e9,
+        'minimo_ns': min(muestras) * 1e9,
+        'iteraciones': 1,
+        'repeticiones': len(muestras),
+        'memoria_privada_kb': statistics.median(memoria),
+    }
+
+
+def _casos_calculador():
+    # Funciones del calculador sobre el dataset vigente
+    with open(calculator.CSV_PATH, 'rb') as f:
+        contenido = f.read()
+    primera = next(iter(calculator.GESTOR.actual().tabla))
+    # Lote de 1000 ítems repartidos entre todas las combinaciones del dataset
+    combinaciones = list(calculator.GESTOR.actual().tabla)
+    lote = [combinaciones[i % len(combinaciones)] for i in range(1000)]
+    lote_modelos, lote_tipos = [m for m, _ in lote], [t for _, t in lote]
+    return {
+        'cargar_datos_csv': calculator.cargar_datos_csv,
+        'cargar_datos_csv_completo': calculator.cargar_datos_csv_completo,
+        'construir_datos': lambda: calculator.construir_datos(contenido),
+        'calcular_impacto': lambda: calculator.calcular_impacto(primera[0], primera[1], 7),
+        'calcular_equivalencias': lambda: calculator.calcular_equivalencias(12.5, 3.2, 40.1),
+        'incertidumbre_individual': lambda: calculator.calcular_impacto(primera[0], primera[1], 7, True),
+        'incertidumbre_lote': lambda: calculator.calcular_impacto_lote(lote_modelos, lote_tipos, [3] * len(lote), True),
+        'lote': lambda: calculator.calcular_impacto_lote(lote_modelos, lote_tipos, [3] * len(lote)),
+        'lote_sin_equivalencias': lambda: calculator.calcular_impacto_lote(
+            lote_modelos, lote_tipos, [3] * len(lote), equivalencias=False),
+        'obtener_estadisticas_por_modelo': calculator.obtener_estadisticas_por_modelo,
+        'obtener_estadisticas_por_tipo_consulta': calculator.obtener_estadisticas_por_tipo_consulta,
+        'obtener_estadisticas_por_proveedor': lambda: calculator.obtener_estadisticas_por('proveedor'),
+        'agrupar_modelo_tipo': lambda: calculator.obtener_estadisticas_por(['modelo', 'tipo_consulta']),
+    }
+
+
+def _casos_rutas():
+    # Rutas Flask vía el cliente de pruebas (sin red)
+    from app import app
+
+    app.config['TESTING'] = True
+    client = app.test_client()
+    formulario = {'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 5}
+    return {
+        'ruta_index': lambda: client.get('/'),
+        'ruta_calcular': lambda: client.post('/calcular', data=formulario),
+        'ruta_comparativo': lambda: client.get('/comparativo'),
+        'ruta_graficos': lambda: client.get('/api/graficos'),
+    }
+
+
+def ejecutar(escalas=ESCALAS_POR_DEFECTO, filtro=None, tiempo_minimo=0.2, salida=print):
+    """
+    Ejecuta la suite completa y retorna {'meta': {...}, 'casos': {nombre: stats}}.
+
+    Los casos sobre el dataset real se llaman por su nombre (ej: 'calcular_impacto');
+    los escalados llevan el sufijo @filas (ej: 'construir_datos@100000').
+    """
+    casos = {}
+
+    def correr(nombre, funcion, medicion=None):
+        if filtro and filtro not in nombre:
+            return
+        casos[nombre] = medicion() if medicion else medir(funcion, tiempo_minimo)
+        memoria = casos[nombre].get('memoria_privada_kb')
+        extra = f"  {memoria / 1024:>8.1f} MiB privados" if memoria else ''
+        salida(f"{nombre:<50} {casos[nombre]['mediana_ns'] / 1e3:>14.2f} µs{extra}")
+
+    def correr_arranque(sufijo, ruta_csv):
+        # Arranque en frío con y sin dataset compilado (la ruta se copia para no tocar data/)
+        for modo, compilado in (('csv', False), ('compilado', True)):
+            correr(f"arranque_{modo}{sufijo}", None, lambda: medir_arranque(ruta_csv, compilado))
+
+    for nombre, funcion in {**_casos_calculador(), **_casos_rutas()}.items():
+        correr(nombre, funcion)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        copia = Path(directorio) / 'ecoai_dataset.csv'
+        copia.write_bytes(calculator.CSV_PATH.read_bytes())
+        correr_arranque('', copia)
+
+        nombres_escalados = list(_casos_calculador()) + ['ruta_graficos', 'arranque_csv', 'arranque_compilado']
+        for filas in escalas:
+            if filtro and not any(filtro in f"{nombre}@{filas}" for nombre in nombres_escalados):
+                continue
+            with dataset_escalado(filas, directorio) as ruta:
+                escalados = {**_casos_calculador(), 'ruta_graficos': _casos_rutas()['ruta_graficos']}
+                for nombre, funcion in escalados.items():
+                    correr(f"{nombre}@{filas}", funcion)
+            correr_arranque(f"@{filas}", ruta)
+
+    return {
+        'meta': {
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'escalas': list(escalas),
+        },
+        'casos': casos,
+    }
+
+
+def guardar(resultado, ruta):
+    """
+    Guarda el resultado de una ejecución como baseline JSON.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(resultado, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+
+def comparar(baseline, actual, umbral=UMBRAL_POR_DEFECTO):
+    """
+    Compara una ejecución contra una baseline.
+
+    Returns:
+        lista de dicts {caso, baseline_ns, actual_ns, razon, regresion} para los
+        casos presentes en ambas; regresion es True si actual > baseline × (1 + umbral)
+    """
+    filas = []
+    for caso, stats in sorted(actual['casos'].items()):
+        base = baseline['casos'].get(caso)
+        if base is None:
+            continue
+        razon = stats['mediana_ns'] / base['mediana_ns'] if base['mediana_ns'] else float('inf')
+        filas.append({
+            'caso': caso,
+            'baseline_ns': base['mediana_ns'],
+            'actual_ns': stats['mediana_ns'],
+            'razon': razon,
+            'regresion': razon > 1 + umbral,
+        })
+    return filas
@@ -0,0 +1,59 @@
+# configuración de gunicorn (gunicorn -c gunicorn.conf.py app:app)
+import gc
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# La app (dataset, agregados, templates) se carga una vez en el master y los
+# workers la heredan con el fork, compartiendo esas páginas (copy-on-write).
+preload_app = os.environ.get('ECOAI_PRELOAD', '1') != '0'
+
+# Directorio donde cada worker vuelca sus métricas para que /metrics las sume.
+# Si no se indica uno, se crea uno nuevo en cada arranque del master para no mezclar
+# ejecuciones anteriores y se borra en on_exit; los workers lo heredan por variable de
+# entorno. La marca ECOAI_METRICAS_TEMPORAL sobrevive a la relectura de esta
+# configuración (kill -HUP), que ya encuentra ECOAI_METRICAS_DIR definida.
+if 'ECOAI_METRICAS_DIR' not in os.environ:
+    os.environ['ECOAI_METRICAS_DIR'] = tempfile.mkdtemp(prefix='ecoai-metricas-')
+    os.environ['ECOAI_METRICAS_TEMPORAL'] = '1'
+
+# Sin GC mientras se importa la app en el master: así los objetos quedan
+# contiguos y no se liberan huecos en páginas que luego se comparten
+# (se vuelve a activar en when_ready, después de gc.freeze()).
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    # Master listo, justo antes de crear los workers
+    if server.cfg.preload_app:
+        from utils import calentamiento
+
+        estado = calentamiento.calentar(server.app.wsgi(), congelar=True)
+        gc.enable()
+        server.log.info("App precalentada en %s ms (%s objetos congelados)",
+                        estado['duracion_ms'], estado['congelados'])
+
+
+def post_worker_init(worker):
+    # Sin preload cada worker se calienta por su cuenta antes de aceptar requests
+    from utils import calentamiento
+
+    if not calentamiento.estado()['listo']:
+        calentamiento.calentar(worker.wsgi)
+
+    # Trabajos que quedaron pendientes o a medias al reiniciarse el worker o el servidor
+    from app import TRABAJOS
+
+    if TRABAJOS is not None:
+        reanudados = TRABAJOS.reanudar()
+        if reanudados:
+            worker.log.info("%s trabajos reanudados", reanudados)
+
+
+def on_exit(server):
+    # Al apagar el master se borra el directorio de métricas creado al arrancar
+    if os.environ.get('ECOAI_METRICAS_TEMPORAL'):
+        shutil.rmtree(os.environ['ECOAI_METRICAS_DIR'], ignore_errors=True)
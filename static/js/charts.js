@@ -17,6 +17,70 @@ const COLOR_PALETTE = {
     }
 };
 
+// Carga diferida: la página no trae datos; cada gráfico se crea cuando entra en pantalla
+// (o casi: rootMargin lo adelanta unos píxeles) y los datos se piden una sola vez a /api/graficos
+
+// id del canvas -> función que lo inicializa y si necesita los datos de /api/graficos
+const LAZY_CHARTS = {
+    modelComparisonChart: { init: initModelComparisonChart, needsData: true },
+    queryTypeChart: { init: initQueryTypeChart, needsData: true },
+    energyDistributionChart: { init: initEnergyDistributionChart, needsData: true },
+    cumulativeImpactChart: { init: initCumulativeImpactChart, needsData: false },
+    efficiencyIndexChart: { init: initEfficiencyIndexChart, needsData: false }
+};
+
+// Promesa compartida por todos los gráficos (un solo fetch, cacheable por ETag)
+let chartDataPromise = null;
+
+function loadChartData() {
+    if (!chartDataPromise) {
+        chartDataPromise = fetch('/api/graficos')
+            .then(response => {
+                if (!response.ok) throw new Error('HTTP ' + response.status);
+                return response.json();
+            })
+            .then(datos => ({
+                models: datos.modelos,
+                queryTypes: datos.tipos_consulta,
+                modelStats: datos.por_modelo,
+                queryTypeStats: datos.por_tipo_consulta
+            }))
+            .catch(error => {
+                chartDataPromise = null; // reintentar con el próximo gráfico visible
+                throw error;
+            });
+    }
+    return chartDataPromise;
+}
+
+function renderLazyChart(canvas) {
+    const chart = LAZY_CHARTS[canvas.id];
+    const datos = chart.needsData ? loadChartData() : Promise.resolve(null);
+    datos.then(chartData => chart.init(chartData))
+        .catch(error => console.error('No se pudieron obtener los datos de los gráficos:', error));
+}
+
+function initLazyCharts() {
+    const canvases = Object.keys(LAZY_CHARTS)
+        .map(id => document.getElementById(id))
+        .filter(canvas => canvas !== null);
+    
+    // Navegadores sin IntersectionObserver: se inicializan todos de inmediato
+    if (!('IntersectionObserver' in window)) {
+        canvases.forEach(renderLazyChart);
+        return;
+    }
+    
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            observer.unobserve(entry.target);
+            renderLazyChart(entry.target);
+        });
+    }, { rootMargin: '200px 0px' });
+    canvases.forEach(canvas => observer.observe(canvas));
+}
+
 // Gráfico de comparación de impacto ambiental por modelo IA (barras agrupadas)
 function initModelComparisonChart(chartData) {
     const ctx = document.getElementById('modelComparisonChart');
@@ -205,29 +269,56 @@ function initEnergyDistributionChart(chartData) {
     });
 }
 
+// Instancia vigente del gráfico acumulado (se destruye al cambiar los selects)
+let cumulativeChart = null;
+
 // Gráfico de líneas que proyecta el impacto ambiental acumulado por cantidad de consultas
-function initCumulativeImpactChart(chartData) {
+// Las series se calculan en el servidor (/api/proyeccion) para el modelo + tipo seleccionado
+async function initCumulativeImpactChart() {
     const ctx = document.getElementById('cumulativeImpactChart');
     if (!ctx) return;
     
-    const selectedModel = document.getElementById('cumulativeModel')?.value || 'GPT-4 Turbo';
-    const selectedQueryType = document.getElementById('cumulativeQueryType')?.value || 'texto';
+    // Las opciones de los selects salen del dataset vigente (catalogo() en el template)
+    const selectedModel = document.getElementById('cumulativeModel')?.value;
+    const selectedQueryType = document.getElementById('cumulativeQueryType')?.value;
+    if (!selectedModel || !selectedQueryType) return;
     
-    // Obtener datos base para modelo + tipo seleccionado
-    const baseStats = chartData.queryTypeStats[selectedQueryType];
+    // Grilla logarítmica de 1 a 10.000 consultas, reducida a 60 puntos en el servidor
+    const params = new URLSearchParams({
+        modelo: selectedModel,
+        tipo_consulta: selectedQueryType,
+        desde: 1,
+        hasta: 10000,
+        pasos: 500,
+        escala: 'log',
+        max_puntos: 60
+    });
     
-    if (!baseStats) {
+    let projection;
+    try {
+        const response = await fetch('/api/proyeccion?' + params.toString());
+        projection = await response.json();
+    } catch (error) {
+        console.error('No se pudo obtener la proyección:', error);
+        return;
+    }
+    
+    const serie = projection.series && projection.series[0];
+    if (!serie) {
         console.error('No se encontraron datos para:', selectedModel, selectedQueryType);
         return;
     }
     
-    // Crear arrays de cantidades para proyección
-    const quantities = [1, 10, 100, 1000, 10000];
-    const waterData = quantities.map(q => (baseStats.agua * q).toFixed(2));
-    const energyData = quantities.map(q => (baseStats.energia * q).toFixed(2));
-    const carbonData = quantities.map(q => (baseStats.carbono * q).toFixed(2));
+    const quantities = projection.x.map(q => Math.round(q));
+    const waterData = serie.agua.map(v => v.toFixed(2));
+    const energyData = serie.energia.map(v => v.toFixed(2));
+    const carbonData = serie.co2.map(v => v.toFixed(2));
     
-    new Chart(ctx, {
+    if (cumulativeChart) {
+        cumulativeChart.destroy();
+    }
+    
+    cumulativeChart = new Chart(ctx, {
         type: 'line',
         data: {
             labels: quantities.map(q => q + ' consultas'),
@@ -299,28 +390,35 @@ function initCumulativeImpactChart(chartData) {
     });
 }
 
+// Vuelve a pedir la proyección al cambiar los selects, solo si el gráfico ya se mostró
+function refreshCumulativeImpactChart() {
+    if (cumulativeChart) {
+        initCumulativeImpactChart();
+    }
+}
+
 // Gráfico de barras horizontales que muestra el índice de eficiencia ambiental por modelo
-function initEfficiencyIndexChart(chartData) {
+// El ranking (100 / impacto ponderado, mayor = más eficiente) se calcula en el servidor (/api/ranking)
+async function initEfficiencyIndexChart() {
     const ctx = document.getElementById('efficiencyIndexChart');
     if (!ctx) return;
     
-    // Calcular score de eficiencia para cada modelo
-    const models = chartData.models;
-    const efficiencyScores = models.map(model => {
-        const stats = chartData.modelStats[model];
-        const total = stats.agua + stats.energia + stats.carbono;
-        return {
-            modelo: model,
-            score: 100 / total
-        };
-    });
-    
-    // Ordenar por score (mayor a menor eficiencia)
-    efficiencyScores.sort((a, b) => b.score - a.score);
+    let ranking;
+    try {
+        const response = await fetch('/api/ranking?por_pagina=10');
+        ranking = await response.json();
+    } catch (error) {
+        console.error('No se pudo obtener el ranking de eficiencia:', error);
+        return;
+    }
+    if (!ranking.ranking) {
+        console.error('Error en el ranking de eficiencia:', ranking.error);
+        return;
+    }
     
-    // Extraer etiquetas y scores ordenados
-    const sortedModels = efficiencyScores.map(e => e.modelo);
-    const sortedScores = efficiencyScores.map(e => e.score);
+    // Ya viene ordenado de mayor a menor eficiencia
+    const sortedModels = ranking.ranking.map(e => e.modelo);
+    const sortedScores = ranking.ranking.map(e => e.indice);
     
     new Chart(ctx, {
         type: 'bar',
@@ -47,4 +47,19 @@ def all_query_types():
     """
     Lista de todos los tipos de consulta válidos.
     """
-    return ['texto', 'código', 'imagen', 'audio', 'video']
\ No newline at end of file
+    return ['texto', 'código', 'imagen', 'audio', 'video']
+
+
+@pytest.fixture
+def catalogo_grande(tmp_path, monkeypatch):
+    """dataset de prueba con 300 modelos (texto e imagen) en lugar del real"""
+    from utils import calculator
+    from utils.dataset import GestorDataset
+    lineas = ['modelo,proveedor,tipo_consulta,unidad_medida,agua(L),energia(kWh),carbono(gCO2e)']
+    for i in range(300):
+        lineas.append(f'Modelo {i},P,texto,pregunta,{1 + (i * 37) % 300 / 100},{0.5 + i % 7 / 10},{2 - i % 11 / 10}')
+        lineas.append(f'Modelo {i},P,imagen,imagen,{3 + i % 5},{1 + i % 3},{1 + (i * 13) % 300 / 10}')
+    ruta = tmp_path / 'catalogo.csv'
+    ruta.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    monkeypatch.setattr(calculator, 'GESTOR', GestorDataset(ruta, calculator.construir_datos, intervalo=3600))
+    return calculator
@@ -0,0 +1,138 @@
+"""
+Unit tests para utils/asignacion.py
+Verifican que la asignación respeta las restricciones y es óptima (contra fuerza bruta)
+"""
+
+import itertools
+import math
+import random
+
+import pytest
+from utils import asignacion
+from utils.asignacion import optimizar_asignacion, resolver
+
+
+def _fuerza_bruta(demandas, arcos, capacidad_modelo):
+    """(asignado, costo) óptimos enumerando todas las asignaciones enteras"""
+    modelos = sorted({m for a in arcos for m in a})
+    opciones = []
+    for t, demanda in enumerate(demandas):
+        opciones.append([
+            x for x in itertools.product(range(int(demanda) + 1), repeat=len(modelos))
+            if sum(x) <= demanda and all(
+                c == 0 or (m in arcos[t] and c <= arcos[t][m][1]) for m, c in zip(modelos, x))
+        ])
+    mejor = None
+    for combinacion in itertools.product(*opciones):
+        if any(sum(x[i] for x in combinacion) > capacidad_modelo.get(m, float('inf'))
+               for i, m in enumerate(modelos)):
+            continue
+        asignado = sum(sum(x) for x in combinacion)
+        costo = sum(arcos[t][m][0] * c for t, x in enumerate(combinacion) for m, c in zip(modelos, x) if c)
+        if mejor is None or (-asignado, costo) < (-mejor[0], mejor[1]):
+            mejor = (asignado, costo)
+    return mejor
+
+
+class TestResolver:
+    """tests del flujo de costo mínimo"""
+
+    def test_optimo_contra_fuerza_bruta(self):
+        """verif que en instancias chicas asigna lo máximo posible al menor costo"""
+        r = random.Random(7)
+        for _ in range(60):
+            demandas = [r.randint(1, 4) for _ in range(2)]
+            arcos = [{m: (r.randint(1, 9), r.choice([1, 2, 3, float('inf')]))
+                      for m in 'abc' if r.random() < 0.8} for _ in demandas]
+            capacidad_modelo = {m: r.randint(0, 4) for m in 'abc' if r.random() < 0.7}
+            flujo, pendiente = resolver(demandas, arcos, capacidad_modelo)
+            asignado = sum(flujo.values())
+            costo = sum(arcos[t][m][0] * c for (t, m), c in flujo.items())
+            esperado = _fuerza_bruta(demandas, arcos, capacidad_modelo)
+            assert asignado == pytest.approx(esperado[0])
+            assert costo == pytest.approx(esperado[1])
+            assert sum(pendiente) == pytest.approx(sum(demandas) - asignado)
+
+    def test_cede_modelo_compartido(self):
+        """verif que un tipo le cede el modelo compartido a otro cuando conviene"""
+        # a es el más barato para ambos, pero a 't1' le ahorra más: 't0' debe usar b
+        arcos = [{'a': (1.0, float('inf')), 'b': (2.0, float('inf'))},
+                 {'a': (1.0, float('inf')), 'b': (10.0, float('inf'))}]
+        flujo, pendiente = resolver([5, 5], arcos, {'a': 5})
+        assert flujo == {(0, 'b'): 5, (1, 'a'): 5}
+        assert pendiente == [0.0, 0.0]
+
+
+class TestOptimizarAsignacion:
+    """tests sobre el dataset real"""
+
+    def test_objetivo_co2_usa_el_modelo_mas_limpio(self):
+        """verif que sin restricciones todo va al modelo con menos CO2 por tipo"""
+        resultado = optimizar_asignacion({'texto': 1000, 'imagen': 10})
+        assert [(f['modelo'], f['tipo_consulta'], f['cantidad']) for f in resultado['asignacion']] == [
+            ('Claude 3', 'texto', 1000), ('Claude 3', 'imagen', 10)]
+        assert resultado['totales']['co2'] == pytest.approx(1000 * 0.425 + 10 * 3.00)
+        assert resultado['por_tipo']['texto'] == {'demanda': 1000, 'asignado': 1000, 'sin_asignar': 0}
+
+    def test_capacidades_y_permitidos(self):
+        """verif que se respetan los permitidos, el tope por tipo y el compartido"""
+        resultado = optimizar_asignacion(
+            {'texto': 1000, 'imagen': 100}, objetivo='agua',
+            permitidos={'imagen': ['Gemini 1.5', 'Claude 3']},
+            capacidades={'Claude 3': 600},
+            capacidades_tipo={'texto': {'Gemini 1.5': 300}},
+        )
+        cantidades = {(f['modelo'], f['tipo_consulta']): f['cantidad'] for f in resultado['asignacion']}
+        assert sum(c for (m, _), c in cantidades.items() if m == 'Claude 3') == pytest.approx(600)
+        assert cantidades[('Gemini 1.5', 'texto')] == pytest.approx(300)
+        assert ('GPT-4 Turbo', 'imagen') not in cantidades
+        # Claude ahorra más agua por imagen (0,30 L) que por texto (0,045 L): las imágenes van primero
+        assert cantidades[('Claude 3', 'imagen')] == pytest.approx(100)
+        assert resultado['por_tipo']['texto']['sin_asignar'] == 0
+
+    def test_capacidad_insuficiente(self):
+        """verif que la demanda que no entra se informa como sin_asignar"""
+        resultado = optimizar_asignacion({'video': 100}, permitidos={'video': ['Claude 3']},
+                                         capacidades={'Claude 3': 40})
+        assert resultado['por_tipo']['video'] == {'demanda': 100, 'asignado': 40, 'sin_asignar': 60}
+
+    def test_pesos_personalizados(self):
+        """verif que el objetivo acepta pesos y los informa"""
+        resultado = optimizar_asignacion({'audio': 10}, objetivo={'agua': 1, 'energia': 0, 'carbono': 0})
+        assert resultado['pesos'] == {'agua': 1.0, 'energia': 0.0, 'carbono': 0.0}
+        assert resultado['totales']['objetivo'] == resultado['totales']['agua']
+
+    @pytest.mark.parametrize('argumentos', [
+        {'demanda': {}},
+        {'demanda': {'podcast': 1}},
+        {'demanda': {'texto': -1}},
+        {'demanda': {'texto': 1}, 'objetivo': 'ruido'},
+        {'demanda': {'texto': 1}, 'permitidos': {'texto': ['Modelo X']}},
+        {'demanda': {'texto': 1}, 'permitidos': {'imagen': ['Claude 3']}},
+        {'demanda': {'texto': 1}, 'capacidades': {'Modelo X': 1}},
+        {'demanda': {'texto': 1}, 'capacidades': {'Claude 3': -5}},
+        {'demanda': {'texto': 1}, 'capacidades_tipo': {'texto': {'Claude 3': 'mucho'}}},
+        {'demanda': {'texto': math.inf}},
+        {'demanda': {'texto': 10 ** 400}},
+        {'demanda': {'texto': math.nan}},
+        {'demanda': {'texto': 1}, 'capacidades': {'Claude 3': math.inf}},
+        {'demanda': {'texto': 1}, 'permitidos': {'texto': [[1]]}},
+    ])
+    def test_entradas_invalidas(self, argumentos):
+        """verif que las entradas inválidas lanzan ValueError"""
+        with pytest.raises(ValueError):
+            optimizar_asignacion(**argumentos)
+
+    def test_catalogo_grande(self, catalogo_grande):
+        """verif que con cientos de modelos y topes en todos se asigna toda la demanda"""
+        from utils.calculator import GESTOR
+        tabla = GESTOR.actual().tabla
+        demanda = {tipo: 20_000 for tipo in tabla.tipos_consulta()}
+        capacidades = {modelo: 150 for modelo in tabla.modelos()}
+        resultado = optimizar_asignacion(demanda, capacidades=capacidades)
+        uso = {}
+        for fila in resultado['asignacion']:
+            uso[fila['modelo']] = uso.get(fila['modelo'], 0) + fila['cantidad']
+        assert max(uso.values()) <= 150 + asignacion.EPSILON
+        assert sum(d['asignado'] for d in resultado['por_tipo'].values()) == pytest.approx(
+            min(sum(demanda.values()), 150 * len(capacidades)))
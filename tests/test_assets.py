@@ -0,0 +1,154 @@
+"""
+Unit tests para utils/assets.py
+Verifican el armado de paquetes CSS/JS, el hash en el nombre y la entrega de variantes precomprimidas
+"""
+
+import gzip
+import hashlib
+import io
+import shutil
+
+import pytest
+from flask import Flask, render_template_string
+from utils import assets
+
+
+@pytest.fixture
+def static(tmp_path):
+    """copia de static/ con un Chart.js de prueba en vendor/"""
+    origen = tmp_path / 'static'
+    shutil.copytree(assets.STATIC_DIR, origen, ignore=shutil.ignore_patterns('dist', 'dist.tmp'))
+    (origen / 'vendor').mkdir(exist_ok=True)
+    (origen / assets.CHARTJS).write_text('!function(){window.Chart=function(){}}()', encoding='utf-8')
+    return origen
+
+
+@pytest.fixture
+def app_assets(static):
+    """app Flask con los assets construidos"""
+    assets.construir(static, descargar=False)
+    app = Flask(__name__, static_folder=str(static))
+    assets.registrar(app, static)
+    return app
+
+
+class TestMinificacion:
+    """tests de la concatenación y minificación"""
+
+    def test_css_resuelve_imports_y_minifica(self, static):
+        """verif que style.css incluye todos los módulos en orden, sin comentarios"""
+        css = assets.minificar_css(assets.resolver_imports(static / 'css' / 'style.css'))
+        assert '@import' not in css and '/*' not in css
+        assert css.index('--') < css.index('.navbar')
+        assert 'calc(100vh - 200px)' in css
+        assert len(css) < sum(len(p.read_text(encoding='utf-8')) for p in (static / 'css').glob('*.css'))
+
+    def test_js_conserva_el_codigo(self):
+        """verif que solo se quitan comentarios de línea completa e indentación"""
+        js = assets.minificar_js('/**\n * doc\n */\nfunction f() {\n    // nota\n    return "a // b";\n}\n')
+        assert js == 'function f() {\nreturn "a // b";\n}\n'
+
+
+class TestConstruccion:
+    """tests del build de los paquetes"""
+
+    def test_nombres_con_hash_y_variantes(self, static):
+        """verif manifiesto, nombre con hash del contenido y variante gzip idéntica al original"""
+        resumen = assets.construir(static, descargar=False)
+        manifiesto = assets.leer_manifiesto(static / assets.DIST)
+        assert set(manifiesto) == set(assets.PAQUETES)
+        nombre = manifiesto['graficos.js']
+        contenido = (static / assets.DIST / nombre).read_bytes()
+        assert contenido.startswith(b'!function(){window.Chart')
+        assert gzip.decompress((static / assets.DIST / (nombre + '.gz')).read_bytes()) == contenido
+        assert resumen['app.css']['gzip'] < resumen['app.css']['bytes']
+
+    def test_hash_cambia_con_el_contenido(self, static):
+        """verif que modificar un fuente cambia el nombre y borra el paquete anterior"""
+        anterior = assets.construir(static, descargar=False)['app.js']['archivo']
+        with open(static / 'js' / 'main.js', 'a', encoding='utf-8') as f:
+            f.write('console.log(1);\n')
+        nuevo = assets.construir(static, descargar=False)['app.js']['archivo']
+        assert nuevo != anterior
+        assert not (static / assets.DIST / anterior).exists()
+
+    def test_falta_chartjs_sin_descarga(self, static):
+        """verif que sin Chart.js y sin descarga el build falla"""
+        (static / assets.CHARTJS).unlink()
+        with pytest.raises(OSError):
+            assets.construir(static, descargar=False)
+
+    def test_sin_hash_fijado_no_descarga(self, static, monkeypatch):
+        """verif que sin CHARTJS_SHA256 no se descarga nada de la red"""
+        (static / assets.CHARTJS).unlink()
+        monkeypatch.setattr(assets.urllib.request, 'urlopen', pytest.fail)
+        with pytest.raises(OSError, match='CHARTJS_SHA256'):
+            assets.construir(static)
+
+    def test_descarga_verifica_el_sha256(self, static, monkeypatch):
+        """verif que una descarga que no coincide con el hash fijado no se escribe"""
+        (static / assets.CHARTJS).unlink()
+        fijado = b'!function(){window.Chart=1}()'
+        monkeypatch.setattr(assets, 'CHARTJS_SHA256', hashlib.sha256(fijado).hexdigest())
+        monkeypatch.setattr(assets.urllib.request, 'urlopen', lambda *a, **k: io.BytesIO(b'alterado'))
+        with pytest.raises(OSError, match='sha256'):
+            assets.construir(static)
+        assert not (static / assets.CHARTJS).exists()
+        monkeypatch.setattr(assets.urllib.request, 'urlopen', lambda *a, **k: io.BytesIO(fijado))
+        assets.construir(static)
+        assert (static / assets.CHARTJS).read_bytes() == fijado
+
+    def test_chartjs_vendorizado_alterado(self, static, monkeypatch):
+        """verif que el build rechaza un Chart.js vendorizado que no coincide con el hash fijado"""
+        monkeypatch.setattr(assets, 'CHARTJS_SHA256', hashlib.sha256(b'otro').hexdigest())
+        with pytest.raises(OSError, match='sha256'):
+            assets.construir(static, descargar=False)
+
+
+class TestEntrega:
+    """tests de la ruta /assets/ y la función assets() de los templates"""
+
+    def test_url_del_paquete_y_cache_inmutable(self, app_assets):
+        """verif que assets() apunta al paquete con hash y se sirve con caché de un año"""
+        with app_assets.test_request_context():
+            [url] = render_template_string("{{ assets('app.css')|join(',') }}").split(',')
+        assert url.startswith('/assets/app.') and url.endswith('.css')
+        response = app_assets.test_client().get(url)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/css'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert response.cache_control.max_age == assets.MAX_AGE_INMUTABLE
+
+    def test_variante_gzip_segun_accept_encoding(self, app_assets):
+        """verif que con Accept-Encoding: gzip se sirve el .gz con Content-Encoding"""
+        nombre = assets.leer_manifiesto(app_assets.static_folder + '/dist')['app.js']
+        cliente = app_assets.test_client()
+        plano = cliente.get(f'/assets/{nombre}')
+        comprimido = cliente.get(f'/assets/{nombre}', headers={'Accept-Encoding': 'gzip'})
+        assert comprimido.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in comprimido.headers['Vary']
+        assert gzip.decompress(comprimido.data) == plano.data
+        assert 'Content-Encoding' not in plano.headers
+
+    def test_solo_archivos_del_manifiesto(self, app_assets):
+        """verif que /assets/ no sirve archivos fuera del manifiesto"""
+        cliente = app_assets.test_client()
+        assert cliente.get('/assets/manifest.json').status_code == 404
+        assert cliente.get('/assets/../css/style.css').status_code == 404
+
+    def test_sin_construir_usa_los_fuentes(self, static):
+        """verif que sin build se incluyen los archivos fuente"""
+        app = Flask(__name__, static_folder=str(static))
+        assets.registrar(app, static)
+        with app.test_request_context():
+            assert render_template_string("{{ assets('graficos.js')|join(',') }}") == \
+                '/static/vendor/chart.umd.js,/static/js/charts.js'
+
+    def test_nunca_usa_el_cdn(self, static):
+        """verif que aunque falte Chart.js local no se enlaza el CDN"""
+        (static / assets.CHARTJS).unlink()
+        app = Flask(__name__, static_folder=str(static))
+        assets.registrar(app, static)
+        with app.test_request_context():
+            urls = render_template_string("{{ assets('graficos.js')|join(',') }}")
+        assert '//' not in urls and urls.startswith('/static/vendor/chart.umd.js')
@@ -0,0 +1,118 @@
+"""
+Tests para la suite de benchmarks (benchmarks/suite.py) y la prueba de carga (benchmarks/carga.py)
+Verifican la medición, los datasets escalados, la comparación contra baselines y la prueba de carga
+"""
+
+import csv
+import threading
+from urllib.parse import parse_qs
+
+import pytest
+from werkzeug.serving import make_server
+
+from benchmarks import carga, suite
+from utils import calculator
+
+
+class TestMedicion:
+    """tests de medición y ejecución de la suite"""
+
+    def test_medir_retorna_estadisticas(self):
+        """verif que medir reporta mediana, mínimo e iteraciones"""
+        stats = suite.medir(lambda: sum(range(100)), tiempo_minimo=0.001, repeticiones=3)
+        assert stats['mediana_ns'] > 0
+        assert stats['minimo_ns'] <= stats['mediana_ns']
+        assert stats['repeticiones'] == 3
+
+    def test_ejecutar_con_filtro(self):
+        """verif que la suite corre casos reales y escalados según el filtro"""
+        resultado = suite.ejecutar(escalas=[60], filtro='calcular_impacto', tiempo_minimo=0.001,
+                                   salida=lambda _: None)
+        assert set(resultado['casos']) == {'calcular_impacto', 'calcular_impacto@60'}
+        assert resultado['meta']['escalas'] == [60]
+
+
+class TestDatasetEscalado:
+    """tests de los datasets sintéticos"""
+
+    def test_dataset_escalado_restaura_gestor(self, tmp_path):
+        """verif que el dataset sintético tiene las filas pedidas y se restaura el original"""
+        gestor_original = calculator.GESTOR
+        with suite.dataset_escalado(120, tmp_path) as ruta:
+            with open(ruta, encoding='utf-8') as f:
+                assert len(list(csv.DictReader(f))) == 120
+            assert calculator.GESTOR is not gestor_original
+            assert calculator.calcular_impacto('Modelo 0', 'texto', 1)['agua'] > 0
+        assert calculator.GESTOR is gestor_original
+
+
+class TestComparacion:
+    """tests de la comparación contra baselines"""
+
+    def test_detecta_regresion(self):
+        """verif que solo se marca regresión por sobre el umbral"""
+        baseline = {'casos': {'a': {'mediana_ns': 100}, 'b': {'mediana_ns': 100}, 'c': {'mediana_ns': 100}}}
+        actual = {'casos': {'a': {'mediana_ns': 110}, 'b': {'mediana_ns': 200}, 'nuevo': {'mediana_ns': 1}}}
+        filas = {f['caso']: f for f in suite.comparar(baseline, actual, umbral=0.25)}
+
+        assert set(filas) == {'a', 'b'}
+        assert not filas['a']['regresion']
+        assert filas['b']['regresion']
+        assert filas['b']['razon'] == 2
+
+    def test_cli_falla_con_regresion(self, tmp_path, monkeypatch):
+        """verif que el modo comparación retorna código 1 ante una regresión"""
+        from benchmarks.__main__ import main
+
+        baseline = tmp_path / 'baseline.json'
+        suite.guardar({'meta': {}, 'casos': {'calcular_equivalencias': {'mediana_ns': 0.001}}}, baseline)
+        codigo = main(['--escalas', '', '--filtro', 'calcular_equivalencias', '--tiempo-minimo', '0.001',
+                       '--baseline', str(baseline), '--comparar'])
+        assert codigo == 1
+
+
+class TestCarga:
+    """tests de la prueba de carga (benchmarks/carga.py)"""
+
+    def test_mezcla_cubre_combinaciones_e_invalidos(self):
+        """verif que calcular cubre todos los modelo × tipo_consulta y la mezcla se valida"""
+        casos = carga.casos()
+        combinaciones = {(m, t) for m in carga.MODELOS for t in carga.TIPOS_CONSULTA}
+        enviados = {tuple(parse_qs(cuerpo)[k][0] for k in ('modelo', 'tipo_consulta'))
+                    for _, _, cuerpo in casos['calcular']}
+        assert enviados == combinaciones
+        assert len(casos['calcular_invalido']) == len(carga.FORMULARIOS_INVALIDOS)
+        assert set(carga.MEZCLA_POR_DEFECTO) == set(casos)
+        assert carga.leer_mezcla('index=3, calcular') == {'index': 3.0, 'calcular': 1.0}
+        for invalida in ('otra=1', 'index=0', 'index=x', ''):
+            with pytest.raises(ValueError):
+                carga.leer_mezcla(invalida)
+
+    def test_percentiles_y_errores(self):
+        """verif percentiles por rango más cercano y que los 5xx y fallas de conexión son errores"""
+        assert carga.percentil(list(range(1, 101)), 99) == 99
+        assert carga.percentil([7], 50) == 7
+        resultados = [('index', 200, 0.001 * i) for i in range(1, 98)] + [('index', 500, 0.5), ('graficos', 0, 1.0)]
+        resumen = carga.resumir(resultados, duracion=2)
+        assert resumen['total']['requests'] == 99
+        assert resumen['index']['errores'] == 1
+        assert resumen['graficos']['tasa_error'] == 1.0
+        assert resumen['index']['status'] == {'200': 97, '500': 1}
+        assert resumen['index']['p50_ms'] == 49.0
+        assert resumen['total']['rps'] == 49.5
+
+    def test_carga_contra_servidor_local(self):
+        """verif que la carga recorre la app real en un servidor HTTP y no registra errores"""
+        from app import app
+        servidor = make_server('127.0.0.1', 0, app, threaded=True)
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        try:
+            resultado = carga.ejecutar_carga(f'http://127.0.0.1:{servidor.server_port}', conexiones=2,
+                                             duracion=0.5, calentamiento=0.1)
+        finally:
+            servidor.shutdown()
+        total = resultado['resumen']['total']
+        assert total['requests'] > 0
+        assert total['errores'] == 0
+        assert total['p50_ms'] <= total['p95_ms'] <= total['p99_ms']
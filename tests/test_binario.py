@@ -0,0 +1,96 @@
+"""
+Unit tests para utils/binario.py
+Verifican la escritura y lectura del formato columnar compilado
+"""
+
+import pytest
+from utils import binario
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    return tmp_path / 'datos.bin'
+
+
+class TestFormatoBinario:
+    """tests de ida y vuelta del formato binario"""
+
+    def test_ida_y_vuelta(self, ruta):
+        """verif que columnas numéricas y de texto se recuperan iguales"""
+        binario.escribir(ruta, {
+            'filas': {
+                'modelo': ['a', 'b', 'a'],
+                'valor': [1.5, 2.25, -3.0],
+            },
+            'otra': {'x': [0.1]},
+        }, meta={'origen': {'version': 'abc'}})
+        meta, tablas = binario.leer(ruta)
+
+        assert meta == {'origen': {'version': 'abc'}}
+        codigos, diccionario = tablas['filas']['modelo']
+        assert [diccionario[c] for c in codigos] == ['a', 'b', 'a']
+        assert list(tablas['filas']['valor']) == [1.5, 2.25, -3.0]
+        assert list(tablas['otra']['x']) == [0.1]
+        assert binario.leer_meta(ruta) == meta
+
+    def test_columnas_alineadas(self, ruta):
+        """verif que cada columna empieza alineada a 8 bytes (necesario para cast sin copia)"""
+        binario.escribir(ruta, {'t': {'texto': ['ñandú'] * 3, 'valor': [1.0, 2.0, 3.0]}})
+        meta, tablas = binario.leer(ruta)
+        assert tablas['t']['valor'].format == 'd'
+        assert tablas['t']['texto'][0].format == 'I'
+
+    def test_acepta_columnas_codificadas(self, ruta):
+        """verif que se puede escribir una columna ya codificada con diccionario"""
+        binario.escribir(ruta, {'t': {'modelo': binario.codificar(['x', 'y', 'x'])}})
+        codigos, diccionario = binario.leer(ruta)[1]['t']['modelo']
+        assert list(codigos) == [0, 1, 0]
+        assert diccionario == ['x', 'y']
+
+    def test_largos_distintos(self, ruta):
+        """verif que columnas de distinto largo se rechazan"""
+        with pytest.raises(ValueError):
+            binario.escribir(ruta, {'t': {'a': [1.0, 2.0], 'b': [1.0]}})
+
+    def test_archivo_invalido(self, ruta):
+        """verif que un archivo ajeno o truncado lanza ValueError"""
+        ruta.write_bytes(b'no es un dataset')
+        with pytest.raises(ValueError):
+            binario.leer(ruta)
+
+        binario.escribir(ruta, {'t': {'valor': [1.0] * 100}})
+        ruta.write_bytes(ruta.read_bytes()[:-8])
+        with pytest.raises(ValueError):
+            binario.leer(ruta)
+
+    def test_meta_archivo_inexistente(self, tmp_path):
+        """verif que leer_meta retorna None si no hay compilado"""
+        assert binario.leer_meta(tmp_path / 'no_existe.bin') is None
+
+
+class TestDiccionarioMapeado:
+    """tests de los diccionarios leídos desde el archivo mapeado"""
+
+    def test_codigo_y_valores(self, ruta):
+        """verif la búsqueda de códigos por hash (con colisiones) y la decodificación"""
+        valores = [f'modelo {i} ñ' for i in range(3000)]
+        binario.escribir(ruta, {'t': {'modelo': valores}})
+        codigos, diccionario = binario.leer(ruta)[1]['t']['modelo']
+
+        assert isinstance(diccionario, binario.DiccionarioMapeado)
+        assert len(diccionario) == 3000
+        assert diccionario[1234] == 'modelo 1234 ñ'
+        assert diccionario[-1] == 'modelo 2999 ñ'
+        assert all(diccionario.codigo(v) == i for i, v in enumerate(valores))
+        assert diccionario.codigo('no existe') is None
+        assert diccionario.codigo(None) is None
+        with pytest.raises(IndexError):
+            diccionario[3000]
+
+    def test_columna_entera(self, ruta):
+        """verif que las columnas array('q') se guardan como enteros"""
+        from array import array
+        binario.escribir(ruta, {'t': {'clave': array('q', [5, 2 ** 40, 7])}})
+        columna = binario.leer(ruta)[1]['t']['clave']
+        assert columna.format == 'q'
+        assert list(columna) == [5, 2 ** 40, 7]
@@ -3,8 +3,11 @@ Unit tests para utils/calculator.py
 Verifican la lógica de cálculo de impacto ambiental en diversas condiciones
 """
 
+import math
+
 import pytest
-from utils.calculator import calcular_impacto, DB
+from utils.calculator import (calcular_impacto, calcular_impacto_lote, calcular_equivalencias, cargar_datos_csv_completo,
+                              obtener_estadisticas, DB, TABLA_COEFICIENTES)
 
 
 class TestCalcularImpactoValidInput:
@@ -241,3 +244,371 @@ class TestDataIntegrity:
                 assert len(row['eq_agua']) > 0, f"eq_agua vacía en {row}"
                 assert len(row['eq_energia']) > 0, f"eq_energia vacía en {row}"
                 assert len(row['eq_co2']) > 0, f"eq_co2 vacía en {row}"
+
+
+def _calcular_impacto_referencia(modelo, tipo_consulta, cantidad):
+    """implementación original (recorre filas crudas de DB) usada como referencia"""
+    filas = DB.get(f"{modelo}_{tipo_consulta}", [])
+    if not filas:
+        return f"Combinación no encontrada: {modelo} + {tipo_consulta}"
+    agua_prom = sum(float(row['agua(L)']) for row in filas) / len(filas)
+    energia_prom = sum(float(row['energia(kWh)']) for row in filas) / len(filas)
+    carbono_prom = sum(float(row['carbono(gCO2e)']) for row in filas) / len(filas)
+    descripciones = {
+        'texto': 'respuesta(s) de texto',
+        'código': 'bloque(s) de código',
+        'imagen': 'imagen(es) generada',
+        'audio': 'minuto(s) de transcripción de audio',
+        'video': 'minuto(s) de video'
+    }
+    descripcion_tipo = descripciones.get(tipo_consulta, tipo_consulta)
+    numero = int(cantidad) if isinstance(cantidad, int) or cantidad == int(cantidad) else cantidad
+    if tipo_consulta == 'imagen' and cantidad != 1:
+        cantidad_formateada = f"{numero} {descripcion_tipo}s"
+    else:
+        cantidad_formateada = f"{numero} {descripcion_tipo}"
+    agua_total = agua_prom * cantidad
+    energia_total = energia_prom * cantidad
+    co2_total = carbono_prom * cantidad
+    equivalencias = calcular_equivalencias(agua_total, energia_total, co2_total)
+    return {
+        "modelo": modelo,
+        "tipo_consulta": tipo_consulta,
+        "cantidad": cantidad,
+        "cantidad_formateada": cantidad_formateada,
+        "unidad_medida": filas[0].get('unidad_medida', ''),
+        "agua": round(agua_total, 2),
+        "energia": round(energia_total, 2),
+        "co2": round(co2_total, 2),
+        **equivalencias
+    }
+
+
+class TestTablaCoeficientes:
+    """tests de la tabla de coeficientes compilada"""
+    
+    def test_tabla_cubre_todas_las_combinaciones(self):
+        """verif que la tabla tiene una entrada por cada clave del DB"""
+        assert len(TABLA_COEFICIENTES) == len(DB)
+        for filas in DB.values():
+            assert (filas[0]['modelo'], filas[0]['tipo_consulta']) in TABLA_COEFICIENTES
+    
+    @pytest.mark.parametrize("cantidad", [1, 2, 3, 7, 100, 12345, 0.5, 2.5, 1.0, 999.99])
+    def test_equivalencia_con_implementacion_original(self, cantidad, all_modelos, all_query_types):
+        """verif que los resultados coinciden con la implementación original en todas las combinaciones"""
+        for modelo in all_modelos + ['InvalidModel']:
+            for tipo in all_query_types + ['tipo_invalido']:
+                esperado = _calcular_impacto_referencia(modelo, tipo, cantidad)
+                assert calcular_impacto(modelo, tipo, cantidad) == esperado, f"Difiere para {modelo} + {tipo}"
+
+
+class TestEstadisticasCacheadas:
+    """tests del motor de estadísticas de una sola pasada con caché"""
+    
+    def test_coincide_con_promedios_por_grupo(self):
+        """verif que una pasada da los mismos promedios que agrupar y promediar por separado"""
+        filas = cargar_datos_csv_completo()
+        estadisticas = obtener_estadisticas()
+        for campo, clave in (('modelo', 'por_modelo'), ('tipo_consulta', 'por_tipo_consulta')):
+            grupos = {}
+            for row in filas:
+                grupos.setdefault(row[campo], []).append(row)
+            for valor, grupo in grupos.items():
+                esperado = round(sum(float(row['agua(L)']) for row in grupo) / len(grupo), 4)
+                assert estadisticas[clave][valor]['agua'] == esperado
+
+
+class TestCalcularImpactoLote:
+    """tests del cálculo vectorizado en lote"""
+    
+    def test_lote_coincide_con_calcular_impacto(self, all_modelos, all_query_types):
+        """verif que cada ítem del lote coincide con calcular_impacto"""
+        items = [(m, t, c) for m in all_modelos for t in all_query_types for c in (1, 3, 2.5)]
+        modelos, tipos, cantidades = map(list, zip(*items))
+        lote = calcular_impacto_lote(modelos, tipos, cantidades)
+        
+        for i, (modelo, tipo, cantidad) in enumerate(items):
+            individual = calcular_impacto(modelo, tipo, cantidad)
+            assert round(lote['agua'][i], 2) == individual['agua']
+            assert round(lote['energia'][i], 2) == individual['energia']
+            assert round(lote['co2'][i], 2) == individual['co2']
+            assert f"{lote['vasos'][i]:.2f} vasos" in individual['eq_agua']
+            assert f"{lote['km_auto'][i]:.5f} km" in individual['eq_co2']
+    
+    def test_lote_errores_por_item(self):
+        """verif que los errores se reportan por ítem sin abortar el lote"""
+        lote = calcular_impacto_lote(
+            ['GPT-4 Turbo', 'InvalidModel', 'Claude 3', 'Gemini 1.5'],
+            ['texto', 'texto', 'audio', 'video'],
+            [5, 2, 'cinco', 0]
+        )
+        assert lote['totales']['items'] == 1
+        assert lote['agua'][0] > 0
+        assert all(lote['agua'][i] is None for i in (1, 2, 3))
+        errores = {e['indice']: e['error'] for e in lote['errores']}
+        assert 'no encontrada' in errores[1]
+        assert 'Error' in errores[2] and 'Error' in errores[3]
+    
+    def test_lote_claves_y_cantidades_invalidas(self):
+        """verif que claves que no son texto y cantidades no finitas o enormes son errores del ítem"""
+        lote = calcular_impacto_lote(
+            [['x'], 'GPT-4 Turbo', 'GPT-4 Turbo', 'GPT-4 Turbo', 'GPT-4 Turbo', 'GPT-4 Turbo'],
+            ['texto', {'a': 1}, 'texto', 'texto', 'texto', 'texto'],
+            [1, 1, 10 ** 400, math.nan, math.inf, 2]
+        )
+        assert lote['totales']['items'] == 1
+        assert all(lote['agua'][i] is None for i in range(5))
+        errores = {e['indice']: e['error'] for e in lote['errores']}
+        assert 'texto' in errores[0] and 'texto' in errores[1]
+        assert 'superar' in errores[2] and 'positivo' in errores[3] and 'superar' in errores[4]
+        assert math.isfinite(lote['totales']['agua'])
+    
+    def test_lote_nan_no_primero(self):
+        """verif que un NaN después de cantidades válidas no pasa la validación rápida"""
+        lote = calcular_impacto_lote(['GPT-4 Turbo'] * 2, ['texto'] * 2, [1, math.nan])
+        assert [e['indice'] for e in lote['errores']] == [1]
+        assert calcular_impacto('GPT-4 Turbo', 'texto', math.nan).startswith('Error')
+    
+    def test_lote_sin_equivalencias(self):
+        """verif que con equivalencias=False se omiten esas columnas y el resto no cambia"""
+        args = (['GPT-4 Turbo', 5, 'Claude 3'], ['texto', 'texto', 'imagen'], [2, 1, 3])
+        completo = calcular_impacto_lote(*args)
+        lote = calcular_impacto_lote(*args, equivalencias=False)
+        assert set(completo) - set(lote) == {'vasos', 'botellas', 'duchas', 'minutos_led', 'km_auto'}
+        assert all(lote[k] == completo[k] for k in lote)
+        assert lote['errores'] == [{'indice': 1, 'error': "Error: modelo y tipo_consulta deben ser texto"}]
+    
+    def test_lote_largos_distintos(self):
+        """verif que arreglos de distinto largo se rechazan"""
+        with pytest.raises(ValueError):
+            calcular_impacto_lote(['GPT-4 Turbo'], ['texto', 'código'], [1])
+
+
+class TestTablaCoeficientesIndexada:
+    """tests de la tabla de coeficientes con búsqueda por clave compuesta"""
+    
+    @pytest.fixture
+    def coeficientes(self):
+        from utils.calculator import Coeficientes
+        return {
+            (f'm{i}', tipo): Coeficientes(i + 0.5, i + 0.25, i + 0.125, 'u', tipo, f'p{i % 3}')
+            for i in range(50) for tipo in ('texto', 'imagen', 'video') if (i + len(tipo)) % 4
+        }
+    
+    def test_equivale_a_dict(self, coeficientes):
+        """verif búsquedas, pertenencia, largo e iteración contra el dict original"""
+        from utils.calculator import TablaCoeficientes
+        tabla = TablaCoeficientes.desde_dict(coeficientes)
+        
+        assert len(tabla) == len(coeficientes)
+        assert set(tabla) == set(coeficientes)
+        for clave, coef in coeficientes.items():
+            assert clave in tabla
+            assert tabla[clave].agua == coef.agua
+            assert tabla.get(clave).proveedor == coef.proveedor
+        assert tabla.modelos() == list(dict.fromkeys(m for m, _ in coeficientes))
+    
+    def test_claves_inexistentes(self, coeficientes):
+        """verif que combinaciones o tipos de clave inválidos no se encuentran"""
+        from utils.calculator import TablaCoeficientes
+        tabla = TablaCoeficientes.desde_dict(coeficientes)
+        ausente = next((f'm{i}', t) for i in range(50) for t in ('texto', 'imagen', 'video')
+                       if (f'm{i}', t) not in coeficientes)
+        
+        assert tabla.get(ausente) is None
+        assert tabla.get(('m1', 'audio')) is None
+        assert tabla.get(('otro', 'texto')) is None
+        assert tabla.get((['lista'], 'texto')) is None
+        assert tabla.get('sin_tupla') is None
+        with pytest.raises(KeyError):
+            tabla[ausente]
+    
+    def test_compilado_sin_estructuras_por_combinacion(self, tmp_path):
+        """verif que la tabla del compilado lee directo del archivo mapeado"""
+        from utils.calculator import CSV_PATH, cargar_compilado, compilar_dataset
+        ruta = tmp_path / 'dataset.bin'
+        compilar_dataset(CSV_PATH, ruta)
+        datos = cargar_compilado(ruta)
+        
+        assert isinstance(datos['tabla'].columnas.columnas['agua'], memoryview)
+        assert datos['tabla'] == TABLA_COEFICIENTES
+        assert datos['tabla'][('Claude 3', 'audio')].unidad_medida == TABLA_COEFICIENTES[('Claude 3', 'audio')].unidad_medida
+
+
+class TestIncertidumbre:
+    """Tests del modo incertidumbre (intervalos de Monte Carlo)"""
+
+    def test_intervalos_contienen_la_estimacion(self):
+        """verif que cada intervalo contiene el valor puntual del dataset"""
+        resultado = calcular_impacto('GPT-4 Turbo', 'texto', 10, True)
+        inc = resultado['incertidumbre']
+        assert inc['nivel'] == 0.9
+        assert inc['sin_distribucion'] == []
+        for clave in ('agua', 'energia', 'co2'):
+            assert inc[clave]['inferior'] <= resultado[clave] <= inc[clave]['superior']
+            assert inc[clave]['inferior'] < inc[clave]['superior']
+
+    def test_sin_incertidumbre_por_defecto(self):
+        """verif que sin nivel el resultado no cambia"""
+        assert 'incertidumbre' not in calcular_impacto('GPT-4 Turbo', 'texto', 10)
+
+    def test_nivel_invalido(self):
+        """verif que un nivel fuera de (0, 1) es un error"""
+        resultado = calcular_impacto('GPT-4 Turbo', 'texto', 10, 1.5)
+        assert isinstance(resultado, str) and 'nivel' in resultado
+
+    def test_combinacion_sin_distribucion(self, monkeypatch):
+        """verif que un coeficiente sin distribución se trata como exacto"""
+        from utils import calculator
+        snapshot = calculator.GESTOR_INCERTIDUMBRE.actual()
+        tabla = {clave: dict(d) for clave, d in snapshot.tabla.items()}
+        del tabla[('Claude 3', 'audio')]['agua']
+        monkeypatch.setattr(calculator.GESTOR_INCERTIDUMBRE, '_snapshot', snapshot._replace(tabla=tabla))
+        resultado = calcular_impacto('Claude 3', 'audio', 2, True)
+        assert resultado['incertidumbre']['sin_distribucion'] == ['agua']
+        agua = resultado['incertidumbre']['agua']
+        assert agua['inferior'] == agua['superior'] == pytest.approx(resultado['agua'])
+
+    def test_distribucion_que_no_contiene_el_punto(self, monkeypatch):
+        """verif que una distribución que no contiene el coeficiente puntual se ignora (exacto)"""
+        from utils import calculator, incertidumbre
+        snapshot = calculator.GESTOR_INCERTIDUMBRE.actual()
+        tabla = {clave: dict(d) for clave, d in snapshot.tabla.items()}
+        tabla[('Claude 3', 'audio')]['agua'] = incertidumbre.Distribucion.uniforme(100.0, 200.0)
+        monkeypatch.setattr(calculator.GESTOR_INCERTIDUMBRE, '_snapshot', snapshot._replace(tabla=tabla))
+        resultado = calcular_impacto('Claude 3', 'audio', 2, True)
+        assert resultado['incertidumbre']['sin_distribucion'] == ['agua']
+        agua = resultado['incertidumbre']['agua']
+        assert agua['inferior'] == agua['superior'] == pytest.approx(resultado['agua'])
+
+    def test_lote_con_incertidumbre(self):
+        """verif columnas de intervalos por ítem y el intervalo de los totales del lote"""
+        resultado = calcular_impacto_lote(['GPT-4 Turbo', 'Claude 3', 'X'], ['texto', 'video', 'texto'], [5, 2, 1], 0.9)
+        individual = calcular_impacto('GPT-4 Turbo', 'texto', 5, 0.9)['incertidumbre']
+        assert resultado['agua_inferior'][0] == pytest.approx(individual['agua']['inferior'], abs=1e-4)
+        assert resultado['co2_superior'][2] is None
+        totales = resultado['incertidumbre']['totales']
+        for clave in ('agua', 'energia', 'co2'):
+            assert totales[clave]['inferior'] <= resultado['totales'][clave] <= totales[clave]['superior']
+        # La suma de dos coeficientes independientes es más angosta que la suma de sus extremos
+        ancho = totales['agua']['superior'] - totales['agua']['inferior']
+        suma_anchos = sum(resultado['agua_superior'][i] - resultado['agua_inferior'][i] for i in (0, 1))
+        assert ancho < suma_anchos
+
+
+@pytest.fixture
+def perfiles_red(tmp_path, monkeypatch):
+    """perfiles de intensidad de prueba: 'sur' con 100 gCO2e/kWh a la noche y 400 de día"""
+    from utils import calculator
+    from utils.intensidad import GestorPerfiles
+    lineas = ['hora,intensidad'] + [f'2024-01-01T{h:02d}:00,{100 if h < 8 else 400}' for h in range(24)]
+    (tmp_path / 'sur.csv').write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    gestor = GestorPerfiles(tmp_path)
+    monkeypatch.setattr(calculator, 'GESTOR_PERFILES', gestor)
+    return gestor
+
+
+class TestIntensidadRed:
+    """Tests del CO2 con la intensidad de carbono de la red por región y hora"""
+
+    def test_co2_es_energia_por_intensidad(self, perfiles_red):
+        """verif que con región el CO2 es energía × intensidad de esa hora"""
+        resultado = calcular_impacto('GPT-4 Turbo', 'texto', 10, region='sur', fecha='2025-03-14T03:00:00')
+        assert resultado['intensidad_carbono'] == 100
+        assert resultado['region'] == 'sur'
+        assert resultado['co2'] == pytest.approx(resultado['energia'] * 100, abs=1e-3)
+        de_dia = calcular_impacto('GPT-4 Turbo', 'texto', 10, region='sur', fecha='2025-03-14T15:00:00')
+        assert de_dia['co2'] == pytest.approx(4 * resultado['co2'], rel=1e-3)
+
+    def test_sin_fecha_usa_media_anual(self, perfiles_red):
+        """verif que sin fecha se usa la intensidad media de la región"""
+        resultado = calcular_impacto('Claude 3', 'imagen', 2, region='sur')
+        assert resultado['intensidad_carbono'] == 300
+
+    def test_errores(self, perfiles_red):
+        """verif región sin perfil y fecha inválida"""
+        assert 'región' in calcular_impacto('GPT-4 Turbo', 'texto', 10, region='norte')
+        assert 'Fecha' in calcular_impacto('GPT-4 Turbo', 'texto', 10, region='sur', fecha='ayer')
+        assert 'region' not in calcular_impacto('GPT-4 Turbo', 'texto', 10)
+
+    def test_incertidumbre_del_co2_sigue_a_la_energia(self, perfiles_red):
+        """verif que con región el intervalo del CO2 es el de la energía × intensidad"""
+        resultado = calcular_impacto('GPT-4 Turbo', 'texto', 10, True, region='sur', fecha='2025-01-01T12:00')
+        inc = resultado['incertidumbre']
+        assert inc['co2']['superior'] == pytest.approx(inc['energia']['superior'] * 400, rel=1e-3)
+
+    def test_lote_con_regiones(self, perfiles_red):
+        """verif la columna intensidad, el CO2 por ítem y los errores del lote"""
+        resultado = calcular_impacto_lote(
+            ['GPT-4 Turbo'] * 4, ['texto'] * 4, [10] * 4, 0.9,
+            regiones=['sur', None, 'norte', 'sur'],
+            fechas=['2025-01-01T03:00', None, None, 'ayer'],
+        )
+        individual = calcular_impacto('GPT-4 Turbo', 'texto', 10, region='sur', fecha='2025-01-01T03:00')
+        assert resultado['intensidad'][:2] == [100, None]
+        assert resultado['co2'][0] == pytest.approx(individual['co2'])
+        assert resultado['co2'][1] == pytest.approx(calcular_impacto('GPT-4 Turbo', 'texto', 10)['co2'])
+        assert [e['indice'] for e in resultado['errores']] == [2, 3]
+        totales = resultado['incertidumbre']['totales']['co2']
+        assert totales['inferior'] <= resultado['totales']['co2'] <= totales['superior']
+
+    def test_lote_region_o_fecha_de_otro_tipo(self, perfiles_red):
+        """verif que regiones que no son texto y fechas de otro tipo son errores del ítem"""
+        resultado = calcular_impacto_lote(
+            ['GPT-4 Turbo'] * 3, ['texto'] * 3, [10] * 3,
+            regiones=[['a'], 'sur', 'sur'], fechas=[None, {'a': 1}, '2025-01-01T03:00'],
+        )
+        errores = {e['indice']: e['error'] for e in resultado['errores']}
+        assert 'texto' in errores[0] and 'Fecha' in errores[1]
+        assert resultado['intensidad'] == [None, None, 100]
+
+
+class TestRankingEficiencia:
+    """tests del ranking de eficiencia del servidor"""
+
+    def test_ranking_del_dataset_real(self):
+        """verif que incluye todos los modelos del dataset con índice 100 / impacto, de mayor a menor"""
+        from utils.calculator import ranking_eficiencia
+        resultado = ranking_eficiencia()
+        estadisticas = obtener_estadisticas()['por_modelo']
+        assert resultado['total'] == len(estadisticas) == len(TABLA_COEFICIENTES.modelos())
+        indices = [fila['indice'] for fila in resultado['ranking']]
+        assert indices == sorted(indices, reverse=True)
+        primero = resultado['ranking'][0]
+        stats = estadisticas[primero['modelo']]
+        assert primero['indice'] == pytest.approx(100 / (stats['agua'] + stats['energia'] + stats['carbono']), abs=1e-4)
+
+    def test_paginas_coinciden_con_orden_completo(self, catalogo_grande):
+        """verif que las páginas del top-k con heap concatenadas son el orden completo por impacto"""
+        pesos = {'agua': 0.5, 'energia': 2, 'carbono': 1}
+        completo = catalogo_grande.ranking_eficiencia(pesos, 'imagen', pagina=1, por_pagina=100)['ranking']
+        completo += catalogo_grande.ranking_eficiencia(pesos, 'imagen', pagina=2, por_pagina=100)['ranking']
+        completo += catalogo_grande.ranking_eficiencia(pesos, 'imagen', pagina=3, por_pagina=100)['ranking']
+        filas = catalogo_grande.GESTOR.actual().tabla.de_tipo('imagen')
+        esperado = sorted((0.5 * a + 2 * e + c, m) for m, a, e, c in filas)
+        assert [(f['impacto'], f['modelo']) for f in completo] == [(round(i, 4), m) for i, m in esperado]
+        assert [f['posicion'] for f in completo] == list(range(1, 301))
+        pagina = catalogo_grande.ranking_eficiencia(pesos, 'imagen', pagina=7, por_pagina=50)
+        assert pagina['total'] == 300 and pagina['ranking'] == []
+
+    def test_pesos_cambian_el_orden(self, catalogo_grande):
+        """verif que con peso solo en agua el ranking es el orden por agua"""
+        resultado = catalogo_grande.ranking_eficiencia({'energia': 0, 'carbono': 0}, 'texto', por_pagina=5)
+        aguas = [fila['agua'] for fila in resultado['ranking']]
+        assert aguas == sorted(aguas) and aguas[0] == 1.0
+        assert resultado['pesos'] == {'agua': 1.0, 'energia': 0.0, 'carbono': 0.0}
+
+    @pytest.mark.parametrize('argumentos', [
+        {'pesos': {'agua': -1}},
+        {'pesos': {'agua': 0, 'energia': 0, 'carbono': 0}},
+        {'pesos': {'co2': 1}},
+        {'pesos': {'agua': float('nan')}},
+        {'tipo_consulta': 'podcast'},
+        {'pagina': 0},
+        {'por_pagina': 1000},
+    ])
+    def test_parametros_invalidos(self, argumentos):
+        """verif que pesos, tipo de consulta y paginación inválidos lanzan ValueError"""
+        from utils.calculator import ranking_eficiencia
+        with pytest.raises(ValueError):
+            ranking_eficiencia(**argumentos)
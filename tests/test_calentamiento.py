@@ -0,0 +1,92 @@
+"""
+Unit tests para utils/calentamiento.py
+Verifican el precalentamiento de la app y el estado que heredan los workers tras un fork
+"""
+
+import os
+
+import pytest
+from app import app
+from utils import calentamiento, metricas
+from utils.calculator import GESTOR
+
+
+@pytest.fixture(autouse=True)
+def sin_calentar(monkeypatch):
+    """cada test parte sin calentar y sin directorio multiproceso"""
+    monkeypatch.delenv('ECOAI_METRICAS_DIR', raising=False)
+    calentamiento.reiniciar()
+    yield
+    calentamiento.reiniciar()
+
+
+def _en_hijo(funcion):
+    # Ejecuta funcion() en un proceso hijo (fork) y retorna su resultado como texto
+    lectura, escritura = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(escritura, str(funcion()).encode())
+        finally:
+            os._exit(0)
+    os.close(escritura)
+    with os.fdopen(lectura) as f:
+        resultado = f.read()
+    os.waitpid(pid, 0)
+    return resultado
+
+
+class TestCalentar:
+    """tests del calentamiento"""
+
+    def test_compila_templates(self):
+        """verif que los templates quedan en la cache de Jinja"""
+        app.jinja_env.cache.clear()
+        estado = calentamiento.calentar(app)
+        assert estado['listo'] is True
+        assert estado['version'] == GESTOR.actual().version
+        cacheados = {nombre for _, nombre in app.jinja_env.cache.keys()}
+        assert {'base.html', 'index.html', 'results.html', 'results_charts.html'} <= cacheados
+
+    def test_descarta_metricas_del_calentamiento(self):
+        """verif que las requests de calentamiento no quedan en /metrics"""
+        metricas.reiniciar()
+        calentamiento.calentar(app)
+        assert 'ecoai_requests_total' not in metricas.exportar()
+
+    def test_no_escribe_en_el_registro_de_uso(self, monkeypatch, tmp_path):
+        """verif que el cálculo de prueba del calentamiento no queda en el registro de uso"""
+        import app as modulo_app
+        from utils.registro import RegistroUso
+        libro = RegistroUso(tmp_path / 'registro.sqlite3', intervalo=0.05)
+        monkeypatch.setattr(modulo_app, 'REGISTRO', libro)
+        calentamiento.calentar(app)
+        assert libro.pendientes() == 0
+        app.test_client().post('/calcular', data={'modelo': 'Claude 3', 'tipo_consulta': 'texto', 'cantidad': 1})
+        assert libro.pendientes() == 1
+
+    def test_ruta_con_error_falla(self, monkeypatch):
+        """verif que una ruta de calentamiento que no responde 200 aborta el arranque"""
+        monkeypatch.setattr(calentamiento, 'RUTAS', ('/no-existe',))
+        with pytest.raises(RuntimeError):
+            calentamiento.calentar(app)
+        assert calentamiento.esta_listo() is False
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requiere fork')
+class TestFork:
+    """tests del estado heredado por los workers (preload de gunicorn)"""
+
+    def test_worker_hereda_calentamiento(self):
+        """verif que el hijo hereda el estado listo y lo marca como heredado"""
+        calentamiento.calentar(app)
+        assert _en_hijo(lambda: calentamiento.estado()['heredado']) == 'True'
+        assert calentamiento.estado()['heredado'] is False
+
+    def test_lock_de_recarga_nuevo_en_el_hijo(self):
+        """verif que un lock de recarga tomado en el padre queda libre en el hijo"""
+        GESTOR._lock.acquire()
+        try:
+            assert _en_hijo(lambda: GESTOR._lock.acquire(blocking=False)) == 'True'
+        finally:
+            GESTOR._lock.release()
@@ -0,0 +1,124 @@
+"""
+Unit tests para utils/columnar.py
+Verifican el almacén columnar y las agregaciones group-by contra una implementación directa
+"""
+
+import random
+
+import pytest
+from utils import columnar
+from utils.calculator import cargar_datos_csv_completo, obtener_estadisticas, obtener_estadisticas_por
+from utils.columnar import TablaColumnar
+
+
+@pytest.fixture
+def filas():
+    """filas sintéticas con varias claves de texto y una métrica"""
+    rng = random.Random(7)
+    return [
+        {
+            'modelo': rng.choice(['a', 'b', 'c', 'd']),
+            'region': rng.choice(['norte', 'sur', 'este']),
+            'valor': str(round(rng.uniform(0.1, 10), 3)),
+        }
+        for _ in range(500)
+    ]
+
+
+@pytest.fixture
+def tabla(filas):
+    return TablaColumnar.desde_filas(filas, ('modelo', 'region'), ('valor',))
+
+
+def _referencia(filas, claves, agg):
+    # group-by directo con dicts de listas
+    grupos = {}
+    for row in filas:
+        clave = tuple(row[c] for c in claves)
+        grupos.setdefault(clave, []).append(float(row['valor']))
+    funciones = {
+        'promedio': lambda v: sum(v) / len(v),
+        'suma': sum,
+        'min': min,
+        'max': max,
+        'conteo': len,
+        'primero': lambda v: v[0],
+    }
+    return {clave: funciones[agg](valores) for clave, valores in grupos.items()}
+
+
+class TestAgrupar:
+    """tests de TablaColumnar.agrupar"""
+
+    @pytest.mark.parametrize('agg', columnar.AGREGACIONES)
+    @pytest.mark.parametrize('claves', [['modelo'], ['region'], ['modelo', 'region'], ['region', 'modelo']])
+    def test_coincide_con_referencia(self, tabla, filas, claves, agg):
+        """verif cada agregación y combinación de claves contra la implementación directa"""
+        resultado = tabla.agrupar(claves, ['valor'], agg)
+        esperado = _referencia(filas, claves, agg)
+        assert set(resultado) == set(esperado)
+        for clave, valor in esperado.items():
+            assert resultado[clave]['valor'] == pytest.approx(valor)
+
+    def test_una_clave_como_texto(self, tabla):
+        """verif que agrupar por una columna da claves str en orden de aparición"""
+        resultado = tabla.agrupar('modelo', {'total': 'valor'}, 'suma')
+        assert list(resultado) == tabla.columnas['modelo'][1]
+        assert all(set(v) == {'total'} for v in resultado.values())
+
+    def test_sin_claves(self, tabla, filas):
+        """verif que sin claves se agrega todo el dataset en un grupo"""
+        resultado = tabla.agrupar([], ['valor'], 'conteo')
+        assert resultado == {(): {'valor': len(filas)}}
+
+    def test_combinaciones_dispersas(self, tabla, filas, monkeypatch):
+        """verif la renumeración de grupos cuando hay muchas combinaciones posibles"""
+        monkeypatch.setattr(columnar, '_FACTOR_DENSO', 0)
+        resultado = tabla.agrupar(['modelo', 'region'], ['valor'], 'max')
+        esperado = _referencia(filas, ['modelo', 'region'], 'max')
+        assert {k: v['valor'] for k, v in resultado.items()} == esperado
+
+    def test_primero_texto(self, tabla, filas):
+        """verif que 'primero' acepta columnas de texto y las decodifica"""
+        resultado = tabla.agrupar('modelo', ['region'], 'primero')
+        for modelo, valores in resultado.items():
+            assert valores['region'] == next(row['region'] for row in filas if row['modelo'] == modelo)
+
+    def test_errores(self, tabla):
+        """verif los errores por columnas o agregaciones inválidas"""
+        with pytest.raises(ValueError):
+            tabla.agrupar('valor', ['valor'])
+        with pytest.raises(ValueError):
+            tabla.agrupar('modelo', ['region'], 'suma')
+        with pytest.raises(ValueError):
+            tabla.agrupar('no_existe', ['valor'])
+        with pytest.raises(ValueError):
+            tabla.agrupar('modelo', ['valor'], 'mediana')
+
+    def test_largos_distintos(self):
+        """verif que no se aceptan columnas de distinto largo"""
+        with pytest.raises(ValueError):
+            TablaColumnar({'a': [1.0, 2.0], 'b': ([0], ['x'])})
+
+
+class TestEstadisticasDataset:
+    """tests de las estadísticas del dataset sobre el motor group-by"""
+
+    def test_por_proveedor(self):
+        """verif la agrupación por proveedor contra el CSV"""
+        filas = cargar_datos_csv_completo()
+        resultado = obtener_estadisticas_por('proveedor')
+        for proveedor in {row['proveedor'] for row in filas}:
+            grupo = [float(row['energia(kWh)']) for row in filas if row['proveedor'] == proveedor]
+            assert resultado[proveedor]['energia'] == round(sum(grupo) / len(grupo), 4)
+
+    def test_varias_claves(self):
+        """verif que agrupar por modelo y unidad da tuplas como claves"""
+        resultado = obtener_estadisticas_por(['modelo', 'unidad_medida'], agg='conteo')
+        assert sum(v['agua'] for v in resultado.values()) == len(cargar_datos_csv_completo())
+        assert all(isinstance(clave, tuple) and len(clave) == 2 for clave in resultado)
+
+    def test_wrappers_equivalentes(self):
+        """verif que las estadísticas cacheadas son las del group-by"""
+        assert obtener_estadisticas()['por_modelo'] == obtener_estadisticas_por('modelo')
+        assert obtener_estadisticas()['por_tipo_consulta'] == obtener_estadisticas_por('tipo_consulta')
@@ -0,0 +1,176 @@
+"""
+Unit tests para utils/dataset.py
+Verifican la detección de cambios, la validación y el reemplazo atómico del snapshot
+"""
+
+import shutil
+import threading
+
+import pytest
+from utils import calculator
+from utils.dataset import GestorDataset
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """copia del dataset real en un directorio temporal"""
+    ruta = tmp_path / 'dataset.csv'
+    shutil.copy(calculator.CSV_PATH, ruta)
+    return ruta
+
+
+@pytest.fixture
+def gestor(csv_path):
+    """gestor que revisa el archivo en cada llamada"""
+    return GestorDataset(csv_path, calculator.construir_datos, intervalo=0)
+
+
+def _quitar_modelo(csv_path, modelo):
+    lineas = csv_path.read_text(encoding='utf-8').splitlines()
+    lineas = [lineas[0]] + [l for l in lineas[1:] if not l.startswith(modelo)]
+    csv_path.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+
+
+class TestCargaInicial:
+    """tests de la carga inicial del snapshot"""
+
+    def test_snapshot_inicial_completo(self, gestor):
+        """verif que el snapshot inicial trae versión, tabla y estadísticas"""
+        snapshot = gestor.actual()
+        assert snapshot.version == calculator.GESTOR.actual().version
+        assert ('Claude 3', 'texto') in snapshot.tabla
+        assert 'Claude 3' in snapshot.estadisticas['por_modelo']
+
+    def test_archivo_inexistente(self, tmp_path):
+        """verif que sin archivo se obtiene un snapshot vacío sin versión"""
+        gestor = GestorDataset(tmp_path / 'no_existe.csv', calculator.construir_datos)
+        assert gestor.actual().version is None
+        assert gestor.actual().tabla == {}
+
+
+class TestRecarga:
+    """tests de recarga en caliente"""
+
+    def test_sin_lectura_en_estado_estable(self, gestor, monkeypatch):
+        """verif que si el archivo no cambia no se vuelve a leer"""
+        lecturas = []
+        monkeypatch.setattr(gestor, '_recargar', lambda: lecturas.append(1))
+        for _ in range(5):
+            gestor.actual()
+        assert lecturas == []
+
+    def test_recarga_cuando_cambia_contenido(self, gestor, csv_path):
+        """verif que un cambio de contenido produce una nueva versión"""
+        anterior = gestor.actual()
+        _quitar_modelo(csv_path, 'Claude 3')
+
+        assert gestor.recargar() is True
+        nuevo = gestor.actual()
+        assert nuevo.version != anterior.version
+        assert 'Claude 3' not in nuevo.estadisticas['por_modelo']
+        # el snapshot anterior sigue intacto para las requests en curso
+        assert ('Claude 3', 'texto') in anterior.tabla
+
+    def test_mismo_contenido_no_reconstruye(self, gestor, csv_path):
+        """verif que tocar el archivo sin cambiar su contenido conserva el snapshot"""
+        anterior = gestor.actual()
+        csv_path.write_bytes(csv_path.read_bytes())
+
+        assert gestor.recargar() is False
+        assert gestor.actual().tabla is anterior.tabla
+
+    def test_contenido_invalido_conserva_version(self, gestor, csv_path):
+        """verif que un CSV inválido no reemplaza el snapshot vigente"""
+        anterior = gestor.actual()
+        texto = csv_path.read_text(encoding='utf-8').replace('0.345', 'abc', 1)
+        csv_path.write_text(texto, encoding='utf-8')
+
+        assert gestor.recargar() is False
+        assert gestor.actual().version == anterior.version
+        assert 'no es numérico' in gestor.info()['ultimo_error']
+
+    def test_recarga_en_segundo_plano(self, gestor, csv_path):
+        """verif que actual() no bloquea y la recarga termina en un thread aparte"""
+        anterior = gestor.actual()
+        _quitar_modelo(csv_path, 'Gemini 1.5')
+
+        gestor.actual()
+        for hilo in threading.enumerate():
+            if hilo.name == 'recarga-dataset':
+                hilo.join(timeout=5)
+        assert gestor.actual().version != anterior.version
+
+
+class TestDatasetCompilado:
+    """tests de la carga del dataset compilado en lugar del CSV"""
+
+    @pytest.fixture
+    def compilado(self, csv_path):
+        ruta = csv_path.with_suffix('.bin')
+        calculator.compilar_dataset(csv_path, ruta)
+        return ruta
+
+    def _gestor(self, csv_path, compilado, cargas):
+        def cargar(ruta):
+            cargas.append(ruta)
+            return calculator.cargar_compilado(ruta)
+        return GestorDataset(csv_path, calculator.construir_datos, intervalo=0,
+                             compilado=compilado, cargar_compilado=cargar)
+
+    def test_usa_compilado_al_dia(self, csv_path, compilado):
+        """verif que si el compilado corresponde al CSV se carga sin parsear el CSV"""
+        cargas = []
+        gestor = self._gestor(csv_path, compilado, cargas)
+        referencia = calculator.construir_datos(csv_path.read_bytes())
+
+        assert cargas == [compilado]
+        assert gestor.actual().version == calculator.GESTOR.actual().version
+        assert gestor.actual().estadisticas == referencia['estadisticas']
+        for clave, coef in referencia['tabla'].items():
+            assert gestor.actual().tabla[clave].agua == coef.agua
+            assert gestor.actual().tabla[clave].proveedor == coef.proveedor
+
+    def test_mismo_contenido_con_otro_mtime(self, csv_path, compilado):
+        """verif que un touch del CSV (mismo contenido) sigue usando el compilado"""
+        csv_path.write_bytes(csv_path.read_bytes())
+        cargas = []
+        self._gestor(csv_path, compilado, cargas)
+        assert cargas == [compilado]
+
+    def test_compilado_desactualizado_usa_csv(self, csv_path, compilado):
+        """verif que si el CSV cambió después de compilar se parsea el CSV"""
+        _quitar_modelo(csv_path, 'Gemini 1.5')
+        cargas = []
+        gestor = self._gestor(csv_path, compilado, cargas)
+        assert cargas == []
+        assert not any(modelo == 'Gemini 1.5' for modelo, _ in gestor.actual().tabla)
+
+    def test_compilado_corrupto_usa_csv(self, csv_path, compilado):
+        """verif que un compilado ilegible no impide cargar el CSV"""
+        compilado.write_bytes(compilado.read_bytes()[:200])
+        gestor = GestorDataset(csv_path, calculator.construir_datos, intervalo=0,
+                               compilado=compilado, cargar_compilado=calculator.cargar_compilado)
+        assert ('Claude 3', 'texto') in gestor.actual().tabla
+
+    def test_recarga_tras_recompilar(self, csv_path, compilado):
+        """verif que al cambiar el CSV y recompilar, la recarga usa el compilado nuevo"""
+        cargas = []
+        gestor = self._gestor(csv_path, compilado, cargas)
+        _quitar_modelo(csv_path, 'Gemini 1.5')
+        calculator.compilar_dataset(csv_path, compilado)
+
+        assert gestor.recargar() is True
+        assert cargas == [compilado, compilado]
+        assert not any(modelo == 'Gemini 1.5' for modelo, _ in gestor.actual().tabla)
+
+    def test_comando_compilar(self, csv_path, capsys):
+        """verif el subcomando python -m utils compilar"""
+        from utils.__main__ import main
+
+        destino = csv_path.with_suffix('.bin')
+        assert main(['compilar', '--origen', str(csv_path), '--destino', str(destino)]) == 0
+        assert '15 filas' in capsys.readouterr().out
+        assert destino.exists()
+
+        csv_path.write_text(csv_path.read_text(encoding='utf-8').splitlines()[0] + '\n', encoding='utf-8')
+        assert main(['compilar', '--origen', str(csv_path), '--destino', str(destino)]) == 1
@@ -262,3 +262,452 @@ class TestResponseContent:
             'cantidad': 1
         })
         assert b'texto' in response2.data.lower() or b'Texto' in response2.data
+
+
+class TestDatasetInfoRoute:
+    """tests para ruta GET /api/dataset"""
+
+    def test_dataset_info_version(self, client):
+        """verificar que se expone la versión y fecha de carga del dataset"""
+        response = client.get('/api/dataset')
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert datos['version']
+        assert datos['cargado_en']
+        assert 'pid' in datos
+
+
+class TestCalcularLoteRoute:
+    """tests para ruta POST /api/calcular/lote"""
+
+    def test_lote_con_incertidumbre(self, client):
+        """verificar que "incertidumbre" agrega intervalos por ítem y de los totales"""
+        response = client.post('/api/calcular/lote', json={'incertidumbre': 0.95, 'items': [
+            {'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 5},
+            {'modelo': 'Claude 3', 'tipo_consulta': 'imagen', 'cantidad': 3},
+        ]})
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert len(datos['energia_superior']) == 2
+        assert datos['incertidumbre']['nivel'] == 0.95
+        assert set(datos['incertidumbre']['totales']) == {'agua', 'energia', 'co2'}
+
+    def test_lote_nivel_invalido(self, client):
+        """verificar que un nivel inválido retorna 400"""
+        response = client.post('/api/calcular/lote', json={'incertidumbre': 'mucho', 'items': []})
+        assert response.status_code == 400
+
+    def test_lote_items(self, client):
+        """verificar que un lote de ítems retorna columnas y totales"""
+        response = client.post('/api/calcular/lote', json={'items': [
+            {'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 5},
+            {'modelo': 'Claude 3', 'tipo_consulta': 'imagen', 'cantidad': 3},
+        ]})
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert len(datos['agua']) == 2
+        assert datos['totales']['items'] == 2
+        assert datos['errores'] == []
+
+    def test_lote_sin_equivalencias(self, client):
+        """verificar que con "equivalencias": false la respuesta no trae esas columnas"""
+        response = client.post('/api/calcular/lote', json={
+            'modelo': ['GPT-4 Turbo'], 'tipo_consulta': ['texto'], 'cantidad': [5], 'equivalencias': False})
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert 'vasos' not in datos and 'km_auto' not in datos
+        assert datos['totales']['items'] == 1
+
+    def test_lote_columnas_con_errores(self, client):
+        """verificar que los ítems inválidos se reportan sin abortar el lote"""
+        response = client.post('/api/calcular/lote', json={
+            'modelo': ['GPT-4 Turbo', 'InvalidModel', 'Claude 3'],
+            'tipo_consulta': ['texto', 'texto', 'audio'],
+            'cantidad': [5, 1, -2],
+        })
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert datos['totales']['items'] == 1
+        assert [e['indice'] for e in datos['errores']] == [1, 2]
+        assert datos['agua'][1] is None and datos['agua'][2] is None
+
+    def test_lote_valores_no_finitos_o_sin_hash(self, client):
+        """verificar que claves no textuales, NaN y cantidades enormes son errores por ítem y la respuesta es JSON válido"""
+        cuerpo = ('{"items": [{"modelo": [["x"]], "tipo_consulta": "texto", "cantidad": 1},'
+                  ' {"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 1' + '0' * 400 + '},'
+                  ' {"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": NaN},'
+                  ' {"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 2}]}')
+        response = client.post('/api/calcular/lote', data=cuerpo, content_type='application/json')
+        assert response.status_code == 200
+        assert b'NaN' not in response.data and b'Infinity' not in response.data
+        datos = response.get_json()
+        assert [e['indice'] for e in datos['errores']] == [0, 1, 2]
+        assert datos['totales']['items'] == 1
+
+    def test_lote_region_no_textual(self, client):
+        """verificar que una región que no es texto es un error del ítem y no un 500"""
+        response = client.post('/api/calcular/lote', json={'items': [
+            {'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 1, 'region': ['a']},
+            {'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 1},
+        ]})
+        assert response.status_code == 200
+        assert [e['indice'] for e in response.get_json()['errores']] == [0]
+
+    def test_lote_cuerpo_invalido(self, client):
+        """verificar que un cuerpo mal formado retorna 400"""
+        assert client.post('/api/calcular/lote', data='no es json').status_code == 400
+        assert client.post('/api/calcular/lote', json={'items': 'x'}).status_code == 400
+        assert client.post('/api/calcular/lote', json={'modelo': ['a'], 'tipo_consulta': [], 'cantidad': []}).status_code == 400
+
+
+class TestCalcularApiRoute:
+    """tests para ruta GET /api/calcular y caché HTTP"""
+
+    def test_calcular_api_json(self, client):
+        """verificar que GET /api/calcular retorna el mismo resultado que calcular_impacto"""
+        from utils.calculator import calcular_impacto
+
+        response = client.get('/api/calcular?modelo=Claude 3&tipo_consulta=audio&cantidad=2.5')
+        assert response.status_code == 200
+        assert response.get_json() == calcular_impacto('Claude 3', 'audio', 2.5)
+
+    def test_calcular_api_incertidumbre(self, client):
+        """verificar intervalos con incertidumbre=1 y ETag distinto al del valor puntual"""
+        puntual = client.get('/api/calcular?modelo=Claude 3&tipo_consulta=audio&cantidad=2')
+        response = client.get('/api/calcular?modelo=Claude 3&tipo_consulta=audio&cantidad=2&incertidumbre=1')
+        assert response.status_code == 200
+        assert response.get_json()['incertidumbre']['nivel'] == 0.9
+        assert response.headers['ETag'] != puntual.headers['ETag']
+
+        response = client.get('/api/calcular?modelo=Claude 3&tipo_consulta=audio&cantidad=2&incertidumbre=abc')
+        assert response.status_code == 400
+
+    def test_api_calcular_cantidad_no_finita(self, client):
+        """verificar que cantidades nan, inf o fuera de rango retornan 400 y no 500"""
+        for cantidad in ('nan', 'inf', '-inf', '1e400', '1' + '0' * 400):
+            response = client.get(f'/api/calcular?modelo=Claude 3&tipo_consulta=audio&cantidad={cantidad}')
+            assert response.status_code == 400, cantidad
+            assert 'Error' in response.get_json()['error']
+
+    def test_calcular_api_region(self, client, tmp_path, monkeypatch):
+        """verificar region y fecha en /api/calcular y que cambian el ETag"""
+        import app as modulo_app
+        from utils import calculator
+        from utils.intensidad import GestorPerfiles
+        (tmp_path / 'sur.csv').write_text('hora,intensidad\n2024-01-01T00:00,250\n', encoding='utf-8')
+        gestor = GestorPerfiles(tmp_path)
+        monkeypatch.setattr(calculator, 'GESTOR_PERFILES', gestor)
+        monkeypatch.setattr(modulo_app, 'GESTOR_PERFILES', gestor)
+        url = '/api/calcular?modelo=Claude 3&tipo_consulta=audio&cantidad=2'
+        response = client.get(url + '&region=sur&fecha=2025-01-01T10:00')
+        assert response.status_code == 200
+        assert response.get_json()['intensidad_carbono'] == 250
+        assert response.headers['ETag'] != client.get(url).headers['ETag']
+        assert client.get(url + '&region=norte').status_code == 400
+
+    def test_calcular_api_304_sin_calcular(self, client, monkeypatch):
+        """verificar que con un If-None-Match vigente el 304 sale sin llamar a calcular_impacto"""
+        import app as modulo_app
+        url = '/api/calcular?modelo=GPT-4 Turbo&tipo_consulta=texto&cantidad=5&incertidumbre=1'
+        etag = client.get(url).headers['ETag']
+        monkeypatch.setattr(modulo_app, 'calcular_impacto', lambda *args: pytest.fail('no debe calcular'))
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+    def test_calcular_api_etag_y_304(self, client):
+        """verificar ETag, Cache-Control y 304 con If-None-Match"""
+        url = '/api/calcular?modelo=GPT-4 Turbo&tipo_consulta=texto&cantidad=5'
+        response = client.get(url)
+        etag = response.headers['ETag']
+        assert not etag.startswith('W/')
+        assert 'public' in response.headers['Cache-Control']
+        assert 'max-age' in response.headers['Cache-Control']
+
+        response2 = client.get(url, headers={'If-None-Match': etag})
+        assert response2.status_code == 304
+        assert response2.data == b''
+
+        otra = client.get('/api/calcular?modelo=GPT-4 Turbo&tipo_consulta=texto&cantidad=6')
+        assert otra.headers['ETag'] != etag
+
+    def test_calcular_api_errores(self, client):
+        """verificar que entradas inválidas retornan 400 con el mensaje de error"""
+        response = client.get('/api/calcular?modelo=InvalidModel&tipo_consulta=texto&cantidad=5')
+        assert response.status_code == 400
+        assert 'no encontrada' in response.get_json()['error']
+        assert client.get('/api/calcular?modelo=Claude 3&tipo_consulta=texto&cantidad=cinco').status_code == 400
+
+    def test_comparativo_etag(self, client):
+        """verificar que /comparativo responde 304 cuando el cliente tiene la versión vigente"""
+        response = client.get('/comparativo')
+        assert response.status_code == 200
+        response2 = client.get('/comparativo', headers={'If-None-Match': response.headers['ETag']})
+        assert response2.status_code == 304
+
+    def test_comparativo_sin_datos_embebidos(self, client, monkeypatch):
+        """verificar que /comparativo no incluye estadísticas ni las calcula"""
+        import app as modulo_app
+        response = client.get('/comparativo')
+        assert b'modelComparisonChart' in response.data
+        assert b'modelStats' not in response.data
+        assert response.data.count(b'id="cumulativeImpactChart"') == 1
+        monkeypatch.setattr(modulo_app, 'obtener_estadisticas', lambda: pytest.fail('no debe calcular estadísticas'))
+        assert client.get('/comparativo').headers['ETag'] == response.headers['ETag']
+
+    def test_comparativo_selects_del_dataset(self, client):
+        """verificar que los selects de la proyección listan los modelos y tipos del dataset"""
+        from utils.calculator import TABLA_COEFICIENTES
+        html = client.get('/comparativo').get_data(as_text=True)
+        selects = html[html.index('id="cumulativeModel"'):html.index('cumulativeImpactChart')]
+        for modelo in TABLA_COEFICIENTES.modelos():
+            assert f'<option value="{modelo}">' in selects
+        for tipo in TABLA_COEFICIENTES.tipos_consulta():
+            assert f'<option value="{tipo}">' in selects
+
+    def test_comparativo_etag_cambia_con_assets_y_templates(self, client, monkeypatch):
+        """verificar que el ETag de /comparativo cambia al reconstruir los assets o editar los templates"""
+        import app as modulo_app
+        from utils import plantillas
+        etag = client.get('/comparativo').headers['ETag']
+        monkeypatch.setattr(modulo_app, 'MANIFIESTO_ASSETS', {'app.js': 'app.0123abcd.js'})
+        etag_assets = client.get('/comparativo').headers['ETag']
+        assert etag_assets != etag
+        monkeypatch.setattr(plantillas, 'version_templates', lambda entorno: 'otra')
+        assert client.get('/comparativo').headers['ETag'] not in (etag, etag_assets)
+
+    def test_graficos_json_y_etag(self, client):
+        """verificar que /api/graficos retorna los promedios por modelo y tipo, cacheables"""
+        from utils.calculator import TABLA_COEFICIENTES, obtener_estadisticas
+        response = client.get('/api/graficos')
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert datos['modelos'] == TABLA_COEFICIENTES.modelos()
+        assert datos['tipos_consulta'] == ['texto', 'código', 'imagen', 'audio', 'video']
+        assert datos['por_modelo'] == obtener_estadisticas()['por_modelo']
+        assert set(datos['por_tipo_consulta']['texto']) == {'agua', 'energia', 'carbono'}
+        assert response.headers['ETag'] != client.get('/comparativo').headers['ETag']
+        response2 = client.get('/api/graficos', headers={'If-None-Match': response.headers['ETag']})
+        assert response2.status_code == 304
+
+    def test_ranking_api(self, client):
+        """verificar que /api/ranking pagina, acepta pesos y tipo de consulta, y es cacheable"""
+        response = client.get('/api/ranking?pesos=agua:1,energia:0,carbono:0&tipo_consulta=texto&por_pagina=2')
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert datos['total'] == 3 and len(datos['ranking']) == 2
+        assert datos['ranking'][0]['agua'] <= datos['ranking'][1]['agua']
+        assert datos['pesos'] == {'agua': 1.0, 'energia': 0.0, 'carbono': 0.0}
+        response2 = client.get('/api/ranking?pesos=agua:1,energia:0,carbono:0&tipo_consulta=texto&por_pagina=2',
+                               headers={'If-None-Match': response.headers['ETag']})
+        assert response2.status_code == 304
+
+    def test_ranking_api_errores(self, client):
+        """verificar que pesos, tipo o página inválidos retornan 400"""
+        for query in ('pesos=agua:x', 'pesos=co2:1', 'tipo_consulta=podcast', 'pagina=0', 'por_pagina=abc'):
+            assert client.get(f'/api/ranking?{query}').status_code == 400
+
+
+class TestOptimizarRoute:
+    """tests para ruta POST /api/optimizar"""
+
+    def test_optimizar_json(self, client):
+        """verificar que /api/optimizar reparte la demanda respetando la capacidad compartida"""
+        response = client.post('/api/optimizar', json={
+            'demanda': {'texto': 500, 'imagen': 20},
+            'objetivo': 'co2',
+            'capacidades': {'Claude 3': 300},
+        })
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert sum(f['cantidad'] for f in datos['asignacion'] if f['modelo'] == 'Claude 3') == pytest.approx(300)
+        assert datos['por_tipo']['texto']['sin_asignar'] == 0
+        assert set(datos['totales']) == {'agua', 'energia', 'co2', 'objetivo'}
+
+    def test_optimizar_errores(self, client):
+        """verificar que un cuerpo o restricciones inválidas retornan 400"""
+        assert client.post('/api/optimizar', data='x', content_type='text/plain').status_code == 400
+        for cuerpo in ({}, {'demanda': {'podcast': 1}}, {'demanda': {'texto': 1}, 'objetivo': 'ruido'},
+                       {'demanda': {'texto': 1}, 'capacidades': []}):
+            response = client.post('/api/optimizar', json=cuerpo)
+            assert response.status_code == 400
+            assert response.get_json()['error'].startswith('Error:')
+        for cuerpo in ('{"demanda": {"texto": Infinity}}', '{"demanda": {"texto": 1e400}}',
+                       '{"demanda": {"texto": 1}, "capacidades": {"Claude 3": 1' + '0' * 400 + '}}',
+                       '{"demanda": {"texto": 1}, "permitidos": {"texto": [[1]]}}'):
+            response = client.post('/api/optimizar', data=cuerpo, content_type='application/json')
+            assert response.status_code == 400
+            assert response.get_json()['error'].startswith('Error:')
+
+
+class TestProyeccionRoute:
+    """tests para rutas GET /api/proyeccion y /api/proyeccion/temporal"""
+
+    def test_proyeccion_columnar(self, client):
+        """verificar que el barrido retorna columnas reducidas al presupuesto"""
+        response = client.get('/api/proyeccion?modelo=Claude 3&tipo_consulta=texto&desde=1&hasta=10000&pasos=500&max_puntos=50')
+        assert response.status_code == 200
+        datos = response.get_json()
+        assert len(datos['x']) == 50
+        assert len(datos['series']) == 1
+        assert 'ETag' in response.headers
+
+    def test_proyeccion_limite_y_errores(self, client):
+        """verificar límites de tamaño y parámetros inválidos"""
+        assert client.get('/api/proyeccion?pasos=10000000').status_code == 413
+        assert client.get('/api/proyeccion?escala=cubica').status_code == 400
+        assert client.get('/api/proyeccion?cantidades=1,a').status_code == 400
+        assert client.get('/api/proyeccion?cantidades=1,nan,-5').status_code == 400
+        assert client.get('/api/proyeccion?hasta=1e400').status_code == 400
+        assert client.get('/api/proyeccion/temporal?modelo=Claude 3&tipo_consulta=texto'
+                          '&crecimiento=10&periodos=1000').status_code == 400
+        assert client.get('/api/proyeccion/temporal?modelo=Claude 3&tipo_consulta=texto&cantidad=nan').status_code == 400
+
+    def test_proyeccion_temporal(self, client):
+        """verificar la proyección temporal y la combinación inexistente"""
+        response = client.get('/api/proyeccion/temporal?modelo=Claude 3&tipo_consulta=texto&cantidad=10&periodos=12')
+        assert response.status_code == 200
+        assert len(response.get_json()['x']) == 12
+        assert client.get('/api/proyeccion/temporal?modelo=X&tipo_consulta=texto').status_code == 404
+
+
+class TestMetricsRoute:
+    """tests para ruta GET /metrics"""
+
+    def test_metrics_registra_requests_y_templates(self, client):
+        """verificar que /metrics expone latencias por ruta y tiempos de templates"""
+        client.get('/')
+        client.post('/calcular', data={'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 5})
+        response = client.get('/metrics')
+
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        texto = response.data.decode('utf-8')
+        assert 'ecoai_requests_total{metodo="POST",ruta="/calcular",status="200"}' in texto
+        assert 'ecoai_request_duracion_segundos_bucket{ruta="/",le="+Inf"}' in texto
+        assert 'ecoai_template_duracion_segundos_count{template="results.html"}' in texto
+        assert 'ecoai_calculo_duracion_segundos_count{funcion="calcular_impacto"}' in texto
+
+
+class TestListoRoute:
+    """tests para ruta GET /listo (readiness)"""
+
+    def test_listo_503_hasta_calentar(self, client):
+        """verificar que /listo responde 503 antes del calentamiento y 200 después"""
+        from utils import calentamiento
+        calentamiento.reiniciar()
+        try:
+            response = client.get('/listo')
+            assert response.status_code == 503
+            assert response.get_json()['listo'] is False
+
+            calentamiento.calentar(client.application)
+            response = client.get('/listo')
+            assert response.status_code == 200
+            datos = response.get_json()
+            assert datos['listo'] is True
+            assert datos['heredado'] is False
+            assert datos['templates'] == 4
+        finally:
+            calentamiento.reiniciar()
+
+
+class TestTrabajosRoute:
+    """tests para rutas /api/trabajos"""
+
+    @pytest.fixture
+    def gestor(self, tmp_path, monkeypatch):
+        """gestor de trabajos temporal habilitado en la app (procesa en un thread)"""
+        import app as modulo_app
+        from utils.trabajos import GestorTrabajos
+        gestor = GestorTrabajos(tmp_path / 'trabajos', procesos=0)
+        monkeypatch.setattr(modulo_app, 'TRABAJOS', gestor)
+        return gestor
+
+    def test_deshabilitado_sin_directorio(self, client, monkeypatch):
+        """verificar 404 si no se definió ECOAI_TRABAJOS_DIR"""
+        import app as modulo_app
+        monkeypatch.setattr(modulo_app, 'TRABAJOS', None)
+        assert client.post('/api/trabajos', data='x').status_code == 404
+        assert client.get('/api/trabajos').status_code == 404
+
+    def test_subir_consultar_y_descargar(self, client, gestor):
+        """verificar que el archivo se acepta con 202, se procesa y sus resultados se descargan"""
+        import io
+        archivo = b'modelo,tipo_consulta,cantidad,fecha\nClaude 3,texto,10,2025-03-01\nGPT-4 Turbo,video,2,2025-04-01\n'
+        response = client.post('/api/trabajos?por=mes', data={'archivo': (io.BytesIO(archivo), 'uso.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 202
+        datos = response.get_json()
+        assert response.headers['Location'] == datos['urls']['estado'] == f"/api/trabajos/{datos['id']}"
+        gestor.esperar(datos['id'])
+
+        estado = client.get(datos['urls']['estado']).get_json()
+        assert (estado['estado'], estado['registros'], estado['nombre']) == ('terminado', 2, 'uso.csv')
+        resultados = client.get(datos['urls']['resultados'])
+        assert resultados.status_code == 200 and resultados.mimetype == 'text/csv'
+        assert 'attachment' in resultados.headers['Content-Disposition']
+        assert resultados.data.decode('utf-8').count('\n') == 3
+        agregados = client.get(datos['urls']['agregados.json']).get_json()
+        assert [g['periodo'] for g in agregados['grupos']] == ['2025-03', '2025-04']
+        assert [t['id'] for t in client.get('/api/trabajos').get_json()['trabajos']] == [datos['id']]
+
+    def test_cuerpo_ndjson_y_errores(self, client, gestor):
+        """verificar la subida como cuerpo NDJSON, el 409 antes de terminar y los 404/400"""
+        cuerpo = b'{"modelo": "Claude 3", "tipo_consulta": "audio", "cantidad": 1}\n'
+        gestor._encolar = lambda id_trabajo: None
+        datos = client.post('/api/trabajos', data=cuerpo, content_type='application/x-ndjson').get_json()
+        assert gestor.estado(datos['id'])['formato'] == 'ndjson'
+        assert client.get(datos['urls']['resultados']).status_code == 409
+        assert client.get(f"/api/trabajos/{datos['id']}/otro").status_code == 404
+        assert client.get('/api/trabajos/' + '0' * 32).status_code == 404
+        assert client.post('/api/trabajos?formato=xlsx', data=cuerpo).status_code == 400
+
+
+class TestRegistroRoute:
+    """tests del registro de uso: /calcular, /api/calcular/lote y GET /api/registro/totales"""
+
+    @pytest.fixture
+    def libro(self, tmp_path, monkeypatch):
+        """registro de uso temporal habilitado en la app"""
+        import app as modulo_app
+        from utils.registro import RegistroUso
+        libro = RegistroUso(tmp_path / 'registro.sqlite3', intervalo=0.05)
+        monkeypatch.setattr(modulo_app, 'REGISTRO', libro)
+        return libro
+
+    def test_deshabilitado_sin_base(self, client, monkeypatch):
+        """verificar 404 si no se definió ECOAI_REGISTRO_DB"""
+        import app as modulo_app
+        monkeypatch.setattr(modulo_app, 'REGISTRO', None)
+        assert client.get('/api/registro/totales').status_code == 404
+
+    def test_calcular_y_lote_se_registran(self, client, libro):
+        """verificar que el formulario y los ítems válidos del lote se acumulan por equipo"""
+        from utils.calculator import calcular_impacto
+        client.post('/calcular', data={'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'cantidad': 5, 'equipo': 'datos'})
+        client.post('/api/calcular/lote', json={'equipo': 'web', 'items': [
+            {'modelo': 'Claude 3', 'tipo_consulta': 'imagen', 'cantidad': 3},
+            {'modelo': 'X', 'tipo_consulta': 'texto', 'cantidad': 1},
+        ]})
+        assert libro.vaciar()
+        response = client.get('/api/registro/totales?por=equipo,modelo&periodo=total')
+        assert response.status_code == 200
+        filas = response.get_json()['filas']
+        assert [(f['equipo'], f['modelo'], f['cantidad']) for f in filas] == [('datos', 'GPT-4 Turbo', 5), ('web', 'Claude 3', 3)]
+        assert filas[0]['co2'] == calcular_impacto('GPT-4 Turbo', 'texto', 5)['co2']
+
+    def test_parametros_invalidos(self, client, libro):
+        """verificar 400 con una columna o periodo no válidos"""
+        assert client.get('/api/registro/totales?por=proveedor').status_code == 400
+        assert client.get('/api/registro/totales?periodo=semana').status_code == 400
+
+    def test_acumulados(self, client, libro):
+        """verificar GET /api/registro/acumulados tras registrar un cálculo"""
+        client.post('/calcular', data={'modelo': 'Claude 3', 'tipo_consulta': 'audio', 'cantidad': 2})
+        assert libro.vaciar()
+        response = client.get('/api/registro/acumulados?periodo=anio&por=modelo')
+        assert response.status_code == 200
+        [fila] = response.get_json()['filas']
+        assert (fila['modelo'], fila['registros'], fila['cantidad']) == ('Claude 3', 1, 2)
+        assert client.get('/api/registro/acumulados?por=equipo').status_code == 400
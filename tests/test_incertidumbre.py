@@ -0,0 +1,130 @@
+"""
+Unit tests para utils/incertidumbre.py
+Verifican los intervalos de Monte Carlo, la suma de coeficientes independientes y la lectura del archivo de distribuciones
+"""
+
+import math
+from statistics import NormalDist
+
+import pytest
+from utils import incertidumbre
+from utils.incertidumbre import Distribucion, intervalo, intervalo_suma
+
+
+class TestIntervalo:
+    """tests del intervalo de un coeficiente"""
+
+    def test_uniforme(self):
+        """verif percentiles 5/95 y media de una uniforme"""
+        resultado = intervalo(Distribucion.uniforme(1.0, 3.0), nivel=0.9)
+        assert resultado['inferior'] == pytest.approx(1.1, abs=0.01)
+        assert resultado['superior'] == pytest.approx(2.9, abs=0.01)
+        assert resultado['media'] == pytest.approx(2.0, abs=0.01)
+        assert resultado['mediana'] == pytest.approx(2.0, abs=0.01)
+
+    def test_normal(self):
+        """verif que el intervalo de una normal es media ± z * desvio"""
+        resultado = intervalo(Distribucion.normal(10.0, 2.0), nivel=0.95)
+        z = NormalDist().inv_cdf(0.975)
+        assert resultado['inferior'] == pytest.approx(10 - z * 2, abs=0.05)
+        assert resultado['superior'] == pytest.approx(10 + z * 2, abs=0.05)
+        assert resultado['media'] == pytest.approx(10.0, abs=0.02)
+
+    def test_normal_truncada_en_cero(self):
+        """verif que una normal con mucha masa negativa se trunca en 0 (también en la media)"""
+        resultado = intervalo(Distribucion.normal(0.1, 1.0), nivel=0.9)
+        assert resultado['inferior'] == 0.0
+        # E[max(X, 0)] = mu * Phi(mu/sigma) + sigma * phi(mu/sigma)
+        esperada = 0.1 * NormalDist().cdf(0.1) + NormalDist().pdf(0.1)
+        assert resultado['media'] == pytest.approx(esperada, abs=0.01)
+
+    def test_escala_con_el_factor(self):
+        """verif que multiplicar por la cantidad escala todo el intervalo"""
+        d = Distribucion.uniforme(0.5, 1.5)
+        uno, diez = intervalo(d), intervalo(d, 10)
+        for campo in uno:
+            assert diez[campo] == pytest.approx(10 * uno[campo])
+
+    def test_coeficiente_exacto(self):
+        """verif que un número se trata como coeficiente sin incertidumbre"""
+        assert intervalo(2.5, 4) == {'media': 10.0, 'mediana': 10.0, 'inferior': 10.0, 'superior': 10.0}
+
+    def test_nivel_invalido(self):
+        """verif que el nivel debe estar entre 0 y 1"""
+        with pytest.raises(ValueError):
+            intervalo(Distribucion.uniforme(0, 1), nivel=1.5)
+
+
+class TestIntervaloSuma:
+    """tests del intervalo de una suma de coeficientes"""
+
+    def test_suma_de_normales(self):
+        """verif que la suma de dos normales independientes tiene desvio sqrt(2) veces mayor"""
+        d = Distribucion.normal(10.0, 1.0)
+        resultado = intervalo_suma([('a', d, 1), ('b', d, 1)], nivel=0.9)
+        ancho = 2 * NormalDist().inv_cdf(0.95) * math.sqrt(2)
+        assert resultado['media'] == pytest.approx(20.0, abs=0.05)
+        assert resultado['superior'] - resultado['inferior'] == pytest.approx(ancho, rel=0.03)
+
+    def test_constantes_y_un_solo_termino(self):
+        """verif que los coeficientes exactos se suman al intervalo del único término aleatorio"""
+        d = Distribucion.uniforme(1.0, 2.0)
+        resultado = intervalo_suma([('a', d, 2), ('b', 3.0, 1)])
+        solo = intervalo(d, 2)
+        for campo in solo:
+            assert resultado[campo] == pytest.approx(solo[campo] + 3.0)
+
+    def test_determinista(self):
+        """verif que las mismas entradas dan el mismo intervalo (semilla fija)"""
+        terminos = [('a', Distribucion.uniforme(0, 1), 3), ('b', Distribucion.normal(5, 1), 2)]
+        assert intervalo_suma(terminos) == intervalo_suma(terminos)
+
+
+class TestConstruirDistribuciones:
+    """tests de la lectura del archivo de distribuciones"""
+
+    ENCABEZADO = 'modelo,tipo_consulta,metrica,distribucion,min,max,media,desvio\n'
+
+    def test_lee_uniforme_y_normal(self):
+        """verif que cada fila se convierte en la Distribucion de su métrica"""
+        contenido = (self.ENCABEZADO
+                     + 'M,texto,agua,uniforme,0.1,0.3,,\n'
+                     + 'M,texto,energia,normal,,,0.2,0.05\n').encode('utf-8')
+        tabla = incertidumbre.construir_distribuciones(contenido)['tabla']
+        assert tabla[('M', 'texto')] == {
+            'agua': Distribucion.uniforme(0.1, 0.3),
+            'energia': Distribucion.normal(0.2, 0.05),
+        }
+
+    def test_descarta_rangos_que_no_contienen_el_punto(self, capsys):
+        """verif que con los coeficientes del dataset se descartan las filas cuyo rango no los contiene"""
+        from utils.calculator import Coeficientes
+        contenido = (self.ENCABEZADO
+                     + 'M,texto,agua,uniforme,0.1,0.3,,\n'
+                     + 'M,texto,energia,normal,,,0.2,0.01\n'
+                     + 'M,texto,carbono,uniforme,0.5,0.8,,\n').encode('utf-8')
+        puntos = {('M', 'texto'): Coeficientes(0.3, 0.5, 0.5, 'pregunta', '')}
+        tabla = incertidumbre.construir_distribuciones(contenido, puntos)['tabla']
+        assert set(tabla[('M', 'texto')]) == {'agua', 'carbono'}
+        assert 'fila 3' in capsys.readouterr().out
+
+    def test_rangos_del_dataset_contienen_los_puntos(self):
+        """verif que cada distribución del archivo incluido contiene el coeficiente puntual del dataset"""
+        from utils import calculator
+        tabla = calculator.GESTOR.actual().tabla
+        contenido = calculator.INCERTIDUMBRE_PATH.read_bytes()
+        validadas = incertidumbre.construir_distribuciones(contenido, tabla)['tabla']
+        assert validadas == incertidumbre.construir_distribuciones(contenido)['tabla']
+
+    @pytest.mark.parametrize('fila', [
+        'M,texto,agua,triangular,0.1,0.3,,',
+        'M,texto,humo,uniforme,0.1,0.3,,',
+        'M,texto,agua,uniforme,0.3,0.1,,',
+        'M,texto,energia,normal,,,0.2,-1',
+        'M,texto,energia,normal,,,,0.1',
+        ',texto,agua,uniforme,0.1,0.3,,',
+    ])
+    def test_filas_invalidas(self, fila):
+        """verif que las filas inválidas se rechazan con ValueError"""
+        with pytest.raises(ValueError):
+            incertidumbre.construir_distribuciones((self.ENCABEZADO + fila + '\n').encode('utf-8'))
@@ -0,0 +1,222 @@
+"""
+Unit tests para utils/ingesta.py
+Verifican la agregación en streaming de registros de uso y el CLI
+"""
+
+import io
+import json
+
+import pytest
+from utils import ingesta
+from utils.__main__ import main
+from utils.calculator import calcular_impacto
+
+REGISTROS = [
+    ('2025-01-05T10:00:00', 'GPT-4 Turbo', 'texto', 5),
+    ('2025-01-20T11:30:00', 'GPT-4 Turbo', 'texto', 3),
+    ('2025-02-01T09:00:00', 'Claude 3', 'imagen', 2),
+    ('2025-02-14T18:00:00', 'Gemini 1.5', 'audio', 1.5),
+    ('2025-02-15T08:00:00', 'InvalidModel', 'texto', 4),
+    ('2025-03-01T08:00:00', 'Claude 3', 'texto', 0),
+]
+
+
+@pytest.fixture
+def csv_registros(tmp_path):
+    """archivo CSV de registros de uso"""
+    ruta = tmp_path / 'uso.csv'
+    lineas = ['fecha,modelo,tipo_consulta,cantidad']
+    lineas += [f'{fecha},{modelo},{tipo},{cantidad}' for fecha, modelo, tipo, cantidad in REGISTROS]
+    ruta.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    return ruta
+
+
+@pytest.fixture
+def ndjson_registros(tmp_path):
+    """archivo NDJSON de registros de uso"""
+    ruta = tmp_path / 'uso.ndjson'
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for fecha, modelo, tipo, cantidad in REGISTROS:
+            f.write(json.dumps({'timestamp': fecha, 'modelo': modelo, 'tipo_consulta': tipo, 'cantidad': cantidad}) + '\n')
+        f.write('{no es json\n')
+    return ruta
+
+
+class TestAgregacion:
+    """tests de la agregación por grupo y periodo"""
+
+    def test_totales_coinciden_con_calcular_impacto(self, csv_registros):
+        """verif que los totales del grupo coinciden con sumar calcular_impacto"""
+        agregado = ingesta.ingerir_archivo(csv_registros, por='mes', procesos=1)
+        grupo = agregado['grupos'][('GPT-4 Turbo', 'texto', 'OpenAI', '2025-01')]
+
+        assert grupo[0] == 2
+        assert grupo[1] == 8
+        assert round(grupo[2], 2) == calcular_impacto('GPT-4 Turbo', 'texto', 8)['agua']
+        assert agregado['registros'] == 6
+        assert agregado['errores'] == 2
+
+    def test_periodos(self, csv_registros):
+        """verif la agrupación por día y total"""
+        por_dia = ingesta.ingerir_archivo(csv_registros, por='dia', procesos=1)
+        assert ('Claude 3', 'imagen', 'Anthropic', '2025-02-01') in por_dia['grupos']
+
+        total = ingesta.ingerir_archivo(csv_registros, por='total', procesos=1)
+        assert {clave[3] for clave in total['grupos']} == {'total'}
+
+    def test_ndjson_igual_a_csv(self, csv_registros, ndjson_registros):
+        """verif que NDJSON y CSV producen los mismos grupos (líneas inválidas cuentan como error)"""
+        desde_csv = ingesta.ingerir_archivo(csv_registros, procesos=1)
+        desde_ndjson = ingesta.ingerir_archivo(ndjson_registros, procesos=1)
+        assert desde_ndjson['grupos'] == desde_csv['grupos']
+        assert desde_ndjson['errores'] == desde_csv['errores'] + 1
+
+    def test_fecha_epoch(self):
+        """verif que fechas en epoch se convierten al periodo correcto"""
+        agregado = ingesta.agregar_registros([('GPT-4 Turbo', 'texto', 1, '1735689600')], por='dia')
+        assert ('GPT-4 Turbo', 'texto', 'OpenAI', '2025-01-01') in agregado['grupos']
+
+    def test_fecha_epoch_con_decimales(self):
+        """verif que una epoch con decimales en texto se toma como epoch y no como fecha ISO"""
+        agregado = ingesta.agregar_registros([('GPT-4 Turbo', 'texto', 1, '1735689600.5')], por='dia')
+        assert list(agregado['grupos']) == [('GPT-4 Turbo', 'texto', 'OpenAI', '2025-01-01')]
+        assert agregado['errores'] == 0
+
+    def test_fecha_con_desplazamiento_en_utc(self):
+        """verif que una fecha ISO con desplazamiento horario se agrupa en su hora UTC, como las epoch"""
+        agregado = ingesta.agregar_registros([('GPT-4 Turbo', 'texto', 1, '2024-12-31T22:00:00-03:00'),
+                                              ('GPT-4 Turbo', 'texto', 1, '1735693200')], por='hora')
+        assert list(agregado['grupos']) == [('GPT-4 Turbo', 'texto', 'OpenAI', '2025-01-01T01')]
+
+    def test_registros_invalidos_cuentan_como_error(self):
+        """verif que líneas que no son objetos, fechas o regiones de otro tipo y cantidades no finitas son errores"""
+        lineas = [
+            '[1, 2]',
+            '"texto"',
+            '{"modelo": ["x"], "tipo_consulta": "texto", "cantidad": 1}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 1, "fecha": {"a": 1}}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 1, "region": ["a"]}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": "nan"}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": NaN}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 1e400}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 1' + '0' * 400 + '}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 1.5e308}',
+            '{"modelo": "GPT-4 Turbo", "tipo_consulta": "texto", "cantidad": 2}',
+        ]
+        impactos = []
+        agregado = ingesta.agregar_registros(ingesta.leer_lineas(lineas, 'ndjson'), por='mes', impactos=impactos)
+        assert (agregado['registros'], agregado['errores']) == (11, 10)
+        assert impactos[:-1] == [None] * 10
+        assert agregado['grupos'][('GPT-4 Turbo', 'texto', 'OpenAI', 'sin_fecha')][:2] == [1, 2]
+
+    def test_cantidad_csv_no_finita(self):
+        """verif que 'nan' e 'inf' en el CSV son errores y no contaminan los totales"""
+        lineas = ['modelo,tipo_consulta,cantidad', 'GPT-4 Turbo,texto,nan', 'GPT-4 Turbo,texto,inf', 'GPT-4 Turbo,texto,3']
+        agregado = ingesta.agregar_registros(ingesta.leer_lineas(lineas, 'csv'), por='total')
+        assert agregado['errores'] == 2
+        assert agregado['grupos'][('GPT-4 Turbo', 'texto', 'OpenAI', 'total')][1] == 3
+
+
+class TestParticionado:
+    """tests del reparto del archivo en rangos para varios procesos"""
+
+    def test_rangos_cubren_archivo(self, csv_registros, monkeypatch):
+        """verif que los rangos son contiguos y terminan en saltos de línea"""
+        monkeypatch.setattr(ingesta, 'BYTES_MINIMOS_POR_RANGO', 1)
+        rangos = ingesta.particionar(csv_registros, 3)
+        contenido = csv_registros.read_bytes()
+
+        assert rangos[0][0] == 0 and rangos[-1][1] == len(contenido)
+        for (_, fin), (inicio, _) in zip(rangos, rangos[1:]):
+            assert fin == inicio and contenido[fin - 1:fin] == b'\n'
+
+    def test_varios_procesos_igual_a_uno(self, csv_registros, monkeypatch):
+        """verif que repartir entre procesos da el mismo resultado"""
+        monkeypatch.setattr(ingesta, 'BYTES_MINIMOS_POR_RANGO', 1)
+        uno = ingesta.ingerir_archivo(csv_registros, procesos=1)
+        varios = ingesta.ingerir_archivo(csv_registros, procesos=3)
+
+        assert varios['registros'] == uno['registros']
+        assert varios['grupos'].keys() == uno['grupos'].keys()
+        for clave, valores in uno['grupos'].items():
+            assert varios['grupos'][clave] == pytest.approx(valores)
+
+
+class TestCLI:
+    """tests del subcomando python -m utils ingerir"""
+
+    def test_cli_json(self, csv_registros, capsys):
+        """verif que el CLI escribe el resultado agregado en JSON"""
+        assert main(['ingerir', str(csv_registros), '--por', 'mes', '--procesos', '1', '--salida', 'json']) == 0
+        salida = json.loads(capsys.readouterr().out)
+        assert salida['registros'] == 6
+        assert any(g['periodo'] == '2025-02' and g['modelo'] == 'Claude 3' for g in salida['grupos'])
+
+    def test_csv_con_bom(self, csv_registros, monkeypatch):
+        """verif que un CSV con BOM UTF-8 (ej: exportado de Excel) se lee igual que sin BOM"""
+        monkeypatch.setattr(ingesta, 'BYTES_MINIMOS_POR_RANGO', 1)
+        sin_bom = ingesta.ingerir_archivo(csv_registros, procesos=1)
+        csv_registros.write_bytes(b'\xef\xbb\xbf' + csv_registros.read_bytes())
+        for procesos in (1, 3):
+            con_bom = ingesta.ingerir_archivo(csv_registros, procesos=procesos)
+            assert con_bom['grupos'].keys() == sin_bom['grupos'].keys()
+            assert con_bom['errores'] == sin_bom['errores']
+
+    def test_cli_errores_de_entrada(self, csv_registros, tmp_path, capsys):
+        """verif que un archivo inexistente o sin las columnas requeridas retorna 1 con un mensaje"""
+        assert main(['ingerir', str(tmp_path / 'no_existe.csv'), '--procesos', '1']) == 1
+        assert capsys.readouterr().err.startswith('Error:')
+        csv_registros.write_text('fecha,modelo,cantidad\n2025-01-01,Claude 3,1\n', encoding='utf-8')
+        assert main(['ingerir', str(csv_registros), '--procesos', '1']) == 1
+        assert 'tipo_consulta' in capsys.readouterr().err
+
+    def test_flujo_stdin(self):
+        """verif la ingesta desde un flujo de texto en bloques"""
+        flujo = io.StringIO('modelo,tipo_consulta,cantidad\n' + 'Claude 3,texto,1\n' * 25)
+        agregado = ingesta.ingerir_flujo(flujo, por='total', tamano_bloque=10)
+        assert agregado['grupos'][('Claude 3', 'texto', 'Anthropic', 'total')][0] == 25
+
+
+    def test_cli_actualiza_acumulados(self, csv_registros, tmp_path, capsys):
+        """verif que --registro suma los totales diarios y la salida se reagrupa por mes"""
+        from utils.registro import RegistroUso
+        base = tmp_path / 'registro.sqlite3'
+        assert main(['ingerir', str(csv_registros), '--por', 'mes', '--salida', 'json',
+                     '--procesos', '1', '--registro', str(base)]) == 0
+        salida = json.loads(capsys.readouterr().out)
+        acumulados = RegistroUso(base).acumulados('mes', por=['modelo', 'tipo_consulta'])
+        esperado = [(g['modelo'], g['tipo_consulta'], g['periodo'], g['registros']) for g in salida['grupos']]
+        assert [(a['modelo'], a['tipo_consulta'], a['periodo'], a['registros']) for a in acumulados] == esperado
+
+    def test_cli_no_usa_registro_del_entorno(self, csv_registros, tmp_path, monkeypatch, capsys):
+        """verif que sin --registro no se toca la base de ECOAI_REGISTRO_DB"""
+        base = tmp_path / 'produccion.sqlite3'
+        monkeypatch.setenv('ECOAI_REGISTRO_DB', str(base))
+        assert main(['ingerir', str(csv_registros), '--procesos', '1']) == 0
+        assert not base.exists()
+
+
+class TestIntensidadRed:
+    """tests del CO2 con perfiles de intensidad de carbono por región"""
+
+    def test_co2_con_region(self, tmp_path, monkeypatch):
+        """verif que los registros con región usan energía × intensidad y se cuentan los sin perfil"""
+        from utils.intensidad import GestorPerfiles
+        (tmp_path / 'sur.csv').write_text('hora,intensidad\n2024-01-01T00:00,250\n', encoding='utf-8')
+        monkeypatch.setattr(ingesta, 'GESTOR_PERFILES', GestorPerfiles(tmp_path))
+        registros = [
+            ('GPT-4 Turbo', 'texto', 4, '2025-01-05T10:00:00', 'sur'),
+            ('GPT-4 Turbo', 'texto', 4, '2025-01-06T10:00:00', 'norte'),
+            ('GPT-4 Turbo', 'texto', 4, '2025-01-07T10:00:00'),
+        ]
+        agregado = ingesta.agregar_registros(registros, por='total')
+        registros_, cantidad, agua, energia, co2 = agregado['grupos'][('GPT-4 Turbo', 'texto', 'OpenAI', 'total')]
+        dataset = calcular_impacto('GPT-4 Turbo', 'texto', 4)
+        assert co2 == pytest.approx(dataset['energia'] * 250 + 2 * dataset['co2'], rel=1e-3)
+        assert agregado['sin_perfil'] == 1
+
+    def test_columna_region_csv(self, tmp_path):
+        """verif que la columna region del CSV llega a los registros"""
+        lineas = ['fecha,modelo,tipo_consulta,cantidad,region', '2025-01-05T10:00:00,Claude 3,texto,2,sur']
+        registros = list(ingesta.leer_lineas(io.StringIO('\n'.join(lineas) + '\n'), 'csv'))
+        assert registros == [('Claude 3', 'texto', 2, '2025-01-05T10:00:00', 'sur')]
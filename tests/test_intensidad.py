@@ -0,0 +1,123 @@
+"""
+Unit tests para utils/intensidad.py
+Verifican la hora del año, la lectura de perfiles de intensidad de carbono y su índice por región
+"""
+
+import math
+
+import pytest
+from utils import intensidad
+from utils.intensidad import HORAS_ANIO, GestorPerfiles, cargar_perfiles, hora_del_anio, leer_perfil
+
+
+def escribir_perfil(ruta, filas):
+    """escribe un perfil con filas (hora, intensidad)"""
+    lineas = ['hora,intensidad'] + [f'{hora},{valor}' for hora, valor in filas]
+    ruta.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+
+
+@pytest.fixture
+def directorio_perfiles(tmp_path):
+    """directorio con dos regiones: 'baja' (100 a la noche, 300 de día) y 'alta' (constante 500)"""
+    escribir_perfil(tmp_path / 'baja.csv', [(f'2024-01-01T{h:02d}:00', 100 if h < 8 else 300) for h in range(24)])
+    escribir_perfil(tmp_path / 'alta.csv', [('2024-06-01T12:00', 500)])
+    return tmp_path
+
+
+class TestHoraDelAnio:
+    """tests de la conversión de fechas a hora del año"""
+
+    def test_calendario_de_366_dias(self):
+        """verif que el 1 de marzo cae en el mismo índice en años bisiestos y no bisiestos"""
+        assert hora_del_anio('2024-01-01T00:00') == 0
+        assert hora_del_anio('2024-03-01T05:00:00') == hora_del_anio('2023-03-01T05:00:00') == 60 * 24 + 5
+        assert hora_del_anio('2024-02-29T10:00') == 59 * 24 + 10
+        assert hora_del_anio('2024-12-31T23:59:59') == HORAS_ANIO - 1
+
+    def test_formatos(self):
+        """verif epoch, sufijo Z, desplazamiento horario y fracciones de segundo"""
+        assert hora_del_anio(1735689600) == hora_del_anio('1735689600') == 0
+        assert hora_del_anio('2025-01-01T02:30:00Z') == 2
+        assert hora_del_anio('2025-01-01T02:00:00-03:00') == 5
+        assert hora_del_anio('2025-01-01T02:00:00.123456') == 2
+
+    def test_sin_fecha_e_invalida(self):
+        """verif que sin fecha se usa la media anual y una fecha inválida retorna None"""
+        assert hora_del_anio(None) == hora_del_anio('') == HORAS_ANIO
+        assert hora_del_anio('ayer') is None
+
+
+class TestLeerPerfil:
+    """tests de la lectura de un perfil"""
+
+    def test_relleno_con_el_dia_anterior(self, directorio_perfiles):
+        """verif que las horas sin datos toman el valor de la misma hora de otro día"""
+        perfil = leer_perfil(directorio_perfiles / 'baja.csv')
+        assert len(perfil) == HORAS_ANIO + 1
+        assert perfil[hora_del_anio('2024-07-15T03:00')] == 100
+        assert perfil[hora_del_anio('2023-07-15T20:00')] == 300
+        assert perfil[HORAS_ANIO] == pytest.approx((8 * 100 + 16 * 300) / 24)
+
+    def test_promedia_varios_anios(self, tmp_path):
+        """verif que la misma hora de años distintos se promedia"""
+        escribir_perfil(tmp_path / 'r.csv', [('2023-05-01T10:00', 200), ('2024-05-01T10:00', 400)])
+        assert leer_perfil(tmp_path / 'r.csv')[hora_del_anio('2025-05-01T10:00')] == 300
+
+    @pytest.mark.parametrize('filas', [[('ayer', 10)], [('2024-01-01T00:00', 'mucho')], [('2024-01-01T00:00', -1)], []])
+    def test_perfil_invalido(self, tmp_path, filas):
+        """verif que horas o intensidades inválidas, o un perfil vacío, son un error"""
+        escribir_perfil(tmp_path / 'r.csv', filas)
+        with pytest.raises(ValueError):
+            leer_perfil(tmp_path / 'r.csv')
+
+
+class TestPerfilesIntensidad:
+    """tests del índice (región, hora del año)"""
+
+    def test_intensidad_por_region_y_hora(self, directorio_perfiles):
+        """verif la búsqueda individual y la media anual"""
+        perfiles = cargar_perfiles(directorio_perfiles)
+        assert perfiles.regiones == ['alta', 'baja']
+        assert perfiles.intensidad('baja', '2025-09-10T04:00') == 100
+        assert perfiles.intensidad('alta', '2025-09-10T04:00') == 500
+        assert perfiles.media_anual('alta') == 500
+        assert perfiles.intensidad('otra', '2025-09-10T04:00') is None
+
+    def test_intensidades_en_columnas(self, directorio_perfiles):
+        """verif que la búsqueda en columnas coincide con la individual y usa NaN si falta"""
+        perfiles = cargar_perfiles(directorio_perfiles)
+        regiones = ['baja', 'baja', 'alta', 'otra', 'baja']
+        fechas = ['2025-01-01T01:00', '2025-01-01T12:00', None, '2025-01-01T01:00', 'ayer']
+        valores = perfiles.intensidades(regiones, fechas)
+        assert valores[:3] == [100, 300, 500]
+        assert math.isnan(valores[3]) and math.isnan(valores[4])
+
+    def test_directorio_inexistente(self, tmp_path):
+        """verif que sin directorio no hay perfiles"""
+        assert len(cargar_perfiles(tmp_path / 'no-existe')) == 0
+
+
+class TestGestorPerfiles:
+    """tests de la recarga de perfiles"""
+
+    def test_recarga_y_conserva_ante_error(self, directorio_perfiles):
+        """verif que un perfil nuevo se carga y uno inválido no reemplaza a los vigentes"""
+        gestor = GestorPerfiles(directorio_perfiles, intervalo=0)
+        version = gestor.version
+        assert version is not None and 'alta' in gestor.actual()
+
+        escribir_perfil(directorio_perfiles / 'nueva.csv', [('2024-01-01T00:00', 50)])
+        assert 'nueva' in gestor.actual()
+        assert gestor.version != version
+
+        escribir_perfil(directorio_perfiles / 'rota.csv', [('ayer', 50)])
+        assert 'nueva' in gestor.actual()
+        assert 'rota' in gestor.ultimo_error
+
+    def test_cache_de_horas_acotada(self, monkeypatch):
+        """verif que la cache de horas se vacía al llegar al máximo"""
+        monkeypatch.setattr(intensidad, 'MAX_CACHE_HORAS', 2)
+        monkeypatch.setattr(intensidad, '_horas', {})
+        for dia in range(1, 6):
+            hora_del_anio(f'2025-01-0{dia}T00:00')
+        assert len(intensidad._horas) <= 2
@@ -0,0 +1,78 @@
+"""
+Unit tests para utils/metricas.py
+Verifican contadores, histogramas, cuantiles y la suma entre procesos
+"""
+
+import json
+
+import pytest
+from utils import metricas
+
+
+@pytest.fixture(autouse=True)
+def metricas_limpias(monkeypatch):
+    """cada test parte sin métricas y en modo de un solo proceso"""
+    monkeypatch.delenv('ECOAI_METRICAS_DIR', raising=False)
+    metricas.reiniciar()
+    yield
+    metricas.reiniciar()
+
+
+class TestRegistro:
+    """tests de contadores e histogramas en memoria"""
+
+    def test_contador_y_histograma_exportados(self):
+        """verif el formato de texto de Prometheus para contadores e histogramas"""
+        metricas.incrementar('ecoai_requests_total', ruta='/', metodo='GET', status='200')
+        metricas.incrementar('ecoai_requests_total', ruta='/', metodo='GET', status='200')
+        metricas.observar('ecoai_request_duracion_segundos', 0.003, ruta='/')
+        texto = metricas.exportar()
+
+        assert '# TYPE ecoai_requests_total counter' in texto
+        assert 'ecoai_requests_total{metodo="GET",ruta="/",status="200"} 2' in texto
+        assert '# TYPE ecoai_request_duracion_segundos histogram' in texto
+        assert 'ecoai_request_duracion_segundos_bucket{ruta="/",le="0.0025"} 0' in texto
+        assert 'ecoai_request_duracion_segundos_bucket{ruta="/",le="0.005"} 1' in texto
+        assert 'ecoai_request_duracion_segundos_count{ruta="/"} 1' in texto
+        assert 'ecoai_request_duracion_segundos_cuantil{ruta="/",quantile="0.99"}' in texto
+
+    def test_cuantiles_por_interpolacion(self):
+        """verif la estimación de cuantiles a partir de los buckets"""
+        conteos = [0] * (len(metricas.BUCKETS) + 1)
+        indice = metricas.BUCKETS.index(0.01)
+        conteos[indice] = 100  # todas las observaciones entre 5ms y 10ms
+        assert metricas.cuantil(conteos, 0.5) == pytest.approx(0.0075)
+        assert metricas.cuantil(conteos, 0.99) == pytest.approx(0.00995)
+
+    def test_cronometro(self):
+        """verif que el cronómetro registra una observación"""
+        with metricas.cronometro('ecoai_calculo_duracion_segundos', funcion='prueba'):
+            pass
+        assert 'ecoai_calculo_duracion_segundos_count{funcion="prueba"} 1' in metricas.exportar()
+
+
+class TestMultiproceso:
+    """tests de la suma de métricas entre workers"""
+
+    def test_suma_archivos_de_otros_workers(self, tmp_path, monkeypatch):
+        """verif que /metrics suma el volcado de otros procesos con el propio"""
+        monkeypatch.setenv('ECOAI_METRICAS_DIR', str(tmp_path))
+        otro = {
+            'contadores': [['ecoai_requests_total', [['metodo', 'GET'], ['ruta', '/'], ['status', '200']], 5]],
+            'histogramas': [],
+        }
+        (tmp_path / 'metricas_99999.json').write_text(json.dumps(otro), encoding='utf-8')
+        metricas.incrementar('ecoai_requests_total', ruta='/', metodo='GET', status='200')
+
+        assert 'ecoai_requests_total{metodo="GET",ruta="/",status="200"} 6' in metricas.exportar()
+
+    def test_volcado_limitado(self, tmp_path, monkeypatch):
+        """verif que sin forzar se vuelca como máximo una vez por intervalo"""
+        monkeypatch.setenv('ECOAI_METRICAS_DIR', str(tmp_path))
+        monkeypatch.setattr(metricas, '_proximo_volcado', 0.0)
+        metricas.incrementar('ecoai_requests_total', ruta='/')
+        metricas.volcar()
+        archivo = next(tmp_path.glob('metricas_*.json'))
+        metricas.incrementar('ecoai_requests_total', ruta='/')
+        metricas.volcar()
+        assert json.loads(archivo.read_text())['contadores'][0][2] == 1
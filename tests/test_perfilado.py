@@ -0,0 +1,91 @@
+"""
+Unit tests para utils/perfilado.py
+Verifican la firma del header, qué requests se perfilan y los archivos que se escriben
+"""
+
+import pstats
+
+import pytest
+from flask import Flask
+from utils import perfilado
+from utils.perfilado import Perfilador
+
+
+@pytest.fixture
+def app_perfilada(monkeypatch, tmp_path):
+    """app real con el perfilador instalado (secreto 's3', sin muestreo)"""
+    from app import app
+    monkeypatch.setattr(app, 'wsgi_app', Perfilador(app.wsgi_app, tmp_path / 'perfiles', secreto='s3'))
+    app.config['TESTING'] = True
+    return app
+
+
+class TestFirma:
+    """tests de la firma del header"""
+
+    def test_firma_por_ruta_y_vigencia(self):
+        """verif que la firma vale solo para su ruta, su secreto y dentro de la vigencia"""
+        valor = perfilado.firmar('s3', '/comparativo', ahora=1_000_000)
+        assert perfilado.firma_valida('s3', valor, '/comparativo', ahora=1_000_010)
+        assert not perfilado.firma_valida('s3', valor, '/', ahora=1_000_010)
+        assert not perfilado.firma_valida('otro', valor, '/comparativo', ahora=1_000_010)
+        assert not perfilado.firma_valida('s3', valor, '/comparativo', ahora=1_000_000 + perfilado.VIGENCIA_FIRMA + 1)
+        assert not perfilado.firma_valida('s3', 'basura', '/comparativo')
+
+
+class TestPerfilador:
+    """tests del middleware"""
+
+    def test_request_firmada_escribe_perfil(self, app_perfilada):
+        """verif que una request firmada deja el .prof y el resumen .txt"""
+        directorio = app_perfilada.wsgi_app.directorio
+        response = app_perfilada.test_client().get(
+            '/comparativo', headers={perfilado.HEADER: perfilado.firmar('s3', '/comparativo')})
+        assert response.status_code == 200
+        nombre = response.headers[perfilado.HEADER]
+        assert 'GET_comparativo' in nombre
+        assert pstats.Stats(str(directorio / f'{nombre}.prof')).total_calls > 0
+        resumen = (directorio / f'{nombre}.txt').read_text(encoding='utf-8')
+        assert resumen.startswith('GET /comparativo -> 200 OK')
+        assert 'tiempo propio' in resumen and 'render_template' in resumen
+
+    def test_sin_firma_no_perfila(self, app_perfilada):
+        """verif que sin firma válida (y sin muestreo) no se escribe nada"""
+        cliente = app_perfilada.test_client()
+        response = cliente.get('/', headers={perfilado.HEADER: perfilado.firmar('otro', '/')})
+        assert perfilado.HEADER not in response.headers
+        assert list(app_perfilada.wsgi_app.directorio.iterdir()) == []
+
+    def test_muestreo_y_rotacion(self, tmp_path):
+        """verif que con muestreo 1 se perfila todo y solo se conservan los últimos perfiles"""
+        app = Flask(__name__)
+        app.add_url_rule('/', 'index', lambda: 'ok')
+        app.wsgi_app = Perfilador(app.wsgi_app, tmp_path, muestreo=1.0, max_perfiles=2)
+        cliente = app.test_client()
+        nombres = [cliente.get('/').headers[perfilado.HEADER] for _ in range(4)]
+        assert sorted(p.name for p in tmp_path.glob('*.prof')) == sorted(f'{n}.prof' for n in nombres[-2:])
+        assert len(list(tmp_path.glob('*.txt'))) == 2
+
+
+class TestRegistrar:
+    """tests de la instalación según el entorno"""
+
+    def test_deshabilitado_no_toca_la_app(self, monkeypatch):
+        """verif que sin ECOAI_PERFIL_DIR no se envuelve la app"""
+        monkeypatch.delenv('ECOAI_PERFIL_DIR', raising=False)
+        app = Flask(__name__)
+        assert perfilado.registrar(app) is None
+        assert 'wsgi_app' not in vars(app)
+
+    def test_habilitado_por_entorno(self, monkeypatch, tmp_path):
+        """verif la configuración por variables de entorno y el muestreo inválido"""
+        monkeypatch.setenv('ECOAI_PERFIL_DIR', str(tmp_path))
+        monkeypatch.setenv('ECOAI_PERFIL_SECRETO', 's3')
+        monkeypatch.setenv('ECOAI_PERFIL_MUESTREO', '0.01')
+        app = Flask(__name__)
+        perfilador = perfilado.registrar(app)
+        assert app.wsgi_app is perfilador
+        assert (perfilador.secreto, perfilador.muestreo) == ('s3', 0.01)
+        monkeypatch.setenv('ECOAI_PERFIL_MUESTREO', '2')
+        with pytest.raises(ValueError):
+            perfilado.registrar(Flask(__name__))
@@ -0,0 +1,109 @@
+"""
+Unit tests para utils/plantillas.py
+Verifican el cache de bytecode en disco y los fragmentos cacheados por versión del dataset
+"""
+
+import pytest
+from flask import Flask, render_template_string
+from jinja2 import Environment, FileSystemLoader
+from utils import plantillas
+from utils.plantillas import CacheFragmentos
+
+
+@pytest.fixture
+def fragmentos():
+    """extensión de fragmentos de la app real, vacía"""
+    from app import app
+    extension = app.jinja_env.extensions[CacheFragmentos.identifier]
+    extension.limpiar()
+    yield extension
+    extension.limpiar()
+
+
+class TestFragmentos:
+    """tests del tag {% fragmento %}"""
+
+    def test_index_se_renderiza_una_vez_por_version(self, client, fragmentos, catalogo_grande):
+        """verif que el contenido de / se genera una vez y se regenera al cambiar el dataset"""
+        primera = client.get('/').data
+        generados = fragmentos.generados
+        assert b'<option value="Modelo 299">Modelo 299 (P)</option>' in primera
+        assert client.get('/').data == primera
+        assert fragmentos.generados == generados
+
+        from utils.dataset import GestorDataset
+        ruta = catalogo_grande.GESTOR.ruta
+        ruta.write_text(ruta.read_text(encoding='utf-8') + 'Modelo Nuevo,Q,texto,pregunta,1,1,1\n', encoding='utf-8')
+        catalogo_grande.GESTOR = GestorDataset(ruta, catalogo_grande.construir_datos, intervalo=3600)
+        assert b'Modelo Nuevo (Q)' in client.get('/').data
+        assert fragmentos.generados > generados
+
+    def test_resultados_renderiza_valores_por_request(self, client, fragmentos):
+        """verif que /calcular cachea las partes fijas pero muestra los valores de cada cálculo"""
+        datos = {'modelo': 'Claude 3', 'tipo_consulta': 'texto'}
+        uno = client.post('/calcular', data={**datos, 'cantidad': 1}).data.decode('utf-8')
+        generados = fragmentos.generados
+        mil = client.post('/calcular', data={**datos, 'cantidad': 1000}).data.decode('utf-8')
+        assert fragmentos.generados == generados
+        assert 'Ver comparativa' in uno and 'Ver comparativa' in mil
+        assert '0.26 <span class="metric-unit">L</span>' in uno
+        assert '255.0 <span class="metric-unit">L</span>' in mil
+
+    def test_auto_reload_no_cachea(self):
+        """verif que con auto_reload (modo debug) el fragmento se renderiza siempre"""
+        entorno = Environment(extensions=[CacheFragmentos], auto_reload=True)
+        template = entorno.from_string("{% fragmento 'x' %}{{ valor }}{% endfragmento %}")
+        assert [template.render(valor=v) for v in (1, 2)] == ['1', '2']
+        entorno.auto_reload = False
+        assert [template.render(valor=v) for v in (3, 4)] == ['3', '3']
+
+    def test_escape_del_fragmento(self):
+        """verif que el HTML guardado no se vuelve a escapar"""
+        entorno = Environment(extensions=[CacheFragmentos], autoescape=True, auto_reload=False)
+        template = entorno.from_string("{% fragmento 'y' %}<b>{{ valor }}</b>{% endfragmento %}")
+        assert template.render(valor='<i>') == '<b>&lt;i&gt;</b>'
+        assert template.render(valor='otro') == '<b>&lt;i&gt;</b>'
+
+
+class TestRegistrar:
+    """tests de la instalación en la app"""
+
+    def test_bytecode_en_disco(self, monkeypatch, tmp_path):
+        """verif que el template compilado se escribe en ECOAI_JINJA_CACHE_DIR y se reutiliza"""
+        (tmp_path / 'templates').mkdir()
+        (tmp_path / 'templates' / 'hola.html').write_text('Hola {{ nombre }}', encoding='utf-8')
+        monkeypatch.setenv('ECOAI_JINJA_CACHE_DIR', str(tmp_path / 'bytecode'))
+
+        def renderizar():
+            app = Flask(__name__, template_folder=str(tmp_path / 'templates'))
+            plantillas.registrar(app)
+            with app.app_context():
+                return app.jinja_env.get_template('hola.html').render(nombre='EcoAI')
+
+        assert renderizar() == 'Hola EcoAI'
+        assert len(list((tmp_path / 'bytecode').glob('*.cache'))) == 1
+        # Una app nueva (otro worker o un reinicio) carga el bytecode sin compilar
+        monkeypatch.setattr(Environment, 'compile', lambda *args, **kwargs: pytest.fail('no debe compilar'))
+        assert renderizar() == 'Hola EcoAI'
+
+    def test_version_templates(self, tmp_path):
+        """verif que la versión cambia al editar un template (con auto_reload) y se cachea sin él"""
+        (tmp_path / 'a.html').write_text('uno', encoding='utf-8')
+        entorno = Environment(loader=FileSystemLoader(str(tmp_path)), auto_reload=True)
+        version = plantillas.version_templates(entorno)
+        (tmp_path / 'a.html').write_text('dos', encoding='utf-8')
+        assert plantillas.version_templates(entorno) != version
+        entorno.auto_reload = False
+        version = plantillas.version_templates(entorno)
+        (tmp_path / 'a.html').write_text('tres', encoding='utf-8')
+        assert plantillas.version_templates(entorno) == version
+
+    def test_cache_deshabilitado(self, monkeypatch):
+        """verif que ECOAI_JINJA_CACHE_DIR vacía deja los templates sin cache en disco"""
+        monkeypatch.setenv('ECOAI_JINJA_CACHE_DIR', '')
+        app = Flask(__name__)
+        extension = plantillas.registrar(app)
+        assert app.jinja_env.bytecode_cache is None
+        assert isinstance(extension, CacheFragmentos)
+        with app.app_context():
+            assert render_template_string("{{ catalogo().tipos_consulta[0].tipo }}") == 'texto'
@@ -0,0 +1,124 @@
+"""
+Unit tests para utils/proyeccion.py
+Verifican grillas, barridos de impacto y la reducción de series con LTTB
+"""
+
+import math
+
+import pytest
+from utils.calculator import TABLA_COEFICIENTES
+from utils.proyeccion import barrido, grilla, lttb, proyeccion_temporal
+
+
+class TestGrilla:
+    """tests de generación de grillas de cantidades"""
+
+    def test_grilla_lineal(self):
+        """verif extremos y espaciado de la grilla lineal"""
+        assert grilla(0, 10, 6) == [0, 2, 4, 6, 8, 10]
+
+    def test_grilla_log(self):
+        """verif que la grilla logarítmica recorre potencias de 10"""
+        valores = grilla(1, 10000, 5, 'log')
+        assert valores == pytest.approx([1, 10, 100, 1000, 10000])
+
+    def test_grilla_invalida(self):
+        """rechazar pasos o escalas inválidas"""
+        with pytest.raises(ValueError):
+            grilla(1, 10, 0)
+        with pytest.raises(ValueError):
+            grilla(0, 10, 5, 'log')
+        with pytest.raises(ValueError):
+            grilla(1, 10, 5, 'cubica')
+
+
+class TestLTTB:
+    """tests del algoritmo Largest-Triangle-Three-Buckets"""
+
+    def test_respeta_presupuesto_y_extremos(self):
+        """verif que se conservan el primer y último punto y el presupuesto"""
+        x = list(range(1000))
+        y = [math.sin(v / 50) for v in x]
+        indices = lttb(x, y, 50)
+        assert len(indices) == 50
+        assert indices[0] == 0 and indices[-1] == 999
+        assert indices == sorted(indices)
+
+    def test_conserva_picos(self):
+        """verif que un pico aislado no se pierde al reducir"""
+        x = list(range(500))
+        y = [0.0] * 500
+        y[321] = 100.0
+        assert 321 in lttb(x, y, 20)
+
+    def test_serie_corta_sin_cambios(self):
+        """verif que una serie menor al presupuesto queda igual"""
+        assert lttb([1, 2, 3], [1, 2, 3], 10) == [0, 1, 2]
+
+
+class TestBarrido:
+    """tests del barrido cantidad × modelo × tipo × horizonte"""
+
+    def test_valores_coinciden_con_coeficientes(self):
+        """verif que cada punto es coeficiente × cantidad × horizonte"""
+        resultado = barrido(['Claude 3'], ['texto', 'audio'], [1, 10, 100], [1, 30])
+        assert resultado['x'] == [1, 10, 100]
+        assert len(resultado['series']) == 4
+
+        coef = TABLA_COEFICIENTES[('Claude 3', 'audio')]
+        serie = next(s for s in resultado['series'] if s['tipo_consulta'] == 1 and s['horizonte'] == 1)
+        assert serie['agua'] == pytest.approx([coef.agua * c * 30 for c in (1, 10, 100)])
+        assert serie['co2'] == pytest.approx([coef.carbono * c * 30 for c in (1, 10, 100)])
+
+    def test_todas_las_combinaciones_por_defecto(self):
+        """verif que sin filtros se barren todos los modelos y tipos del dataset"""
+        resultado = barrido()
+        assert len(resultado['series']) + len(resultado['omitidas']) == \
+            len(resultado['modelos']) * len(resultado['tipos_consulta'])
+        assert len(resultado['series']) == len(TABLA_COEFICIENTES)
+
+    def test_reduccion_a_presupuesto(self):
+        """verif que las series largas se reducen al presupuesto de puntos"""
+        resultado = barrido(['GPT-4 Turbo'], ['texto'], grilla(1, 1e6, 5000, 'log'), max_puntos=100)
+        assert len(resultado['x']) == 100
+        assert len(resultado['series'][0]['agua']) == 100
+        assert resultado['x'][-1] == pytest.approx(1e6)
+
+    def test_cantidades_y_horizontes_invalidos(self):
+        """verif que cantidades o horizontes no finitos, negativos o demasiado grandes se rechazan"""
+        for cantidades, horizontes in (([1, math.nan], [1]), ([1, -5], [1]), ([math.inf], [1]),
+                                       ([1], [math.nan]), ([1e12], [1e4])):
+            with pytest.raises(ValueError):
+                barrido(['Claude 3'], ['texto'], cantidades, horizontes)
+        with pytest.raises(ValueError):
+            grilla(1, math.inf, 5)
+
+
+class TestProyeccionTemporal:
+    """tests de la proyección acumulada en el tiempo"""
+
+    def test_sin_crecimiento_es_lineal(self):
+        """verif que sin crecimiento el acumulado es cantidad × periodos"""
+        serie = proyeccion_temporal('Gemini 1.5', 'texto', 100, 12)
+        assert serie['cantidad'][-1] == pytest.approx(1200)
+        assert serie['agua'][-1] == pytest.approx(1200 * TABLA_COEFICIENTES[('Gemini 1.5', 'texto')].agua)
+
+    def test_con_crecimiento(self):
+        """verif el crecimiento compuesto del uso por periodo"""
+        serie = proyeccion_temporal('Gemini 1.5', 'texto', 100, 3, crecimiento=0.1)
+        assert serie['cantidad'] == pytest.approx([100, 210, 331])
+
+    def test_combinacion_inexistente(self):
+        """verif que una combinación inexistente retorna None"""
+        assert proyeccion_temporal('InvalidModel', 'texto', 1, 10) is None
+
+    def test_crecimiento_acotado(self):
+        """verif que un crecimiento que desbordaría el acumulado, o valores no finitos, se rechazan"""
+        with pytest.raises(ValueError):
+            proyeccion_temporal('Gemini 1.5', 'texto', 1, 1000, crecimiento=10)
+        with pytest.raises(ValueError):
+            proyeccion_temporal('Gemini 1.5', 'texto', 1, 10, crecimiento=math.nan)
+        with pytest.raises(ValueError):
+            proyeccion_temporal('Gemini 1.5', 'texto', math.nan, 10)
+        serie = proyeccion_temporal('Gemini 1.5', 'texto', 1, 10, crecimiento=-0.5)
+        assert serie['cantidad'][-1] == pytest.approx(2 - 0.5 ** 9)
@@ -0,0 +1,191 @@
+"""
+Unit tests para utils/registro.py
+Verifican la escritura diferida en lotes y las consultas de totales del registro de uso
+"""
+
+import os
+import sqlite3
+
+import pytest
+from utils import registro
+from utils.registro import RegistroUso
+
+
+@pytest.fixture
+def libro(tmp_path):
+    """registro de uso en una base temporal"""
+    return RegistroUso(tmp_path / 'registro.sqlite3', intervalo=0.05)
+
+
+def cargar_usos(libro):
+    """registra usos de dos equipos en tres meses"""
+    filas = [
+        ('2025-01-05T10:00:00', 'datos', 'GPT-4 Turbo', 'texto', 5, 1.0, 2.0, 3.0),
+        ('2025-01-20T11:00:00', 'datos', 'Claude 3', 'imagen', 2, 0.5, 0.5, 0.5),
+        ('2025-02-01T09:00:00', 'web', 'GPT-4 Turbo', 'texto', 1, 0.2, 0.4, 0.6),
+        ('2025-03-31T23:59:59', 'datos', 'GPT-4 Turbo', 'texto', 3, 0.6, 1.2, 1.8),
+    ]
+    assert libro.registrar_filas(filas)
+    assert libro.vaciar()
+
+
+class TestEscrituraDiferida:
+    """tests de la cola de escritura"""
+
+    def test_registrar_no_escribe_en_la_request(self, tmp_path):
+        """verif que registrar solo encola y el thread escribe después"""
+        libro = RegistroUso(tmp_path / 'r.sqlite3', intervalo=60)
+        libro.registrar('GPT-4 Turbo', 'texto', 5, 1.7, 1.7, 2.9, equipo='datos')
+        assert libro.pendientes() == 1
+        assert libro.totales(periodo='total') == []
+        assert libro.vaciar()
+        assert libro.pendientes() == 0
+        [fila] = libro.totales(periodo='total')
+        assert fila == {'equipo': 'datos', 'periodo': 'total', 'registros': 1,
+                        'cantidad': 5, 'agua': 1.7, 'energia': 1.7, 'co2': 2.9}
+
+    def test_lote_en_una_transaccion(self, libro):
+        """verif que muchas filas encoladas se escriben todas"""
+        filas = [(registro.ahora_iso(), 'e', 'Claude 3', 'texto', 1, 0.1, 0.1, 0.1)] * 12_000
+        libro.registrar_filas(filas)
+        assert libro.vaciar()
+        assert libro.escritos == 12_000
+        assert libro.totales(periodo='total')[0]['registros'] == 12_000
+
+    def test_cola_llena_descarta(self, tmp_path):
+        """verif que con la cola llena se descarta sin bloquear"""
+        libro = RegistroUso(tmp_path / 'r.sqlite3', intervalo=60, max_pendientes=2)
+        assert libro.registrar('Claude 3', 'texto', 1, 0, 0, 0)
+        assert not libro.registrar_filas([(registro.ahora_iso(), '', 'Claude 3', 'texto', 1, 0, 0, 0)] * 2)
+        assert libro.descartados == 2
+
+    def test_fila_invalida_no_descarta_el_lote(self, libro):
+        """verif que una fila con NaN, un texto faltante o sin fecha ISO se descarta sola y el resto se escribe"""
+        valida = (registro.ahora_iso(), 'e', 'Claude 3', 'texto', 1, 0.1, 0.1, 0.1)
+        libro.registrar_filas([valida, valida[:4] + (float('nan'), 0.1, 0.1, 0.1), valida[:2] + (None,) + valida[3:],
+                               valida[:4] + (2 ** 70, 0.1, 0.1, 0.1), ('',) + valida[1:], ('2025-01',) + valida[1:],
+                               valida])
+        assert libro.vaciar()
+        assert (libro.escritos, libro.descartados) == (2, 5)
+        assert libro.totales(periodo='total')[0]['registros'] == 2
+        assert libro.acumulados('total')[0]['registros'] == 2
+
+    def test_error_inesperado_no_detiene_el_escritor(self, libro, monkeypatch):
+        """verif que una excepción que no es de SQLite descarta solo la fila que falla y el thread sigue"""
+        original = registro._escribir_acumulados
+
+        def escribir_acumulados(conexion, buckets):
+            if any(clave[2] == 'roto' for clave in buckets):
+                raise RuntimeError('fila rota')
+            original(conexion, buckets)
+
+        monkeypatch.setattr(registro, '_escribir_acumulados', escribir_acumulados)
+        valida = (registro.ahora_iso(), 'e', 'Claude 3', 'texto', 1, 0.1, 0.1, 0.1)
+        libro.registrar_filas([valida, valida[:2] + ('roto',) + valida[3:], valida])
+        assert libro.vaciar()
+        assert (libro.escritos, libro.descartados) == (2, 1)
+        assert libro.ultimo_error == 'fila rota'
+        libro.registrar_filas([valida])
+        assert libro.vaciar()
+        assert libro.escritos == 3
+        assert libro.totales(periodo='total')[0]['registros'] == 3
+        assert libro.acumulados('total')[0]['registros'] == 3
+
+    def test_esquema_con_indices(self, libro):
+        """verif que la base usa WAL y tiene los índices de las consultas"""
+        conexion = sqlite3.connect(libro.ruta)
+        indices = {fila[0] for fila in conexion.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'usos_fecha', 'usos_equipo_fecha', 'usos_modelo_tipo_fecha'} <= indices
+        assert conexion.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        plan = ' '.join(str(f) for f in conexion.execute(
+            "EXPLAIN QUERY PLAN SELECT sum(co2) FROM usos WHERE equipo = 'x' AND fecha >= '2025'"))
+        assert 'usos_equipo_fecha' in plan
+
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason='requiere fork')
+    def test_hijo_no_hereda_la_cola(self, tmp_path):
+        """verif que tras un fork el hijo no reescribe las filas pendientes del padre"""
+        libro = RegistroUso(tmp_path / 'r.sqlite3', intervalo=60)
+        libro.registrar('Claude 3', 'texto', 1, 0, 0, 0)
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if libro.pendientes() == 0 and libro.vaciar() else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert libro.vaciar()
+        assert libro.totales(periodo='total')[0]['registros'] == 1
+
+
+class TestTotales:
+    """tests de las consultas de totales"""
+
+    def test_por_equipo_y_mes(self, libro):
+        """verif la agrupación por equipo y periodo"""
+        cargar_usos(libro)
+        filas = libro.totales(['equipo'], 'mes')
+        assert [(f['equipo'], f['periodo'], f['registros']) for f in filas] == [
+            ('datos', '2025-01', 2), ('datos', '2025-03', 1), ('web', '2025-02', 1)]
+        assert filas[0]['co2'] == pytest.approx(3.5)
+
+    def test_filtros_y_rango_inclusivo(self, libro):
+        """verif filtros por columna y que hasta incluye todo el prefijo"""
+        cargar_usos(libro)
+        filas = libro.totales(['modelo', 'tipo_consulta'], 'anio', desde='2025-02', hasta='2025-03', equipo='datos')
+        assert filas == [{'modelo': 'GPT-4 Turbo', 'tipo_consulta': 'texto', 'periodo': '2025', 'registros': 1,
+                          'cantidad': 3, 'agua': 0.6, 'energia': 1.2, 'co2': 1.8}]
+
+    def test_columna_o_periodo_invalido(self, libro):
+        """verif que solo se aceptan las columnas y periodos conocidos"""
+        with pytest.raises(ValueError):
+            libro.totales(['fecha; DROP TABLE usos'])
+        with pytest.raises(ValueError):
+            libro.totales(periodo='semana')
+        with pytest.raises(ValueError):
+            libro.totales(proveedor='OpenAI')
+
+
+class TestAcumulados:
+    """tests de los acumulados materializados por día, mes y año"""
+
+    def test_coinciden_con_los_totales_crudos(self, libro):
+        """verif que los acumulados por mes son los mismos totales que agrupar la tabla usos"""
+        cargar_usos(libro)
+        crudos = libro.totales(['modelo', 'tipo_consulta'], 'mes')
+        assert libro.acumulados('mes') == crudos
+        [total] = libro.acumulados('total', por=())
+        [crudo] = libro.totales([], 'total')
+        assert total['registros'] == crudo['registros'] == 4
+        assert total['co2'] == pytest.approx(crudo['co2'])
+
+    def test_se_actualizan_por_lote(self, libro):
+        """verif que cada lote suma sobre los buckets existentes (no se reescriben)"""
+        cargar_usos(libro)
+        libro.registrar('GPT-4 Turbo', 'texto', 10, 1.0, 1.0, 1.0, fecha='2025-01-31T08:00:00')
+        assert libro.vaciar()
+        [enero] = libro.acumulados('mes', desde='2025-01', hasta='2025-01', modelo='GPT-4 Turbo')
+        assert (enero['registros'], enero['cantidad'], enero['co2']) == (2, 15, 4.0)
+        dias = libro.acumulados('dia', desde='2025-01-31', hasta='2025-01-31', por=())
+        assert [(d['periodo'], d['registros']) for d in dias] == [('2025-01-31', 1)]
+
+    def test_acumular_desde_la_ingesta(self, libro):
+        """verif que acumular suma totales ya agregados sin pasar por la tabla usos"""
+        buckets = libro.acumular([
+            ('2024-12-31T23', 'Claude 3', 'audio', 3, 6, 1.0, 2.0, 3.0),
+            ('2025-01-01', 'Claude 3', 'audio', 1, 2, 0.5, 0.5, 0.5),
+        ])
+        assert buckets == 6
+        anios = libro.acumulados('anio', por=['modelo'])
+        assert [(a['periodo'], a['registros']) for a in anios] == [('2024', 3), ('2025', 1)]
+        assert libro.totales(periodo='total') == []
+        with pytest.raises(ValueError):
+            libro.acumular([('2025-01', 'Claude 3', 'audio', 1, 1, 0, 0, 0)])
+
+    def test_reconstruye_en_una_base_anterior(self, tmp_path):
+        """verif que una base sin la tabla acumulados la construye desde usos"""
+        ruta = tmp_path / 'vieja.sqlite3'
+        conexion = sqlite3.connect(ruta)
+        conexion.executescript(registro.ESQUEMA)
+        with conexion:
+            conexion.execute(registro.INSERTAR, ('2025-05-01T10:00:00', '', 'Claude 3', 'texto', 4, 1, 1, 1))
+        conexion.close()
+        [fila] = RegistroUso(ruta).acumulados('anio')
+        assert (fila['periodo'], fila['registros'], fila['cantidad']) == ('2025', 1, 4)
@@ -0,0 +1,186 @@
+"""
+Unit tests para utils/trabajos.py
+Verifican el procesamiento en segundo plano, el progreso y la reanudación tras un reinicio
+"""
+
+import csv
+import io
+import json
+
+import pytest
+from utils import trabajos
+from utils.calculator import calcular_impacto
+from utils.trabajos import GestorTrabajos
+
+CSV = (
+    'fecha,modelo,tipo_consulta,cantidad\n'
+    '2025-01-05T10:00:00,GPT-4 Turbo,texto,5\n'
+    '2025-01-20T11:00:00,Claude 3,imagen,2\n'
+    '2025-02-01T09:00:00,Modelo X,texto,1\n'
+    '2025-02-03T09:00:00,Claude 3,imagen,4\n'
+)
+
+
+@pytest.fixture
+def gestor(tmp_path):
+    """gestor que procesa en un thread (sin pool de procesos)"""
+    return GestorTrabajos(tmp_path / 'trabajos', procesos=0)
+
+
+def crear(gestor, texto=CSV, formato='csv', por='mes'):
+    return gestor.crear(io.BytesIO(texto.encode('utf-8')), formato, por)
+
+
+class TestProcesamiento:
+    """tests del trabajo completo"""
+
+    def test_resultados_y_agregados(self, gestor):
+        """verif que cada registro se puntúa como calcular_impacto y los agregados suman por mes"""
+        estado = crear(gestor)
+        assert estado['estado'] in ('pendiente', 'procesando', 'terminado')
+        final = gestor.esperar(estado['id'])
+        assert final['estado'] == 'terminado'
+        assert (final['registros'], final['errores'], final['porcentaje'], final['eta_segundos']) == (4, 1, 100.0, 0.0)
+
+        _, ruta = gestor.archivo(estado['id'], 'resultados.csv')
+        filas = list(csv.DictReader(ruta.open(encoding='utf-8')))
+        assert [f['registro'] for f in filas] == ['1', '2', '3', '4']
+        assert float(filas[0]['co2']) == pytest.approx(calcular_impacto('GPT-4 Turbo', 'texto', 5)['co2'], abs=0.01)
+        assert filas[2]['error'] and filas[2]['agua'] == ''
+
+        _, ruta = gestor.archivo(estado['id'], 'agregados.json')
+        grupos = json.loads(ruta.read_text(encoding='utf-8'))['grupos']
+        imagen = [g for g in grupos if g['modelo'] == 'Claude 3']
+        assert [(g['periodo'], g['cantidad']) for g in imagen] == [('2025-01', 2), ('2025-02', 4)]
+        assert final['totales']['agua'] == pytest.approx(sum(float(f['agua'] or 0) for f in filas), abs=1e-3)
+
+    def test_ndjson(self, gestor):
+        """verif que acepta NDJSON"""
+        texto = '{"modelo": "Gemini 1.5", "tipo_consulta": "audio", "cantidad": 3, "fecha": "2025-05-01"}\n'
+        final = gestor.esperar(crear(gestor, texto, 'ndjson', por='anio')['id'])
+        assert final['estado'] == 'terminado' and final['registros'] == 1
+
+    def test_csv_con_bom(self, gestor):
+        """verif que un CSV con BOM UTF-8 se procesa igual que sin BOM"""
+        final = gestor.esperar(crear(gestor, '\ufeff' + CSV)['id'])
+        assert final['estado'] == 'terminado'
+        assert (final['registros'], final['errores']) == (4, 1)
+
+    def test_encabezado_invalido(self, gestor):
+        """verif que un CSV sin las columnas requeridas termina con error"""
+        final = gestor.esperar(crear(gestor, 'a,b\n1,2\n')['id'])
+        assert final['estado'] == 'error'
+        assert 'modelo' in final['error']
+        assert gestor.archivo(final['id'], 'resultados.csv')[1] is None
+
+    def test_falla_deterministica_no_se_reintenta(self, gestor, monkeypatch):
+        """verif que un error que no es OSError/ValueError (csv.Error, AttributeError) termina el trabajo sin reintentos"""
+        final = gestor.esperar(crear(gestor, 'modelo,tipo_consulta,cantidad\nClaude 3,texto,"' + 'x' * 200_000 + '"\n')['id'])
+        assert (final['estado'], final['intentos']) == ('error', 1)
+        assert final['error'].startswith('Error: CSV mal formado: field larger')
+
+        def fallar(*args, **kwargs):
+            raise AttributeError('sin atributo')
+        monkeypatch.setattr(trabajos.ingesta, 'agregar_registros', fallar)
+        final = gestor.esperar(crear(gestor)['id'])
+        assert (final['estado'], final['intentos'], final['error']) == ('error', 1, 'Error: AttributeError: sin atributo')
+
+    def test_cantidades_no_finitas_fuera_de_los_totales(self, gestor):
+        """verif que nan/inf cuentan como errores y el estado sigue siendo JSON válido"""
+        texto = 'modelo,tipo_consulta,cantidad\nClaude 3,texto,nan\nClaude 3,texto,inf\nClaude 3,texto,2\n'
+        final = gestor.esperar(crear(gestor, texto)['id'])
+        assert (final['estado'], final['errores']) == ('terminado', 2)
+        contenido = (gestor.directorio / final['id'] / 'estado.json').read_text(encoding='utf-8')
+        assert 'NaN' not in contenido and 'Infinity' not in contenido
+        assert final['totales']['agua'] == pytest.approx(calcular_impacto('Claude 3', 'texto', 2)['agua'], abs=0.01)
+
+    def test_entradas_invalidas(self, gestor):
+        """verif formato, periodo y tamaño máximo"""
+        with pytest.raises(ValueError):
+            crear(gestor, formato='xlsx')
+        with pytest.raises(ValueError):
+            crear(gestor, por='semana')
+        with pytest.raises(ValueError):
+            gestor.crear(io.BytesIO(b'x' * 100), 'csv', max_bytes=10)
+        assert list(gestor.directorio.iterdir()) == []
+
+    def test_id_inexistente_o_invalido(self, gestor):
+        """verif que ids desconocidos o con rutas no encuentran nada"""
+        assert gestor.estado('0' * 32) is None
+        assert gestor.estado('../../etc') is None
+        assert gestor.archivo('0' * 32, 'resultados.csv') == (None, None)
+
+
+class TestProgreso:
+    """tests del cálculo de progreso y ETA"""
+
+    def test_eta_por_bytes_leidos(self):
+        """verif que la ETA proyecta la velocidad de lectura sobre los bytes restantes"""
+        estado = {'estado': 'procesando', 'bytes_total': 1000, 'bytes_leidos': 250, 'registros': 50,
+                  'iniciado_en': 100.0, 'actualizado_en': 110.0}
+        resultado = trabajos.progreso(estado, ahora=112.0)
+        assert resultado['porcentaje'] == 25.0
+        assert resultado['eta_segundos'] == pytest.approx(28.0)
+        assert resultado['registros_estimados'] == 200
+        assert resultado['registros_por_segundo'] == 5.0
+
+    def test_pendiente_sin_eta(self):
+        """verif que un trabajo pendiente no tiene ETA"""
+        resultado = trabajos.progreso({'estado': 'pendiente', 'bytes_total': 10, 'bytes_leidos': 0})
+        assert (resultado['porcentaje'], resultado['eta_segundos']) == (0.0, None)
+
+
+class TestReanudacion:
+    """tests de persistencia entre reinicios"""
+
+    def test_trabajo_a_medias_se_reanuda(self, tmp_path):
+        """verif que un trabajo que quedó procesando (worker muerto) se procesa de nuevo"""
+        directorio = tmp_path / 'trabajos'
+        sin_pool = GestorTrabajos(directorio, procesos=0)
+        sin_pool._encolar = lambda id_trabajo: None
+        id_trabajo = crear(sin_pool)['id']
+        ruta_estado = directorio / id_trabajo / 'estado.json'
+        estado = json.loads(ruta_estado.read_text(encoding='utf-8'))
+        estado.update(estado='procesando', intentos=1)
+        ruta_estado.write_text(json.dumps(estado), encoding='utf-8')
+
+        nuevo = GestorTrabajos(directorio, procesos=0)
+        assert nuevo.reanudar() == 1
+        final = nuevo.esperar(id_trabajo)
+        assert final['estado'] == 'terminado' and final['intentos'] == 2
+
+    def test_candado_evita_doble_proceso(self, gestor):
+        """verif que si otro proceso tiene el candado, procesar no hace nada"""
+        gestor._encolar = lambda id_trabajo: None
+        id_trabajo = crear(gestor)['id']
+        directorio = gestor.directorio / id_trabajo
+        with open(directorio / 'candado', 'a') as candado:
+            assert trabajos._tomar_candado(candado)
+            assert trabajos.procesar(directorio) is None
+            assert gestor.reanudar() == 0
+        assert trabajos.procesar(directorio)['estado'] == 'terminado'
+
+    def test_interrumpido_muchas_veces(self, gestor):
+        """verif que tras MAX_INTENTOS interrupciones el trabajo queda con error"""
+        gestor._encolar = lambda id_trabajo: None
+        id_trabajo = crear(gestor)['id']
+        ruta_estado = gestor.directorio / id_trabajo / 'estado.json'
+        estado = json.loads(ruta_estado.read_text(encoding='utf-8'))
+        estado['intentos'] = trabajos.MAX_INTENTOS
+        ruta_estado.write_text(json.dumps(estado), encoding='utf-8')
+        assert trabajos.procesar(gestor.directorio / id_trabajo)['estado'] == 'error'
+
+    def test_purgar_terminados_viejos(self, gestor):
+        """verif que se borran solo los trabajos terminados hace más de la retención"""
+        id_trabajo = gestor.esperar(crear(gestor)['id'])['id']
+        gestor.purgar()
+        assert gestor.estado(id_trabajo) is not None
+        gestor.purgar(ahora=gestor.estado(id_trabajo)['terminado_en'] + trabajos.RETENCION_SEGUNDOS + 1)
+        assert gestor.estado(id_trabajo) is None
+
+    def test_pool_de_procesos(self, tmp_path):
+        """verif el procesamiento en el pool de procesos (spawn)"""
+        gestor = GestorTrabajos(tmp_path / 'trabajos', procesos=1)
+        final = gestor.esperar(crear(gestor)['id'], timeout=60)
+        assert final['estado'] == 'terminado' and final['registros'] == 4
+        gestor._pool.shutdown()
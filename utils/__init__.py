@@ -1,6 +1,13 @@
 # módulo utils para cálculos y utilidades
 
-from .calculator import calcular_impacto, cargar_datos_csv, DB
+from .calculator import calcular_impacto, cargar_datos_csv, TABLA_COEFICIENTES
 
-__all__ = ['calcular_impacto', 'cargar_datos_csv', 'DB']
+__all__ = ['calcular_impacto', 'cargar_datos_csv', 'DB', 'TABLA_COEFICIENTES']
 
+
+def __getattr__(nombre):
+    # DB se carga recién cuando se usa (ver utils.calculator)
+    if nombre == 'DB':
+        from . import calculator
+        return calculator.DB
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
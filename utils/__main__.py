@@ -0,0 +1,75 @@
+"""
+Línea de comandos de EcoAI.
+
+Uso:
+    python -m utils ingerir registros.csv --por mes --procesos 4
+    python -m utils ingerir - --formato ndjson < registros.ndjson
+    python -m utils ingerir registros.csv --registro registro.sqlite3
+    python -m utils compilar
+    python -m utils assets
+    python -m utils perfil /comparativo
+"""
+
+import argparse
+import sys
+
+from .assets import main_assets
+from .ingesta import PERIODOS, main_ingerir
+from .perfilado import main_firmar
+
+
+def main_compilar(args):
+    """
+    Punto de entrada del subcomando `python -m utils compilar`.
+    """
+    from .calculator import compilar_dataset
+
+    try:
+        resumen = compilar_dataset(args.origen, args.destino)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{resumen['filas']} filas, {resumen['combinaciones']} combinaciones, "
+          f"{resumen['bytes']} bytes (versión {resumen['version']})")
+    return 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog='python -m utils', description='Herramientas de EcoAI')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    ingerir = subparsers.add_parser('ingerir', help='agrega el impacto de un registro de uso (CSV o NDJSON)')
+    ingerir.add_argument('archivo', help="archivo de registros, o '-' para leer desde stdin")
+    ingerir.add_argument('--por', choices=list(PERIODOS), default='mes', help='periodo de agrupación')
+    ingerir.add_argument('--formato', choices=['csv', 'ndjson'], help='formato de entrada (por defecto según la extensión)')
+    ingerir.add_argument('--procesos', type=int, help='procesos a usar (por defecto, uno por CPU)')
+    ingerir.add_argument('--salida', choices=['csv', 'json'], default='csv', help='formato de salida')
+    ingerir.add_argument('--registro',
+                         help='base del registro de uso cuyos acumulados se actualizan (explícito: sumar el '
+                              'mismo archivo dos veces lo cuenta dos veces)')
+    ingerir.set_defaults(func=main_ingerir)
+
+    compilar = subparsers.add_parser('compilar', help='valida el CSV y genera el dataset compilado (binario)')
+    compilar.add_argument('--origen', help='CSV de entrada (por defecto data/ecoai_dataset.csv)')
+    compilar.add_argument('--destino', help='archivo compilado (por defecto el CSV con extensión .bin)')
+    compilar.set_defaults(func=main_compilar)
+
+    assets = subparsers.add_parser('assets', help='arma los paquetes CSS/JS minificados, con hash y precomprimidos')
+    assets.add_argument('--sin-descarga', action='store_true',
+                        help='no descargar Chart.js si falta en static/vendor/ (falla si no está)')
+    assets.set_defaults(func=main_assets)
+
+    perfil = subparsers.add_parser('perfil', help='imprime el header firmado que pide perfilar una request')
+    perfil.add_argument('ruta', help='path de la request a perfilar (ej: /comparativo)')
+    perfil.set_defaults(func=main_firmar)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Asignación de una carga de trabajo a los modelos del dataset minimizando su impacto.
+
+Dada una demanda por tipo de consulta (ej: 1.000.000 de textos y 50.000
+imágenes al mes), reparte cada tipo entre los modelos que lo ofrecen para
+minimizar la suma ponderada de agua, energía y CO2, respetando:
+
+- los modelos permitidos por tipo de consulta,
+- la capacidad de cada modelo para un tipo (ej: 1.000 imágenes),
+- la capacidad total de cada modelo, compartida entre los tipos que atiende.
+
+Es un problema de transporte (flujo de costo mínimo) con los tipos como
+orígenes y los modelos como destinos, costo = coeficientes de la tabla de
+calcular_impacto × pesos. Se resuelve con caminos mínimos sucesivos: cada
+camino aumentante pasa solo por tipos (un tipo le cede a otro un modelo que
+ya usa), así Bellman-Ford corre sobre un grafo de tantos nodos como tipos de
+consulta y las aristas salen de las asignaciones vigentes, no de todos los
+pares tipo × modelo. El mejor modelo de cada tipo y la mejor cesión de
+cada par de tipos se mantienen en heaps entre aumentos.
+"""
+
+import heapq
+import math
+
+from . import calculator
+
+# Objetivos con nombre -> pesos de agua, energía y carbono
+OBJETIVOS = {
+    'co2': {'agua': 0.0, 'energia': 0.0, 'carbono': 1.0},
+    'agua': {'agua': 1.0, 'energia': 0.0, 'carbono': 0.0},
+    'energia': {'agua': 0.0, 'energia': 1.0, 'carbono': 0.0},
+}
+
+# Tolerancia para considerar agotada una capacidad o una demanda
+EPSILON = 1e-9
+
+
+def _numero_positivo(valor, descripcion, cero=False):
+    # Finito y hasta CANTIDAD_MAXIMA (así los totales no desbordan); la
+    # comparación descarta también NaN e ints que no entran en un float
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or \
+            not 0 <= valor <= calculator.CANTIDAD_MAXIMA or (valor == 0 and not cero):
+        raise ValueError(f"Error: {descripcion} debe ser un número {'mayor o igual a 0' if cero else 'positivo'} "
+                         f"y finito (hasta {calculator.CANTIDAD_MAXIMA:.0e})")
+    return float(valor)
+
+
+def leer_objetivo(objetivo):
+    """
+    Convierte el objetivo en pesos: un nombre de OBJETIVOS o un dict de pesos.
+
+    Raises:
+        ValueError si el objetivo no es válido
+    """
+    if isinstance(objetivo, str):
+        if objetivo not in OBJETIVOS:
+            raise ValueError(f"Error: objetivo '{objetivo}' desconocido (usar {', '.join(OBJETIVOS)} o pesos)")
+        return dict(OBJETIVOS[objetivo])
+    if not isinstance(objetivo, dict):
+        raise ValueError("Error: el objetivo debe ser un nombre o un dict de pesos")
+    return calculator.leer_pesos(objetivo)
+
+
+def resolver(demandas, arcos, capacidad_modelo):
+    """
+    Resuelve el problema de transporte con caminos mínimos sucesivos.
+
+    Args:
+        demandas: lista con la demanda de cada tipo (índice = tipo)
+        arcos: por tipo, dict modelo -> (costo unitario, capacidad del arco)
+        capacidad_modelo: dict modelo -> capacidad compartida entre tipos (sin clave = ilimitada)
+
+    Returns:
+        (flujo, pendiente): flujo dict (tipo, modelo) -> cantidad y la demanda
+        sin asignar de cada tipo (> 0 solo si las capacidades no alcanzan)
+    """
+    n = len(demandas)
+    pendiente = list(demandas)
+    flujo = {}
+    uso = {}
+    tipos_de = {}
+    for t in range(n):
+        for m in arcos[t]:
+            tipos_de.setdefault(m, []).append(t)
+
+    # Heaps con borrado diferido: las entradas inválidas se descartan al llegar al tope
+    # y se vuelven a agregar cuando el evento que las invalidó se revierte.
+    # salidas[t]: (costo, modelo) de los modelos a los que t puede asignar más
+    salidas = [[(costo, m) for m, (costo, _) in arcos[t].items()] for t in range(n)]
+    for heap in salidas:
+        heapq.heapify(heap)
+    # cesiones[(t1, t2)]: (costo de t1 - costo de t2, modelo) de los modelos que t2 usa y t1 podría tomar
+    cesiones = {(t1, t2): [] for t1 in range(n) for t2 in range(n) if t1 != t2}
+
+    def libre_modelo(m):
+        return capacidad_modelo.get(m, math.inf) - uso.get(m, 0.0)
+
+    def libre_arco(t, m):
+        return arcos[t][m][1] - flujo.get((t, m), 0.0)
+
+    def sumar(t, m, delta):
+        antes = flujo.get((t, m), 0.0)
+        lleno = libre_arco(t, m) <= EPSILON
+        if antes + delta > EPSILON:
+            flujo[(t, m)] = antes + delta
+        else:
+            flujo.pop((t, m), None)
+        if antes <= EPSILON < antes + delta:
+            # t empieza a usar m: los demás tipos pueden tomarlo
+            for t1 in tipos_de[m]:
+                if t1 != t:
+                    heapq.heappush(cesiones[(t1, t)], (arcos[t1][m][0] - arcos[t][m][0], m))
+        if lleno and libre_arco(t, m) > EPSILON:
+            # El arco (t, m) vuelve a tener lugar
+            heapq.heappush(salidas[t], (arcos[t][m][0], m))
+            for t2 in tipos_de[m]:
+                if t2 != t and flujo.get((t2, m), 0.0) > EPSILON:
+                    heapq.heappush(cesiones[(t, t2)], (arcos[t][m][0] - arcos[t2][m][0], m))
+
+    def mejor_salida(t):
+        heap = salidas[t]
+        while heap and (libre_modelo(heap[0][1]) <= EPSILON or libre_arco(t, heap[0][1]) <= EPSILON):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def mejor_cesion(t1, t2):
+        heap = cesiones[(t1, t2)]
+        while heap and (flujo.get((t2, heap[0][1]), 0.0) <= EPSILON or libre_arco(t1, heap[0][1]) <= EPSILON):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    # Cota de seguridad: cada aumento agota una demanda, un arco, un modelo o una asignación
+    for _ in range(4 * (sum(len(a) for a in arcos) + n) + 10):
+        # Bellman-Ford sobre los tipos, desde los que tienen demanda pendiente.
+        # Arista t1 -> t2: t1 toma parte de un modelo que usa t2, que debe reubicarla
+        aristas = [(t1, t2, c) for (t1, t2) in cesiones for c in (mejor_cesion(t1, t2),) if c is not None]
+        distancia = [0.0 if pendiente[t] > EPSILON else math.inf for t in range(n)]
+        previo = [None] * n
+        for _ in range(n):
+            cambio = False
+            for t1, t2, (peso, m) in aristas:
+                if distancia[t1] + peso < distancia[t2] - EPSILON:
+                    distancia[t2] = distancia[t1] + peso
+                    previo[t2] = (t1, m)
+                    cambio = True
+            if not cambio:
+                break
+
+        mejor = None
+        for t in range(n):
+            if distancia[t] < math.inf:
+                destino = mejor_salida(t)
+                if destino is not None and (mejor is None or distancia[t] + destino[0] < mejor[0]):
+                    mejor = (distancia[t] + destino[0], t, destino[1])
+        if mejor is None:
+            break
+
+        # Camino: tipo origen -> ... -> tipo final -> modelo final, y cuánto admite
+        _, t_final, m_final = mejor
+        delta = min(libre_arco(t_final, m_final), libre_modelo(m_final))
+        tramos = []
+        t = t_final
+        while previo[t] is not None and len(tramos) < n:
+            t1, m = previo[t]
+            tramos.append((t1, m, t))
+            delta = min(delta, libre_arco(t1, m), flujo.get((t, m), 0.0))
+            t = t1
+        delta = min(delta, pendiente[t])
+        if delta <= EPSILON:
+            break
+
+        pendiente[t] -= delta
+        for t1, m, t2 in tramos:
+            sumar(t1, m, delta)
+            sumar(t2, m, -delta)
+        sumar(t_final, m_final, delta)
+        uso[m_final] = uso.get(m_final, 0.0) + delta
+
+    return flujo, [p if p > EPSILON else 0.0 for p in pendiente]
+
+
+def optimizar_asignacion(demanda, objetivo='co2', permitidos=None, capacidades=None, capacidades_tipo=None):
+    """
+    Reparte una carga de trabajo entre los modelos del dataset minimizando su impacto.
+
+    Args:
+        demanda: dict tipo_consulta -> cantidad (en la unidad del tipo)
+        objetivo: 'co2', 'agua', 'energia' o un dict de pesos {agua, energia, carbono}
+        permitidos: dict tipo_consulta -> lista de modelos permitidos (por defecto, todos los del dataset)
+        capacidades: dict modelo -> cantidad máxima, compartida entre todos los tipos que atiende
+        capacidades_tipo: dict tipo_consulta -> {modelo: cantidad máxima de ese tipo}
+
+    Returns:
+        dict con pesos, asignacion ([{modelo, tipo_consulta, cantidad, agua, energia, co2}]),
+        por_tipo ({tipo: {demanda, asignado, sin_asignar}}) y totales ({agua, energia, co2, objetivo})
+
+    Raises:
+        ValueError si la demanda, el objetivo o las restricciones no son válidos
+    """
+    pesos = leer_objetivo(objetivo)
+    if not isinstance(demanda, dict) or not demanda:
+        raise ValueError("Error: la demanda debe ser un dict tipo_consulta -> cantidad")
+    permitidos = {} if permitidos is None else permitidos
+    capacidades = {} if capacidades is None else capacidades
+    capacidades_tipo = {} if capacidades_tipo is None else capacidades_tipo
+    for nombre, valor in (('permitidos', permitidos), ('capacidades', capacidades),
+                          ('capacidades_tipo', capacidades_tipo)):
+        if not isinstance(valor, dict):
+            raise ValueError(f"Error: {nombre} debe ser un dict")
+
+    tabla = calculator.GESTOR.actual().tabla
+    modelos_dataset = set(tabla.modelos())
+    for tipo in list(permitidos) + list(capacidades_tipo):
+        if tipo not in demanda:
+            raise ValueError(f"Error: restricción para '{tipo}', que no está en la demanda")
+    for modelo in capacidades:
+        if modelo not in modelos_dataset:
+            raise ValueError(f"Error: modelo '{modelo}' no encontrado")
+    capacidad_modelo = {m: _numero_positivo(c, f"la capacidad de {m}", cero=True) for m, c in capacidades.items()}
+
+    tipos, demandas, arcos, coeficientes = [], [], [], {}
+    for tipo, cantidad in demanda.items():
+        cantidad = _numero_positivo(cantidad, f"la demanda de {tipo}")
+        filas = {modelo: (agua, energia, carbono) for modelo, agua, energia, carbono in tabla.de_tipo(tipo)}
+        if not filas:
+            raise ValueError(f"Error: tipo de consulta '{tipo}' no encontrado")
+        lista = permitidos.get(tipo)
+        if lista is not None:
+            if isinstance(lista, str) or not isinstance(lista, (list, tuple)):
+                raise ValueError(f"Error: los modelos permitidos para {tipo} deben ser una lista")
+            for modelo in lista:
+                if not isinstance(modelo, str):
+                    raise ValueError(f"Error: los modelos permitidos para {tipo} deben ser nombres (texto)")
+                if modelo not in filas:
+                    raise ValueError(f"Error: combinación no encontrada: {modelo} + {tipo}")
+            filas = {modelo: filas[modelo] for modelo in lista}
+        topes = capacidades_tipo.get(tipo, {})
+        if not isinstance(topes, dict):
+            raise ValueError(f"Error: capacidades_tipo[{tipo}] debe ser un dict modelo -> cantidad")
+        for modelo in topes:
+            if modelo not in filas:
+                raise ValueError(f"Error: capacidad para {modelo} + {tipo}, que no es una combinación permitida")
+        arcos_tipo = {}
+        for modelo, (agua, energia, carbono) in filas.items():
+            costo = pesos['agua'] * agua + pesos['energia'] * energia + pesos['carbono'] * carbono
+            tope = _numero_positivo(topes[modelo], f"la capacidad de {modelo} + {tipo}", cero=True) \
+                if modelo in topes else math.inf
+            arcos_tipo[modelo] = (costo, tope)
+            coeficientes[(tipo, modelo)] = (agua, energia, carbono)
+        tipos.append(tipo)
+        demandas.append(cantidad)
+        arcos.append(arcos_tipo)
+
+    flujo, pendiente = resolver(demandas, arcos, capacidad_modelo)
+
+    asignacion = []
+    totales = {'agua': 0.0, 'energia': 0.0, 'co2': 0.0, 'objetivo': 0.0}
+    asignado = [0.0] * len(tipos)
+    for (t, modelo), cantidad in flujo.items():
+        agua, energia, carbono = coeficientes[(tipos[t], modelo)]
+        asignado[t] += cantidad
+        fila = {
+            'modelo': modelo,
+            'tipo_consulta': tipos[t],
+            'cantidad': round(cantidad, 6),
+            'agua': round(agua * cantidad, 2),
+            'energia': round(energia * cantidad, 2),
+            'co2': round(carbono * cantidad, 2),
+        }
+        asignacion.append(fila)
+        totales['agua'] += agua * cantidad
+        totales['energia'] += energia * cantidad
+        totales['co2'] += carbono * cantidad
+        totales['objetivo'] += arcos[t][modelo][0] * cantidad
+    asignacion.sort(key=lambda f: (tipos.index(f['tipo_consulta']), -f['cantidad'], f['modelo']))
+
+    return {
+        'pesos': pesos,
+        'asignacion': asignacion,
+        'por_tipo': {
+            tipo: {'demanda': demandas[t], 'asignado': round(asignado[t], 6), 'sin_asignar': round(pendiente[t], 6)}
+            for t, tipo in enumerate(tipos)
+        },
+        'totales': {clave: round(valor, 2) for clave, valor in totales.items()},
+    }
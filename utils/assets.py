@@ -0,0 +1,276 @@
+"""
+Pipeline de assets estáticos: paquetes de CSS/JS concatenados, minificados,
+con hash en el nombre y precomprimidos.
+
+`python -m utils assets` arma cada paquete de PAQUETES (resolviendo los
+@import de style.css), lo minifica, lo escribe en static/dist/ como
+<nombre>.<hash>.<ext> junto a sus variantes .gz y .br (esta última solo si
+está instalado el paquete brotli) y guarda en manifest.json el nombre final de
+cada paquete. Como el nombre cambia con el contenido, /assets/ los sirve con
+Cache-Control immutable de un año y elige la variante comprimida según el
+Accept-Encoding del navegador.
+
+En los templates, assets('app.css') retorna las URLs a incluir: la del
+paquete si está construido, o las de los archivos fuente (desarrollo).
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import shutil
+import sys
+import urllib.request
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se generan las variantes .gz
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / 'static'
+DIST = 'dist'
+
+# Chart.js se sirve siempre desde static/vendor/ (nunca del CDN). Si falta,
+# el build lo descarga una vez y solo lo escribe si coincide con CHARTJS_SHA256;
+# mientras el hash no esté fijado, el archivo hay que vendorizarlo a mano.
+CHARTJS_VERSION = '4.4.1'
+CHARTJS_URL = f'https://cdn.jsdelivr.net/npm/chart.js@{CHARTJS_VERSION}/dist/chart.umd.js'
+CHARTJS_SHA256 = None
+CHARTJS = 'vendor/chart.umd.js'
+
+# Paquete -> archivos fuente (relativos a static/), en orden
+PAQUETES = {
+    'app.css': ['css/style.css'],
+    'app.js': ['js/main.js'],
+    'graficos.js': [CHARTJS, 'js/charts.js'],
+}
+
+# Un año: los nombres con hash nunca cambian de contenido
+MAX_AGE_INMUTABLE = 365 * 24 * 3600
+
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+_IMPORT = re.compile(r"""@import\s+url\(\s*['"]?([^'")]+)['"]?\s*\)\s*;""")
+
+
+def resolver_imports(ruta, vistos=None):
+    """
+    Retorna el CSS de `ruta` con sus @import url(...) locales reemplazados por el contenido.
+    """
+    ruta = Path(ruta)
+    vistos = set() if vistos is None else vistos
+    if ruta in vistos:
+        return ''
+    vistos.add(ruta)
+
+    def incluir(coincidencia):
+        destino = coincidencia.group(1)
+        if '//' in destino:
+            return coincidencia.group(0)
+        return resolver_imports(ruta.parent / destino, vistos)
+
+    return _IMPORT.sub(incluir, ruta.read_text(encoding='utf-8'))
+
+
+def minificar_css(texto):
+    """
+    Quita comentarios y espacios sobrantes de una hoja de estilos.
+
+    Conservador: no toca el espacio antes de ':' (en un selector es un
+    combinador) ni los espacios dentro de calc().
+    """
+    texto = re.sub(r'/\*.*?\*/', '', texto, flags=re.S)
+    texto = re.sub(r'\s+', ' ', texto)
+    texto = re.sub(r'\s*([{};,>])\s*', r'\1', texto)
+    texto = re.sub(r':\s+', ':', texto)
+    texto = texto.replace(';}', '}')
+    return texto.strip() + '\n'
+
+
+def minificar_js(texto):
+    """
+    Quita la indentación, las líneas vacías y los comentarios que ocupan
+    líneas completas. No reescribe código (sin parser, cualquier otra
+    transformación sería riesgosa); gzip/brotli se encargan del resto.
+    """
+    lineas = []
+    en_comentario = False
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if en_comentario:
+            en_comentario = '*/' not in linea
+            continue
+        if linea.startswith('/*'):
+            en_comentario = '*/' not in linea
+            continue
+        if not linea or linea.startswith('//'):
+            continue
+        lineas.append(linea)
+    return '\n'.join(lineas) + '\n'
+
+
+def verificar_chartjs(contenido):
+    """
+    Verifica que `contenido` sea la versión fijada de Chart.js.
+
+    Raises:
+        OSError si el sha256 no coincide con CHARTJS_SHA256
+    """
+    if CHARTJS_SHA256 is not None and hashlib.sha256(contenido).hexdigest() != CHARTJS_SHA256:
+        raise OSError(f"{CHARTJS} no coincide con el sha256 fijado de Chart.js {CHARTJS_VERSION}")
+
+
+def descargar_chartjs(destino):
+    """
+    Descarga la versión fijada de Chart.js a `destino`, verificando su sha256 antes de escribirla.
+
+    Raises:
+        OSError si no hay hash fijado, no se pudo descargar o el contenido no coincide
+    """
+    if CHARTJS_SHA256 is None:
+        raise OSError(f"falta {CHARTJS} y CHARTJS_SHA256 no está fijado; vendorizá Chart.js {CHARTJS_VERSION}")
+    with urllib.request.urlopen(CHARTJS_URL, timeout=30) as respuesta:
+        contenido = respuesta.read()
+    verificar_chartjs(contenido)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_suffix('.tmp')
+    temporal.write_bytes(contenido)
+    temporal.replace(destino)
+
+
+def armar_paquete(origen, archivos):
+    """
+    Concatena y minifica los archivos de un paquete.
+
+    Returns:
+        contenido (bytes) del paquete
+    """
+    partes = []
+    for archivo in archivos:
+        ruta = origen / archivo
+        if archivo.endswith('.css'):
+            partes.append(minificar_css(resolver_imports(ruta)))
+        elif archivo.startswith('vendor/'):
+            # Ya viene minificado; se separa con ; por si no termina en uno
+            contenido = ruta.read_bytes()
+            if archivo == CHARTJS:
+                verificar_chartjs(contenido)
+            partes.append(contenido.decode('utf-8').rstrip() + ';\n')
+        else:
+            partes.append(minificar_js(ruta.read_text(encoding='utf-8')))
+    return ''.join(partes).encode('utf-8')
+
+
+def construir(origen=STATIC_DIR, descargar=True):
+    """
+    Construye todos los paquetes en <origen>/dist/ y escribe el manifiesto.
+
+    Args:
+        origen: directorio static
+        descargar: si falta Chart.js en static/vendor/, descargarlo (verificado por sha256)
+
+    Returns:
+        dict paquete -> {archivo, bytes, gzip, brotli}
+
+    Raises:
+        OSError si falta un archivo fuente, no se pudo descargar Chart.js o no coincide su sha256
+    """
+    origen = Path(origen)
+    destino = origen / DIST
+    chartjs = origen / CHARTJS
+    if not chartjs.exists() and descargar:
+        descargar_chartjs(chartjs)
+
+    temporal = origen / (DIST + '.tmp')
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir(parents=True)
+    manifiesto, resumen = {}, {}
+    for paquete, archivos in PAQUETES.items():
+        contenido = armar_paquete(origen, archivos)
+        base, extension = paquete.rsplit('.', 1)
+        nombre = f'{base}.{hashlib.sha256(contenido).hexdigest()[:10]}.{extension}'
+        (temporal / nombre).write_bytes(contenido)
+        comprimido = gzip.compress(contenido, compresslevel=9, mtime=0)
+        (temporal / (nombre + '.gz')).write_bytes(comprimido)
+        resumen[paquete] = {'archivo': nombre, 'bytes': len(contenido), 'gzip': len(comprimido), 'brotli': None}
+        if brotli is not None:
+            comprimido = brotli.compress(contenido, quality=11)
+            (temporal / (nombre + '.br')).write_bytes(comprimido)
+            resumen[paquete]['brotli'] = len(comprimido)
+        manifiesto[paquete] = nombre
+    (temporal / 'manifest.json').write_text(json.dumps(manifiesto, indent=2) + '\n', encoding='utf-8')
+
+    # Se reemplaza el directorio entero: no quedan paquetes de builds anteriores
+    shutil.rmtree(destino, ignore_errors=True)
+    temporal.replace(destino)
+    return resumen
+
+
+def leer_manifiesto(directorio):
+    """
+    Retorna el manifiesto de un directorio dist, o {} si no se construyeron los assets.
+    """
+    try:
+        return json.loads((Path(directorio) / 'manifest.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def registrar(app, origen=STATIC_DIR):
+    """
+    Registra en la app la ruta /assets/<nombre> y la función de template assets().
+    """
+    from flask import abort, request, send_file, url_for
+
+    directorio = Path(origen) / DIST
+    manifiesto = leer_manifiesto(directorio)
+    servibles = set(manifiesto.values())
+
+    def assets(paquete):
+        nombre = manifiesto.get(paquete)
+        if nombre is not None:
+            return [url_for('asset', nombre=nombre)]
+        # Sin construir (desarrollo): los archivos fuente, Chart.js incluido
+        return [url_for('static', filename=archivo) for archivo in PAQUETES[paquete]]
+
+    def asset(nombre):
+        if nombre not in servibles:
+            abort(404)
+        ruta = directorio / nombre
+        tipo = mimetypes.guess_type(nombre)[0]
+        codificacion = None
+        for candidata, sufijo in CODIFICACIONES:
+            if candidata in request.accept_encodings and ruta.with_name(nombre + sufijo).exists():
+                codificacion, ruta = candidata, ruta.with_name(nombre + sufijo)
+                break
+        response = send_file(ruta, mimetype=tipo, conditional=True, etag=True)
+        if codificacion:
+            response.headers['Content-Encoding'] = codificacion
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = MAX_AGE_INMUTABLE
+        response.cache_control.immutable = True
+        return response
+
+    app.add_url_rule('/assets/<path:nombre>', 'asset', asset)
+    app.add_template_global(assets, 'assets')
+    return manifiesto
+
+
+def main_assets(args):
+    """
+    Punto de entrada del subcomando `python -m utils assets`.
+    """
+    try:
+        resumen = construir(descargar=not args.sin_descarga)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for paquete, datos in resumen.items():
+        br = f", {datos['brotli']} brotli" if datos['brotli'] is not None else ''
+        print(f"{paquete} -> {datos['archivo']} ({datos['bytes']} bytes, {datos['gzip']} gzip{br})")
+    if brotli is None:
+        print("Aviso: sin el paquete brotli solo se generan variantes .gz", file=sys.stderr)
+    return 0
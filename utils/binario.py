@@ -0,0 +1,320 @@
+"""
+Formato binario columnar del dataset compilado.
+
+El archivo guarda una o más tablas en columnas: las numéricas como arreglos de
+float64 o int64 y las de texto codificadas con diccionario (códigos uint32 más
+los valores distintos). Cada sección empieza alineada a 8 bytes, así que al
+abrir el archivo con mmap se exponen como memoryview sin copiar ni parsear
+nada: el sistema operativo carga solo las páginas que se leen y todos los
+procesos que mapean el mismo archivo comparten esas páginas.
+
+Los diccionarios también viven en el archivo (offsets + bytes UTF-8 + una
+tabla hash de direccionamiento abierto para buscar el código de un valor), de
+modo que la memoria propia de cada proceso no crece con el dataset.
+
+Estructura:
+    MAGIA (8 bytes) | largo del encabezado (uint32) | encabezado JSON | secciones
+
+El encabezado describe cada tabla ({filas, columnas: {nombre: {tipo, offset,
+diccionario}}}) y lleva metadatos libres (origen del CSV, estadísticas, etc.).
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Sequence
+
+MAGIA = b'ECOAIBIN'
+VERSION_FORMATO = 2
+
+_LARGO = struct.Struct('<I')
+_ALINEACION = 8
+
+# Tipos de columna numérica -> código de array/memoryview
+TIPOS_NUMERICOS = {'float': 'd', 'entero': 'q'}
+
+# Claves del encabezado que guardan la posición de una sección
+_CLAVES_OFFSET = ('offset', 'offsets', 'datos', 'indice')
+
+
+def _alinear(posicion):
+    return -posicion % _ALINEACION
+
+
+def _hash(datos):
+    # Hash estable entre procesos (hash() de Python cambia por proceso)
+    return zlib.crc32(datos)
+
+
+class Diccionario(list):
+    """
+    Valores distintos de una columna de texto (el código es la posición).
+    """
+
+    def __init__(self, valores=()):
+        super().__init__(valores)
+        self._codigos = {valor: i for i, valor in enumerate(self)}
+
+    def codigo(self, valor):
+        """
+        Retorna el código de `valor`, o None si no está en el diccionario.
+        """
+        try:
+            return self._codigos.get(valor)
+        except TypeError:
+            return None
+
+
+class DiccionarioMapeado(Sequence):
+    """
+    Diccionario de una columna de texto leído desde el archivo mapeado.
+
+    Los valores se decodifican al accederlos; codigo() usa la tabla hash del
+    archivo, así que no se construye ningún dict por proceso.
+    """
+
+    def __init__(self, offsets, datos, ranuras):
+        self._offsets = offsets    # memoryview 'Q' (largo + 1)
+        self._datos = datos        # memoryview de bytes UTF-8
+        self._ranuras = ranuras    # memoryview 'I' (código + 1, 0 = libre)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _bytes(self, i):
+        return self._datos[self._offsets[i]:self._offsets[i + 1]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('índice fuera de rango')
+        return str(self._bytes(i), 'utf-8')
+
+    def __eq__(self, otro):
+        if isinstance(otro, (list, tuple, DiccionarioMapeado)):
+            return list(self) == list(otro)
+        return NotImplemented
+
+    def codigo(self, valor):
+        """
+        Retorna el código de `valor`, o None si no está en el diccionario.
+        """
+        if not isinstance(valor, str) or not len(self._ranuras):
+            return None
+        datos = valor.encode('utf-8')
+        mascara = len(self._ranuras) - 1
+        ranura = _hash(datos) & mascara
+        while True:
+            codigo = self._ranuras[ranura]
+            if codigo == 0:
+                return None
+            if self._bytes(codigo - 1) == datos:
+                return codigo - 1
+            ranura = (ranura + 1) & mascara
+
+
+def codificar(valores):
+    """
+    Codifica una columna de texto con diccionario.
+
+    Returns:
+        (códigos array('I'), Diccionario con los valores distintos en orden de aparición)
+    """
+    posiciones = {}
+    codigos = array('I', [posiciones.setdefault(v, len(posiciones)) for v in valores])
+    return codigos, Diccionario(posiciones)
+
+
+def _secciones_diccionario(diccionario):
+    # (offsets, datos, ranuras) del diccionario en bytes
+    codificados = [v.encode('utf-8') for v in diccionario]
+    offsets = array('Q', [0])
+    for datos in codificados:
+        offsets.append(offsets[-1] + len(datos))
+    cantidad = 1
+    while cantidad < 2 * len(codificados):
+        cantidad *= 2
+    ranuras = array('I', bytes(4 * cantidad)) if codificados else array('I')
+    mascara = cantidad - 1
+    for codigo, datos in enumerate(codificados):
+        ranura = _hash(datos) & mascara
+        while ranuras[ranura]:
+            ranura = (ranura + 1) & mascara
+        ranuras[ranura] = codigo + 1
+    return offsets.tobytes(), b''.join(codificados), ranuras.tobytes()
+
+
+def escribir(ruta, tablas, meta=None):
+    """
+    Escribe las tablas en el formato binario columnar (de forma atómica).
+
+    Args:
+        ruta: archivo de destino
+        tablas: {nombre: {columna: valores}}; valores es una secuencia de float,
+            un array('q') de enteros, una secuencia de str o una columna ya
+            codificada (códigos, diccionario). Todas las columnas de una tabla
+            deben tener el mismo largo.
+        meta: dict serializable a JSON que se guarda en el encabezado
+    """
+    if sys.byteorder != 'little':
+        raise ValueError("el formato compilado requiere una plataforma little-endian")
+
+    bloques = []   # bytes de cada sección, en el orden del archivo
+
+    def bloque(datos):
+        bloques.append(datos)
+        return len(bloques) - 1
+
+    descripcion = {}
+    for nombre, columnas in tablas.items():
+        filas = None
+        descripcion_columnas = {}
+        for columna, valores in columnas.items():
+            if isinstance(valores, tuple):
+                codigos, diccionario = valores
+            elif len(valores) and isinstance(valores[0], str):
+                codigos, diccionario = codificar(valores)
+            else:
+                codigos, diccionario = None, None
+            largo = len(valores) if codigos is None else len(codigos)
+            if filas is None:
+                filas = largo
+            elif largo != filas:
+                raise ValueError(f"{nombre}.{columna}: largo {largo} distinto de {filas}")
+
+            if codigos is None:
+                formato = getattr(valores, 'typecode', None) or getattr(valores, 'format', None)
+                tipo = 'entero' if formato in ('q', 'l') else 'float'
+                datos = array(TIPOS_NUMERICOS[tipo], valores).tobytes()
+                descripcion_columnas[columna] = {'tipo': tipo, 'offset': bloque(datos)}
+            else:
+                offsets, textos, ranuras = _secciones_diccionario(diccionario)
+                descripcion_columnas[columna] = {
+                    'tipo': 'texto',
+                    'offset': bloque(array('I', codigos).tobytes()),
+                    'diccionario': {
+                        'valores': len(diccionario),
+                        'offsets': bloque(offsets),
+                        'datos': bloque(textos),
+                        'bytes': len(textos),
+                        'indice': bloque(ranuras),
+                        'ranuras': len(ranuras) // 4,
+                    },
+                }
+        descripcion[nombre] = {'filas': filas or 0, 'columnas': descripcion_columnas}
+
+    # Los offsets dependen del largo del encabezado, que a su vez los incluye:
+    # se calculan con un encabezado provisional y se repite hasta que se estabilizan
+    offsets = [0] * len(bloques)
+    while True:
+        encabezado = json.dumps({
+            'formato': VERSION_FORMATO,
+            'meta': meta or {},
+            'tablas': _con_offsets(descripcion, offsets),
+        }, ensure_ascii=False).encode('utf-8')
+        posicion = len(MAGIA) + _LARGO.size + len(encabezado)
+        nuevos = []
+        for datos in bloques:
+            posicion += _alinear(posicion)
+            nuevos.append(posicion)
+            posicion += len(datos)
+        if nuevos == offsets:
+            break
+        offsets = nuevos
+
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(MAGIA)
+        f.write(_LARGO.pack(len(encabezado)))
+        f.write(encabezado)
+        for offset, datos in zip(offsets, bloques):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _con_offsets(descripcion, offsets):
+    # Copia de la descripción reemplazando los índices de sección por su posición
+    if isinstance(descripcion, dict):
+        return {
+            clave: offsets[valor] if clave in _CLAVES_OFFSET and isinstance(valor, int)
+            else _con_offsets(valor, offsets)
+            for clave, valor in descripcion.items()
+        }
+    return descripcion
+
+
+def _leer_encabezado(f):
+    if f.read(len(MAGIA)) != MAGIA:
+        raise ValueError("no es un dataset compilado de EcoAI")
+    try:
+        (largo,) = _LARGO.unpack(f.read(_LARGO.size))
+        encabezado = json.loads(f.read(largo).decode('utf-8'))
+    except (struct.error, ValueError):
+        raise ValueError("encabezado del dataset compilado corrupto")
+    if encabezado.get('formato') != VERSION_FORMATO:
+        raise ValueError(f"versión de formato no soportada: {encabezado.get('formato')}")
+    return encabezado
+
+
+def leer_meta(ruta):
+    """
+    Lee solo los metadatos del encabezado (sin mapear las columnas).
+
+    Returns:
+        dict meta, o None si el archivo no existe
+    """
+    try:
+        with open(ruta, 'rb') as f:
+            return _leer_encabezado(f)['meta']
+    except FileNotFoundError:
+        return None
+
+
+def leer(ruta):
+    """
+    Mapea el archivo en memoria y retorna sus tablas sin copiar los datos.
+
+    Returns:
+        (meta, tablas) donde tablas es {nombre: {columna: valor}}; las columnas
+        numéricas son memoryview ('d' o 'q') y las de texto tuplas
+        (memoryview de códigos uint32, DiccionarioMapeado)
+    """
+    if sys.byteorder != 'little':
+        raise ValueError("el formato compilado requiere una plataforma little-endian")
+    with open(ruta, 'rb') as f:
+        encabezado = _leer_encabezado(f)
+        # La memoryview mantiene vivo el mapa aunque se cierre el archivo
+        vista = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    tamano = len(vista)
+
+    def seccion(inicio, largo, formato, donde):
+        if inicio + largo > tamano:
+            raise ValueError(f"dataset compilado truncado en {donde}")
+        return vista[inicio:inicio + largo].cast(formato)
+
+    tablas = {}
+    for nombre, tabla in encabezado['tablas'].items():
+        filas = tabla['filas']
+        columnas = {}
+        for columna, info in tabla['columnas'].items():
+            donde = f"{nombre}.{columna}"
+            if info['tipo'] == 'texto':
+                d = info['diccionario']
+                diccionario = DiccionarioMapeado(
+                    seccion(d['offsets'], 8 * (d['valores'] + 1), 'Q', donde),
+                    seccion(d['datos'], d['bytes'], 'B', donde),
+                    seccion(d['indice'], 4 * d['ranuras'], 'I', donde),
+                )
+                columnas[columna] = (seccion(info['offset'], 4 * filas, 'I', donde), diccionario)
+            else:
+                columnas[columna] = seccion(info['offset'], 8 * filas, TIPOS_NUMERICOS[info['tipo']], donde)
+        tablas[nombre] = columnas
+    return encabezado['meta'], tablas
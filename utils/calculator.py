@@ -1,6 +1,31 @@
 import csv
+import heapq
+import io
+import math
+import os
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from itertools import repeat
+from operator import mul, truediv
 from pathlib import Path
 
+from . import binario, incertidumbre, intensidad, metricas
+from .columnar import TablaColumnar
+from .dataset import GestorDataset, firma_archivo, version_contenido
+
+# Ruta del dataset principal (ECOAI_DATASET permite apuntar a otro CSV)
+CSV_PATH = Path(os.environ.get('ECOAI_DATASET') or Path(__file__).parent.parent / 'data' / 'ecoai_dataset.csv')
+
+# Dataset compilado (python -m utils compilar); se usa en lugar del CSV si está al día
+COMPILADO_PATH = CSV_PATH.with_suffix('.bin')
+
+# Distribuciones de los coeficientes para el modo incertidumbre (ver utils/incertidumbre.py)
+INCERTIDUMBRE_PATH = CSV_PATH.with_name(f'{CSV_PATH.stem}_incertidumbre.csv')
+
+# Perfiles horarios de intensidad de carbono por región (ver utils/intensidad.py)
+PERFILES_DIR = Path(os.environ.get('ECOAI_PERFILES_DIR') or CSV_PATH.parent / 'intensidad')
+
 def cargar_datos_csv():
     """
     Carga el dataset de ecoai desde CSV en un diccionario anidado.
@@ -10,87 +35,467 @@ def cargar_datos_csv():
     
     Esto permite búsquedas O(1) en lugar de O(n).
     """
-    csv_path = Path(__file__).parent.parent / 'data' / 'ecoai_dataset.csv'
-    db = {}
+    csv_path = CSV_PATH
     
     try:
         with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                key = f"{row['modelo']}_{row['tipo_consulta']}"
-                if key not in db:
-                    db[key] = []
-                db[key].append(row)
+            return indexar_filas(csv.DictReader(f))
     except FileNotFoundError:
         print(f"Advertencia: No se encontró {csv_path}")
         return {}
-    
+
+def indexar_filas(filas):
+    """
+    Indexa filas del CSV por la clave f"{modelo}_{tipo_consulta}".
+    """
+    db = {}
+    for row in filas:
+        key = f"{row['modelo']}_{row['tipo_consulta']}"
+        if key not in db:
+            db[key] = []
+        db[key].append(row)
     return db
 
-# Cargar datos al iniciar el módulo
-DB = cargar_datos_csv()
+# Columnas mínimas que debe tener cada fila del dataset
+COLUMNAS_REQUERIDAS = ('modelo', 'tipo_consulta', 'unidad_medida', 'agua(L)', 'energia(kWh)', 'carbono(gCO2e)')
+COLUMNAS_NUMERICAS = ('agua(L)', 'energia(kWh)', 'carbono(gCO2e)')
+
+def validar_filas(filas):
+    """
+    Valida que las filas tengan las columnas requeridas y coeficientes numéricos positivos.
+    
+    Raises:
+        ValueError con la primera fila inválida encontrada
+    """
+    if not filas:
+        raise ValueError("el dataset no tiene filas")
+    for numero, row in enumerate(filas, start=2):
+        for campo in COLUMNAS_REQUERIDAS:
+            if not row.get(campo):
+                raise ValueError(f"fila {numero}: falta el campo {campo}")
+        for campo in COLUMNAS_NUMERICAS:
+            try:
+                valor = float(row[campo])
+            except ValueError:
+                raise ValueError(f"fila {numero}: {campo} no es numérico ({row[campo]!r})")
+            if valor <= 0:
+                raise ValueError(f"fila {numero}: {campo} debe ser positivo")
+
+# Mapeo de descripciones por tipo de consulta
+DESCRIPCIONES = {
+    'texto': 'respuesta(s) de texto',
+    'código': 'bloque(s) de código',
+    'imagen': 'imagen(es) generada',
+    'audio': 'minuto(s) de transcripción de audio',
+    'video': 'minuto(s) de video'
+}
+
+class Coeficientes:
+    """
+    Coeficientes por unidad (ya promediados) de una combinación modelo + tipo de consulta.
+    
+    Usa __slots__ para que cada entrada de la tabla ocupe lo mínimo posible.
+    """
+    __slots__ = ('agua', 'energia', 'carbono', 'unidad_medida', 'descripcion', 'proveedor')
+    
+    def __init__(self, agua, energia, carbono, unidad_medida, descripcion, proveedor=''):
+        self.agua = agua
+        self.energia = energia
+        self.carbono = carbono
+        self.unidad_medida = unidad_medida
+        self.descripcion = descripcion
+        self.proveedor = proveedor
+    
+    def __eq__(self, otro):
+        if not isinstance(otro, Coeficientes):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(otro, campo) for campo in self.__slots__)
+    
+    def __repr__(self):
+        return (f"Coeficientes(agua={self.agua}, energia={self.energia}, "
+                f"carbono={self.carbono}, unidad_medida={self.unidad_medida!r})")
+
+class TablaCoeficientes(Mapping):
+    """
+    Tabla de coeficientes indexada por (modelo, tipo_consulta).
+    
+    Las combinaciones se guardan en columnas ordenadas por la clave compuesta
+    código_modelo × cantidad_de_tipos + código_tipo: buscar una combinación es
+    obtener los dos códigos de los diccionarios y hacer una búsqueda binaria
+    sobre las claves. Las columnas pueden estar en memoria o mapeadas desde el
+    dataset compilado; en ese caso no se construye nada por combinación y la
+    memoria propia del proceso no crece con el dataset.
+    
+    Se usa como un dict de solo lectura: tabla.get((modelo, tipo_consulta)).
+    """
+    # Coeficientes ya construidos que se conservan (combinaciones más consultadas)
+    MAX_CACHE = 4096
+    
+    def __init__(self, columnas):
+        self.columnas = columnas
+        c = columnas.columnas
+        self._codigos_modelo, self._modelos = c['modelo']
+        self._codigos_tipo, self._tipos = c['tipo_consulta']
+        self._codigos_proveedor, self._proveedores = c['proveedor']
+        self._codigos_unidad, self._unidades = c['unidad_medida']
+        self._agua, self._energia, self._carbono = c['agua'], c['energia'], c['carbono']
+        self._claves = c['clave']
+        self._cache = {}
+    
+    @classmethod
+    def desde_dict(cls, tabla):
+        """
+        Construye la tabla desde un dict {(modelo, tipo_consulta): Coeficientes}.
+        """
+        codigos_modelo, modelos = binario.codificar([modelo for modelo, _ in tabla])
+        codigos_tipo, tipos = binario.codificar([tipo for _, tipo in tabla])
+        compuestas = [m * len(tipos) + t for m, t in zip(codigos_modelo, codigos_tipo)]
+        orden = sorted(range(len(compuestas)), key=compuestas.__getitem__)
+        coefs = list(tabla.values())
+        en_orden = [coefs[i] for i in orden]
+        return cls(TablaColumnar({
+            'modelo': (array('I', [codigos_modelo[i] for i in orden]), modelos),
+            'tipo_consulta': (array('I', [codigos_tipo[i] for i in orden]), tipos),
+            'proveedor': binario.codificar([c.proveedor for c in en_orden]),
+            'unidad_medida': binario.codificar([c.unidad_medida for c in en_orden]),
+            'agua': array('d', [c.agua for c in en_orden]),
+            'energia': array('d', [c.energia for c in en_orden]),
+            'carbono': array('d', [c.carbono for c in en_orden]),
+            'clave': array('q', [compuestas[i] for i in orden]),
+        }))
+    
+    def _posicion(self, clave):
+        try:
+            modelo, tipo_consulta = clave
+        except (TypeError, ValueError):
+            return None
+        codigo_modelo = self._modelos.codigo(modelo)
+        codigo_tipo = self._tipos.codigo(tipo_consulta)
+        if codigo_modelo is None or codigo_tipo is None:
+            return None
+        compuesta = codigo_modelo * len(self._tipos) + codigo_tipo
+        i = bisect_left(self._claves, compuesta)
+        if i < len(self._claves) and self._claves[i] == compuesta:
+            return i
+        return None
+    
+    def _coeficientes(self, i):
+        tipo_consulta = self._tipos[self._codigos_tipo[i]]
+        return Coeficientes(
+            agua=self._agua[i],
+            energia=self._energia[i],
+            carbono=self._carbono[i],
+            unidad_medida=self._unidades[self._codigos_unidad[i]],
+            descripcion=DESCRIPCIONES.get(tipo_consulta, tipo_consulta),
+            proveedor=self._proveedores[self._codigos_proveedor[i]]
+        )
+    
+    def get(self, clave, default=None):
+        try:
+            coef = self._cache.get(clave)
+        except TypeError:
+            return default
+        if coef is None:
+            i = self._posicion(clave)
+            if i is None:
+                return default
+            coef = self._coeficientes(i)
+            if len(self._cache) >= self.MAX_CACHE:
+                self._cache.clear()
+            self._cache[clave] = coef
+        return coef
+    
+    def __getitem__(self, clave):
+        coef = self.get(clave)
+        if coef is None:
+            raise KeyError(clave)
+        return coef
+    
+    def __contains__(self, clave):
+        return self.get(clave) is not None
+    
+    def __iter__(self):
+        modelos, tipos = self._modelos, self._tipos
+        for m, t in zip(self._codigos_modelo, self._codigos_tipo):
+            yield (modelos[m], tipos[t])
+    
+    def __len__(self):
+        return len(self._claves)
+    
+    def values(self):
+        return (self._coeficientes(i) for i in range(len(self)))
+    
+    def items(self):
+        return zip(self, self.values())
+    
+    def modelos(self):
+        """Modelos presentes en la tabla, en orden de aparición en el dataset."""
+        return list(self._modelos)
+    
+    def tipos_consulta(self):
+        """Tipos de consulta presentes en la tabla, en orden de aparición en el dataset."""
+        return list(self._tipos)
+    
+    def de_tipo(self, tipo_consulta):
+        """
+        Coeficientes de cada modelo para un tipo de consulta, sin construir Coeficientes.
+        
+        Returns:
+            lista de (modelo, agua, energia, carbono); vacía si el tipo no existe
+        """
+        codigo = self._tipos.codigo(tipo_consulta)
+        if codigo is None:
+            return []
+        modelos, codigos_tipo = self._modelos, self._codigos_tipo
+        return [
+            (modelos[self._codigos_modelo[i]], self._agua[i], self._energia[i], self._carbono[i])
+            for i in range(len(self._claves)) if codigos_tipo[i] == codigo
+        ]
+
+# Columnas que se conservan al pasar a formato columnar (el resto del CSV son
+# valores derivados: mensuales y equivalencias en texto)
+COLUMNAS_TEXTO = ('modelo', 'proveedor', 'tipo_consulta', 'unidad_medida')
+
+# Métricas de las estadísticas: nombre en el resultado -> columna del dataset
+METRICAS_ESTADISTICAS = {'agua': 'agua(L)', 'energia': 'energia(kWh)', 'carbono': 'carbono(gCO2e)'}
+
+def columnas_desde_filas(filas):
+    """
+    Convierte filas del CSV al almacén columnar (texto codificado con
+    diccionario, coeficientes como array('d')).
+    
+    Args:
+        filas: lista de filas del CSV (dicts de csv.DictReader)
+    
+    Returns:
+        TablaColumnar
+    """
+    return TablaColumnar.desde_filas(filas, COLUMNAS_TEXTO, COLUMNAS_NUMERICAS)
+
+def agrupar_estadisticas(columnas, claves, agg='promedio'):
+    """
+    Agrega agua, energía y carbono agrupando por una o varias columnas de texto.
+    
+    Args:
+        columnas: TablaColumnar del dataset
+        claves: columna (ej: 'proveedor') o lista de columnas (ej: ['modelo', 'unidad_medida'])
+        agg: 'promedio', 'suma', 'min', 'max' o 'conteo'
+    
+    Returns:
+        dict con estructura: {clave: {agua: X, energia: Y, carbono: Z}} (redondeado a 4 decimales)
+    """
+    grupos = columnas.agrupar(claves, METRICAS_ESTADISTICAS, agg)
+    return {
+        clave: {metrica: round(valor, 4) for metrica, valor in valores.items()}
+        for clave, valores in grupos.items()
+    }
+
+def resumir_columnas(columnas):
+    """
+    Calcula la tabla de coeficientes y las estadísticas sobre el almacén columnar.
+    
+    Los coeficientes se promedian por combinación (modelo, tipo_consulta), de
+    modo que calcular_impacto solo hace una búsqueda y tres multiplicaciones.
+    
+    Args:
+        columnas: TablaColumnar (ver columnas_desde_filas)
+    
+    Returns:
+        (tabla, estadisticas) con tabla una TablaCoeficientes
+        (tabla[(modelo, tipo_consulta)] = Coeficientes(...)) y
+        estadisticas = {'por_modelo': {...}, 'por_tipo_consulta': {...}}
+    """
+    claves = ('modelo', 'tipo_consulta')
+    promedios = columnas.agrupar(claves, METRICAS_ESTADISTICAS, 'promedio')
+    primeros = columnas.agrupar(claves, ('proveedor', 'unidad_medida'), 'primero')
+    tabla = {}
+    for (modelo, tipo_consulta), coef in promedios.items():
+        tabla[(modelo, tipo_consulta)] = Coeficientes(
+            agua=coef['agua'],
+            energia=coef['energia'],
+            carbono=coef['carbono'],
+            unidad_medida=primeros[(modelo, tipo_consulta)]['unidad_medida'],
+            descripcion=DESCRIPCIONES.get(tipo_consulta, tipo_consulta),
+            proveedor=primeros[(modelo, tipo_consulta)]['proveedor']
+        )
+    
+    estadisticas = {
+        'por_modelo': agrupar_estadisticas(columnas, 'modelo'),
+        'por_tipo_consulta': agrupar_estadisticas(columnas, 'tipo_consulta')
+    }
+    return TablaCoeficientes.desde_dict(tabla), estadisticas
+
+def compilar_tabla_coeficientes(db):
+    """
+    Compila las filas crudas del DB en una tabla de coeficientes numéricos.
+    
+    Estructura:
+        tabla[(modelo, tipo_consulta)] = Coeficientes(agua, energia, carbono, ...)
+    
+    Args:
+        db: diccionario retornado por cargar_datos_csv
+    
+    Returns:
+        TablaCoeficientes con clave (modelo, tipo_consulta) y valor Coeficientes
+    """
+    filas = [row for filas in db.values() for row in filas]
+    return resumir_columnas(columnas_desde_filas(filas))[0]
+
+def calcular_estadisticas(filas):
+    """
+    Calcula los promedios por modelo y por tipo de consulta.
+    
+    Args:
+        filas: iterable de filas del CSV (dicts de csv.DictReader)
+    
+    Returns:
+        dict con estructura: {'por_modelo': {...}, 'por_tipo_consulta': {...}}
+    """
+    columnas = columnas_desde_filas(list(filas))
+    return {
+        'por_modelo': agrupar_estadisticas(columnas, 'modelo'),
+        'por_tipo_consulta': agrupar_estadisticas(columnas, 'tipo_consulta')
+    }
+
+def obtener_estadisticas():
+    """
+    Retorna las estadísticas por modelo y por tipo de consulta del snapshot vigente.
+    
+    Se calculan una sola vez al cargar cada versión del dataset, así que en estado
+    estable no hay lectura de archivos.
+    
+    Returns:
+        dict con estructura: {'por_modelo': {...}, 'por_tipo_consulta': {...}}
+    """
+    return GESTOR.actual().estadisticas
+
+def obtener_estadisticas_por(claves, agg='promedio'):
+    """
+    Agrega agua, energía y carbono del dataset vigente por cualquier columna de texto.
+    
+    Ej: obtener_estadisticas_por('proveedor') o
+    obtener_estadisticas_por(['modelo', 'unidad_medida'], agg='max').
+    
+    Returns:
+        dict con estructura: {clave: {agua: X, energia: Y, carbono: Z}}
+    """
+    return agrupar_estadisticas(GESTOR.actual().columnas, claves, agg)
 
 def obtener_estadisticas_por_modelo():
     """
     Calcula estadísticas (promedios) de agua, energía y carbono por cada modelo.
     
+    Equivale a obtener_estadisticas_por('modelo'), precalculado por snapshot.
+    
     Returns:
         dict con estructura: {modelo: {agua: X, energia: Y, carbono: Z}}
     """
-    modelos_stats = {}
-    
-    # Agrupar datos por modelo
-    modelos_dict = {}
-    for row in cargar_datos_csv_completo():
-        modelo = row['modelo']
-        if modelo not in modelos_dict:
-            modelos_dict[modelo] = []
-        modelos_dict[modelo].append(row)
-    
-    # Calcular promedios por modelo
-    for modelo, filas in modelos_dict.items():
-        agua_prom = sum(float(row['agua(L)']) for row in filas) / len(filas)
-        energia_prom = sum(float(row['energia(kWh)']) for row in filas) / len(filas)
-        carbono_prom = sum(float(row['carbono(gCO2e)']) for row in filas) / len(filas)
-        
-        modelos_stats[modelo] = {
-            'agua': round(agua_prom, 4),
-            'energia': round(energia_prom, 4),
-            'carbono': round(carbono_prom, 4)
-        }
-    
-    return modelos_stats
+    return obtener_estadisticas()['por_modelo']
 
 def obtener_estadisticas_por_tipo_consulta():
     """
     Calcula estadísticas (promedios) de agua, energía y carbono por cada tipo de consulta.
     
+    Equivale a obtener_estadisticas_por('tipo_consulta'), precalculado por snapshot.
+    
     Returns:
         dict con estructura: {tipo_consulta: {agua: X, energia: Y, carbono: Z}}
     """
-    tipos_stats = {}
-    
-    # Agrupar datos por tipo de consulta
-    tipos_dict = {}
-    for row in cargar_datos_csv_completo():
-        tipo = row['tipo_consulta']
-        if tipo not in tipos_dict:
-            tipos_dict[tipo] = []
-        tipos_dict[tipo].append(row)
-    
-    # Calcular promedios por tipo
-    for tipo, filas in tipos_dict.items():
-        agua_prom = sum(float(row['agua(L)']) for row in filas) / len(filas)
-        energia_prom = sum(float(row['energia(kWh)']) for row in filas) / len(filas)
-        carbono_prom = sum(float(row['carbono(gCO2e)']) for row in filas) / len(filas)
-        
-        tipos_stats[tipo] = {
-            'agua': round(agua_prom, 4),
-            'energia': round(energia_prom, 4),
-            'carbono': round(carbono_prom, 4)
-        }
+    return obtener_estadisticas()['por_tipo_consulta']
+
+# Pesos por defecto del índice de eficiencia (suma simple, como el gráfico original)
+PESOS_EFICIENCIA = {'agua': 1.0, 'energia': 1.0, 'carbono': 1.0}
+
+# Máximo de modelos por página del ranking
+MAX_POR_PAGINA = 100
+
+def leer_pesos(pesos):
+    """
+    Completa y valida los pesos del índice de eficiencia.
+    
+    Args:
+        pesos: dict parcial {agua, energia, carbono} (None = PESOS_EFICIENCIA)
     
-    return tipos_stats
+    Returns:
+        dict con los tres pesos como float
+    
+    Raises:
+        ValueError si hay una métrica desconocida, un peso negativo o todos son cero
+    """
+    resultado = dict(PESOS_EFICIENCIA)
+    for metrica, peso in (pesos or {}).items():
+        if metrica not in resultado:
+            raise ValueError(f"Error: métrica '{metrica}' desconocida (usar agua, energia o carbono)")
+        if isinstance(peso, bool) or not isinstance(peso, (int, float)) or not peso >= 0 or math.isinf(peso):
+            raise ValueError(f"Error: el peso de {metrica} debe ser un número mayor o igual a 0")
+        resultado[metrica] = float(peso)
+    if not any(resultado.values()):
+        raise ValueError("Error: al menos un peso debe ser mayor a 0")
+    return resultado
+
+def ranking_eficiencia(pesos=None, tipo_consulta=None, pagina=1, por_pagina=20):
+    """
+    Ranking de modelos por índice de eficiencia ambiental, sobre todos los modelos del dataset.
+    
+    El impacto de cada modelo es la suma ponderada de sus coeficientes por
+    unidad (promedio del modelo, o los de un tipo de consulta) y el índice es
+    100 / impacto: más alto = más eficiente. Solo se ordenan los primeros
+    pagina × por_pagina modelos (heapq.nsmallest, O(n log k)), así las
+    primeras páginas no dependen del tamaño del catálogo.
+    
+    Args:
+        pesos: dict {agua, energia, carbono} (por defecto PESOS_EFICIENCIA)
+        tipo_consulta: si se indica, usa los coeficientes de ese tipo
+        pagina: página (desde 1)
+        por_pagina: modelos por página (hasta MAX_POR_PAGINA)
+    
+    Returns:
+        dict con pesos, tipo_consulta, total, pagina, por_pagina y
+        ranking: [{posicion, modelo, indice, impacto, agua, energia, carbono}]
+    
+    Raises:
+        ValueError si los pesos, el tipo de consulta o la paginación no son válidos
+    """
+    pesos = leer_pesos(pesos)
+    if isinstance(pagina, bool) or not isinstance(pagina, int) or pagina < 1:
+        raise ValueError("Error: la página debe ser un entero mayor o igual a 1")
+    if isinstance(por_pagina, bool) or not isinstance(por_pagina, int) or not 1 <= por_pagina <= MAX_POR_PAGINA:
+        raise ValueError(f"Error: por_pagina debe estar entre 1 y {MAX_POR_PAGINA}")
+    
+    snapshot = GESTOR.actual()
+    if tipo_consulta is None:
+        filas = [(modelo, v['agua'], v['energia'], v['carbono'])
+                 for modelo, v in snapshot.estadisticas['por_modelo'].items()]
+    else:
+        filas = snapshot.tabla.de_tipo(tipo_consulta)
+        if not filas:
+            raise ValueError(f"Error: tipo de consulta '{tipo_consulta}' no encontrado")
+    
+    w_agua, w_energia, w_carbono = pesos['agua'], pesos['energia'], pesos['carbono']
+    impactos = ((w_agua * agua + w_energia * energia + w_carbono * carbono, modelo, agua, energia, carbono)
+                for modelo, agua, energia, carbono in filas)
+    inicio = (pagina - 1) * por_pagina
+    primeros = heapq.nsmallest(inicio + por_pagina, impactos)[inicio:]
+    
+    return {
+        'pesos': pesos,
+        'tipo_consulta': tipo_consulta,
+        'total': len(filas),
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'ranking': [
+            {
+                'posicion': inicio + i + 1,
+                'modelo': modelo,
+                'indice': round(100 / impacto, 4) if impacto > 0 else None,
+                'impacto': round(impacto, 4),
+                'agua': round(agua, 4),
+                'energia': round(energia, 4),
+                'carbono': round(carbono, 4),
+            }
+            for i, (impacto, modelo, agua, energia, carbono) in enumerate(primeros)
+        ],
+    }
 
 def cargar_datos_csv_completo():
     """
@@ -99,7 +504,7 @@ def cargar_datos_csv_completo():
     Returns:
         lista de filas del CSV
     """
-    csv_path = Path(__file__).parent.parent / 'data' / 'ecoai_dataset.csv'
+    csv_path = CSV_PATH
     filas = []
     
     try:
@@ -111,6 +516,153 @@ def cargar_datos_csv_completo():
     
     return filas
 
+def construir_datos(contenido):
+    """
+    Parsea y valida el contenido del CSV y construye las estructuras derivadas.
+    
+    Se ejecuta fuera del camino de las requests (al iniciar o en el thread de
+    recarga del GestorDataset).
+    
+    Args:
+        contenido: bytes del archivo CSV
+    
+    Returns:
+        dict con claves columnas, tabla y estadisticas
+    """
+    filas = list(csv.DictReader(io.StringIO(contenido.decode('utf-8'))))
+    validar_filas(filas)
+    columnas = columnas_desde_filas(filas)
+    with metricas.cronometro('ecoai_agregacion_duracion_segundos'):
+        tabla, estadisticas = resumir_columnas(columnas)
+    return {
+        'columnas': columnas,
+        'tabla': tabla,
+        'estadisticas': estadisticas
+    }
+
+def compilar_dataset(origen=None, destino=None):
+    """
+    Valida el CSV y escribe el dataset compilado (formato binario columnar).
+    
+    Además de las columnas de las filas, guarda la tabla de coeficientes ya
+    promediada y las estadísticas, así que cargarlo no recorre las filas.
+    
+    Args:
+        origen: CSV de entrada (por defecto CSV_PATH)
+        destino: archivo compilado (por defecto COMPILADO_PATH)
+    
+    Returns:
+        dict con version, filas, combinaciones y bytes escritos
+    
+    Raises:
+        ValueError si el CSV no es válido
+    """
+    origen = Path(origen or CSV_PATH)
+    destino = Path(destino or COMPILADO_PATH)
+    firma = firma_archivo(origen)
+    with open(origen, 'rb') as f:
+        contenido = f.read()
+    datos = construir_datos(contenido)
+    
+    tabla = datos['tabla']
+    version = version_contenido(contenido)
+    binario.escribir(destino, {'filas': datos['columnas'].columnas, 'coeficientes': tabla.columnas.columnas}, meta={
+        'origen': {'version': version, 'firma': list(firma)},
+        'estadisticas': datos['estadisticas'],
+    })
+    return {
+        'version': version,
+        'filas': len(datos['columnas']),
+        'combinaciones': len(tabla),
+        'bytes': destino.stat().st_size,
+    }
+
+def cargar_compilado(ruta):
+    """
+    Carga el dataset compilado con mmap (sin parsear ni recorrer filas).
+    
+    Las filas, los diccionarios y la tabla de coeficientes quedan mapeados
+    desde el archivo, compartidos entre los workers a través del page cache.
+    
+    Returns:
+        dict con claves columnas, tabla y estadisticas (igual que construir_datos)
+    """
+    meta, tablas = binario.leer(ruta)
+    return {
+        'columnas': TablaColumnar(tablas['filas']),
+        'tabla': TablaCoeficientes(TablaColumnar(tablas['coeficientes'])),
+        'estadisticas': meta['estadisticas']
+    }
+
+def construir_vacio():
+    """
+    Estructuras vacías para cuando no hay dataset.
+    """
+    columnas = columnas_desde_filas([])
+    tabla, estadisticas = resumir_columnas(columnas)
+    return {'columnas': columnas, 'tabla': tabla, 'estadisticas': estadisticas}
+
+# Cargar datos al iniciar el módulo (del compilado si está al día, si no del CSV);
+# el gestor los recarga si el CSV cambia
+GESTOR = GestorDataset(
+    CSV_PATH,
+    construir_datos,
+    intervalo=float(os.environ.get('ECOAI_INTERVALO_RECARGA', 5)),
+    compilado=COMPILADO_PATH,
+    cargar_compilado=cargar_compilado,
+    vacio=construir_vacio
+)
+
+# Distribuciones de los coeficientes; sin el archivo todos los coeficientes son exactos.
+# Al cargarlas se descartan las que no contienen el coeficiente puntual del dataset vigente
+GESTOR_INCERTIDUMBRE = GestorDataset(
+    INCERTIDUMBRE_PATH,
+    lambda contenido: incertidumbre.construir_distribuciones(contenido, GESTOR.actual().tabla),
+    intervalo=float(os.environ.get('ECOAI_INTERVALO_RECARGA', 5)),
+    vacio=incertidumbre.construir_vacio
+)
+
+# Perfiles de intensidad de carbono; sin perfiles el CO2 sale de carbono(gCO2e) del dataset
+GESTOR_PERFILES = intensidad.GestorPerfiles(
+    PERFILES_DIR,
+    intervalo=float(os.environ.get('ECOAI_INTERVALO_RECARGA', 5))
+)
+
+# Snapshot inicial (se mantiene por compatibilidad; usar GESTOR.actual() para la versión vigente)
+TABLA_COEFICIENTES = GESTOR.actual().tabla
+
+def __getattr__(nombre):
+    # DB (filas crudas del CSV indexadas) se carga solo si alguien lo usa, para
+    # no parsear el CSV al importar el módulo cuando hay dataset compilado
+    if nombre == 'DB':
+        db = globals()['DB'] = cargar_datos_csv()
+        return db
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+# Factores de equivalencia
+LITROS_POR_VASO = 0.25        # 1 vaso = 250ml
+LITROS_POR_BOTELLA = 0.5      # 1 botella = 500ml
+LITROS_POR_DUCHA = 75         # una ducha de 5 min consume aprox 75L
+MINUTOS_LED_POR_KWH = 16.67   # 1 kWh = 16.67 minutos de LED
+GCO2_POR_KM_AUTO = 120        # 1 km en auto = 0.12 kg CO2 = 120 gCO2e
+
+# Cantidad máxima por cálculo (o por ítem de un lote): mantiene finitos los
+# totales, las equivalencias y las sumas de un lote completo
+CANTIDAD_MAXIMA = 1e15
+
+def error_cantidad(cantidad):
+    """
+    Valida una cantidad: número finito, positivo y hasta CANTIDAD_MAXIMA.
+    
+    Returns:
+        mensaje de error, o None si la cantidad es válida
+    """
+    if not isinstance(cantidad, (int, float)) or not cantidad > 0:
+        return "Error: La cantidad debe ser un número positivo"
+    if not cantidad <= CANTIDAD_MAXIMA:
+        return f"Error: La cantidad no puede superar {CANTIDAD_MAXIMA:.0e}"
+    return None
+
 def calcular_equivalencias(agua_total, energia_total, co2_total):
     """
     Calcula las equivalencias basadas en los valores totales de agua, energía y CO2.
@@ -124,17 +676,17 @@ def calcular_equivalencias(agua_total, energia_total, co2_total):
         dict con equivalencias formateadas
     """
     # Equivalencias de agua (1 vaso = 250ml = 0.25L)
-    vasos = agua_total / 0.25
-    botellas = agua_total / 0.5
-    duchas = agua_total / 75  # Una ducha de 5 min consume aprox 75L
+    vasos = agua_total / LITROS_POR_VASO
+    botellas = agua_total / LITROS_POR_BOTELLA
+    duchas = agua_total / LITROS_POR_DUCHA
     eq_agua = f"{vasos:.2f} vasos de agua / {botellas:.2f} botellas de 500ml / {duchas:.4f} duchas de 5 min"
     
     # Equivalencias de energía (1 kWh = 16.67 minutos de LED)
-    minutos = energia_total * 16.67
+    minutos = energia_total * MINUTOS_LED_POR_KWH
     eq_energia = f"{minutos:.2f} min ampolleta LED"
     
     # Equivalencias de CO2 (1 km en auto = 0.12 kg CO2 = 120 gCO2e)
-    km_auto = co2_total / 120
+    km_auto = co2_total / GCO2_POR_KM_AUTO
     eq_co2 = f"{km_auto:.5f} km en auto"
     
     return {
@@ -143,7 +695,70 @@ def calcular_equivalencias(agua_total, energia_total, co2_total):
         "eq_co2": eq_co2
     }
 
-def calcular_impacto(modelo, tipo_consulta, cantidad):
+def formatear_cantidad(tipo_consulta, cantidad, descripcion_tipo):
+    """
+    Formatea la cantidad con la descripción de su unidad (ej: '5 respuesta(s) de texto').
+    """
+    # Solo agregar 's' al final de "generada" para imágenes en plural
+    numero = int(cantidad) if isinstance(cantidad, int) or cantidad == int(cantidad) else cantidad
+    if tipo_consulta == 'imagen' and cantidad != 1:
+        return f"{numero} {descripcion_tipo}s"
+    return f"{numero} {descripcion_tipo}"
+
+def leer_nivel(nivel):
+    """
+    Normaliza el parámetro de incertidumbre: None/False (desactivado), True
+    (nivel por defecto) o un nivel de confianza entre 0 y 1.
+    
+    Returns:
+        nivel (float) o None
+    
+    Raises:
+        ValueError si el nivel no es válido
+    """
+    if nivel is None or nivel is False:
+        return None
+    if nivel is True:
+        return incertidumbre.NIVEL
+    if not isinstance(nivel, (int, float)) or not 0 < nivel < 1:
+        raise ValueError("Error: el nivel de confianza debe estar entre 0 y 1")
+    return float(nivel)
+
+def distribuciones_de(modelo, tipo_consulta, coef):
+    """
+    Distribución de cada coeficiente de la combinación ({métrica del resultado: Distribucion}).
+    
+    Los coeficientes sin distribución en el archivo de incertidumbre se
+    devuelven como número (exactos), igual que aquellos cuya distribución no
+    contiene el valor puntual (el dataset pudo recargarse después que las distribuciones).
+    """
+    propias = GESTOR_INCERTIDUMBRE.actual().tabla.get((modelo, tipo_consulta), {})
+    resultado = {}
+    for metrica, clave in incertidumbre.METRICAS.items():
+        punto = getattr(coef, metrica)
+        distribucion = propias.get(metrica)
+        resultado[clave] = distribucion if distribucion is not None and distribucion.contiene(punto) else punto
+    return resultado
+
+def _redondear_intervalo(intervalo):
+    return {campo: round(valor, 4) for campo, valor in intervalo.items()}
+
+def intensidad_de(region, fecha=None):
+    """
+    Intensidad de carbono (gCO2e/kWh) de la red de `region` en la hora de `fecha`.
+    
+    Returns:
+        (intensidad, None) o (None, mensaje de error)
+    """
+    perfiles = GESTOR_PERFILES.actual()
+    if region not in perfiles:
+        return None, f"Sin perfil de intensidad para la región: {region}"
+    valor = perfiles.intensidad(region, fecha)
+    if valor is None:
+        return None, f"Fecha no válida: {fecha}"
+    return valor, None
+
+def calcular_impacto(modelo, tipo_consulta, cantidad, nivel=None, region=None, fecha=None):
     """
     Calcula el impacto ambiental basado en modelo, tipo de consulta y cantidad.
     
@@ -151,62 +766,297 @@ def calcular_impacto(modelo, tipo_consulta, cantidad):
         modelo: nombre del modelo (ej: 'GPT-4 Turbo')
         tipo_consulta: tipo de consulta (ej: 'texto', 'código', 'imagen', 'audio', 'video')
         cantidad: cantidad según la unidad (número de preguntas, minutos, etc.)
+        nivel: si se indica (True o un nivel de confianza, ej: 0.9), agrega
+            'incertidumbre' con los intervalos de agua, energia y co2
+        region: si se indica, el CO2 se calcula como energía × intensidad de
+            la red de esa región (en la hora de `fecha`, o la media anual)
+        fecha: fecha ISO 8601 o epoch del uso (solo con region)
     
     Returns:
         dict con resultados o string de error
     """
-    if not isinstance(cantidad, (int, float)) or cantidad <= 0:
-        return "Error: La cantidad debe ser un número positivo"
+    error = error_cantidad(cantidad)
+    if error:
+        return error
+    try:
+        nivel = leer_nivel(nivel)
+    except ValueError as e:
+        return str(e)
     
-    # Buscar en el diccionario usando clave modelo_tipo
-    key = f"{modelo}_{tipo_consulta}"
-    filas_coincidentes = DB.get(key, [])
+    # Una sola búsqueda en la tabla compilada (coeficientes ya promediados)
+    coef = GESTOR.actual().tabla.get((modelo, tipo_consulta))
     
-    if not filas_coincidentes:
+    if coef is None:
         return f"Combinación no encontrada: {modelo} + {tipo_consulta}"
     
-    # Promediar valores si hay múltiples filas
-    agua_prom = sum(float(row['agua(L)']) for row in filas_coincidentes) / len(filas_coincidentes)
-    energia_prom = sum(float(row['energia(kWh)']) for row in filas_coincidentes) / len(filas_coincidentes)
-    carbono_prom = sum(float(row['carbono(gCO2e)']) for row in filas_coincidentes) / len(filas_coincidentes)
-    
-    # Obtener unidad de medida
-    unidad_medida = filas_coincidentes[0].get('unidad_medida', '')
-    
-    # Mapeo de descripciones por tipo de consulta
-    descripciones = {
-        'texto': 'respuesta(s) de texto',
-        'código': 'bloque(s) de código',
-        'imagen': 'imagen(es) generada',
-        'audio': 'minuto(s) de transcripción de audio',
-        'video': 'minuto(s) de video'
-    }
+    intensidad_red = None
+    if region:
+        intensidad_red, error = intensidad_de(region, fecha)
+        if error:
+            return error
     
-    descripcion_tipo = descripciones.get(tipo_consulta, tipo_consulta)
-    # Solo agregar 's' al final de "generada" para imágenes en plural
-    if tipo_consulta == 'imagen' and cantidad != 1:
-        cantidad_formateada = f"{int(cantidad) if isinstance(cantidad, int) or cantidad == int(cantidad) else cantidad} {descripcion_tipo}s"
-    else:
-        cantidad_formateada = f"{int(cantidad) if isinstance(cantidad, int) or cantidad == int(cantidad) else cantidad} {descripcion_tipo}"
+    cantidad_formateada = formatear_cantidad(tipo_consulta, cantidad, coef.descripcion)
     
     # Calcular totales basados en la cantidad
-    agua_total = agua_prom * cantidad
-    energia_total = energia_prom * cantidad
-    co2_total = carbono_prom * cantidad
+    agua_total = coef.agua * cantidad
+    energia_total = coef.energia * cantidad
+    co2_total = coef.carbono * cantidad if intensidad_red is None else energia_total * intensidad_red
     
     # Calcular equivalencias dinámicamente basadas en los totales
     equivalencias = calcular_equivalencias(agua_total, energia_total, co2_total)
     
-    return {
+    resultado = {
         "modelo": modelo,
         "tipo_consulta": tipo_consulta,
         "cantidad": cantidad,
         "cantidad_formateada": cantidad_formateada,
-        "unidad_medida": unidad_medida,
+        "unidad_medida": coef.unidad_medida,
         "agua": round(agua_total, 2),
         "energia": round(energia_total, 2),
         "co2": round(co2_total, 2),
         "eq_agua": equivalencias["eq_agua"],
         "eq_energia": equivalencias["eq_energia"],
         "eq_co2": equivalencias["eq_co2"]
-    }
\ No newline at end of file
+    }
+    if intensidad_red is not None:
+        resultado["region"] = region
+        resultado["intensidad_carbono"] = round(intensidad_red, 2)
+    
+    if nivel is not None:
+        # Intervalos leídos de la muestra base ordenada (no depende de la cantidad de muestras)
+        distribuciones = distribuciones_de(modelo, tipo_consulta, coef)
+        factores = dict.fromkeys(distribuciones, cantidad)
+        if intensidad_red is not None:
+            # Con intensidad de la red, la incertidumbre del CO2 es la de la energía
+            distribuciones["co2"] = distribuciones["energia"]
+            factores["co2"] = cantidad * intensidad_red
+        resultado["incertidumbre"] = {
+            "nivel": nivel,
+            "muestras": incertidumbre.MUESTRAS,
+            "sin_distribucion": [c for c, d in distribuciones.items() if not isinstance(d, incertidumbre.Distribucion)],
+            **{c: _redondear_intervalo(incertidumbre.intervalo(d, factores[c], nivel)) for c, d in distribuciones.items()}
+        }
+    return resultado
+
+def _columna(valores, factor, operacion=truediv):
+    """Aplica una operación elemento a elemento contra un escalar (en C vía map)."""
+    return list(map(operacion, valores, repeat(factor)))
+
+class _Posiciones(dict):
+    """
+    (modelo, tipo_consulta) -> posición en las columnas de coeficientes de un lote.
+    
+    Las combinaciones ya vistas se resuelven con la búsqueda del dict (en C);
+    solo la primera aparición de cada una consulta la tabla.
+    """
+    
+    def __init__(self, tabla):
+        super().__init__()
+        self.tabla = tabla
+        self.coefs = []
+    
+    def __missing__(self, clave):
+        coef = self.tabla.get(clave)
+        pos = None
+        if coef is not None:
+            pos = len(self.coefs)
+            self.coefs.append(coef)
+        self[clave] = pos
+        return pos
+
+
+def calcular_impacto_lote(modelos, tipos_consulta, cantidades, nivel=None, regiones=None, fechas=None,
+                          equivalencias=True):
+    """
+    Calcula el impacto de muchos ítems a la vez sobre la tabla de coeficientes.
+    
+    Recibe arreglos paralelos (ítem i = modelos[i], tipos_consulta[i], cantidades[i])
+    y opera columna a columna con map/operator, sin construir un dict por ítem.
+    Los ítems inválidos no abortan el lote: se reportan en 'errores' y sus
+    posiciones quedan en None en todas las columnas.
+    
+    Rendimiento medido (1.000.000 de ítems válidos, un núcleo, CPython 3.11):
+    ~1,16 M ítems/s con equivalencias=False y ~0,75 M ítems/s con ellas. Cada
+    columna es una pasada en C de ~70-150 ns/ítem (indexar el coeficiente y
+    multiplicar); las cinco de equivalencias agregan ~0,4 s por millón, por
+    eso el millón por segundo solo se alcanza sin ellas.
+    
+    Args:
+        modelos: lista de nombres de modelo
+        tipos_consulta: lista de tipos de consulta
+        cantidades: lista de cantidades
+        nivel: si se indica (True o un nivel de confianza), agrega las columnas
+            <métrica>_inferior y <métrica>_superior por ítem y en
+            'incertidumbre' los intervalos de los totales del lote
+        regiones: lista de regiones (opcional); en los ítems con región el CO2
+            es energía × intensidad de la red, y se agrega la columna intensidad
+        fechas: lista de fechas ISO 8601 o epoch (opcional, solo con regiones)
+        equivalencias: si es False, no se calculan las columnas de equivalencias
+    
+    Returns:
+        dict con columnas agua, energia, co2 (sin redondear), las equivalencias
+        numéricas vasos, botellas, duchas, minutos_led, km_auto (salvo con
+        equivalencias=False), los totales del lote y la lista de errores
+        [{'indice': i, 'error': mensaje}]
+    """
+    n = len(cantidades)
+    if len(modelos) != n or len(tipos_consulta) != n:
+        raise ValueError("modelos, tipos_consulta y cantidades deben tener el mismo largo")
+    if (regiones is not None and len(regiones) != n) or (fechas is not None and len(fechas) != n):
+        raise ValueError("regiones y fechas deben tener el mismo largo que cantidades")
+    nivel = leer_nivel(nivel)
+    
+    # Posición de cada ítem en las columnas de coeficientes, que solo tienen las
+    # combinaciones presentes en el lote (una sola pasada por los ítems)
+    errores = {}
+    posiciones = _Posiciones(GESTOR.actual().tabla)
+    try:
+        indices = list(map(posiciones.__getitem__, zip(modelos, tipos_consulta)))
+    except TypeError:
+        # Un valor no hasheable (ej: una lista) no se puede buscar: revisión por ítem
+        indices = [None] * n
+    
+    # modelo y tipo_consulta deben ser texto (o faltar): otros valores no se
+    # pueden buscar en la tabla y se reportan como error del ítem. Solo hace
+    # falta revisarlos si algún ítem no encontró su combinación
+    if None in indices and not set(map(type, modelos)) | set(map(type, tipos_consulta)) <= {str, type(None)}:
+        modelos, tipos_consulta = list(modelos), list(tipos_consulta)
+        for i, (m, t) in enumerate(zip(modelos, tipos_consulta)):
+            if not isinstance(m, (str, type(None))) or not isinstance(t, (str, type(None))):
+                errores[i] = "Error: modelo y tipo_consulta deben ser texto"
+                modelos[i] = tipos_consulta[i] = None
+        indices = list(map(posiciones.__getitem__, zip(modelos, tipos_consulta)))
+    
+    # La última posición (NaN) es para ítems con error
+    coefs = posiciones.coefs
+    col_agua = [c.agua for c in coefs] + [math.nan]
+    col_energia = [c.energia for c in coefs] + [math.nan]
+    col_carbono = [c.carbono for c in coefs] + [math.nan]
+    
+    # Validación rápida (en C) para el caso común; recorrido por ítem solo si hay errores
+    # (min/max ignoran un NaN que no esté primero: la suma lo detecta)
+    cantidades_validas = (set(map(type, cantidades)) <= {int, float}
+                          and (n == 0 or (min(cantidades) > 0 and max(cantidades) <= CANTIDAD_MAXIMA))
+                          and not math.isnan(sum(cantidades)))
+    if not cantidades_validas:
+        cantidades = list(cantidades)
+        for i, c in enumerate(cantidades):
+            error = error_cantidad(c)
+            if error:
+                errores.setdefault(i, error)
+                cantidades[i] = math.nan
+    if None in indices:
+        for i, pos in enumerate(indices):
+            if pos is None and i not in errores:
+                errores[i] = f"Combinación no encontrada: {modelos[i]} + {tipos_consulta[i]}"
+    
+    # Intensidad de la red por ítem (None = sin región, se usa carbono del dataset)
+    intensidades = None
+    if regiones is not None:
+        if not set(map(type, regiones)) <= {str, type(None)}:
+            # Una región que no es texto no se puede buscar en los perfiles: error del ítem
+            regiones = list(regiones)
+            for i, region in enumerate(regiones):
+                if not isinstance(region, (str, type(None))):
+                    errores.setdefault(i, "Error: region debe ser texto")
+                    regiones[i] = None
+        perfiles = GESTOR_PERFILES.actual()
+        intensidades = perfiles.intensidades(regiones, fechas if fechas is not None else repeat(None, n))
+        for i, (region, valor) in enumerate(zip(regiones, intensidades)):
+            if not region:
+                intensidades[i] = None
+            elif valor != valor and i not in errores:
+                errores[i] = (f"Sin perfil de intensidad para la región: {region}" if region not in perfiles
+                              else f"Fecha no válida: {fechas[i]}")
+    for i in errores:
+        indices[i] = len(coefs)
+    
+    agua = list(map(mul, map(col_agua.__getitem__, indices), cantidades))
+    energia = list(map(mul, map(col_energia.__getitem__, indices), cantidades))
+    co2 = list(map(mul, map(col_carbono.__getitem__, indices), cantidades))
+    if intensidades is not None:
+        co2 = [c if i is None else e * i for e, c, i in zip(energia, co2, intensidades)]
+    
+    resultado = {'agua': agua, 'energia': energia, 'co2': co2}
+    if equivalencias:
+        resultado.update({
+            'vasos': _columna(agua, LITROS_POR_VASO),
+            'botellas': _columna(agua, LITROS_POR_BOTELLA),
+            'duchas': _columna(agua, LITROS_POR_DUCHA),
+            'minutos_led': _columna(energia, MINUTOS_LED_POR_KWH, mul),
+            'km_auto': _columna(co2, GCO2_POR_KM_AUTO),
+        })
+    if intensidades is not None:
+        resultado['intensidad'] = intensidades
+    
+    if nivel is not None:
+        # Intervalo por unidad de cada combinación presente, escalado por la cantidad de cada ítem
+        claves = [clave for clave, pos in posiciones.items() if pos is not None]
+        distribuciones = [distribuciones_de(m, t, c) for (m, t), c in zip(claves, coefs)]
+        for metrica in incertidumbre.METRICAS.values():
+            intervalos = [incertidumbre.intervalo(d[metrica], 1.0, nivel) for d in distribuciones]
+            for limite in ('inferior', 'superior'):
+                columna = [i[limite] for i in intervalos] + [math.nan]
+                resultado[f'{metrica}_{limite}'] = list(map(mul, map(columna.__getitem__, indices), cantidades))
+        if intensidades is not None:
+            for limite in ('inferior', 'superior'):
+                resultado[f'co2_{limite}'] = [
+                    c if i is None else e * i
+                    for e, c, i in zip(resultado[f'energia_{limite}'], resultado[f'co2_{limite}'], intensidades)
+                ]
+    
+    # Totales del lote sobre los ítems válidos; las posiciones con error quedan en None
+    if errores:
+        validos = [i for i in range(n) if i not in errores]
+        sumandos = [[columna[i] for i in validos] for columna in (agua, energia, co2)]
+        for columna in resultado.values():
+            for i in errores:
+                columna[i] = None
+    else:
+        sumandos = (agua, energia, co2)
+    
+    resultado['totales'] = {
+        'items': n - len(errores),
+        'agua': round(math.fsum(sumandos[0]), 2),
+        'energia': round(math.fsum(sumandos[1]), 2),
+        'co2': round(math.fsum(sumandos[2]), 2)
+    }
+    resultado['errores'] = [{'indice': i, 'error': mensaje} for i, mensaje in sorted(errores.items())]
+    
+    if nivel is not None:
+        # Cantidad total por combinación: un mismo coeficiente desconocido se
+        # aplica a todos sus ítems, las combinaciones se suponen independientes
+        por_combinacion = [0] * (len(coefs) + 1)
+        for pos, c in zip(indices, cantidades):
+            por_combinacion[pos] += c
+        # Con intensidad de la red, el CO2 de esos ítems es energía × intensidad:
+        # su término usa la distribución (y las muestras) de la energía
+        cantidad_red = [0] * (len(coefs) + 1)
+        energia_por_intensidad = [0] * (len(coefs) + 1)
+        if intensidades is not None:
+            for pos, c, i in zip(indices, cantidades, intensidades):
+                if i is not None:
+                    cantidad_red[pos] += c
+                    energia_por_intensidad[pos] += c * i
+        totales = {}
+        for metrica in incertidumbre.METRICAS.values():
+            terminos = []
+            for pos, ((m, t), d) in enumerate(zip(claves, distribuciones)):
+                factor = por_combinacion[pos]
+                if metrica == 'co2' and cantidad_red[pos]:
+                    terminos.append(('|'.join((m, t, 'energia')), d['energia'], energia_por_intensidad[pos]))
+                    factor -= cantidad_red[pos]
+                if factor:
+                    terminos.append(('|'.join((m, t, metrica)), d[metrica], factor))
+            totales[metrica] = _redondear_intervalo(incertidumbre.intervalo_suma(terminos, nivel))
+        resultado['incertidumbre'] = {
+            'nivel': nivel,
+            'muestras': incertidumbre.MUESTRAS,
+            'totales': totales,
+            'sin_distribucion': [
+                {'modelo': m, 'tipo_consulta': t, 'metricas': [c for c, v in d.items() if not isinstance(v, incertidumbre.Distribucion)]}
+                for (m, t), d in zip(claves, distribuciones)
+                if not all(isinstance(v, incertidumbre.Distribucion) for v in d.values())
+            ],
+        }
+    return resultado
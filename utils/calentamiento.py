@@ -0,0 +1,133 @@
+"""
+Precalentamiento de la app para gunicorn y estado de readiness.
+
+Con preload_app, gunicorn importa la app una sola vez en el master y luego
+hace fork de los workers: el dataset, los agregados y los templates compilados
+que se construyen antes del fork se comparten entre workers (copy-on-write).
+calentar() deja todo eso listo en el master y, con congelar=True, mueve los
+objetos existentes a la generación permanente del GC (gc.freeze) para que las
+recolecciones de los workers no recorran ni escriban esas páginas.
+
+Sin preload, cada worker llama a calentar() al iniciar (post_worker_init). En
+ambos casos /listo responde 503 hasta que el proceso terminó de calentarse.
+"""
+
+import gc
+import os
+import time
+
+from . import incertidumbre, metricas
+from .calculator import GESTOR
+
+# Rutas que se recorren al calentar (compilan templates y llenan caches)
+RUTAS = (
+    '/',
+    '/comparativo',
+    '/api/graficos',
+    '/api/dataset',
+)
+
+# Clave del environ WSGI que marca las requests de calentamiento (no llega
+# desde afuera: los headers HTTP entran como HTTP_*); la app no las registra
+# en el registro de uso
+ENTORNO_CALENTAMIENTO = 'ecoai.calentamiento'
+
+_estado = {
+    'listo': False,
+    'version': None,      # versión del dataset con la que se calentó
+    'duracion_ms': None,
+    'templates': 0,
+    'congelados': 0,      # objetos movidos a la generación permanente
+    'pid': None,          # proceso que hizo el calentamiento
+}
+
+
+def calentar(app, congelar=False):
+    """
+    Carga el dataset, compila los templates, recorre las rutas principales y
+    genera las muestras base del modo incertidumbre.
+
+    Las métricas que generan estas requests se descartan para que no se
+    mezclen con el tráfico real, y el cálculo de prueba de /calcular no se
+    registra en el registro de uso (ver ENTORNO_CALENTAMIENTO).
+
+    Args:
+        app: aplicación Flask
+        congelar: si es True, llama a gc.freeze() al terminar (usar en el
+            master de gunicorn justo antes del fork de los workers)
+
+    Returns:
+        dict con el estado de readiness (ver estado())
+
+    Raises:
+        RuntimeError si alguna ruta de calentamiento no responde 200
+    """
+    inicio = time.perf_counter()
+    snapshot = GESTOR.actual()
+
+    entorno = app.jinja_env
+    nombres = entorno.list_templates(filter_func=lambda nombre: nombre.endswith('.html'))
+    for nombre in nombres:
+        entorno.get_template(nombre)
+
+    cliente = app.test_client()
+    cliente.environ_base[ENTORNO_CALENTAMIENTO] = True
+    for ruta in RUTAS:
+        respuesta = cliente.get(ruta)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"calentamiento: {ruta} respondió {respuesta.status_code}")
+    if snapshot.tabla:
+        modelo, tipo_consulta = next(iter(snapshot.tabla))
+        cliente.post('/calcular', data={'modelo': modelo, 'tipo_consulta': tipo_consulta, 'cantidad': 1})
+
+    # Muestras base del modo incertidumbre (se generan una vez por proceso)
+    for tipo in incertidumbre.DISTRIBUCIONES:
+        incertidumbre.muestra_base(tipo, incertidumbre.MUESTRAS)
+        incertidumbre.muestra_base(tipo, incertidumbre.MUESTRAS_SUMA)
+
+    metricas.reiniciar()
+
+    congelados = 0
+    if congelar:
+        gc.collect()
+        gc.freeze()
+        congelados = gc.get_freeze_count()
+
+    _estado.update(
+        listo=True,
+        version=snapshot.version,
+        duracion_ms=round((time.perf_counter() - inicio) * 1000, 1),
+        templates=len(nombres),
+        congelados=congelados,
+        pid=os.getpid(),
+    )
+    return estado()
+
+
+def esta_listo():
+    """
+    True si el proceso ya se calentó y tiene un dataset cargado.
+    """
+    return _estado['listo'] and GESTOR.actual().version is not None
+
+
+def estado():
+    """
+    Retorna el estado de readiness de este proceso.
+
+    'heredado' indica que el calentamiento se hizo en otro proceso (el master
+    de gunicorn con preload) y este worker lo recibió con el fork.
+    """
+    return {
+        **_estado,
+        'listo': esta_listo(),
+        'version_actual': GESTOR.actual().version,
+        'heredado': _estado['pid'] is not None and _estado['pid'] != os.getpid(),
+    }
+
+
+def reiniciar():
+    """
+    Vuelve al estado sin calentar (usado en tests).
+    """
+    _estado.update(listo=False, version=None, duracion_ms=None, templates=0, congelados=0, pid=None)
@@ -0,0 +1,217 @@
+"""
+Almacén columnar del dataset y agregaciones group-by.
+
+Cada columna numérica es un arreglo tipado de float64 (array('d') o una
+memoryview sobre el dataset compilado) y cada columna de texto está codificada
+con diccionario: (códigos uint32, lista de valores distintos). Agrupar usa los
+códigos como identificador de grupo, así que no se comparan ni hashean strings
+por fila y las agregaciones recorren arreglos planos.
+"""
+
+from array import array
+from collections import Counter
+from itertools import repeat
+from operator import add, mul
+
+from .binario import codificar
+
+AGREGACIONES = ('promedio', 'suma', 'min', 'max', 'conteo', 'primero')
+
+# Si la cantidad de combinaciones posibles de las claves supera este múltiplo
+# de las filas, los grupos se numeran con un dict en lugar de un arreglo denso
+_FACTOR_DENSO = 4
+
+
+class TablaColumnar:
+    """
+    Columnas de igual largo, numéricas o de texto codificado con diccionario.
+
+    Args:
+        columnas: {nombre: array/memoryview de float} o {nombre: (códigos, valores)}
+    """
+
+    def __init__(self, columnas):
+        self.columnas = dict(columnas)
+        largos = {len(self._datos(nombre)) for nombre in self.columnas}
+        if len(largos) > 1:
+            raise ValueError(f"las columnas tienen largos distintos: {sorted(largos)}")
+        self.filas = largos.pop() if largos else 0
+
+    @classmethod
+    def desde_filas(cls, filas, texto, numericas):
+        """
+        Construye la tabla desde filas tipo dict (ej: csv.DictReader).
+
+        Args:
+            filas: lista de dicts
+            texto: nombres de las columnas de texto (se codifican con diccionario)
+            numericas: nombres de las columnas numéricas (se convierten a float)
+        """
+        columnas = {nombre: codificar([row.get(nombre) or '' for row in filas]) for nombre in texto}
+        for nombre in numericas:
+            columnas[nombre] = array('d', [float(row[nombre]) for row in filas])
+        return cls(columnas)
+
+    def __len__(self):
+        return self.filas
+
+    def __contains__(self, nombre):
+        return nombre in self.columnas
+
+    def es_texto(self, nombre):
+        return isinstance(self.columnas[nombre], tuple)
+
+    def _datos(self, nombre):
+        # Arreglo plano de la columna (los códigos si es de texto)
+        columna = self.columnas[nombre]
+        return columna[0] if isinstance(columna, tuple) else columna
+
+    def valores(self, nombre):
+        """
+        Retorna la columna decodificada como lista (strings para las de texto).
+        """
+        columna = self.columnas[nombre]
+        if isinstance(columna, tuple):
+            codigos, diccionario = columna
+            return list(map(diccionario.__getitem__, codigos))
+        return list(columna)
+
+    def _grupos(self, claves):
+        """
+        Asigna un identificador de grupo a cada fila según las columnas de texto `claves`.
+
+        Returns:
+            (ids por fila, cantidad de ids, función id -> clave del grupo)
+        """
+        for nombre in claves:
+            if nombre not in self.columnas:
+                raise ValueError(f"Columna no encontrada: {nombre}")
+            if not self.es_texto(nombre):
+                raise ValueError(f"Solo se puede agrupar por columnas de texto: {nombre}")
+
+        if not claves:
+            return repeat(0, self.filas), 1, lambda _: ()
+
+        codigos = [self.columnas[nombre][0] for nombre in claves]
+        diccionarios = [self.columnas[nombre][1] for nombre in claves]
+        if len(claves) == 1:
+            diccionario = diccionarios[0]
+            return codigos[0], len(diccionario), lambda g: (diccionario[g],)
+
+        # Id combinado en base mixta: c1 * (k2 * k3 ...) + c2 * (k3 ...) + c3 ...
+        ids = codigos[0]
+        combinaciones = len(diccionarios[0])
+        for columna, diccionario in zip(codigos[1:], diccionarios[1:]):
+            ids = map(add, map(mul, ids, repeat(len(diccionario))), columna)
+            combinaciones *= len(diccionario)
+        ids = list(ids)
+
+        tamanos = [len(d) for d in diccionarios]
+
+        def decodificar(g):
+            partes = []
+            for diccionario, tamano in zip(reversed(diccionarios), reversed(tamanos)):
+                g, codigo = divmod(g, tamano)
+                partes.append(diccionario[codigo])
+            return tuple(reversed(partes))
+
+        if combinaciones <= _FACTOR_DENSO * max(self.filas, 1):
+            return ids, combinaciones, decodificar
+
+        # Muchas combinaciones posibles pero pocas presentes: se renumeran las presentes
+        densos = {}
+        ids = [densos.setdefault(g, len(densos)) for g in ids]
+        originales = list(densos)
+        return ids, len(originales), lambda g: decodificar(originales[g])
+
+    def agrupar(self, claves, metricas, agg='promedio'):
+        """
+        Agrupa las filas por las columnas `claves` y agrega las `metricas` (group-by).
+
+        Args:
+            claves: columna de texto o lista de columnas de texto
+            metricas: lista de columnas, o dict {nombre en el resultado: columna}
+            agg: 'promedio', 'suma', 'min', 'max', 'conteo' o 'primero'
+                ('primero' también acepta columnas de texto)
+
+        Returns:
+            dict {clave: {metrica: valor}}, con clave str si se agrupa por una
+            columna o tupla si se agrupa por varias, en orden de los códigos
+            (orden de primera aparición para una sola columna)
+        """
+        if agg not in AGREGACIONES:
+            raise ValueError(f"Agregación no válida: {agg}")
+        una_clave = isinstance(claves, str)
+        claves = [claves] if una_clave else list(claves)
+        if not isinstance(metricas, dict):
+            metricas = {nombre: nombre for nombre in metricas}
+        for columna in metricas.values():
+            if columna not in self.columnas:
+                raise ValueError(f"Columna no encontrada: {columna}")
+            if agg != 'primero' and self.es_texto(columna):
+                raise ValueError(f"La columna {columna} no es numérica")
+
+        ids, cantidad, decodificar = self._grupos(claves)
+        if not isinstance(ids, (list, array, memoryview)):
+            ids = list(ids)
+        conteos = Counter(ids)
+
+        resultado_por_metrica = {}
+        for nombre, columna in metricas.items():
+            resultado_por_metrica[nombre] = _agregar(ids, self._datos(columna), cantidad, agg, conteos)
+            if agg == 'primero' and self.es_texto(columna):
+                diccionario = self.columnas[columna][1]
+                resultado_por_metrica[nombre] = [
+                    None if c is None else diccionario[c] for c in resultado_por_metrica[nombre]
+                ]
+
+        resultado = {}
+        for g in sorted(conteos):
+            clave = decodificar(g)
+            resultado[clave[0] if una_clave else clave] = {
+                nombre: valores[g] for nombre, valores in resultado_por_metrica.items()
+            }
+        return resultado
+
+
+def _agregar(ids, valores, cantidad, agg, conteos):
+    """
+    Agrega `valores` por grupo (ids[i] es el grupo de la fila i).
+
+    Returns:
+        lista indexada por id de grupo
+    """
+    if agg == 'conteo':
+        return [conteos.get(g, 0) for g in range(cantidad)]
+
+    if agg == 'primero':
+        primeros = [None] * cantidad
+        pendientes = len(conteos)
+        for g, v in zip(ids, valores):
+            if primeros[g] is None:
+                primeros[g] = v
+                pendientes -= 1
+                if not pendientes:
+                    break
+        return primeros
+
+    if agg in ('suma', 'promedio'):
+        sumas = [0.0] * cantidad
+        for g, v in zip(ids, valores):
+            sumas[g] += v
+        if agg == 'suma':
+            return sumas
+        return [s / conteos[g] if conteos.get(g) else None for g, s in enumerate(sumas)]
+
+    extremos = [None] * cantidad
+    if agg == 'min':
+        for g, v in zip(ids, valores):
+            actual = extremos[g]
+            if actual is None or v < actual:
+                extremos[g] = v
+    else:
+        for g, v in zip(ids, valores):
+            actual = extremos[g]
+            if actual is None or v > actual:
+                extremos[g] = v
+    return extremos
@@ -0,0 +1,254 @@
+"""
+Gestor del dataset con recarga en caliente.
+
+Cada worker de gunicorn mantiene un snapshot inmutable del dataset. Cuando el
+archivo cambia, el nuevo contenido se parsea y valida en un thread aparte y
+luego se reemplaza la referencia al snapshot de una sola vez, así las requests
+en curso nunca ven una tabla a medio cargar.
+
+Si existe un dataset compilado (ver utils/binario.py) generado a partir del
+mismo contenido del CSV, se carga ese en lugar de parsear el CSV.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from . import binario, metricas
+from .columnar import TablaColumnar
+
+# Snapshot inmutable del dataset y sus estructuras derivadas
+Snapshot = namedtuple('Snapshot', [
+    'version',       # hash corto del contenido (None si no hay dataset)
+    'cargado_en',    # fecha ISO 8601 (UTC) de la carga
+    'firma',         # (mtime_ns, tamaño) del archivo al momento de leerlo
+    'columnas',      # TablaColumnar con las filas del dataset (ver utils/columnar.py)
+    'tabla',         # mapping (modelo, tipo_consulta) -> coeficientes (ej: TablaCoeficientes)
+    'estadisticas',  # {'por_modelo': {...}, 'por_tipo_consulta': {...}}
+])
+
+
+# Gestores vivos, para reiniciar su estado en el proceso hijo tras un fork
+_gestores = weakref.WeakSet()
+
+
+def _tras_fork():
+    # Un fork copia el lock tal como estaba pero no el thread que lo tenía tomado
+    # (ej: una recarga en curso en el master de gunicorn); el hijo parte con uno
+    # nuevo y revisa el archivo en su primer acceso
+    for gestor in _gestores:
+        gestor._lock = threading.Lock()
+        gestor._proxima_revision = 0.0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def firma_archivo(ruta):
+    """
+    Retorna (mtime_ns, tamaño) del archivo sin abrirlo, o None si no existe.
+    """
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def version_contenido(contenido):
+    """
+    Calcula la versión del dataset a partir de su contenido (sha256 truncado).
+    """
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+class GestorDataset:
+    """
+    Mantiene el snapshot actual del dataset y lo recarga cuando el archivo cambia.
+
+    Args:
+        ruta: ruta del archivo del dataset
+        construir: función que recibe el contenido (bytes) y retorna un dict con
+            las claves columnas, tabla y estadisticas (los campos del Snapshot que
+            no completa el gestor: version, cargado_en y firma). Debe lanzar
+            ValueError si el contenido no es válido.
+        intervalo: segundos mínimos entre revisiones del archivo
+        compilado: ruta del dataset compilado (opcional)
+        cargar_compilado: función que recibe la ruta del compilado y retorna
+            el mismo dict que construir
+        vacio: función sin argumentos que retorna ese dict para cuando no
+            existe el archivo (por defecto, estructuras vacías genéricas)
+    """
+
+    def __init__(self, ruta, construir, intervalo=5.0, compilado=None, cargar_compilado=None, vacio=None):
+        self.ruta = ruta
+        self.construir = construir
+        self.intervalo = intervalo
+        self.compilado = compilado
+        self.cargar_compilado = cargar_compilado
+        self.vacio = vacio
+        self.ultimo_error = None
+        self._lock = threading.Lock()
+        self._proxima_revision = 0.0
+        self._snapshot = self._cargar_inicial()
+        _gestores.add(self)
+
+    def actual(self):
+        """
+        Retorna el snapshot vigente.
+
+        Como máximo una vez por intervalo revisa la firma del archivo (os.stat);
+        si cambió, la recarga se hace en un thread de fondo y esta llamada
+        retorna de inmediato con el snapshot anterior.
+        """
+        ahora = time.monotonic()
+        if ahora >= self._proxima_revision:
+            self._proxima_revision = ahora + self.intervalo
+            self._revisar()
+        return self._snapshot
+
+    def info(self):
+        """
+        Retorna la versión y fecha de carga del snapshot vigente en este proceso.
+        """
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'cargado_en': snapshot.cargado_en,
+            'pid': os.getpid(),
+            'ultimo_error': self.ultimo_error
+        }
+
+    def recargar(self):
+        """
+        Recarga el dataset de forma síncrona si el contenido cambió.
+
+        Returns:
+            True si se reemplazó el snapshot, False si no hubo cambios o si el
+            nuevo contenido no era válido (el error queda en ultimo_error).
+        """
+        with self._lock:
+            return self._recargar()
+
+    def _revisar(self):
+        firma = firma_archivo(self.ruta)
+        if firma is None or firma == self._snapshot.firma:
+            return
+        # Si ya hay una recarga en curso no se espera: se usa el snapshot actual
+        if not self._lock.acquire(blocking=False):
+            return
+
+        def tarea():
+            try:
+                self._recargar()
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=tarea, name='recarga-dataset', daemon=True).start()
+
+    def _recargar(self):
+        firma = firma_archivo(self.ruta)
+        if firma is None:
+            return False
+        actual = self._snapshot
+        try:
+            nuevo = self._cargar(firma, actual.version)
+        except OSError as e:
+            self.ultimo_error = str(e)
+            return False
+        except ValueError as e:
+            self.ultimo_error = str(e)
+            print(f"Advertencia: dataset inválido en {self.ruta}, se mantiene la versión {actual.version}: {e}")
+            # Se registra la firma para no reintentar hasta que el archivo vuelva a cambiar
+            self._snapshot = actual._replace(firma=firma)
+            return False
+
+        if nuevo is None:
+            # Solo cambió el mtime: se conserva el snapshot con la nueva firma
+            self._snapshot = actual._replace(firma=firma)
+            return False
+
+        self.ultimo_error = None
+        # Reemplazo atómico de la referencia
+        self._snapshot = nuevo
+        return True
+
+    def _cargar(self, firma, version_actual=None):
+        """
+        Construye el snapshot para el archivo con la firma dada.
+
+        Usa el compilado si corresponde al contenido del CSV: por firma sin
+        leer el CSV, o comparando el hash si solo cambió el mtime.
+
+        Returns:
+            el Snapshot nuevo, o None si el contenido es el de version_actual
+        """
+        origen = self._origen_compilado()
+        if origen is not None and origen.get('firma') == list(firma):
+            if origen['version'] == version_actual:
+                return None
+            nuevo = self._snapshot_compilado(origen['version'], firma)
+            if nuevo is not None:
+                return nuevo
+
+        with open(self.ruta, 'rb') as f:
+            contenido = f.read()
+        version = version_contenido(contenido)
+        if version == version_actual:
+            return None
+        if origen is not None and origen.get('version') == version:
+            nuevo = self._snapshot_compilado(version, firma)
+            if nuevo is not None:
+                return nuevo
+        return self._construir_snapshot(lambda: self.construir(contenido), version, firma)
+
+    def _origen_compilado(self):
+        # {'version', 'firma'} del CSV a partir del cual se generó el compilado
+        if self.compilado is None:
+            return None
+        try:
+            meta = binario.leer_meta(self.compilado)
+        except (OSError, ValueError):
+            return None
+        return meta.get('origen') if meta else None
+
+    def _snapshot_compilado(self, version, firma):
+        try:
+            return self._construir_snapshot(lambda: self.cargar_compilado(self.compilado), version, firma)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Advertencia: no se pudo cargar {self.compilado}, se usa el CSV: {e}")
+            return None
+
+    def _construir_snapshot(self, construir, version, firma):
+        with metricas.cronometro('ecoai_dataset_carga_duracion_segundos'):
+            datos = construir()
+        return Snapshot(
+            version=version,
+            cargado_en=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            firma=firma,
+            **datos
+        )
+
+    def _cargar_inicial(self):
+        firma = firma_archivo(self.ruta)
+        try:
+            if firma is None:
+                raise FileNotFoundError(self.ruta)
+            return self._cargar(firma)
+        except FileNotFoundError:
+            print(f"Advertencia: No se encontró {self.ruta}")
+            if self.vacio is not None:
+                return self._construir_snapshot(self.vacio, None, None)
+            return Snapshot(
+                version=None,
+                cargado_en=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                firma=None,
+                columnas=TablaColumnar({}),
+                tabla={},
+                estadisticas={'por_modelo': {}, 'por_tipo_consulta': {}}
+            )
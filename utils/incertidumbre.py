@@ -0,0 +1,303 @@
+"""
+Rangos de incertidumbre de los coeficientes por simulación de Monte Carlo.
+
+Cada coeficiente (agua, energía o carbono de una combinación modelo + tipo de
+consulta) puede tener una distribución en un archivo aparte del dataset:
+uniforme (min, max) o normal (media, desvio; truncada en 0). Las muestras son
+transformaciones afines de una única muestra base por tipo de distribución
+(uniforme en [0, 1) o normal estándar), generada una vez por proceso:
+
+    valor = centro + escala * z
+
+Como la transformación es monótona, los cuantiles de una combinación se leen
+directo de la muestra base ordenada, y escalar por la cantidad también los
+escala: el intervalo de un cálculo individual cuesta O(log n) sin importar la
+cantidad de muestras. Para los totales de un lote (suma de varias
+combinaciones independientes) sí se suman las muestras elemento a elemento con
+map/operator; cada coeficiente usa la muestra base rotada según un hash de su
+clave, así las combinaciones no quedan correlacionadas entre sí.
+"""
+
+import csv
+import io
+import math
+import random
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, repeat
+from operator import add, mul
+from statistics import NormalDist
+
+from .columnar import TablaColumnar
+
+DISTRIBUCIONES = ('uniforme', 'normal')
+
+# Métrica del archivo de distribuciones -> clave en el resultado del calculador
+METRICAS = {'agua': 'agua', 'energia': 'energia', 'carbono': 'co2'}
+
+COLUMNAS_REQUERIDAS = ('modelo', 'tipo_consulta', 'metrica', 'distribucion')
+
+# Muestras por coeficiente y nivel de confianza por defecto (intervalo central)
+MUESTRAS = 100_000
+NIVEL = 0.90
+
+# Muestras para los totales de un lote: cada combinación presente cuesta una
+# pasada sobre las muestras, así que se usan menos que para un coeficiente solo
+MUESTRAS_SUMA = 20_000
+
+# Semilla fija: mismas entradas, mismos intervalos (las respuestas son cacheables)
+SEMILLA = 2024
+
+_bases = {}   # (distribución, n) -> _Base
+
+
+class Distribucion:
+    """
+    Distribución de un coeficiente: valor = centro + escala * z.
+
+    Para 'uniforme' z ~ U[0, 1) (centro = min, escala = max - min); para
+    'normal' z ~ N(0, 1) (centro = media, escala = desvio) y los valores
+    negativos se truncan a 0.
+    """
+    __slots__ = ('tipo', 'centro', 'escala')
+
+    def __init__(self, tipo, centro, escala):
+        self.tipo = tipo
+        self.centro = centro
+        self.escala = escala
+
+    @classmethod
+    def uniforme(cls, minimo, maximo):
+        return cls('uniforme', minimo, maximo - minimo)
+
+    @classmethod
+    def normal(cls, media, desvio):
+        return cls('normal', media, desvio)
+
+    def contiene(self, valor):
+        """
+        Si `valor` cae en el rango de la distribución: [min, max] para 'uniforme'
+        y media ± 3 desvíos para 'normal'.
+        """
+        if self.tipo == 'uniforme':
+            maximo = self.centro + self.escala
+            return self.centro <= valor <= maximo or math.isclose(valor, maximo)
+        return abs(valor - self.centro) <= 3 * self.escala
+
+    def __eq__(self, otro):
+        if not isinstance(otro, Distribucion):
+            return NotImplemented
+        return (self.tipo, self.centro, self.escala) == (otro.tipo, otro.centro, otro.escala)
+
+    def __repr__(self):
+        return f"Distribucion({self.tipo!r}, centro={self.centro}, escala={self.escala})"
+
+
+class _Base:
+    """
+    Muestra base de una distribución estándar, ordenada y con sumas acumuladas.
+    """
+    __slots__ = ('muestras', 'ordenadas', 'acumuladas')
+
+    def __init__(self, muestras):
+        self.muestras = muestras
+        self.ordenadas = array('d', sorted(muestras))
+        self.acumuladas = array('d', accumulate(self.ordenadas, initial=0.0))
+
+
+def muestra_base(tipo, n=MUESTRAS):
+    """
+    Retorna la muestra base (cacheada por proceso) de la distribución estándar `tipo`.
+    """
+    base = _bases.get((tipo, n))
+    if base is None:
+        semilla = SEMILLA + DISTRIBUCIONES.index(tipo)
+        if tipo == 'normal':
+            muestras = array('d', NormalDist().samples(n, seed=semilla))
+        else:
+            aleatorio = random.Random(semilla).random
+            muestras = array('d', [aleatorio() for _ in range(n)])
+        base = _bases[(tipo, n)] = _Base(muestras)
+    return base
+
+
+def _cuantil(ordenadas, p):
+    # Cuantil p con interpolación lineal entre muestras vecinas
+    posicion = p * (len(ordenadas) - 1)
+    i = int(posicion)
+    if i + 1 >= len(ordenadas):
+        return ordenadas[-1]
+    return ordenadas[i] + (ordenadas[i + 1] - ordenadas[i]) * (posicion - i)
+
+
+def _limites(nivel):
+    if not 0 < nivel < 1:
+        raise ValueError("el nivel de confianza debe estar entre 0 y 1")
+    return (1 - nivel) / 2, (1 + nivel) / 2
+
+
+def intervalo(distribucion, factor=1.0, nivel=NIVEL, n=MUESTRAS):
+    """
+    Intervalo de `factor` × coeficiente a partir de la muestra base (sin recorrerla).
+
+    Args:
+        distribucion: Distribucion del coeficiente, o un número si es exacto
+        factor: multiplicador positivo (la cantidad)
+        nivel: probabilidad central del intervalo (0.9 -> percentiles 5 y 95)
+        n: cantidad de muestras
+
+    Returns:
+        dict {media, mediana, inferior, superior}
+    """
+    inferior, superior = _limites(nivel)
+    if not isinstance(distribucion, Distribucion):
+        valor = distribucion * factor
+        return {'media': valor, 'mediana': valor, 'inferior': valor, 'superior': valor}
+
+    base = muestra_base(distribucion.tipo, n)
+    centro, escala = distribucion.centro, distribucion.escala
+
+    def valor(z):
+        return max(centro + escala * z, 0.0) * factor
+
+    if escala > 0:
+        # Media con truncamiento: solo suman las muestras con centro + escala * z >= 0
+        corte = bisect_left(base.ordenadas, -centro / escala)
+        positivas = n - corte
+        suma_z = base.acumuladas[-1] - base.acumuladas[corte]
+        media = (centro * positivas + escala * suma_z) / n * factor
+    else:
+        media = max(centro, 0.0) * factor
+    return {
+        'media': media,
+        'mediana': valor(_cuantil(base.ordenadas, 0.5)),
+        'inferior': valor(_cuantil(base.ordenadas, inferior)),
+        'superior': valor(_cuantil(base.ordenadas, superior)),
+    }
+
+
+def _desvios(distribucion, clave, factor, n):
+    # factor × (valor - centro) por muestra: la base rotada según la clave y escalada
+    base = muestra_base(distribucion.tipo, n)
+    k = zlib.crc32(clave.encode('utf-8')) % n
+    rotada = base.muestras[k:] + base.muestras[:k]
+    valores = map(mul, rotada, repeat(distribucion.escala * factor))
+    if distribucion.centro + distribucion.escala * base.ordenadas[0] < 0:
+        # Truncamiento en 0 de la normal: valor >= 0 equivale a desvío >= -centro
+        valores = map(max, valores, repeat(-distribucion.centro * factor))
+    return valores
+
+
+def intervalo_suma(terminos, nivel=NIVEL, n=MUESTRAS_SUMA):
+    """
+    Intervalo de una suma de coeficientes independientes, por Monte Carlo.
+
+    Args:
+        terminos: lista de (clave, distribucion, factor); clave identifica al
+            coeficiente (ej: 'GPT-4 Turbo|texto|agua') y distribucion puede
+            ser un número si el coeficiente es exacto
+        nivel: probabilidad central del intervalo
+        n: cantidad de muestras
+
+    Returns:
+        dict {media, mediana, inferior, superior}
+    """
+    inferior, superior = _limites(nivel)
+    aleatorios = [t for t in terminos if isinstance(t[1], Distribucion)]
+    if len(aleatorios) == 1:
+        # Un solo término aleatorio: sus cuantiles salen directo de la muestra base
+        constante = math.fsum(d * f for _, d, f in terminos if not isinstance(d, Distribucion))
+        _, distribucion, factor = aleatorios[0]
+        resultado = intervalo(distribucion, factor, nivel)
+        return {campo: valor + constante for campo, valor in resultado.items()}
+
+    # Los centros se suman una sola vez; por muestra solo se acumulan los desvíos
+    constante = math.fsum(
+        (d.centro if isinstance(d, Distribucion) else d) * f for _, d, f in terminos
+    )
+    total = repeat(0.0, n)
+    for clave, distribucion, factor in aleatorios:
+        total = map(add, total, _desvios(distribucion, clave, factor, n))
+    ordenadas = sorted(total)
+    return {
+        'media': math.fsum(ordenadas) / n + constante,
+        'mediana': _cuantil(ordenadas, 0.5) + constante,
+        'inferior': _cuantil(ordenadas, inferior) + constante,
+        'superior': _cuantil(ordenadas, superior) + constante,
+    }
+
+
+def _numero(row, campo, numero):
+    try:
+        valor = float(row.get(campo) or '')
+    except ValueError:
+        raise ValueError(f"fila {numero}: {campo} no es numérico ({row.get(campo)!r})")
+    if valor < 0 or math.isnan(valor) or math.isinf(valor):
+        raise ValueError(f"fila {numero}: {campo} debe ser un número no negativo")
+    return valor
+
+
+def leer_distribucion(row, numero):
+    """
+    Construye la Distribucion de una fila del archivo de distribuciones.
+
+    Raises:
+        ValueError si la distribución o sus parámetros no son válidos
+    """
+    tipo = row['distribucion']
+    if tipo == 'uniforme':
+        minimo, maximo = _numero(row, 'min', numero), _numero(row, 'max', numero)
+        if minimo > maximo:
+            raise ValueError(f"fila {numero}: min mayor que max")
+        return Distribucion.uniforme(minimo, maximo)
+    if tipo == 'normal':
+        return Distribucion.normal(_numero(row, 'media', numero), _numero(row, 'desvio', numero))
+    raise ValueError(f"fila {numero}: distribución no válida ({tipo!r}); usar {', '.join(DISTRIBUCIONES)}")
+
+
+def construir_distribuciones(contenido, puntos=None):
+    """
+    Parsea y valida el archivo de distribuciones (CSV).
+
+    Columnas: modelo, tipo_consulta, metrica (agua, energia o carbono),
+    distribucion (uniforme o normal) y sus parámetros: min y max, o media y desvio.
+
+    Args:
+        contenido: bytes del archivo
+        puntos: tabla {(modelo, tipo_consulta): Coeficientes} del dataset (opcional);
+            las filas cuyo rango no contiene el coeficiente puntual se descartan
+            con una advertencia (ese coeficiente queda exacto)
+
+    Returns:
+        dict con claves columnas, tabla ({(modelo, tipo_consulta): {metrica: Distribucion}})
+        y estadisticas (vacío), como espera GestorDataset
+    """
+    filas = list(csv.DictReader(io.StringIO(contenido.decode('utf-8'))))
+    tabla = {}
+    for numero, row in enumerate(filas, start=2):
+        for campo in COLUMNAS_REQUERIDAS:
+            if not row.get(campo):
+                raise ValueError(f"fila {numero}: falta el campo {campo}")
+        if row['metrica'] not in METRICAS:
+            raise ValueError(f"fila {numero}: métrica no válida ({row['metrica']!r})")
+        clave = (row['modelo'], row['tipo_consulta'])
+        distribucion = leer_distribucion(row, numero)
+        coef = puntos.get(clave) if puntos is not None else None
+        if coef is not None and not distribucion.contiene(getattr(coef, row['metrica'])):
+            print(f"Advertencia: fila {numero}: el rango de {row['metrica']} no contiene el coeficiente "
+                  f"del dataset ({getattr(coef, row['metrica'])}) para {clave[0]} + {clave[1]}; se ignora")
+            continue
+        tabla.setdefault(clave, {})[row['metrica']] = distribucion
+    return {
+        'columnas': TablaColumnar.desde_filas(filas, COLUMNAS_REQUERIDAS, ()),
+        'tabla': tabla,
+        'estadisticas': {},
+    }
+
+
+def construir_vacio():
+    """
+    Sin archivo de distribuciones todos los coeficientes se consideran exactos.
+    """
+    return {'columnas': TablaColumnar({}), 'tabla': {}, 'estadisticas': {}}
@@ -0,0 +1,496 @@
+"""
+Ingesta en streaming de registros de uso de IA (CSV o NDJSON).
+
+Los registros se leen con generadores, en bloques, y se agregan directamente
+sobre la tabla de coeficientes sin construir el dict de resultado de
+calcular_impacto por línea. Los archivos grandes se dividen en rangos de bytes
+alineados a saltos de línea y cada rango se procesa en un proceso distinto, así
+la memoria depende solo de la cantidad de grupos, no del tamaño de la entrada.
+
+Cada registro debe tener modelo, tipo_consulta y cantidad, y opcionalmente una
+fecha (ISO 8601 o epoch en segundos) en el campo 'fecha' o 'timestamp' y una
+región. Si hay perfiles de intensidad de carbono (ver utils/intensidad.py), el
+CO2 de los registros con región es energía × intensidad de la red en esa hora.
+"""
+
+import codecs
+import csv
+import io
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from .calculator import CANTIDAD_MAXIMA, GESTOR, GESTOR_PERFILES
+
+# Largo del prefijo ISO 8601 que identifica cada periodo (2025-03-14T09...)
+PERIODOS = {
+    'hora': 13,
+    'dia': 10,
+    'mes': 7,
+    'anio': 4,
+    'total': 0,
+}
+
+CAMPOS_FECHA = ('fecha', 'timestamp')
+
+# Registros por bloque al buscar las intensidades de carbono en columnas
+TAMANO_BLOQUE = 10_000
+
+# Tamaño mínimo de un rango de bytes para que valga la pena un proceso aparte
+BYTES_MINIMOS_POR_RANGO = 8 * 1024 * 1024
+
+
+def detectar_formato(ruta):
+    """
+    Deduce el formato ('csv' o 'ndjson') por la extensión del archivo.
+    """
+    nombre = str(ruta).lower()
+    if nombre.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return 'csv'
+
+
+def _a_numero(valor):
+    # Convierte la cantidad leída del archivo; si no es un número finito se deja
+    # tal cual (o None) para que se reporte como error
+    numero = valor
+    if not isinstance(valor, (int, float)):
+        if not isinstance(valor, str):
+            return None
+        try:
+            numero = int(valor)
+        except ValueError:
+            try:
+                numero = float(valor)
+            except ValueError:
+                return valor
+    try:
+        if math.isfinite(numero):
+            return numero
+    except OverflowError:
+        pass
+    return valor if isinstance(valor, str) else None
+
+
+def _periodo(fecha, largo):
+    """
+    Retorna el periodo (prefijo ISO 8601, en UTC) de una fecha según el largo del bucket.
+
+    Las fechas con desplazamiento horario (+03:00) se convierten a UTC, igual
+    que las epoch; las que no lo tienen se toman como UTC.
+    """
+    if largo == 0:
+        return 'total'
+    if fecha is None or fecha == '':
+        return 'sin_fecha'
+    if isinstance(fecha, (int, float)):
+        epoch = fecha
+    else:
+        # Epoch como texto, con decimales o no ("1700000000.5"); lo demás es ISO 8601
+        try:
+            epoch = float(fecha)
+        except ValueError:
+            epoch = None
+    if epoch is not None:
+        fecha = datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+    elif len(fecha) >= 16 and fecha[-6] in '+-':
+        fecha = datetime.fromisoformat(fecha).astimezone(timezone.utc).isoformat()
+    return fecha[:largo]
+
+
+def validar_encabezado(encabezado):
+    """
+    Verifica que el encabezado de un CSV tenga las columnas modelo, tipo_consulta y cantidad.
+
+    Raises:
+        ValueError con las columnas que faltan
+    """
+    faltan = [c for c in ('modelo', 'tipo_consulta', 'cantidad') if c not in encabezado]
+    if faltan:
+        raise ValueError(f"faltan las columnas {', '.join(faltan)} en el encabezado del CSV")
+
+
+def leer_lineas(f, formato, encabezado=None):
+    """
+    Genera registros (modelo, tipo_consulta, cantidad, fecha, region) desde un archivo de texto.
+
+    Args:
+        f: archivo (o iterable de líneas) ya posicionado
+        formato: 'csv' o 'ndjson'
+        encabezado: columnas del CSV si f no comienza en la primera línea
+    """
+    if formato == 'ndjson':
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                yield (None, None, None, None, None)
+                continue
+            if not isinstance(registro, dict):
+                yield (None, None, None, None, None)
+                continue
+            modelo, tipo_consulta, region = (registro.get(c) for c in ('modelo', 'tipo_consulta', 'region'))
+            if not isinstance(modelo, str) or not isinstance(tipo_consulta, str) or (
+                    region is not None and not isinstance(region, str)):
+                yield (None, None, None, None, None)
+                continue
+            fecha = next((registro[c] for c in CAMPOS_FECHA if c in registro), None)
+            yield (modelo, tipo_consulta, _a_numero(registro.get('cantidad')), fecha, region)
+        return
+
+    lector = csv.reader(f)
+    if encabezado is None:
+        encabezado = next(lector, [])
+    validar_encabezado(encabezado)
+    i_modelo = encabezado.index('modelo')
+    i_tipo = encabezado.index('tipo_consulta')
+    i_cantidad = encabezado.index('cantidad')
+    i_fecha = next((encabezado.index(c) for c in CAMPOS_FECHA if c in encabezado), None)
+    i_region = encabezado.index('region') if 'region' in encabezado else None
+    largo = len(encabezado)
+    for fila in lector:
+        if len(fila) < largo:
+            if fila:
+                yield (None, None, None, None, None)
+            continue
+        yield (fila[i_modelo], fila[i_tipo], _a_numero(fila[i_cantidad]),
+               fila[i_fecha] if i_fecha is not None else None,
+               fila[i_region] if i_region is not None else None)
+
+
+def en_bloques(iterable, tamano):
+    """
+    Agrupa un iterable en listas de hasta `tamano` elementos.
+    """
+    bloque = []
+    for elemento in iterable:
+        bloque.append(elemento)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def nuevo_agregado():
+    """
+    Retorna un acumulador vacío: {'grupos': {...}, 'registros': 0, 'errores': 0, 'sin_perfil': 0}.
+
+    Cada grupo (modelo, tipo_consulta, proveedor, periodo) guarda
+    [registros, cantidad, agua, energia, co2]. 'sin_perfil' cuenta los
+    registros con región pero sin perfil de intensidad (su CO2 sale del dataset).
+    """
+    return {'grupos': {}, 'registros': 0, 'errores': 0, 'sin_perfil': 0}
+
+
+def agregar_registros(registros, por='mes', agregado=None, impactos=None):
+    """
+    Acumula los totales de impacto de un iterable de registros.
+
+    Las intensidades de carbono se buscan por bloque, en columnas, sobre el
+    índice (región, hora del año) de los perfiles.
+
+    Args:
+        registros: iterable de tuplas (modelo, tipo_consulta, cantidad, fecha)
+            o (modelo, tipo_consulta, cantidad, fecha, region)
+        por: periodo de agrupación ('hora', 'dia', 'mes', 'anio' o 'total')
+        agregado: acumulador existente (de nuevo_agregado) para continuar
+        impactos: lista opcional donde se agrega, por registro, (agua, energia, co2)
+            o None si el registro es inválido
+
+    Returns:
+        el acumulador actualizado
+    """
+    if agregado is None:
+        agregado = nuevo_agregado()
+    largo = PERIODOS[por]
+    tabla = GESTOR.actual().tabla
+    perfiles = GESTOR_PERFILES.actual()
+    grupos = agregado['grupos']
+    registros_leidos = 0
+    errores = 0
+    sin_perfil = 0
+
+    for bloque in en_bloques(registros, TAMANO_BLOQUE):
+        regiones = [registro[4] if len(registro) > 4 else None for registro in bloque]
+        if perfiles and any(regiones):
+            intensidades = perfiles.intensidades(regiones, [registro[3] for registro in bloque])
+        else:
+            intensidades = [math.nan] * len(bloque)
+
+        for (modelo, tipo_consulta, cantidad, fecha, *_), region, intensidad in zip(bloque, regiones, intensidades):
+            registros_leidos += 1
+            coef = tabla.get((modelo, tipo_consulta))
+            # Hasta CANTIDAD_MAXIMA, como en calcular_impacto: los totales de un archivo no desbordan
+            if coef is None or not isinstance(cantidad, (int, float)) or not 0 < cantidad <= CANTIDAD_MAXIMA:
+                errores += 1
+                if impactos is not None:
+                    impactos.append(None)
+                continue
+            try:
+                periodo = _periodo(fecha, largo)
+            except (ValueError, OverflowError, OSError, TypeError, AttributeError):
+                errores += 1
+                if impactos is not None:
+                    impactos.append(None)
+                continue
+            agua = coef.agua * cantidad
+            energia = coef.energia * cantidad
+            if intensidad == intensidad:
+                co2 = energia * intensidad
+            else:
+                co2 = coef.carbono * cantidad
+                if region:
+                    sin_perfil += 1
+            if impactos is not None:
+                impactos.append((agua, energia, co2))
+            clave = (modelo, tipo_consulta, coef.proveedor, periodo)
+            acc = grupos.get(clave)
+            if acc is None:
+                grupos[clave] = [1, cantidad, agua, energia, co2]
+            else:
+                acc[0] += 1
+                acc[1] += cantidad
+                acc[2] += agua
+                acc[3] += energia
+                acc[4] += co2
+
+    agregado['registros'] += registros_leidos
+    agregado['errores'] += errores
+    agregado['sin_perfil'] += sin_perfil
+    return agregado
+
+
+def combinar(destino, origen):
+    """
+    Suma el acumulador `origen` sobre `destino` (resultados parciales de cada proceso).
+    """
+    grupos = destino['grupos']
+    for clave, valores in origen['grupos'].items():
+        acc = grupos.get(clave)
+        if acc is None:
+            grupos[clave] = list(valores)
+        else:
+            for i, valor in enumerate(valores):
+                acc[i] += valor
+    destino['registros'] += origen['registros']
+    destino['errores'] += origen['errores']
+    destino['sin_perfil'] += origen['sin_perfil']
+    return destino
+
+
+def reagrupar(agregado, por):
+    """
+    Lleva un acumulador a un periodo más grueso (ej: de 'dia' a 'mes') truncando los periodos.
+    """
+    largo = PERIODOS[por]
+    destino = nuevo_agregado()
+    grupos = destino['grupos']
+    for (modelo, tipo_consulta, proveedor, periodo), valores in agregado['grupos'].items():
+        if largo == 0:
+            periodo = 'total'
+        elif periodo != 'sin_fecha':
+            periodo = periodo[:largo]
+        clave = (modelo, tipo_consulta, proveedor, periodo)
+        acc = grupos.get(clave)
+        if acc is None:
+            grupos[clave] = list(valores)
+        else:
+            for i, valor in enumerate(valores):
+                acc[i] += valor
+    for campo in ('registros', 'errores', 'sin_perfil'):
+        destino[campo] = agregado[campo]
+    return destino
+
+
+def particionar(ruta, partes):
+    """
+    Divide un archivo en rangos de bytes [inicio, fin) alineados a saltos de línea.
+
+    Returns:
+        lista de tuplas (inicio, fin); si el archivo es CSV el primer rango
+        incluye el encabezado, que procesar_rango descarta
+    """
+    tamano = os.path.getsize(ruta)
+    partes = max(1, min(partes, tamano // BYTES_MINIMOS_POR_RANGO or 1))
+    cortes = [0]
+    with open(ruta, 'rb') as f:
+        for i in range(1, partes):
+            f.seek(max(tamano * i // partes, cortes[-1]))
+            f.readline()
+            cortes.append(min(f.tell(), tamano))
+    cortes.append(tamano)
+    return [(inicio, fin) for inicio, fin in zip(cortes, cortes[1:]) if fin > inicio]
+
+
+def saltar_bom(f):
+    """
+    Posiciona un archivo binario recién abierto después del BOM UTF-8, si lo tiene.
+    """
+    if f.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+        f.seek(0)
+
+
+def _leer_rango(f, fin):
+    # Genera las líneas (bytes) del archivo hasta la posición `fin`
+    while f.tell() < fin:
+        linea = f.readline()
+        if not linea:
+            break
+        yield linea
+
+
+def procesar_rango(ruta, formato, inicio, fin, encabezado, por):
+    """
+    Procesa un rango de bytes del archivo y retorna su acumulador parcial.
+
+    Se ejecuta en los procesos del pool; lee en streaming, sin cargar el rango.
+    """
+    with open(ruta, 'rb') as f:
+        if inicio == 0:
+            saltar_bom(f)
+        else:
+            f.seek(inicio)
+        lineas = (linea.decode('utf-8') for linea in _leer_rango(f, fin))
+        if encabezado is not None and inicio == 0:
+            next(lineas, None)
+        return agregar_registros(leer_lineas(lineas, formato, encabezado), por)
+
+
+def _leer_encabezado(ruta):
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def ingerir_archivo(ruta, por='mes', formato=None, procesos=None):
+    """
+    Agrega un archivo de registros de uso completo, repartido entre procesos.
+
+    Args:
+        ruta: archivo CSV o NDJSON
+        por: periodo de agrupación ('hora', 'dia', 'mes', 'anio' o 'total')
+        formato: 'csv' o 'ndjson' (por defecto según la extensión)
+        procesos: cantidad de procesos (por defecto, uno por CPU)
+
+    Returns:
+        acumulador con grupos, registros y errores
+
+    Raises:
+        OSError si no se puede leer el archivo
+        ValueError si el periodo no es válido o al CSV le faltan columnas
+    """
+    if por not in PERIODOS:
+        raise ValueError(f"Periodo no válido: {por}")
+    formato = formato or detectar_formato(ruta)
+    encabezado = _leer_encabezado(ruta) if formato == 'csv' else None
+    if encabezado is not None:
+        validar_encabezado(encabezado)
+    rangos = particionar(ruta, procesos or os.cpu_count() or 1)
+
+    if len(rangos) <= 1:
+        agregado = nuevo_agregado()
+        for inicio, fin in rangos:
+            combinar(agregado, procesar_rango(ruta, formato, inicio, fin, encabezado, por))
+        return agregado
+
+    agregado = nuevo_agregado()
+    with ProcessPoolExecutor(max_workers=len(rangos)) as pool:
+        futuros = [pool.submit(procesar_rango, ruta, formato, inicio, fin, encabezado, por)
+                   for inicio, fin in rangos]
+        for futuro in futuros:
+            combinar(agregado, futuro.result())
+    return agregado
+
+
+def ingerir_flujo(f, por='mes', formato='csv', tamano_bloque=10_000):
+    """
+    Agrega registros desde un flujo de texto (ej: stdin) en bloques, en un solo proceso.
+    """
+    if por not in PERIODOS:
+        raise ValueError(f"Periodo no válido: {por}")
+    agregado = nuevo_agregado()
+    for bloque in en_bloques(leer_lineas(f, formato), tamano_bloque):
+        agregar_registros(bloque, por, agregado)
+    return agregado
+
+
+def filas_agregadas(agregado):
+    """
+    Convierte el acumulador en filas ordenadas listas para exportar.
+    """
+    for (modelo, tipo_consulta, proveedor, periodo), valores in sorted(agregado['grupos'].items()):
+        registros, cantidad, agua, energia, co2 = valores
+        yield {
+            'modelo': modelo,
+            'tipo_consulta': tipo_consulta,
+            'proveedor': proveedor,
+            'periodo': periodo,
+            'registros': registros,
+            'cantidad': cantidad,
+            'agua': round(agua, 4),
+            'energia': round(energia, 4),
+            'co2': round(co2, 4),
+        }
+
+
+def escribir_resultado(agregado, salida, formato='csv'):
+    """
+    Escribe las filas agregadas en CSV o JSON.
+    """
+    filas = list(filas_agregadas(agregado))
+    if formato == 'json':
+        json.dump({
+            'registros': agregado['registros'],
+            'errores': agregado['errores'],
+            'sin_perfil': agregado['sin_perfil'],
+            'grupos': filas,
+        }, salida, ensure_ascii=False, indent=2)
+        salida.write('\n')
+        return
+    campos = ['modelo', 'tipo_consulta', 'proveedor', 'periodo', 'registros', 'cantidad', 'agua', 'energia', 'co2']
+    escritor = csv.DictWriter(salida, fieldnames=campos, lineterminator='\n')
+    escritor.writeheader()
+    escritor.writerows(filas)
+
+
+def main_ingerir(args):
+    """
+    Punto de entrada del subcomando `python -m utils ingerir`.
+
+    Con --registro, los totales por día (o por hora) se suman además a los
+    acumulados del registro de uso y la salida se reagrupa al periodo pedido.
+    """
+    ruta_registro = getattr(args, 'registro', None)
+    por = args.por
+    if ruta_registro and por != 'hora':
+        por = 'dia'
+    try:
+        if args.archivo == '-':
+            entrada = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+            agregado = ingerir_flujo(entrada, por=por, formato=args.formato or 'csv')
+        else:
+            agregado = ingerir_archivo(args.archivo, por=por, formato=args.formato, procesos=args.procesos)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if ruta_registro:
+        from .registro import RegistroUso
+        buckets = RegistroUso(ruta_registro).acumular(
+            (periodo, modelo, tipo_consulta, *valores)
+            for (modelo, tipo_consulta, _, periodo), valores in agregado['grupos'].items()
+        )
+        print(f"{buckets} acumulados actualizados en {ruta_registro}", file=sys.stderr)
+        agregado = reagrupar(agregado, args.por)
+    escribir_resultado(agregado, sys.stdout, args.salida)
+    print(f"{agregado['registros']} registros procesados, {agregado['errores']} con errores",
+          file=sys.stderr)
+    if agregado['sin_perfil']:
+        print(f"{agregado['sin_perfil']} registros con región sin perfil de intensidad "
+              f"(CO2 según el dataset)", file=sys.stderr)
+    return 0
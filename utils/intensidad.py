@@ -0,0 +1,261 @@
+"""
+Perfiles horarios de intensidad de carbono de la red eléctrica por región.
+
+Cada región tiene un archivo <region>.csv en el directorio de perfiles con las
+columnas hora (ISO 8601 en UTC, ej: 2024-03-14T09:00) e intensidad
+(gCO2e/kWh). Los perfiles se indexan por (región, hora del año) en un único
+arreglo plano de float64:
+
+    intensidades[codigo_region * PASO + hora_del_anio]
+
+La hora del año se cuenta en un calendario de 366 días (en los años no
+bisiestos se salta el 29 de febrero), así un perfil de cualquier año sirve
+para registros de cualquier otro y el 1 de marzo siempre cae en el mismo
+índice. La última posición de cada región (hora_del_anio = HORAS_ANIO) guarda
+la media anual, que se usa cuando el registro no trae fecha.
+
+Convertir una fecha en hora del año se cachea por hora (prefijo
+'AAAA-MM-DDTHH' o hora desde epoch), así unir millones de registros contra
+los perfiles es una búsqueda en un dict y un índice en el arreglo por registro.
+"""
+
+import csv
+import math
+import os
+import time
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .dataset import firma_archivo, version_contenido
+
+HORAS_ANIO = 366 * 24
+
+# Posiciones por región: las horas del año más la media anual
+PASO = HORAS_ANIO + 1
+
+# Máximo de fechas distintas cacheadas (se vacía al superarlo)
+MAX_CACHE_HORAS = 1_000_000
+
+_horas = {}   # prefijo 'AAAA-MM-DDTHH' u hora desde epoch -> hora del año
+
+
+def _indice_hora(dt):
+    # Hora del año de un datetime en UTC, en el calendario de 366 días
+    dia = dt.timetuple().tm_yday - 1
+    if dia >= 59 and not (dt.year % 4 == 0 and (dt.year % 100 != 0 or dt.year % 400 == 0)):
+        dia += 1
+    return dia * 24 + dt.hour
+
+
+def hora_del_anio(fecha):
+    """
+    Convierte una fecha (ISO 8601 o epoch en segundos) en su hora del año (UTC).
+
+    Las fechas ISO sin zona horaria se toman como UTC.
+
+    Returns:
+        índice entre 0 y HORAS_ANIO - 1, HORAS_ANIO si no hay fecha (media
+        anual), o None si la fecha no es válida
+    """
+    # Camino rápido: ISO sin desplazamiento horario ya vista en esa hora
+    if type(fecha) is str and (len(fecha) < 16 or fecha[-6] not in '+-'):
+        indice = _horas.get(fecha[:13])
+        if indice is not None:
+            return indice
+    return _convertir(fecha)
+
+
+def _convertir(fecha):
+    if fecha is None or fecha == '':
+        return HORAS_ANIO
+    try:
+        if isinstance(fecha, (int, float)) or fecha.isdigit():
+            clave = int(float(fecha)) // 3600
+            indice = _horas.get(clave)
+            if indice is None:
+                indice = _indice_hora(datetime.fromtimestamp(clave * 3600, tz=timezone.utc))
+        elif len(fecha) >= 16 and fecha[-6] in '+-':
+            # Con desplazamiento horario: se convierte (no se cachea, depende de los minutos)
+            return _indice_hora(datetime.fromisoformat(fecha).astimezone(timezone.utc))
+        else:
+            clave = fecha[:13]
+            indice = _indice_hora(datetime.fromisoformat(clave))
+    except (ValueError, OverflowError, OSError, TypeError, AttributeError):
+        return None
+    if len(_horas) >= MAX_CACHE_HORAS:
+        _horas.clear()
+    _horas[clave] = indice
+    return indice
+
+
+class PerfilesIntensidad:
+    """
+    Intensidad de carbono (gCO2e/kWh) indexada por (región, hora del año).
+
+    Args:
+        regiones: lista de nombres de región (el código es la posición)
+        valores: array('d') de largo len(regiones) * PASO
+    """
+
+    def __init__(self, regiones=(), valores=None):
+        self.regiones = list(regiones)
+        self.valores = valores if valores is not None else array('d')
+        self._codigos = {region: i for i, region in enumerate(self.regiones)}
+
+    def __len__(self):
+        return len(self.regiones)
+
+    def __contains__(self, region):
+        return region in self._codigos
+
+    def intensidad(self, region, fecha=None):
+        """
+        Intensidad de la región en la hora de `fecha` (media anual si no hay fecha).
+
+        Returns:
+            gCO2e/kWh, o None si no hay perfil para la región o la fecha no es válida
+        """
+        codigo = self._codigos.get(region)
+        hora = hora_del_anio(fecha)
+        if codigo is None or hora is None:
+            return None
+        return self.valores[codigo * PASO + hora]
+
+    def intensidades(self, regiones, fechas):
+        """
+        Intensidad para columnas paralelas de regiones y fechas.
+
+        Returns:
+            lista de gCO2e/kWh, con NaN donde no hay perfil o la fecha no es válida
+        """
+        valores = self.valores
+        codigos = map(self._codigos.get, regiones)
+        horas = map(hora_del_anio, fechas)
+        return [
+            valores[c * PASO + h] if c is not None and h is not None else math.nan
+            for c, h in zip(codigos, horas)
+        ]
+
+    def media_anual(self, region):
+        """Intensidad media del perfil de la región, o None si no hay perfil."""
+        return self.intensidad(region)
+
+
+def leer_perfil(ruta):
+    """
+    Lee el perfil horario de una región y lo lleva al calendario de 366 días.
+
+    Si el archivo cubre varios años, cada hora del año es el promedio de sus
+    valores; las horas sin datos (ej: el 29 de febrero en un perfil de un año
+    no bisiesto) toman el valor de la misma hora del día anterior.
+
+    Returns:
+        array('d') de largo PASO (las horas del año más la media anual)
+
+    Raises:
+        ValueError si el archivo no tiene datos válidos
+    """
+    sumas = [0.0] * HORAS_ANIO
+    conteos = [0] * HORAS_ANIO
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        lector = csv.DictReader(f)
+        if lector.fieldnames is None or not {'hora', 'intensidad'} <= set(lector.fieldnames):
+            raise ValueError(f"{ruta}: se esperaban las columnas hora e intensidad")
+        for numero, row in enumerate(lector, start=2):
+            hora = hora_del_anio(row['hora']) if row['hora'] else None
+            if hora is None or hora == HORAS_ANIO:
+                raise ValueError(f"{ruta}, fila {numero}: hora no válida ({row['hora']!r})")
+            try:
+                valor = float(row['intensidad'])
+            except (TypeError, ValueError):
+                raise ValueError(f"{ruta}, fila {numero}: intensidad no es numérica ({row['intensidad']!r})")
+            if not 0 <= valor < math.inf:
+                raise ValueError(f"{ruta}, fila {numero}: intensidad debe ser un número no negativo")
+            sumas[hora] += valor
+            conteos[hora] += 1
+
+    if not any(conteos):
+        raise ValueError(f"{ruta}: el perfil no tiene filas")
+    perfil = array('d', [s / c if c else math.nan for s, c in zip(sumas, conteos)])
+
+    # Relleno de huecos: misma hora del día anterior (dos vueltas, el año es cíclico);
+    # si una hora del día no tiene ningún dato se usa la hora anterior
+    for _ in range(2):
+        for hora in range(HORAS_ANIO):
+            if math.isnan(perfil[hora]):
+                perfil[hora] = perfil[hora - 24]
+    for _ in range(2):
+        for hora in range(HORAS_ANIO):
+            if math.isnan(perfil[hora]):
+                perfil[hora] = perfil[hora - 1]
+    perfil.append(math.fsum(perfil) / HORAS_ANIO)
+    return perfil
+
+
+def cargar_perfiles(directorio):
+    """
+    Carga todos los perfiles <region>.csv de un directorio.
+
+    Returns:
+        PerfilesIntensidad (vacío si el directorio no existe)
+    """
+    rutas = sorted(Path(directorio).glob('*.csv')) if os.path.isdir(directorio) else []
+    valores = array('d')
+    for ruta in rutas:
+        valores.extend(leer_perfil(ruta))
+    return PerfilesIntensidad([ruta.stem for ruta in rutas], valores)
+
+
+class GestorPerfiles:
+    """
+    Mantiene los perfiles cargados y los recarga si cambian los archivos.
+
+    Como máximo una vez por intervalo compara la firma (mtime, tamaño) de los
+    archivos del directorio; si cambió alguno se recargan todos (son pocos y
+    chicos). Si la recarga falla se conservan los perfiles anteriores y el
+    error queda en ultimo_error. version identifica el contenido de los
+    perfiles vigentes (None si no hay ninguno).
+    """
+
+    def __init__(self, directorio, intervalo=5.0):
+        self.directorio = Path(directorio)
+        self.intervalo = intervalo
+        self.ultimo_error = None
+        self.version = None
+        self._firma = None
+        self._proxima_revision = 0.0
+        self._perfiles = PerfilesIntensidad()
+        self._revisar()
+
+    def _firma_actual(self):
+        if not self.directorio.is_dir():
+            return ()
+        return tuple((ruta.name, firma_archivo(ruta)) for ruta in sorted(self.directorio.glob('*.csv')))
+
+    def _revisar(self):
+        firma = self._firma_actual()
+        if firma == self._firma:
+            return
+        try:
+            perfiles = cargar_perfiles(self.directorio)
+            self._perfiles = perfiles
+            self.version = (
+                version_contenido('\x1f'.join(perfiles.regiones).encode('utf-8') + perfiles.valores.tobytes())
+                if perfiles else None
+            )
+            self.ultimo_error = None
+        except (OSError, ValueError) as e:
+            self.ultimo_error = str(e)
+            print(f"Advertencia: perfiles de intensidad inválidos, se mantienen los anteriores: {e}")
+        self._firma = firma
+
+    def actual(self):
+        """
+        Retorna los perfiles vigentes (revisando los archivos como máximo una vez por intervalo).
+        """
+        ahora = time.monotonic()
+        if ahora >= self._proxima_revision:
+            self._proxima_revision = ahora + self.intervalo
+            self._revisar()
+        return self._perfiles
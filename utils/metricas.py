@@ -0,0 +1,288 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus.
+
+Cada proceso acumula contadores e histogramas en memoria (una suma y un
+incremento por observación). Con varios workers de gunicorn, si está definida
+la variable ECOAI_METRICAS_DIR, cada worker vuelca su estado a
+ECOAI_METRICAS_DIR/metricas_<pid>.json como máximo una vez por segundo, y
+/metrics suma los archivos de todos los workers al exportar.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CUANTILES = (0.5, 0.95, 0.99)
+
+# Nombre -> (tipo, ayuda)
+DEFINICIONES = {
+    'ecoai_requests_total': ('counter', 'Requests atendidas por ruta, método y status'),
+    'ecoai_request_duracion_segundos': ('histogram', 'Latencia de las requests por ruta'),
+    'ecoai_template_duracion_segundos': ('histogram', 'Tiempo de renderizado por template'),
+    'ecoai_calculo_duracion_segundos': ('histogram', 'Tiempo en funciones del calculador'),
+    'ecoai_dataset_carga_duracion_segundos': ('histogram', 'Tiempo de parseo y validación del dataset'),
+    'ecoai_agregacion_duracion_segundos': ('histogram', 'Tiempo de cálculo de estadísticas agregadas'),
+    'ecoai_registro_escritura_duracion_segundos': ('histogram', 'Tiempo de escritura de cada lote del registro de uso'),
+    'ecoai_registro_descartados_total': ('counter', 'Filas del registro de uso descartadas (cola llena o error de escritura)'),
+    'ecoai_perfiles_total': ('counter', 'Requests perfiladas con cProfile (ver utils/perfilado.py)'),
+}
+
+# Intervalo mínimo entre volcados a disco en modo multiproceso
+INTERVALO_VOLCADO = 1.0
+
+_lock = threading.Lock()
+_contadores = {}    # (nombre, labels) -> valor
+_histogramas = {}   # (nombre, labels) -> [conteos por bucket..., +Inf, suma]
+_proximo_volcado = 0.0
+
+
+def _tras_fork():
+    # El hijo (worker) vuelca su primer estado sin esperar el intervalo del padre
+    global _lock, _proximo_volcado
+    _lock = threading.Lock()
+    _proximo_volcado = 0.0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def directorio_multiproceso():
+    """
+    Directorio compartido entre workers, o None si se usa un solo proceso.
+    """
+    directorio = os.environ.get('ECOAI_METRICAS_DIR')
+    return Path(directorio) if directorio else None
+
+
+def _clave(nombre, labels):
+    return (nombre, tuple(sorted(labels.items())))
+
+
+def incrementar(nombre, valor=1, **labels):
+    """
+    Incrementa un contador.
+    """
+    clave = _clave(nombre, labels)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def observar(nombre, valor, **labels):
+    """
+    Registra una observación (en segundos) en un histograma.
+    """
+    clave = _clave(nombre, labels)
+    with _lock:
+        histograma = _histogramas.get(clave)
+        if histograma is None:
+            histograma = _histogramas[clave] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite:
+                break
+        else:
+            i = len(BUCKETS)
+        histograma[i] += 1
+        histograma[-1] += valor
+
+
+@contextlib.contextmanager
+def cronometro(nombre, **labels):
+    """
+    Mide la duración del bloque y la registra en el histograma `nombre`.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, time.perf_counter() - inicio, **labels)
+
+
+def _estado():
+    with _lock:
+        return {
+            'contadores': [[n, list(l), v] for (n, l), v in _contadores.items()],
+            'histogramas': [[n, list(l), list(h)] for (n, l), h in _histogramas.items()],
+        }
+
+
+def volcar(forzar=False):
+    """
+    Escribe el estado de este proceso en el directorio multiproceso (si está definido).
+
+    Sin forzar, escribe como máximo una vez cada INTERVALO_VOLCADO segundos.
+    """
+    global _proximo_volcado
+    directorio = directorio_multiproceso()
+    if directorio is None:
+        return
+    ahora = time.monotonic()
+    if not forzar and ahora < _proximo_volcado:
+        return
+    _proximo_volcado = ahora + INTERVALO_VOLCADO
+
+    directorio.mkdir(parents=True, exist_ok=True)
+    destino = directorio / f'metricas_{os.getpid()}.json'
+    temporal = destino.with_suffix('.tmp')
+    temporal.write_text(json.dumps(_estado()), encoding='utf-8')
+    os.replace(temporal, destino)
+
+
+def _estados():
+    # Estado de todos los procesos: archivos del directorio + el propio (siempre al día)
+    directorio = directorio_multiproceso()
+    if directorio is None:
+        return [_estado()]
+    volcar(forzar=True)
+    estados = []
+    for archivo in directorio.glob('metricas_*.json'):
+        try:
+            estados.append(json.loads(archivo.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return estados
+
+
+def combinar_estados(estados):
+    """
+    Suma contadores e histogramas de varios procesos.
+    """
+    contadores = {}
+    histogramas = {}
+    for estado in estados:
+        for nombre, labels, valor in estado['contadores']:
+            clave = (nombre, tuple(tuple(par) for par in labels))
+            contadores[clave] = contadores.get(clave, 0) + valor
+        for nombre, labels, valores in estado['histogramas']:
+            clave = (nombre, tuple(tuple(par) for par in labels))
+            acumulado = histogramas.get(clave)
+            if acumulado is None:
+                histogramas[clave] = list(valores)
+            else:
+                for i, valor in enumerate(valores):
+                    acumulado[i] += valor
+    return contadores, histogramas
+
+
+def cuantil(conteos, q):
+    """
+    Estima el cuantil q a partir de los conteos por bucket (interpolación lineal,
+    como histogram_quantile de Prometheus).
+    """
+    total = sum(conteos)
+    if total == 0:
+        return float('nan')
+    objetivo = q * total
+    acumulado = 0
+    for i, conteo in enumerate(conteos):
+        if acumulado + conteo >= objetivo and conteo > 0:
+            if i == len(BUCKETS):
+                return BUCKETS[-1]
+            inferior = BUCKETS[i - 1] if i > 0 else 0.0
+            return inferior + (BUCKETS[i] - inferior) * (objetivo - acumulado) / conteo
+        acumulado += conteo
+    return BUCKETS[-1]
+
+
+def _formato_labels(labels, extra=()):
+    pares = list(labels) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pares)
+    return '{' + texto + '}'
+
+
+def exportar():
+    """
+    Retorna todas las métricas (sumadas entre procesos) en formato de texto de Prometheus.
+
+    Para cada histograma se exportan además los cuantiles p50/p95/p99
+    estimados a partir de los buckets como <nombre>_cuantil.
+    """
+    contadores, histogramas = combinar_estados(_estados())
+    lineas = []
+
+    for nombre, (tipo, ayuda) in DEFINICIONES.items():
+        if tipo == 'counter':
+            series = sorted((l, v) for (n, l), v in contadores.items() if n == nombre)
+            if not series:
+                continue
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+            lineas += [f'{nombre}{_formato_labels(l)} {v}' for l, v in series]
+            continue
+
+        series = sorted((l, h) for (n, l), h in histogramas.items() if n == nombre)
+        if not series:
+            continue
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+        for labels, valores in series:
+            conteos, suma = valores[:-1], valores[-1]
+            acumulado = 0
+            for limite, conteo in zip(BUCKETS + ('+Inf',), conteos):
+                acumulado += conteo
+                lineas.append(f'{nombre}_bucket{_formato_labels(labels, [("le", limite)])} {acumulado}')
+            lineas.append(f'{nombre}_sum{_formato_labels(labels)} {suma}')
+            lineas.append(f'{nombre}_count{_formato_labels(labels)} {acumulado}')
+
+        lineas += [f'# HELP {nombre}_cuantil {ayuda} (cuantiles estimados)', f'# TYPE {nombre}_cuantil gauge']
+        for labels, valores in series:
+            for q in CUANTILES:
+                lineas.append(f'{nombre}_cuantil{_formato_labels(labels, [("quantile", q)])} {cuantil(valores[:-1], q)}')
+
+    return '\n'.join(lineas) + '\n'
+
+
+def reiniciar():
+    """
+    Borra las métricas de este proceso y su volcado en el directorio
+    multiproceso, si existe (usado en tests y tras el precalentamiento).
+    """
+    with _lock:
+        _contadores.clear()
+        _histogramas.clear()
+    directorio = directorio_multiproceso()
+    if directorio is not None:
+        try:
+            (directorio / f'metricas_{os.getpid()}.json').unlink()
+        except FileNotFoundError:
+            pass
+
+
+def instrumentar(app):
+    """
+    Registra los hooks de Flask que miden cada request y cada template renderizado.
+    """
+    from flask import before_render_template, g, request, template_rendered
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g._metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def _registrar_request(response):
+        inicio = g.pop('_metricas_inicio', None)
+        if inicio is not None:
+            ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+            observar('ecoai_request_duracion_segundos', time.perf_counter() - inicio, ruta=ruta)
+            incrementar('ecoai_requests_total', ruta=ruta, metodo=request.method, status=str(response.status_code))
+            volcar()
+        return response
+
+    def _inicio_template(sender, template, context, **extra):
+        g.setdefault('_metricas_templates', []).append(time.perf_counter())
+
+    def _fin_template(sender, template, context, **extra):
+        pila = g.get('_metricas_templates')
+        if pila:
+            observar('ecoai_template_duracion_segundos', time.perf_counter() - pila.pop(),
+                     template=template.name or 'sin_nombre')
+
+    # weak=False: las funciones son locales y se perderían con referencias débiles
+    before_render_template.connect(_inicio_template, app, weak=False)
+    template_rendered.connect(_fin_template, app, weak=False)
@@ -0,0 +1,204 @@
+"""
+Perfilado de requests a pedido (cProfile).
+
+Deshabilitado por defecto: si no está definida ECOAI_PERFIL_DIR, registrar()
+no instala nada y las requests no pasan por este módulo. Habilitado, envuelve
+el WSGI de la app y perfila una request cuando:
+
+- trae el header X-EcoAI-Perfil con una firma válida: "<epoch>.<hmac>", el
+  HMAC-SHA256 con ECOAI_PERFIL_SECRETO de "<epoch>:<ruta>" (vale
+  VIGENCIA_FIRMA segundos y solo para esa ruta; ver firmar()), o
+- sale sorteada con la tasa de muestreo ECOAI_PERFIL_MUESTREO (0 a 1).
+
+Por cada request perfilada se escriben en el directorio <nombre>.prof (datos
+crudos de pstats, para snakeviz o `python -m pstats`) y <nombre>.txt (las
+funciones con más tiempo propio y acumulado), y la respuesta informa el
+nombre en el header X-EcoAI-Perfil. Se conservan los últimos MAX_PERFILES.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import metricas
+
+HEADER = 'X-EcoAI-Perfil'
+_HEADER_WSGI = 'HTTP_X_ECOAI_PERFIL'
+
+# Segundos durante los que una firma es válida
+VIGENCIA_FIRMA = 300
+
+# Perfiles conservados en el directorio (se borran los más antiguos)
+MAX_PERFILES = 200
+
+# Funciones listadas en el resumen de texto, por cada orden
+FUNCIONES_RESUMEN = 30
+
+_contador = itertools.count(1)
+
+
+def firmar(secreto, ruta, ahora=None):
+    """
+    Valor del header X-EcoAI-Perfil que habilita el perfilado de `ruta`.
+
+    Args:
+        secreto: ECOAI_PERFIL_SECRETO
+        ruta: path de la request (ej: /comparativo), sin query string
+        ahora: epoch en segundos (por defecto, ahora)
+    """
+    epoch = int(time.time() if ahora is None else ahora)
+    firma = hmac.new(secreto.encode('utf-8'), f'{epoch}:{ruta}'.encode('utf-8'), hashlib.sha256).hexdigest()
+    return f'{epoch}.{firma}'
+
+
+def firma_valida(secreto, valor, ruta, ahora=None):
+    """
+    Verifica un header X-EcoAI-Perfil: firma correcta para la ruta y dentro de la vigencia.
+    """
+    epoch, _, _ = valor.partition('.')
+    try:
+        epoch = int(epoch)
+    except ValueError:
+        return False
+    ahora = time.time() if ahora is None else ahora
+    if abs(ahora - epoch) > VIGENCIA_FIRMA:
+        return False
+    return hmac.compare_digest(valor, firmar(secreto, ruta, epoch))
+
+
+def resumen_texto(perfil, encabezado, limite=FUNCIONES_RESUMEN):
+    """
+    Resumen legible de un perfil: las funciones con más tiempo propio y con más tiempo acumulado.
+    """
+    salida = io.StringIO()
+    salida.write(encabezado + '\n')
+    stats = pstats.Stats(perfil, stream=salida)
+    stats.strip_dirs()
+    for orden, titulo in (('tottime', 'tiempo propio'), ('cumulative', 'tiempo acumulado')):
+        salida.write(f'\n=== Funciones con más {titulo} ===\n')
+        stats.sort_stats(orden).print_stats(limite)
+    return salida.getvalue()
+
+
+class Perfilador:
+    """
+    Middleware WSGI que perfila las requests firmadas o sorteadas.
+    """
+
+    def __init__(self, wsgi_app, directorio, secreto=None, muestreo=0.0, max_perfiles=MAX_PERFILES):
+        self.wsgi_app = wsgi_app
+        self.directorio = Path(directorio)
+        self.secreto = secreto or None
+        self.muestreo = float(muestreo)
+        self.max_perfiles = max_perfiles
+        self._lock = threading.Lock()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def debe_perfilar(self, environ):
+        """
+        True si la request trae una firma válida o sale sorteada.
+        """
+        valor = environ.get(_HEADER_WSGI)
+        if valor and self.secreto and firma_valida(self.secreto, valor, environ.get('PATH_INFO', '')):
+            return True
+        return self.muestreo > 0 and random.random() < self.muestreo
+
+    def __call__(self, environ, start_response):
+        if not self.debe_perfilar(environ):
+            return self.wsgi_app(environ, start_response)
+
+        metodo = environ.get('REQUEST_METHOD', 'GET')
+        ruta = environ.get('PATH_INFO', '/')
+        nombre = '{}_{}_{}_{}_{}'.format(
+            datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S'), metodo,
+            re.sub(r'[^A-Za-z0-9]+', '-', ruta).strip('-') or 'raiz', os.getpid(), next(_contador))
+        status = []
+
+        def start_response_perfil(estado, headers, exc_info=None):
+            status.append(estado)
+            return start_response(estado, headers + [(HEADER, nombre)], exc_info)
+
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        perfil.enable()
+        try:
+            # El cuerpo se consume dentro del perfil (incluye templates que se generan al iterar)
+            respuesta = self.wsgi_app(environ, start_response_perfil)
+            try:
+                cuerpo = list(respuesta)
+            finally:
+                if hasattr(respuesta, 'close'):
+                    respuesta.close()
+        finally:
+            perfil.disable()
+            duracion = time.perf_counter() - inicio
+            try:
+                self.guardar(perfil, nombre, f'{metodo} {ruta} -> {status[0] if status else "sin respuesta"} '
+                                             f'en {duracion * 1000:.1f} ms (pid {os.getpid()})')
+            except OSError as e:
+                print(f"perfilado: no se pudo guardar {nombre}: {e}", file=sys.stderr)
+        return cuerpo
+
+    def guardar(self, perfil, nombre, encabezado):
+        """
+        Escribe <nombre>.prof y <nombre>.txt y borra los perfiles más antiguos que MAX_PERFILES.
+        """
+        perfil.dump_stats(self.directorio / f'{nombre}.prof')
+        (self.directorio / f'{nombre}.txt').write_text(resumen_texto(perfil, encabezado), encoding='utf-8')
+        metricas.incrementar('ecoai_perfiles_total')
+        with self._lock:
+            crudos = sorted(self.directorio.glob('*.prof'), key=lambda p: (p.stat().st_mtime_ns, p.name))
+            for viejo in crudos[:max(0, len(crudos) - self.max_perfiles)]:
+                viejo.unlink(missing_ok=True)
+                viejo.with_suffix('.txt').unlink(missing_ok=True)
+
+
+def registrar(app):
+    """
+    Instala el perfilado en la app si está definida ECOAI_PERFIL_DIR.
+
+    Sin esa variable no se modifica la app (costo cero por request).
+    Con ella, al menos uno de ECOAI_PERFIL_SECRETO o ECOAI_PERFIL_MUESTREO
+    determina qué requests se perfilan.
+
+    Returns:
+        el Perfilador instalado, o None
+
+    Raises:
+        ValueError si ECOAI_PERFIL_MUESTREO no es un número entre 0 y 1
+    """
+    directorio = os.environ.get('ECOAI_PERFIL_DIR')
+    if not directorio:
+        return None
+    try:
+        muestreo = float(os.environ.get('ECOAI_PERFIL_MUESTREO') or 0)
+    except ValueError:
+        muestreo = -1
+    if not 0 <= muestreo <= 1:
+        raise ValueError("ECOAI_PERFIL_MUESTREO debe ser un número entre 0 y 1")
+    perfilador = Perfilador(app.wsgi_app, directorio, os.environ.get('ECOAI_PERFIL_SECRETO'), muestreo)
+    app.wsgi_app = perfilador
+    return perfilador
+
+
+def main_firmar(args):
+    """
+    Punto de entrada del subcomando `python -m utils perfil`: imprime el header firmado.
+    """
+    secreto = os.environ.get('ECOAI_PERFIL_SECRETO')
+    if not secreto:
+        print("Error: definir ECOAI_PERFIL_SECRETO", file=sys.stderr)
+        return 1
+    print(f'{HEADER}: {firmar(secreto, args.ruta)}')
+    return 0
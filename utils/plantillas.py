@@ -0,0 +1,150 @@
+"""
+Caches de templates: bytecode de Jinja en disco y fragmentos renderizados.
+
+- Bytecode: cada worker de gunicorn compila base.html, index.html, ... la
+  primera vez que los usa. Con un FileSystemBytecodeCache el código
+  compilado se escribe una vez y lo reutilizan los demás workers y los
+  reinicios. El directorio es ECOAI_JINJA_CACHE_DIR o, por defecto, el de
+  Jinja para el usuario (<tmp>/_jinja2-cache-<uid>, permisos 0700: el
+  bytecode se ejecuta al cargarse y no debe poder escribirlo otro usuario).
+  Jinja invalida cada entrada por el checksum del template.
+- Versión: version_templates() resume las fuentes de los templates en un
+  hash, para los ETag de las páginas que no dependen del dataset.
+- Fragmentos: {% fragmento 'nombre' %}...{% endfragmento %} renderiza el
+  bloque una vez por versión del dataset y luego retorna el HTML guardado.
+  Se usa en las partes de las páginas que no dependen de la request (textos,
+  navegación, listas de modelos y tipos); los valores calculados se siguen
+  renderizando en cada request. Con auto_reload (modo debug) no se cachea.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import weakref
+from pathlib import Path
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from . import calculator
+
+# Etiquetas del formulario por tipo de consulta (los tipos nuevos usan su nombre)
+ETIQUETAS_TIPO = {
+    'texto': ('Consultas de texto 📄', 'Número de consultas de texto simple'),
+    'código': ('Creación de código 💻', 'Cantidad de bloques de código'),
+    'imagen': ('Generación de imagen 🖼️', 'Número de imágenes generadas'),
+    'audio': ('Transcripción de audio 🎵', 'Cantidad de minutos de audio'),
+    'video': ('Creación de video 🎬', 'Cantidad de minutos de video'),
+}
+
+# Hash de las fuentes por entorno de Jinja (ver version_templates)
+_versiones = weakref.WeakKeyDictionary()
+
+
+class CacheFragmentos(Extension):
+    """
+    Extensión de Jinja con el tag {% fragmento 'nombre' %}.
+
+    Los fragmentos se guardan en memoria por proceso como
+    nombre -> (versión del dataset, HTML); un cambio de versión los regenera.
+    """
+    tags = {'fragmento'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.fragmentos = {}
+        self.generados = 0
+        self._lock = threading.Lock()
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        nombre = parser.parse_expression()
+        cuerpo = parser.parse_statements(('name:endfragmento',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_renderizar', [nombre]), [], [], cuerpo).set_lineno(lineno)
+
+    def _renderizar(self, nombre, caller):
+        if self.environment.auto_reload:
+            return caller()
+        version = calculator.GESTOR.actual().version
+        guardado = self.fragmentos.get(nombre)
+        if guardado is not None and guardado[0] == version:
+            return guardado[1]
+        html = Markup(caller())
+        with self._lock:
+            self.fragmentos[nombre] = (version, html)
+            self.generados += 1
+        return html
+
+    def limpiar(self):
+        """
+        Descarta los fragmentos guardados (usado en tests).
+        """
+        with self._lock:
+            self.fragmentos.clear()
+
+
+def version_templates(entorno):
+    """
+    Hash de las fuentes de todos los templates .html del entorno.
+
+    Se calcula una vez por proceso; con auto_reload (modo debug), en cada
+    llamada, así refleja los templates editados.
+    """
+    if not entorno.auto_reload:
+        version = _versiones.get(entorno)
+        if version is not None:
+            return version
+    digest = hashlib.sha256()
+    for nombre in entorno.list_templates(filter_func=lambda nombre: nombre.endswith('.html')):
+        fuente = entorno.loader.get_source(entorno, nombre)[0]
+        digest.update(f'{nombre}\0{fuente}\0'.encode('utf-8'))
+    version = digest.hexdigest()[:16]
+    _versiones[entorno] = version
+    return version
+
+
+def catalogo():
+    """
+    Modelos (con su proveedor) y tipos de consulta del dataset vigente, para los formularios.
+
+    Returns:
+        dict con modelos ([{modelo, proveedor}]) y tipos_consulta ([{tipo, etiqueta, ayuda}])
+    """
+    tabla = calculator.GESTOR.actual().tabla
+    proveedores = {}
+    for (modelo, _), coef in tabla.items():
+        proveedores.setdefault(modelo, coef.proveedor)
+    tipos = []
+    for tipo in tabla.tipos_consulta():
+        etiqueta, ayuda = ETIQUETAS_TIPO.get(tipo, (tipo.capitalize(), f'Cantidad de {tipo}'))
+        tipos.append({'tipo': tipo, 'etiqueta': etiqueta, 'ayuda': ayuda})
+    return {
+        'modelos': [{'modelo': modelo, 'proveedor': proveedores[modelo]} for modelo in tabla.modelos()],
+        'tipos_consulta': tipos,
+    }
+
+
+def registrar(app):
+    """
+    Instala el cache de bytecode, la extensión de fragmentos y catalogo() en los templates.
+
+    ECOAI_JINJA_CACHE_DIR elige el directorio del bytecode (por defecto, el
+    de Jinja para el usuario); definida vacía deshabilita el cache en disco.
+
+    Returns:
+        la extensión CacheFragmentos instalada
+    """
+    directorio = os.environ.get('ECOAI_JINJA_CACHE_DIR')
+    entorno = app.jinja_env
+    if directorio != '':
+        try:
+            if directorio:
+                Path(directorio).mkdir(parents=True, exist_ok=True)
+            entorno.bytecode_cache = FileSystemBytecodeCache(directorio)
+        except (OSError, RuntimeError) as e:
+            print(f"plantillas: sin cache de bytecode en {directorio}: {e}", file=sys.stderr)
+    entorno.add_extension(CacheFragmentos)
+    app.add_template_global(catalogo, 'catalogo')
+    return entorno.extensions[CacheFragmentos.identifier]
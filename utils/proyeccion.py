@@ -0,0 +1,226 @@
+"""
+Proyecciones y barridos de impacto sobre la tabla de coeficientes.
+
+Evalúa el impacto sobre grillas de cantidad × modelo × tipo de consulta ×
+horizonte en una sola pasada por serie y retorna columnas compactas. Las
+series largas se reducen a un presupuesto de puntos con LTTB
+(Largest-Triangle-Three-Buckets), que conserva la forma visual de la curva.
+"""
+
+import math
+from itertools import accumulate, repeat
+from operator import mul
+
+from .calculator import CANTIDAD_MAXIMA, GESTOR, error_cantidad
+
+# Métricas disponibles y atributo del coeficiente del que salen
+METRICAS = {
+    'agua': 'agua',
+    'energia': 'energia',
+    'co2': 'carbono',
+}
+
+
+def grilla(desde, hasta, pasos, escala='lineal'):
+    """
+    Genera una grilla de `pasos` cantidades entre `desde` y `hasta` (inclusive).
+
+    Args:
+        escala: 'lineal' o 'log' (espaciado geométrico, requiere desde > 0)
+    """
+    if pasos < 1:
+        raise ValueError("pasos debe ser al menos 1")
+    if not (math.isfinite(desde) and math.isfinite(hasta)):
+        raise ValueError("desde y hasta deben ser números finitos")
+    if pasos == 1:
+        return [float(desde)]
+    if escala == 'log':
+        if desde <= 0 or hasta <= 0:
+            raise ValueError("la escala logarítmica requiere valores positivos")
+        inicio, fin = math.log10(desde), math.log10(hasta)
+        paso = (fin - inicio) / (pasos - 1)
+        return [10 ** (inicio + paso * i) for i in range(pasos)]
+    if escala != 'lineal':
+        raise ValueError(f"Escala no válida: {escala}")
+    paso = (hasta - desde) / (pasos - 1)
+    return [desde + paso * i for i in range(pasos)]
+
+
+def lttb(x, y, umbral):
+    """
+    Selecciona hasta `umbral` índices de la serie (x, y) con Largest-Triangle-Three-Buckets.
+
+    Conserva siempre el primer y el último punto.
+
+    Returns:
+        lista ordenada de índices
+    """
+    n = len(x)
+    if umbral >= n:
+        return list(range(n))
+    if umbral < 3:
+        raise ValueError("el presupuesto de puntos debe ser al menos 3")
+
+    indices = [0]
+    tamano_bucket = (n - 2) / (umbral - 2)
+    a = 0
+    for i in range(umbral - 2):
+        # Promedio del bucket siguiente (tercer vértice del triángulo)
+        inicio_sig = int((i + 1) * tamano_bucket) + 1
+        fin_sig = min(int((i + 2) * tamano_bucket) + 1, n)
+        cantidad_sig = fin_sig - inicio_sig
+        x_prom = sum(x[inicio_sig:fin_sig]) / cantidad_sig
+        y_prom = sum(y[inicio_sig:fin_sig]) / cantidad_sig
+
+        # Punto del bucket actual que forma el triángulo de mayor área
+        inicio = int(i * tamano_bucket) + 1
+        fin = int((i + 1) * tamano_bucket) + 1
+        xa, ya = x[a], y[a]
+        mejor, area_max = inicio, -1.0
+        for j in range(inicio, fin):
+            area = abs((xa - x_prom) * (y[j] - ya) - (xa - x[j]) * (y_prom - ya))
+            if area > area_max:
+                area_max, mejor = area, j
+        indices.append(mejor)
+        a = mejor
+    indices.append(n - 1)
+    return indices
+
+
+def reducir(x, y, max_puntos):
+    """
+    Reduce la serie (x, y) a `max_puntos` con LTTB; retorna (x, y) sin cambios si ya cabe.
+    """
+    if not max_puntos or len(x) <= max_puntos:
+        return x, y
+    indices = lttb(x, y, max_puntos)
+    return [x[i] for i in indices], [y[i] for i in indices]
+
+
+def _resolver_combinaciones(tabla, modelos, tipos_consulta):
+    # Usa todos los modelos/tipos del dataset si no se especifican
+    if not modelos:
+        modelos = tabla.modelos()
+    if not tipos_consulta:
+        tipos_consulta = tabla.tipos_consulta()
+    return list(modelos), list(tipos_consulta)
+
+
+def _validar_cantidades(cantidades, horizontes):
+    # Cantidades y horizontes finitos y positivos, sin que su producto supere
+    # CANTIDAD_MAXIMA (así todas las series quedan finitas)
+    for cantidad in cantidades:
+        error = error_cantidad(cantidad)
+        if error:
+            raise ValueError(f"{error} (cantidad: {cantidad})")
+    for horizonte in horizontes:
+        if not isinstance(horizonte, (int, float)) or not 0 < horizonte < math.inf:
+            raise ValueError(f"los horizontes deben ser números positivos (horizonte: {horizonte})")
+    if cantidades and horizontes and max(cantidades) * max(horizontes) > CANTIDAD_MAXIMA:
+        raise ValueError(f"cantidad × horizonte no puede superar {CANTIDAD_MAXIMA:.0e}")
+
+
+def barrido(modelos=None, tipos_consulta=None, cantidades=(1, 10, 100, 1000, 10000),
+            horizontes=(1,), max_puntos=None):
+    """
+    Evalúa el impacto sobre la grilla cantidad × modelo × tipo_consulta × horizonte.
+
+    Cada serie corresponde a una combinación (modelo, tipo_consulta, horizonte)
+    y recorre la grilla de cantidades; el horizonte multiplica la cantidad
+    (ej: cantidad diaria × 30 días).
+
+    Como todas las métricas son proporcionales a la cantidad, las series son la
+    misma curva escalada: LTTB elige los mismos puntos para todas, así que la
+    grilla se reduce una sola vez y solo se evalúan los puntos conservados.
+
+    Args:
+        modelos: lista de modelos (por defecto todos los del dataset)
+        tipos_consulta: lista de tipos (por defecto todos los del dataset)
+        cantidades: grilla de cantidades (ver grilla())
+        horizontes: multiplicadores de periodo (ej: [1, 30, 365])
+        max_puntos: presupuesto de puntos por serie (LTTB); None para no reducir
+
+    Raises:
+        ValueError si una cantidad u horizonte no es finito y positivo, o su
+        producto supera CANTIDAD_MAXIMA
+
+    Returns:
+        dict con 'x' (grilla de cantidades, común a todas las series),
+        'modelos', 'tipos_consulta', 'horizontes' (diccionarios de códigos),
+        'series' ([{modelo, tipo_consulta, horizonte, agua, energia, co2}] con
+        índices a esos diccionarios) y 'omitidas' (combinaciones sin datos)
+    """
+    tabla = GESTOR.actual().tabla
+    modelos, tipos_consulta = _resolver_combinaciones(tabla, modelos, tipos_consulta)
+    horizontes = list(horizontes)
+    _validar_cantidades(list(cantidades), horizontes)
+    cantidades, _ = reducir(list(cantidades), list(cantidades), max_puntos)
+
+    series = []
+    omitidas = []
+    for i_modelo, modelo in enumerate(modelos):
+        for i_tipo, tipo_consulta in enumerate(tipos_consulta):
+            coef = tabla.get((modelo, tipo_consulta))
+            if coef is None:
+                omitidas.append([modelo, tipo_consulta])
+                continue
+            for i_horizonte, horizonte in enumerate(horizontes):
+                serie = {'modelo': i_modelo, 'tipo_consulta': i_tipo, 'horizonte': i_horizonte}
+                for metrica, atributo in METRICAS.items():
+                    serie[metrica] = list(map(mul, cantidades, repeat(getattr(coef, atributo) * horizonte)))
+                series.append(serie)
+
+    return {
+        'x': cantidades,
+        'modelos': modelos,
+        'tipos_consulta': tipos_consulta,
+        'horizontes': horizontes,
+        'series': series,
+        'omitidas': omitidas,
+    }
+
+
+def proyeccion_temporal(modelo, tipo_consulta, cantidad_por_periodo, periodos,
+                        crecimiento=0.0, max_puntos=None):
+    """
+    Proyecta el impacto acumulado periodo a periodo, con crecimiento compuesto del uso.
+
+    El uso del periodo t (1..periodos) es cantidad_por_periodo × (1 + crecimiento)^(t-1).
+
+    Raises:
+        ValueError si la cantidad o el crecimiento no son válidos, o si el uso
+        acumulado superaría CANTIDAD_MAXIMA
+
+    Returns:
+        dict con columnas x (periodo), cantidad (acumulada), agua, energia y
+        co2 (acumulados), o None si la combinación no existe
+    """
+    coef = GESTOR.actual().tabla.get((modelo, tipo_consulta))
+    if coef is None:
+        return None
+    if periodos < 1:
+        raise ValueError("periodos debe ser al menos 1")
+    error = error_cantidad(cantidad_por_periodo)
+    if error:
+        raise ValueError(error)
+    if not isinstance(crecimiento, (int, float)) or not -1 < crecimiento < math.inf:
+        raise ValueError("el crecimiento debe ser un número finito mayor que -1")
+
+    factor = 1.0 + crecimiento
+    # Cota del acumulado (periodos × el uso del último periodo), en logaritmos
+    # para no desbordar factor ** t
+    cota = math.log10(cantidad_por_periodo) + math.log10(periodos) + (periodos - 1) * math.log10(max(factor, 1.0))
+    if cota > math.log10(CANTIDAD_MAXIMA):
+        raise ValueError(f"el uso acumulado superaría {CANTIDAD_MAXIMA:.0e}: reducir crecimiento o periodos")
+    uso = [cantidad_por_periodo * factor ** t for t in range(periodos)]
+    # Las métricas son proporcionales a la cantidad acumulada: se reduce esa curva
+    x, acumulado = reducir(list(range(1, periodos + 1)), list(accumulate(uso)), max_puntos)
+    serie = {
+        'modelo': modelo,
+        'tipo_consulta': tipo_consulta,
+        'x': x,
+        'cantidad': acumulado,
+    }
+    for metrica, atributo in METRICAS.items():
+        serie[metrica] = list(map(mul, acumulado, repeat(getattr(coef, atributo))))
+    return serie
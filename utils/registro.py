@@ -0,0 +1,510 @@
+"""
+Registro persistente del uso (ledger) en SQLite con escritura diferida.
+
+Cada cálculo registrado se encola en memoria y un thread de fondo lo escribe
+en lotes (un INSERT múltiple por transacción), así la latencia de la request
+no incluye el fsync del disco. La base usa WAL, de modo que varios workers de
+gunicorn pueden escribir en el mismo archivo y las consultas no bloquean a
+los escritores.
+
+Las consultas de totales agrupan por equipo, modelo, tipo de consulta y
+periodo (prefijo de la fecha ISO 8601, igual que la ingesta) sobre índices
+que empiezan por el filtro más común de cada caso.
+
+Además se mantienen acumulados materializados por día, mes y año (por modelo
+y tipo de consulta) en la tabla acumulados. Cada lote escrito, y cada archivo
+ingerido con `python -m utils ingerir --registro`, suma sus totales sobre
+esos buckets con un UPSERT, así actualizar cuesta O(1) por bucket tocado y
+leer un año de uso cuesta O(buckets), sin recorrer los registros crudos.
+"""
+
+import atexit
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+
+from . import metricas
+from .ingesta import PERIODOS
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usos (
+    id INTEGER PRIMARY KEY,
+    fecha TEXT NOT NULL,            -- ISO 8601 en UTC (AAAA-MM-DDTHH:MM:SS)
+    equipo TEXT NOT NULL DEFAULT '',
+    modelo TEXT NOT NULL,
+    tipo_consulta TEXT NOT NULL,
+    cantidad REAL NOT NULL,
+    agua REAL NOT NULL,
+    energia REAL NOT NULL,
+    co2 REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usos_fecha ON usos (fecha);
+CREATE INDEX IF NOT EXISTS usos_equipo_fecha ON usos (equipo, fecha);
+CREATE INDEX IF NOT EXISTS usos_modelo_tipo_fecha ON usos (modelo, tipo_consulta, fecha);
+"""
+
+ESQUEMA_ACUMULADOS = """
+CREATE TABLE IF NOT EXISTS acumulados (
+    granularidad TEXT NOT NULL,     -- dia, mes o anio
+    periodo TEXT NOT NULL,          -- prefijo de la fecha (o 'sin_fecha')
+    modelo TEXT NOT NULL,
+    tipo_consulta TEXT NOT NULL,
+    registros INTEGER NOT NULL,
+    cantidad REAL NOT NULL,
+    agua REAL NOT NULL,
+    energia REAL NOT NULL,
+    co2 REAL NOT NULL,
+    PRIMARY KEY (granularidad, periodo, modelo, tipo_consulta)
+) WITHOUT ROWID;
+"""
+
+ACUMULAR = """
+INSERT INTO acumulados (granularidad, periodo, modelo, tipo_consulta, registros, cantidad, agua, energia, co2)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularidad, periodo, modelo, tipo_consulta) DO UPDATE SET
+    registros = registros + excluded.registros,
+    cantidad = cantidad + excluded.cantidad,
+    agua = agua + excluded.agua,
+    energia = energia + excluded.energia,
+    co2 = co2 + excluded.co2
+"""
+
+# Reconstruye los acumulados de una base creada antes de que existieran
+RECONSTRUIR_ACUMULADOS = """
+INSERT INTO acumulados
+SELECT ?, substr(fecha, 1, ?), modelo, tipo_consulta, count(*), sum(cantidad), sum(agua), sum(energia), sum(co2)
+FROM usos GROUP BY 2, modelo, tipo_consulta
+"""
+
+INSERTAR = """
+INSERT INTO usos (fecha, equipo, modelo, tipo_consulta, cantidad, agua, energia, co2)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Columnas por las que se puede agrupar y filtrar
+AGRUPACIONES = ('equipo', 'modelo', 'tipo_consulta')
+
+# Granularidades materializadas en la tabla acumulados
+GRANULARIDADES = ('dia', 'mes', 'anio')
+
+# Segundos que el escritor espera a juntar un lote antes de escribir
+INTERVALO_ESCRITURA = 0.5
+
+# Filas que disparan la escritura sin esperar el intervalo
+TAMANO_LOTE = 5000
+
+# Máximo de filas en cola; por encima se descartan (no se bloquea la request)
+MAX_PENDIENTES = 200_000
+
+# Registros vivos, para reiniciar su estado en el proceso hijo tras un fork
+_registros = weakref.WeakSet()
+
+
+def _tras_fork():
+    # Las filas pendientes del padre las escribe el padre; el hijo parte con
+    # una cola vacía y arranca su propio escritor en el primer registro
+    for registro in _registros:
+        registro._condicion = threading.Condition()
+        registro._pendientes = deque()
+        registro._en_escritura = 0
+        registro._pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def ahora_iso():
+    """
+    Fecha y hora actual en UTC como 'AAAA-MM-DDTHH:MM:SS'.
+    """
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def sumar_acumulados(grupos):
+    """
+    Lleva totales por (periodo, modelo, tipo_consulta) a los buckets de cada granularidad.
+
+    Args:
+        grupos: iterable de (periodo, modelo, tipo_consulta, registros, cantidad,
+            agua, energia, co2), con periodo de al menos un día ('AAAA-MM-DD...')
+            o 'sin_fecha'
+
+    Returns:
+        dict {(granularidad, periodo, modelo, tipo_consulta): [registros, cantidad, agua, energia, co2]}
+
+    Raises:
+        ValueError si un periodo es más grueso que un día
+    """
+    buckets = {}
+    for periodo, modelo, tipo_consulta, *valores in grupos:
+        if periodo != 'sin_fecha' and len(periodo) < PERIODOS['dia']:
+            raise ValueError(f"periodo más grueso que un día: {periodo!r}")
+        for granularidad in GRANULARIDADES:
+            clave = (granularidad, periodo if periodo == 'sin_fecha' else periodo[:PERIODOS[granularidad]],
+                     modelo, tipo_consulta)
+            acc = buckets.get(clave)
+            if acc is None:
+                buckets[clave] = list(valores)
+            else:
+                for i, valor in enumerate(valores):
+                    acc[i] += valor
+    return buckets
+
+
+# Fecha ISO 8601 con al menos el día: los acumulados se arman con su prefijo
+_FECHA = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _fila_valida(fila):
+    # Textos y números que la base acepta: un NaN violaría NOT NULL y un int
+    # fuera de 64 bits no entra en SQLite (y harían fallar el lote completo)
+    if len(fila) != 8 or not isinstance(fila[0], str) or not _FECHA.match(fila[0]):
+        return False
+    for i, valor in enumerate(fila):
+        if i < 4:
+            if not isinstance(valor, str):
+                return False
+        elif type(valor) is int:
+            if not -2 ** 63 <= valor < 2 ** 63:
+                return False
+        elif type(valor) is not float or not math.isfinite(valor):
+            return False
+    return True
+
+
+def _escribir_lote(conexion, lote):
+    # Registros crudos y acumulados en la misma transacción: o se escriben ambos o ninguno
+    with conexion:
+        conexion.executemany(INSERTAR, lote)
+        _escribir_acumulados(conexion, sumar_acumulados(_por_dia(lote)))
+
+
+def _por_dia(filas):
+    # Filas del registro -> totales por (día, modelo, tipo_consulta)
+    dias = {}
+    for fecha, _, modelo, tipo_consulta, cantidad, agua, energia, co2 in filas:
+        clave = (fecha[:PERIODOS['dia']], modelo, tipo_consulta)
+        acc = dias.get(clave)
+        if acc is None:
+            dias[clave] = [1, cantidad, agua, energia, co2]
+        else:
+            acc[0] += 1
+            acc[1] += cantidad
+            acc[2] += agua
+            acc[3] += energia
+            acc[4] += co2
+    return ((*clave, *valores) for clave, valores in dias.items())
+
+
+def _escribir_acumulados(conexion, buckets):
+    conexion.executemany(ACUMULAR, ((*clave, *valores) for clave, valores in buckets.items()))
+
+
+def conectar(ruta):
+    """
+    Abre una conexión a la base del registro (WAL, fsync solo en los checkpoints).
+    """
+    conexion = sqlite3.connect(ruta, timeout=30)
+    conexion.execute('PRAGMA journal_mode=WAL')
+    conexion.execute('PRAGMA synchronous=NORMAL')
+    return conexion
+
+
+class RegistroUso:
+    """
+    Registro de uso en SQLite con una cola de escritura diferida por proceso.
+
+    Args:
+        ruta: archivo de la base (se crea con el esquema si no existe)
+        intervalo: segundos que el escritor espera a juntar un lote
+        max_pendientes: máximo de filas en cola antes de descartar
+    """
+
+    def __init__(self, ruta, intervalo=INTERVALO_ESCRITURA, max_pendientes=MAX_PENDIENTES):
+        self.ruta = str(ruta)
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        self.escritos = 0
+        self.descartados = 0
+        self.ultimo_error = None
+        self._condicion = threading.Condition()
+        self._pendientes = deque()
+        self._en_escritura = 0
+        self._urgente = False
+        self._pid = None
+        with conectar(self.ruta) as conexion:
+            conexion.executescript(ESQUEMA)
+            nueva = conexion.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name = 'acumulados'").fetchone()[0] == 0
+            conexion.executescript(ESQUEMA_ACUMULADOS)
+            if nueva:
+                for granularidad in GRANULARIDADES:
+                    conexion.execute(RECONSTRUIR_ACUMULADOS, (granularidad, PERIODOS[granularidad]))
+        conexion.close()
+        _registros.add(self)
+        atexit.register(self.vaciar)
+
+    def registrar(self, modelo, tipo_consulta, cantidad, agua, energia, co2, equipo='', fecha=None):
+        """
+        Encola un cálculo para escribirlo en segundo plano (no toca el disco).
+
+        Returns:
+            True si se encoló, False si la cola estaba llena
+        """
+        fila = (fecha or ahora_iso(), equipo or '', modelo, tipo_consulta, cantidad, agua, energia, co2)
+        return self.registrar_filas([fila])
+
+    def registrar_filas(self, filas):
+        """
+        Encola varias filas (fecha, equipo, modelo, tipo_consulta, cantidad, agua, energia, co2).
+
+        El escritor valida cada fila antes de insertarla: las que tienen un
+        texto faltante o un número no finito se descartan (y se cuentan en
+        descartados) sin afectar al resto del lote.
+
+        Returns:
+            True si se encolaron, False si no había lugar (se descartan todas)
+        """
+        filas = list(filas)
+        with self._condicion:
+            if len(self._pendientes) + len(filas) > self.max_pendientes:
+                self.descartados += len(filas)
+                metricas.incrementar('ecoai_registro_descartados_total', len(filas))
+                return False
+            self._pendientes.extend(filas)
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._escritor, name='registro-uso', daemon=True).start()
+            if len(self._pendientes) >= TAMANO_LOTE:
+                self._condicion.notify_all()
+        return True
+
+    def pendientes(self):
+        """Filas encoladas o en escritura que todavía no están en la base."""
+        with self._condicion:
+            return len(self._pendientes) + self._en_escritura
+
+    def vaciar(self, timeout=10.0):
+        """
+        Espera a que se escriban todas las filas encoladas.
+
+        Returns:
+            True si la cola quedó vacía antes del timeout
+        """
+        with self._condicion:
+            if self._pid != os.getpid():
+                return not self._pendientes
+            self._urgente = True
+            self._condicion.notify_all()
+            return self._condicion.wait_for(lambda: not self._pendientes and not self._en_escritura, timeout)
+
+    def _escritor(self):
+        conexion = conectar(self.ruta)
+        condicion = self._condicion
+        while True:
+            with condicion:
+                condicion.wait_for(lambda: self._pendientes)
+                # Se junta un lote: hasta TAMANO_LOTE filas, el intervalo o un vaciar()
+                condicion.wait_for(lambda: self._urgente or len(self._pendientes) >= TAMANO_LOTE, self.intervalo)
+                lote = list(self._pendientes)
+                self._pendientes.clear()
+                self._en_escritura = len(lote)
+                self._urgente = False
+            inicio = time.perf_counter()
+            invalidas = len(lote)
+            lote = [fila for fila in lote if _fila_valida(fila)]
+            invalidas -= len(lote)
+            if invalidas:
+                # Se descartan solo las filas inválidas; el resto del lote se escribe
+                self.descartados += invalidas
+                metricas.incrementar('ecoai_registro_descartados_total', invalidas)
+                self.ultimo_error = f"{invalidas} filas inválidas descartadas"
+            try:
+                _escribir_lote(conexion, lote)
+                self.escritos += len(lote)
+                if not invalidas:
+                    self.ultimo_error = None
+            except Exception as e:
+                # Cualquier error (no solo de SQLite) mataría el thread y el registro
+                # dejaría de escribirse: se reintenta fila por fila y se descartan las que fallan
+                print(f"Advertencia: no se pudo escribir un lote de {len(lote)} filas en el registro de uso: {e}")
+                fallidas = 0
+                for fila in lote:
+                    try:
+                        _escribir_lote(conexion, [fila])
+                    except Exception as e_fila:
+                        fallidas += 1
+                        self.ultimo_error = str(e_fila)
+                self.escritos += len(lote) - fallidas
+                if fallidas:
+                    self.descartados += fallidas
+                    metricas.incrementar('ecoai_registro_descartados_total', fallidas)
+                    print(f"Advertencia: {fallidas} filas descartadas del registro de uso: {self.ultimo_error}")
+                elif not invalidas:
+                    self.ultimo_error = None
+            metricas.observar('ecoai_registro_escritura_duracion_segundos', time.perf_counter() - inicio)
+            with condicion:
+                self._en_escritura = 0
+                condicion.notify_all()
+
+    def totales(self, por=('equipo',), periodo='mes', desde=None, hasta=None, **filtros):
+        """
+        Totales de impacto agrupados, leídos con una sola consulta indexada.
+
+        Solo incluye las filas ya escritas (las encoladas aparecen como máximo
+        un intervalo después).
+
+        Args:
+            por: columnas de AGRUPACIONES por las que agrupar
+            periodo: 'hora', 'dia', 'mes', 'anio' o 'total'
+            desde: prefijo de fecha inicial, inclusive (ej: '2025-01')
+            hasta: prefijo de fecha final, inclusive (ej: '2025-03' incluye todo marzo)
+            filtros: igualdad sobre equipo, modelo o tipo_consulta
+
+        Returns:
+            lista de dicts {<por>..., periodo, registros, cantidad, agua, energia, co2}
+            ordenada por las columnas de agrupación y el periodo
+
+        Raises:
+            ValueError si una columna o el periodo no son válidos
+        """
+        por = list(por)
+        for columna in por + list(filtros):
+            if columna not in AGRUPACIONES:
+                raise ValueError(f"columna no válida: {columna!r}; usar {', '.join(AGRUPACIONES)}")
+        if periodo not in PERIODOS:
+            raise ValueError(f"periodo no válido: {periodo!r}; usar {', '.join(PERIODOS)}")
+
+        largo = PERIODOS[periodo]
+        expresion_periodo = f'substr(fecha, 1, {largo})' if largo else "'total'"
+        condiciones, parametros = [], []
+        for columna, valor in filtros.items():
+            if valor is not None:
+                condiciones.append(f'{columna} = ?')
+                parametros.append(valor)
+        if desde:
+            condiciones.append('fecha >= ?')
+            parametros.append(desde)
+        if hasta:
+            # '~' ordena después de cualquier carácter de una fecha ISO: incluye todo el prefijo
+            condiciones.append('fecha < ?')
+            parametros.append(hasta + '~')
+
+        agrupar = por + ['periodo']
+        sql = (
+            f"SELECT {', '.join(por + [expresion_periodo + ' AS periodo'])}, "
+            "count(*), sum(cantidad), sum(agua), sum(energia), sum(co2) FROM usos"
+            + (f" WHERE {' AND '.join(condiciones)}" if condiciones else '')
+            + f" GROUP BY {', '.join(agrupar)} ORDER BY {', '.join(agrupar)}"
+        )
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            filas = conexion.execute(sql, parametros).fetchall()
+        finally:
+            conexion.close()
+        campos = agrupar + ['registros', 'cantidad', 'agua', 'energia', 'co2']
+        return [dict(zip(campos, fila)) for fila in filas]
+
+    def acumular(self, grupos):
+        """
+        Suma totales ya agregados (ej: de la ingesta) a los acumulados, en una transacción.
+
+        No pasan por la cola ni por la tabla usos: solo actualizan los buckets.
+
+        Args:
+            grupos: iterable de (periodo, modelo, tipo_consulta, registros,
+                cantidad, agua, energia, co2), ver sumar_acumulados
+
+        Returns:
+            cantidad de buckets actualizados
+        """
+        buckets = sumar_acumulados(grupos)
+        conexion = conectar(self.ruta)
+        try:
+            with conexion:
+                _escribir_acumulados(conexion, buckets)
+        finally:
+            conexion.close()
+        return len(buckets)
+
+    def acumulados(self, periodo='mes', desde=None, hasta=None, por=('modelo', 'tipo_consulta'), **filtros):
+        """
+        Totales leídos de los acumulados materializados (sin recorrer la tabla usos).
+
+        Incluye lo registrado por la app (ya escrito) y lo ingerido con --registro.
+
+        Args:
+            periodo: 'dia', 'mes', 'anio' o 'total' (suma de los años)
+            desde, hasta: prefijos de fecha inclusive, truncados a la granularidad
+            por: columnas entre modelo y tipo_consulta por las que agrupar
+            filtros: igualdad sobre modelo o tipo_consulta
+
+        Returns:
+            lista de dicts {<por>..., periodo, registros, cantidad, agua, energia, co2}
+
+        Raises:
+            ValueError si una columna o el periodo no son válidos
+        """
+        por = list(por)
+        for columna in por + list(filtros):
+            if columna not in ('modelo', 'tipo_consulta'):
+                raise ValueError(f"columna no válida: {columna!r}; usar modelo, tipo_consulta")
+        if periodo not in GRANULARIDADES + ('total',):
+            raise ValueError(f"periodo no válido: {periodo!r}; usar {', '.join(GRANULARIDADES)} o total")
+
+        granularidad = 'anio' if periodo == 'total' else periodo
+        largo = PERIODOS[granularidad]
+        condiciones, parametros = ['granularidad = ?'], [granularidad]
+        for columna, valor in filtros.items():
+            if valor is not None:
+                condiciones.append(f'{columna} = ?')
+                parametros.append(valor)
+        if desde:
+            condiciones.append('periodo >= ?')
+            parametros.append(desde[:largo])
+        if hasta:
+            condiciones.append('periodo <= ?')
+            parametros.append(hasta[:largo])
+
+        agrupar = por + ['periodo']
+        expresion_periodo = "'total'" if periodo == 'total' else 'periodo'
+        sql = (
+            f"SELECT {', '.join(por + [expresion_periodo + ' AS periodo'])}, "
+            "sum(registros), sum(cantidad), sum(agua), sum(energia), sum(co2) FROM acumulados"
+            f" WHERE {' AND '.join(condiciones)}"
+            f" GROUP BY {', '.join(agrupar)} ORDER BY {', '.join(agrupar)}"
+        )
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            filas = conexion.execute(sql, parametros).fetchall()
+        finally:
+            conexion.close()
+        campos = agrupar + ['registros', 'cantidad', 'agua', 'energia', 'co2']
+        return [dict(zip(campos, fila)) for fila in filas]
+
+    def info(self):
+        """
+        Estado de la cola de escritura de este proceso.
+        """
+        return {
+            'ruta': self.ruta,
+            'pendientes': self.pendientes(),
+            'escritos': self.escritos,
+            'descartados': self.descartados,
+            'ultimo_error': self.ultimo_error,
+        }
+
+
+def desde_entorno():
+    """
+    Crea el registro en la ruta de ECOAI_REGISTRO_DB, o retorna None si no está definida.
+    """
+    ruta = os.environ.get('ECOAI_REGISTRO_DB')
+    return RegistroUso(ruta) if ruta else None
@@ -0,0 +1,477 @@
+"""
+Trabajos en segundo plano: impacto de archivos de registros de uso subidos a la API.
+
+Procesar una exportación grande dentro de la request superaría el timeout de
+los workers de gunicorn. En cambio, la request solo copia el archivo a disco
+(en streaming) y retorna un id; el archivo se procesa en un pool acotado de
+ECOAI_TRABAJOS_PROCESOS procesos (1 por defecto; 0 usa un thread del worker)
+con el mismo código que `python -m utils ingerir`.
+
+Todo el estado vive en ECOAI_TRABAJOS_DIR, un directorio por trabajo:
+
+    <id>/entrada.csv | entrada.ndjson   el archivo subido
+    <id>/estado.json                    estado, progreso (bytes y filas) y totales
+    <id>/resultados.csv                 cada registro con su agua, energía y CO2
+    <id>/agregados.csv | agregados.json totales por modelo, tipo y periodo
+    <id>/candado                        flock del proceso que lo está procesando
+
+Así cualquier worker responde el progreso de cualquier trabajo, y un trabajo
+sobrevive a los reinicios: los que quedan pendientes o a medias (sin nadie que
+tenga su candado) se vuelven a encolar al iniciar el worker o al consultarlos,
+y se procesan desde el principio. El flock asegura que un trabajo encolado en
+varios workers se procese una sola vez.
+"""
+
+import csv
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin exclusión entre procesos
+    fcntl = None
+
+from . import ingesta
+
+# Columnas de resultados.csv
+CAMPOS_RESULTADOS = ('registro', 'modelo', 'tipo_consulta', 'cantidad', 'fecha', 'region',
+                     'agua', 'energia', 'co2', 'error')
+
+# Segundos mínimos entre escrituras del progreso en estado.json
+INTERVALO_PROGRESO = 0.5
+
+# Los trabajos terminados (o con error) se borran pasado este tiempo
+RETENCION_SEGUNDOS = 7 * 24 * 3600
+
+# Intentos de procesar un trabajo interrumpido (ej: proceso sin memoria) antes de marcarlo con error
+MAX_INTENTOS = 3
+
+# Bloque de copia al guardar el archivo subido
+TAMANO_COPIA = 1024 * 1024
+
+_ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+
+# Gestores vivos, para reiniciar su pool en el proceso hijo tras un fork
+_gestores = weakref.WeakSet()
+
+
+def _tras_fork():
+    # El pool (threads o procesos hijos) es del padre; el hijo crea el suyo al usarlo
+    for gestor in _gestores:
+        gestor._lock = threading.Lock()
+        gestor._pool = None
+        gestor._pid = None
+        gestor._en_cola = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def _leer_json(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _escribir_json(ruta, datos):
+    # Escritura atómica: quien lee ve el estado anterior o el nuevo, nunca uno a medias
+    temporal = ruta.with_name(f'{ruta.name}.{os.getpid()}.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        # allow_nan=False: un NaN o inf haría inválido el JSON de /api/trabajos/<id>
+        json.dump(datos, f, ensure_ascii=False, allow_nan=False)
+    os.replace(temporal, ruta)
+
+
+def _tomar_candado(archivo):
+    """True si este proceso obtuvo el flock del trabajo (nadie más lo está procesando)."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def procesar(directorio):
+    """
+    Procesa un trabajo: puntúa cada registro, agrega por periodo y guarda los resultados.
+
+    Se ejecuta en el pool. Si otro proceso tiene el candado del trabajo, o el
+    trabajo ya terminó, no hace nada.
+
+    Args:
+        directorio: directorio del trabajo
+
+    Returns:
+        el estado final, o None si lo está procesando otro proceso
+    """
+    directorio = Path(directorio)
+    with open(directorio / 'candado', 'a') as candado:
+        if not _tomar_candado(candado):
+            return None
+        estado = _leer_json(directorio / 'estado.json')
+        if estado['estado'] in ('terminado', 'error'):
+            return estado
+
+        estado['intentos'] = estado.get('intentos', 0) + 1
+        if estado['intentos'] > MAX_INTENTOS:
+            estado.update(estado='error', terminado_en=time.time(),
+                          error=f"Error: el procesamiento se interrumpió {MAX_INTENTOS} veces")
+            _escribir_json(directorio / 'estado.json', estado)
+            return estado
+
+        entrada = directorio / estado['archivo']
+        estado.update(estado='procesando', iniciado_en=time.time(), bytes_leidos=0, registros=0, errores=0,
+                      error=None)
+        estado['bytes_total'] = entrada.stat().st_size
+        estado['actualizado_en'] = estado['iniciado_en']
+        _escribir_json(directorio / 'estado.json', estado)
+        try:
+            _puntuar(directorio, entrada, estado)
+        except Exception as e:
+            # Cualquier falla del procesamiento (archivo ilegible, csv.Error, un
+            # error de programa) es determinística: se registra y no se reintenta
+            (directorio / 'resultados.csv.tmp').unlink(missing_ok=True)
+            if isinstance(e, (OSError, ValueError)):
+                mensaje = str(e)
+            elif isinstance(e, csv.Error):
+                mensaje = f"CSV mal formado: {e}"
+            else:
+                mensaje = f"{type(e).__name__}: {e}"
+            estado.pop('totales', None)
+            estado.update(estado='error', error=f"Error: {mensaje}", terminado_en=time.time())
+            _escribir_json(directorio / 'estado.json', estado)
+        return estado
+
+
+def _finito(valor):
+    # Total redondeado, o None si no es finito (no debería pasar: la ingesta
+    # descarta cantidades no finitas o mayores que CANTIDAD_MAXIMA)
+    return round(valor, 4) if math.isfinite(valor) else None
+
+
+def _puntuar(directorio, entrada, estado):
+    if estado['formato'] == 'csv':
+        with open(entrada, encoding='utf-8-sig', newline='') as f:
+            ingesta.validar_encabezado(next(csv.reader(f), []))
+    leidos = [0]
+
+    def lineas(f):
+        for linea in f:
+            leidos[0] += len(linea)
+            yield linea.decode('utf-8')
+
+    agregado = ingesta.nuevo_agregado()
+    totales = [0.0, 0.0, 0.0]
+    registro = 0
+    proximo = time.monotonic() + INTERVALO_PROGRESO
+    temporal = directorio / 'resultados.csv.tmp'
+    with open(entrada, 'rb') as f, open(temporal, 'w', encoding='utf-8', newline='') as salida:
+        ingesta.saltar_bom(f)
+        escritor = csv.writer(salida, lineterminator='\n')
+        escritor.writerow(CAMPOS_RESULTADOS)
+        for bloque in ingesta.en_bloques(ingesta.leer_lineas(lineas(f), estado['formato']), ingesta.TAMANO_BLOQUE):
+            impactos = []
+            ingesta.agregar_registros(bloque, estado['por'], agregado, impactos)
+            filas = []
+            for (modelo, tipo_consulta, cantidad, fecha, region), impacto in zip(bloque, impactos):
+                registro += 1
+                if impacto is None:
+                    filas.append((registro, modelo, tipo_consulta, cantidad, fecha, region, '', '', '',
+                                  'registro inválido'))
+                    continue
+                agua, energia, co2 = impacto
+                totales[0] += agua
+                totales[1] += energia
+                totales[2] += co2
+                filas.append((registro, modelo, tipo_consulta, cantidad, fecha, region,
+                              round(agua, 6), round(energia, 6), round(co2, 6), ''))
+            escritor.writerows(filas)
+            if time.monotonic() >= proximo:
+                estado.update(bytes_leidos=leidos[0], registros=agregado['registros'],
+                              errores=agregado['errores'], actualizado_en=time.time())
+                _escribir_json(directorio / 'estado.json', estado)
+                proximo = time.monotonic() + INTERVALO_PROGRESO
+    os.replace(temporal, directorio / 'resultados.csv')
+
+    for formato in ('csv', 'json'):
+        with open(directorio / f'agregados.{formato}', 'w', encoding='utf-8', newline='') as salida:
+            ingesta.escribir_resultado(agregado, salida, formato)
+    ahora = time.time()
+    estado.update(
+        estado='terminado',
+        bytes_leidos=leidos[0],
+        registros=agregado['registros'],
+        errores=agregado['errores'],
+        sin_perfil=agregado['sin_perfil'],
+        grupos=len(agregado['grupos']),
+        totales={'agua': _finito(totales[0]), 'energia': _finito(totales[1]), 'co2': _finito(totales[2])},
+        actualizado_en=ahora,
+        terminado_en=ahora,
+    )
+    _escribir_json(directorio / 'estado.json', estado)
+
+
+def progreso(estado, ahora=None):
+    """
+    Agrega al estado el porcentaje leído, la velocidad y el tiempo estimado restante.
+
+    La estimación usa los bytes leídos del archivo (no hace falta contar las
+    filas antes de empezar): registros_estimados y eta_segundos suponen que el
+    resto del archivo tiene el mismo largo medio por registro.
+    """
+    estado = dict(estado)
+    total = estado.get('bytes_total') or 0
+    leidos = estado.get('bytes_leidos') or 0
+    estado['porcentaje'] = 100.0 if estado['estado'] == 'terminado' else \
+        round(100 * leidos / total, 1) if total else 0.0
+    estado['eta_segundos'] = 0.0 if estado['estado'] == 'terminado' else None
+    estado['registros_estimados'] = estado.get('registros') if estado['estado'] == 'terminado' else None
+    if estado['estado'] == 'procesando' and leidos:
+        ahora = time.time() if ahora is None else ahora
+        transcurrido = max(estado['actualizado_en'] - estado['iniciado_en'], 1e-6)
+        velocidad = leidos / transcurrido
+        restante = (total - leidos) / velocidad - (ahora - estado['actualizado_en'])
+        estado['eta_segundos'] = round(max(restante, 0.0), 1)
+        estado['registros_por_segundo'] = round(estado['registros'] / transcurrido, 1)
+        estado['registros_estimados'] = round(estado['registros'] * total / leidos)
+    return estado
+
+
+class GestorTrabajos:
+    """
+    Crea trabajos, los encola en el pool y consulta su estado en el directorio compartido.
+
+    Args:
+        directorio: ECOAI_TRABAJOS_DIR (se crea si no existe)
+        procesos: tamaño del pool de procesos; 0 procesa en un thread del worker
+    """
+
+    def __init__(self, directorio, procesos=1):
+        self.directorio = Path(directorio)
+        self.procesos = procesos
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._en_cola = {}      # id -> future de los trabajos encolados por este proceso
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        _gestores.add(self)
+
+    def _directorio(self, id_trabajo):
+        if not isinstance(id_trabajo, str) or not _ID_VALIDO.match(id_trabajo):
+            return None
+        directorio = self.directorio / id_trabajo
+        return directorio if (directorio / 'estado.json').exists() else None
+
+    def _encolar(self, id_trabajo):
+        with self._lock:
+            futuro = self._en_cola.get(id_trabajo)
+            if futuro is not None and not futuro.done():
+                return
+            if self._pid != os.getpid() or self._pool is None:
+                self._pid = os.getpid()
+                self._pool = self._crear_pool()
+            try:
+                futuro = self._pool.submit(procesar, str(self.directorio / id_trabajo))
+            except BrokenProcessPool:
+                # Un hijo murió (ej: sin memoria): se descarta el pool y se crea otro
+                self._pool = self._crear_pool()
+                futuro = self._pool.submit(procesar, str(self.directorio / id_trabajo))
+            self._en_cola[id_trabajo] = futuro
+        futuro.add_done_callback(lambda f: self._terminado(id_trabajo, f))
+
+    def _crear_pool(self):
+        if self.procesos <= 0:
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix='trabajos')
+        # spawn: el worker de gunicorn puede tener threads, que no sobreviven a un fork
+        return ProcessPoolExecutor(max_workers=self.procesos, mp_context=get_context('spawn'))
+
+    def _terminado(self, id_trabajo, futuro):
+        with self._lock:
+            if self._en_cola.get(id_trabajo) is futuro:
+                del self._en_cola[id_trabajo]
+        if not futuro.cancelled() and futuro.exception() is not None:
+            print(f"trabajos: falló el trabajo {id_trabajo}: {futuro.exception()!r}", file=sys.stderr)
+
+    def _huerfano(self, directorio):
+        """True si nadie tiene el candado del trabajo (quedó a medias por un reinicio)."""
+        with open(directorio / 'candado', 'a') as candado:
+            return _tomar_candado(candado)
+
+    def crear(self, flujo, formato, por='mes', nombre='', max_bytes=None):
+        """
+        Guarda el archivo subido y encola su procesamiento.
+
+        Args:
+            flujo: archivo binario (ej: request.stream o el archivo de un form)
+            formato: 'csv' o 'ndjson'
+            por: periodo de agrupación de los agregados
+            nombre: nombre original del archivo (informativo)
+            max_bytes: tamaño máximo aceptado
+
+        Returns:
+            el estado inicial del trabajo
+
+        Raises:
+            ValueError si el formato o el periodo no son válidos o el archivo supera max_bytes
+        """
+        if formato not in ('csv', 'ndjson'):
+            raise ValueError(f"Error: formato no válido: {formato} (usar csv o ndjson)")
+        if por not in ingesta.PERIODOS:
+            raise ValueError(f"Error: periodo no válido: {por}")
+        self.purgar()
+
+        id_trabajo = uuid.uuid4().hex
+        directorio = self.directorio / id_trabajo
+        directorio.mkdir()
+        archivo = f'entrada.{formato}'
+        copiados = 0
+        try:
+            with open(directorio / archivo, 'wb') as destino:
+                while True:
+                    bloque = flujo.read(TAMANO_COPIA)
+                    if not bloque:
+                        break
+                    copiados += len(bloque)
+                    if max_bytes is not None and copiados > max_bytes:
+                        raise ValueError(f"Error: el archivo supera el máximo de {max_bytes} bytes")
+                    destino.write(bloque)
+        except BaseException:
+            shutil.rmtree(directorio, ignore_errors=True)
+            raise
+
+        estado = {
+            'id': id_trabajo,
+            'estado': 'pendiente',
+            'nombre': nombre or '',
+            'archivo': archivo,
+            'formato': formato,
+            'por': por,
+            'creado_en': time.time(),
+            'bytes_total': copiados,
+            'bytes_leidos': 0,
+            'registros': 0,
+            'errores': 0,
+        }
+        _escribir_json(directorio / 'estado.json', estado)
+        self._encolar(id_trabajo)
+        return progreso(estado)
+
+    def estado(self, id_trabajo):
+        """
+        Estado y progreso de un trabajo (ver progreso()), o None si no existe.
+
+        Un trabajo sin terminar que nadie está procesando se vuelve a encolar.
+        """
+        directorio = self._directorio(id_trabajo)
+        if directorio is None:
+            return None
+        estado = _leer_json(directorio / 'estado.json')
+        if estado['estado'] in ('pendiente', 'procesando') and id_trabajo not in self._en_cola \
+                and self._huerfano(directorio):
+            self._encolar(id_trabajo)
+        return progreso(estado)
+
+    def listar(self, limite=50):
+        """
+        Los últimos trabajos creados (más recientes primero).
+        """
+        estados = []
+        for directorio in self.directorio.iterdir():
+            try:
+                estados.append(_leer_json(directorio / 'estado.json'))
+            except (OSError, ValueError):
+                continue
+        estados.sort(key=lambda e: e['creado_en'], reverse=True)
+        return [progreso(e) for e in estados[:limite]]
+
+    def archivo(self, id_trabajo, nombre):
+        """
+        Ruta de un archivo de resultados ('resultados.csv', 'agregados.csv' o 'agregados.json').
+
+        Returns:
+            (estado, ruta): ruta es None si el trabajo no terminó; (None, None) si no existe
+        """
+        estado = self.estado(id_trabajo)
+        if estado is None:
+            return None, None
+        if estado['estado'] != 'terminado':
+            return estado, None
+        return estado, self.directorio / id_trabajo / nombre
+
+    def reanudar(self):
+        """
+        Encola los trabajos pendientes o a medias que nadie está procesando (al iniciar un worker).
+
+        Returns:
+            cantidad de trabajos encolados
+        """
+        encolados = 0
+        for directorio in self.directorio.iterdir():
+            try:
+                estado = _leer_json(directorio / 'estado.json')
+            except (OSError, ValueError):
+                continue
+            if estado['estado'] in ('pendiente', 'procesando') and self._huerfano(directorio):
+                self._encolar(estado['id'])
+                encolados += 1
+        return encolados
+
+    def purgar(self, ahora=None):
+        """
+        Borra los trabajos terminados (o con error) hace más de RETENCION_SEGUNDOS.
+        """
+        limite = (time.time() if ahora is None else ahora) - RETENCION_SEGUNDOS
+        for directorio in self.directorio.iterdir():
+            try:
+                estado = _leer_json(directorio / 'estado.json')
+            except (OSError, ValueError):
+                continue
+            if estado['estado'] in ('terminado', 'error') and estado.get('terminado_en', limite) < limite:
+                shutil.rmtree(directorio, ignore_errors=True)
+
+    def esperar(self, id_trabajo, timeout=30.0):
+        """
+        Espera a que un trabajo termine (usado en tests y benchmarks).
+
+        Returns:
+            el estado final, o el último estado si se cumplió el timeout
+        """
+        limite = time.monotonic() + timeout
+        while True:
+            estado = self.estado(id_trabajo)
+            if estado is None or estado['estado'] in ('terminado', 'error') or time.monotonic() >= limite:
+                return estado
+            time.sleep(0.02)
+
+
+def desde_entorno():
+    """
+    Crea el gestor en ECOAI_TRABAJOS_DIR, o retorna None si no está definida.
+
+    Raises:
+        ValueError si ECOAI_TRABAJOS_PROCESOS no es un entero >= 0
+    """
+    directorio = os.environ.get('ECOAI_TRABAJOS_DIR')
+    if not directorio:
+        return None
+    try:
+        procesos = int(os.environ.get('ECOAI_TRABAJOS_PROCESOS') or 1)
+    except ValueError:
+        procesos = -1
+    if procesos < 0:
+        raise ValueError("ECOAI_TRABAJOS_PROCESOS debe ser un entero mayor o igual a 0")
+    return GestorTrabajos(directorio, procesos)